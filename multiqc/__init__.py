@@ -4,3 +4,5 @@ from multiqc.utils import config
 config.logger = logging.getLogger(__name__)
 
 __version__ = config.version
+
+from multiqc.multiqc import run
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+
+""" MultiQC: A modular tool to aggregate results from bioinformatics analyses across many samples into a single report
+
+Run with `python -m multiqc` or using the `multiqc` command line script.
+Use `multiqc serve` to serve a report from memory instead of writing a file.
+"""
+
+import pkg_resources
+import sys
+
+from multiqc import multiqc
+from multiqc.utils import serve
+
+def run_multiqc():
+    # Serve a report instead of writing one
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve.serve_cli(args=sys.argv[2:], prog_name='multiqc serve')
+    # Add any extra plugin command line options
+    for entry_point in pkg_resources.iter_entry_points('multiqc.cli_options.v1'):
+        opt_func = entry_point.load()
+        multiqc.run_cli = opt_func(multiqc.run_cli)
+    # Modify the default click error handling
+    multiqc.modify_usage_error(multiqc.run_cli)
+    # Call the main function
+    multiqc.run_cli(prog_name='multiqc')
+
+if __name__ == "__main__":
+    run_multiqc()
@@ -3,17 +3,20 @@
 """ MultiQC modules base class, contains helper functions """
 
 from __future__ import print_function
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import io
 import fnmatch
 import logging
 import markdown
 import mimetypes
+import multiprocessing
 import os
 import re
 import textwrap
 
 from multiqc.utils import report, config, util_functions
+from multiqc.utils.mapped_file import MappedFile
+from multiqc.utils.regex_extractor import get_extractor
 logger = logging.getLogger(__name__)
 
 class BaseMultiqcModule(object):
@@ -58,14 +61,22 @@ class BaseMultiqcModule(object):
 
         self.sections = list()
 
-    def find_log_files(self, sp_key, filecontents=True, filehandles=False):
+    def find_log_files(self, sp_key, filecontents=True, filehandles=False, filemap=False):
         """
         Return matches log files of interest.
         :param sp_key: Search pattern key specified in config
         :param filehandles: Set to true to return a file handle instead of slurped file contents
+        :param filemap: Set to true to return a read-only memory-mapped file (MappedFile)
+                        instead of slurped file contents. Use f['f'].lines() to iterate over
+                        lines and f['f'].finditer() to search it with a regex.
+                        lines() raises UnicodeDecodeError if it reaches text that
+                        isn't valid UTF-8, so the module can skip that file.
+                        Files larger than config.log_filesize_limit are read according to the
+                        search pattern's large_files policy. Memory-mapped files are always
+                        read in full, as they are only read as far as the module needs.
         :return: Yields a dict with filename (fn), root directory (root), cleaned sample name
-                 generated from the filename (s_name) and either the file contents or file handle
-                 for the current matched file (f).
+                 generated from the filename (s_name) and either the file contents, file handle
+                 or mapped file for the current matched file (f).
                  As yield is used, the results can be iterated over without loading all files at once
         """
 
@@ -76,10 +87,7 @@ class BaseMultiqcModule(object):
 
         # Old, depreciated syntax support. Likely to be removed in a future version.
         if isinstance(sp_key, dict):
-            report.files[self.name] = list()
-            for sf in report.searchfiles:
-                if report.search_file(sp_key, {'fn': sf[0], 'root': sf[1]}):
-                    report.files[self.name].append({'fn': sf[0], 'root': sf[1]})
+            report.files[self.name] = report.file_index.search(sp_key)
             sp_key = self.name
             logwarn = "Depreciation Warning: {} - Please use new style for find_log_files()".format(self.name)
             if len(report.files[self.name]) > 0:
@@ -89,10 +97,16 @@ class BaseMultiqcModule(object):
         elif not isinstance(sp_key, str):
             logger.warn("Did not understand find_log_files() search key")
             return
+        large_files = report.large_files_policy(config.sp.get(sp_key, {}))
 
-        for f in report.files[sp_key]:
+        # Sample names are cleaned when files are found, unless this module cleans them differently
+        default_clean = getattr(type(self).clean_s_name, '__func__', type(self).clean_s_name) is \
+            getattr(BaseMultiqcModule.clean_s_name, '__func__', BaseMultiqcModule.clean_s_name)
+
+        for found in report.files[sp_key]:
             # Make a note of the filename so that we can report it if something crashes
-            report.last_found_file = os.path.join(f['root'], f['fn'])
+            report.last_found_file = found.path
+            f = found.as_dict()
 
             # Filter out files based on exclusion patterns
             if path_filters_exclude and len(path_filters_exclude) > 0:
@@ -111,24 +125,53 @@ class BaseMultiqcModule(object):
                     logger.debug("{} - Selecting '{}' as it matched the path_filters for '{}'".format(sp_key, f['fn'], self.name))
 
             # Make a sample name from the filename
-            f['s_name'] = self.clean_s_name(f['fn'], f['root'])
+            if not default_clean or f['s_name'] is None:
+                f['s_name'] = self.clean_s_name(f['fn'], f['root'])
+
+            policy = None
             if filehandles or filecontents:
+                policy = self._large_file_policy(f, large_files, filemap)
+            if policy in ('header', 'sample'):
+                try:
+                    contents, nbytes = report.read_large_file(found.path, policy)
+                except (IOError, OSError, ValueError, UnicodeDecodeError) as e:
+                    if config.report_readerrors:
+                        logger.debug("Couldn't read large file when returning file: {}\n{}".format(f['fn'], e))
+                    continue
+                report.bytes_read[self.name] += nbytes
+                f['f'] = io.StringIO(contents) if filehandles else contents
+                yield f
+            elif filemap:
+                try:
+                    mf = MappedFile(found.path)
+                except (IOError, OSError, ValueError) as e:
+                    if config.report_readerrors:
+                        logger.debug("Couldn't map file when returning file: {}\n{}".format(f['fn'], e))
+                    continue
+                with mf:
+                    f['f'] = mf
+                    yield f
+                    report.bytes_read[self.name] += mf.bytes_read
+            elif filehandles or filecontents:
                 try:
                     # Custom content module can now handle image files
-                    (ftype, encoding) = mimetypes.guess_type(os.path.join(f['root'], f['fn']))
+                    (ftype, encoding) = mimetypes.guess_type(found.path)
                     if ftype is not None and ftype.startswith('image'):
-                        with io.open (os.path.join(f['root'],f['fn']), "rb") as fh:
+                        with io.open (found.path, "rb") as fh:
                             # always return file handles
                             f['f'] = fh
                             yield f
+                            report.bytes_read[self.name] += fh.tell()
                     else:
                         # Everything else - should be all text files
-                        with io.open (os.path.join(f['root'],f['fn']), "r", encoding='utf-8') as fh:
+                        with io.open (found.path, "r", encoding='utf-8') as fh:
                             if filehandles:
                                 f['f'] = fh
                                 yield f
+                                report.bytes_read[self.name] += fh.buffer.tell()
                             elif filecontents:
                                 f['f'] = fh.read()
+                                report.bytes_read[self.name] += fh.buffer.tell()
                                 yield f
                 except (IOError, OSError, ValueError, UnicodeDecodeError) as e:
                     if config.report_readerrors:
@@ -137,6 +180,102 @@ class BaseMultiqcModule(object):
             else:
                 yield f
 
+    def _large_file_policy(self, f, large_files, filemap=False):
+        """ How to read a found file, logging it if the file is larger than config.log_filesize_limit.
+        Files this large are only found for search patterns with a large_files policy.
+        :param f: Found file dict
+        :param large_files: The search pattern's large_files policy
+        :param filemap: True if the file will be memory-mapped, so only read as far as needed
+        :return: 'header', 'stream' or 'sample' for large files, otherwise None
+        """
+        if large_files is None or f.get('filesize') is None or f['filesize'] <= config.log_filesize_limit:
+            return None
+        policy = 'stream' if filemap else large_files
+        logger.info("{} - '{}' is {:,} bytes, larger than log_filesize_limit. Reading {}".format(
+            self.name, f['fn'], f['filesize'], {
+                'header': 'the start of the file only',
+                'stream': 'the whole file',
+                'sample': 'a sample of lines from across the file'
+            }[policy]))
+        return policy
+
+    def map_log_files(self, sp_key, parse_fn, filecontents=True, filehandles=False, processes=None, max_in_flight=None):
+        """
+        Parse matched log files in a pool of processes.
+        Files are found as with find_log_files(), then read and parsed in the worker
+        processes. Results come back in the same order as find_log_files(), so
+        modules can add them exactly as if they had parsed each file in turn.
+        :param sp_key: Search pattern key specified in config
+        :param parse_fn: Function to parse one file. Called with the found file dict,
+                         with the file contents or file handle as f['f'] (or neither if
+                         filecontents and filehandles are both False). Must be a module-level
+                         function, and return something that can be pickled.
+        :param filecontents: Set to true to give parse_fn the file contents
+        :param filehandles: Set to true to give parse_fn a file handle instead
+        :param processes: Number of processes. Defaults to config.parse_processes, where
+                          0 uses one per CPU when at least config.parse_processes_min_files
+                          files are found. 1 parses every file in this process.
+        :param max_in_flight: Number of files being parsed or waiting to be added at
+                              once. Defaults to four per process.
+        :return: Yields a tuple of the found file dict (without 'f') and the result of
+                 parse_fn for each file. report.last_found_file is set to each file
+                 as it is yielded, and as its result is waited for.
+        """
+        found_files = self.find_log_files(sp_key, filecontents=False)
+        large_files = report.large_files_policy(config.sp.get(sp_key, {}))
+        if processes is None:
+            processes = int(getattr(config, 'parse_processes', 0) or 0)
+        if processes == 0:
+            # Starting processes is only worth it with lots of files
+            found_files = list(found_files)
+            if len(found_files) >= int(getattr(config, 'parse_processes_min_files', 50)):
+                processes = multiprocessing.cpu_count()
+            else:
+                processes = 1
+
+        pool = None
+        if processes > 1:
+            try:
+                # Worker processes may be started fresh (spawn), without user config
+                pool = multiprocessing.Pool(processes, initializer=_init_parse_worker, initargs=(config.snapshot(),))
+            except (OSError, ImportError) as e:
+                logger.debug("{} - Couldn't start processes to parse files, parsing one at a time: {}".format(self.name, e))
+        if pool is None:
+            for f in found_files:
+                report.last_found_file = os.path.join(f['root'], f['fn'])
+                policy = self._large_file_policy(f, large_files) if filecontents or filehandles else None
+                result, nbytes, read_ok = _parse_found_file(parse_fn, f, filecontents, filehandles, policy)
+                report.bytes_read[self.name] += nbytes
+                if read_ok:
+                    yield f, result
+            return
+
+        logger.debug("{} - Parsing files in {} processes".format(self.name, processes))
+        if max_in_flight is None:
+            max_in_flight = processes * 4
+        in_flight = deque()
+        try:
+            for f in found_files:
+                policy = self._large_file_policy(f, large_files) if filecontents or filehandles else None
+                in_flight.append((f, pool.apply_async(_parse_found_file, (parse_fn, f, filecontents, filehandles, policy))))
+                if len(in_flight) >= max_in_flight:
+                    for r in self._map_log_files_result(*in_flight.popleft()):
+                        yield r
+            while len(in_flight) > 0:
+                for r in self._map_log_files_result(*in_flight.popleft()):
+                    yield r
+        finally:
+            pool.terminate()
+
+    def _map_log_files_result(self, f, async_result):
+        """ Wait for the result of one file from map_log_files(). Errors from
+        parse_fn are raised here, after noting the file that caused them. """
+        report.last_found_file = os.path.join(f['root'], f['fn'])
+        result, nbytes, read_ok = async_result.get()
+        report.bytes_read[self.name] += nbytes
+        if read_ok:
+            yield f, result
+
     def add_section(self, name=None, anchor=None, description='', comment='', helptext='', plot='', content='', autoformat=True, autoformat_type='markdown'):
         """ Add a section to the module report output """
 
@@ -200,56 +339,7 @@ class BaseMultiqcModule(object):
         :config.prepend_dirs: boolean, whether to prepend dir name to s_name
         :return: The cleaned sample name, ready to be used
         """
-        s_name_original = s_name
-        if root is None:
-            root = ''
-
-        if config.fn_clean_sample_names:
-            # Split then take first section to remove everything after these matches
-            for ext in config.fn_clean_exts:
-                if type(ext) is str:
-                    ext = {'type': 'truncate', 'pattern': ext}
-                if ext['type'] == 'truncate':
-                    s_name = os.path.basename(s_name.split(ext['pattern'], 1)[0])
-                elif ext['type'] in ('remove', 'replace'):
-                    if ext['type'] == 'replace':
-                        logger.warning("use 'config.fn_clean_sample_names.remove' instead "
-                                       "of 'config.fn_clean_sample_names.replace' [deprecated]")
-                    s_name = s_name.replace(ext['pattern'], '')
-                elif ext['type'] == 'regex':
-                    s_name = re.sub(ext['pattern'], '', s_name)
-                elif ext['type'] == 'regex_keep':
-                    match = re.search(ext['pattern'], s_name)
-                    s_name = match.group() if match else s_name
-                else:
-                    logger.error('Unrecognised config.fn_clean_exts type: {}'.format(ext['type']))
-            # Trim off characters at the end of names
-            for chrs in config.fn_clean_trim:
-                if s_name.endswith(chrs):
-                    s_name = s_name[:-len(chrs)]
-                if s_name.startswith(chrs):
-                    s_name = s_name[len(chrs):]
-
-        # Prepend sample name with directory
-        if config.prepend_dirs:
-            sep = config.prepend_dirs_sep
-            root = root.lstrip('.{}'.format(os.sep))
-            dirs = [d.strip() for d in root.split(os.sep) if d.strip() != '']
-            if config.prepend_dirs_depth != 0:
-                d_idx = config.prepend_dirs_depth * -1
-                if config.prepend_dirs_depth > 0:
-                    dirs = dirs[d_idx:]
-                else:
-                    dirs = dirs[:d_idx]
-            if len(dirs) > 0:
-                s_name = "{}{}{}".format(sep.join(dirs), sep, s_name)
-
-        # Remove trailing whitespace
-        s_name = s_name.strip()
-        if s_name == '':
-            s_name = s_name_original
-
-        return s_name
+        return report.clean_s_name(s_name, root)
 
     def ignore_samples(self, data):
         """ Strip out samples which match `sample_names_ignore` """
@@ -270,6 +360,30 @@ class BaseMultiqcModule(object):
         except (TypeError, AttributeError):
             return data
 
+    def compile_regexes(self, regexes, value_type=float, flags=re.MULTILINE):
+        """ Compile a dict of metric regexes into one pattern, to find all of
+        the metrics in a single pass over a log. Each regex should capture the
+        value in its first group. Compiled regexes are cached, so this is cheap
+        to call for every file.
+        :param regexes: Dict of metric key: regex string
+        :param value_type: Function to convert values (eg. int), after removing
+                           commas. Values that can't be converted are kept as
+                           strings. None to keep all values as strings.
+        :param flags: Regex flags
+        :return: RegexExtractor - call .search(text) to get a dict of values
+        """
+        return get_extractor(regexes, value_type, flags)
+
+    def extract_values(self, contents, regexes, value_type=float, flags=re.MULTILINE):
+        """ Find the first value for each of a dict of metric regexes in some text.
+        Gives the same results as running re.search() for each regex, but only
+        reads through the text once. See compile_regexes() for the options.
+        :param contents: Text of a log file (or one line from it)
+        :param regexes: Dict of metric key: regex string
+        :return: Dict of metric key: value, for the regexes that matched
+        """
+        return get_extractor(regexes, value_type, flags).search(contents)
+
     def general_stats_addcols(self, data, headers=None, namespace=None):
         """ Helper function to add to the General Statistics variable.
         Adds to report.general_stats and does not return anything. Fills
@@ -346,3 +460,43 @@ class BaseMultiqcModule(object):
         if pconfig is None:
             pconfig = {}
         return linegraph.plot(data, pconfig)
+
+
+def _init_parse_worker(config_snapshot):
+    """ Set up a BaseMultiqcModule.map_log_files() worker process with the config of the main process """
+    config.restore(config_snapshot)
+
+def _parse_found_file(parse_fn, f, filecontents, filehandles, policy=None):
+    """ Read and parse one file for BaseMultiqcModule.map_log_files(). Runs in
+    worker processes, so read errors are logged and returned instead of raised.
+    :param policy: large_files policy, if the file is larger than config.log_filesize_limit
+    :return: Tuple of the parse_fn result, number of bytes read and whether the file could be read
+    """
+    f = dict(f)
+    if not filehandles and not filecontents:
+        return parse_fn(f), 0, True
+    if policy in ('header', 'sample'):
+        try:
+            contents, nbytes = report.read_large_file(os.path.join(f['root'], f['fn']), policy)
+        except (IOError, OSError, ValueError, UnicodeDecodeError) as e:
+            if config.report_readerrors:
+                logger.debug("Couldn't read large file when returning file: {}\n{}".format(f['fn'], e))
+            return None, 0, False
+        f['f'] = io.StringIO(contents) if filehandles else contents
+        return parse_fn(f), nbytes, True
+    try:
+        fh = io.open(os.path.join(f['root'], f['fn']), "r", encoding='utf-8')
+        if filecontents and not filehandles:
+            with fh:
+                f['f'] = fh.read()
+                nbytes = fh.buffer.tell()
+    except (IOError, OSError, ValueError, UnicodeDecodeError) as e:
+        if config.report_readerrors:
+            logger.debug("Couldn't open filehandle when returning file: {}\n{}".format(f['fn'], e))
+        return None, 0, False
+    if filehandles:
+        with fh:
+            f['f'] = fh
+            result = parse_fn(f)
+            return result, fh.buffer.tell(), True
+    return parse_fn(f), nbytes, True
@@ -1,6 +1,5 @@
-from itertools import chain
-
 from multiqc.plots import linegraph
+from multiqc.utils.histogram import Histogram
 
 def plot_ihist(samples, file_type, **plot_args):
     """ Create line graph plot for basic histogram data for 'ihist'.
@@ -9,19 +8,11 @@ def plot_ihist(samples, file_type, **plot_args):
     samples = bbmap.MultiqcModule.mod_data[file_type]
     """
 
-    sumy = sum([int(samples[sample]['data'][x][0])
-                for sample in samples
-                for x in samples[sample]['data']])
-
-    cutoff = sumy * 0.99
-    all_x = set()
-    for item in sorted(chain(*[samples[sample]['data'].items()
-                                for sample in samples])):
-        all_x.add(item[0])
-        cutoff -= item[1][0]
-        if cutoff < 0:
-            xmax = item[0]
-            break
+    # Cut the plot where the counts for all samples pass 99% of the total
+    pooled = Histogram.pooled([ Histogram.from_dict(samples[sample]['data'], count_idx=0)
+                                for sample in samples ])
+    xmax = pooled.quantile(0.99, inclusive=False)
+    all_x = set((pooled.values[pooled.values <= xmax] if xmax is not None else pooled.values).tolist())
 
     data = {
         sample: {
@@ -36,87 +36,99 @@ class StatsReportMixin():
         self.bcftools_stats_vqc_transv = dict()
         self.bcftools_stats_vqc_indels = dict()
         depth_data = dict()
-        for f in self.find_log_files('bcftools/stats'):
+        for f in self.find_log_files('bcftools/stats', filemap=True):
             s_names = list()
-            for line in f['f'].splitlines():
-                s = line.split("\t")
-                # Get the sample names - one per 'set'
-                if s[0] == "ID":
-                    s_name = self.clean_s_name(s[2], f['root'])
-                    s_names.append(s_name)
-                    if s_name in self.bcftools_stats:
-                        log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
-                    self.add_data_source(f, s_name, section='stats')
-                    self.bcftools_stats[s_name] = dict()
-                    self.bcftools_stats_indels[s_name] = dict()
-                    self.bcftools_stats_vqc_snp[s_name] = dict()
-                    self.bcftools_stats_vqc_transi[s_name] = dict()
-                    self.bcftools_stats_vqc_transv[s_name] = dict()
-                    self.bcftools_stats_vqc_indels[s_name] = dict()
-                    depth_data[s_name] = OrderedDict()
-                    self.bcftools_stats_indels[s_name][0] = None # Avoid joining line across missing 0
+            try:
+                for line in f['f'].lines():
+                    s = line.split("\t")
+                    # Get the sample names - one per 'set'
+                    if s[0] == "ID":
+                        s_name = self.clean_s_name(s[2], f['root'])
+                        s_names.append(s_name)
+                        if s_name in self.bcftools_stats:
+                            log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
+                        self.bcftools_stats[s_name] = dict()
+                        self.bcftools_stats_indels[s_name] = dict()
+                        self.bcftools_stats_vqc_snp[s_name] = dict()
+                        self.bcftools_stats_vqc_transi[s_name] = dict()
+                        self.bcftools_stats_vqc_transv[s_name] = dict()
+                        self.bcftools_stats_vqc_indels[s_name] = dict()
+                        depth_data[s_name] = OrderedDict()
+                        self.bcftools_stats_indels[s_name][0] = None # Avoid joining line across missing 0
 
-                # Parse key stats
-                if s[0] == "SN" and len(s_names) > 0:
-                    s_name = s_names[int(s[1])]
-                    field = s[2].strip()[:-1]
-                    field = field.replace(' ', '_')
-                    value = float(s[3].strip())
-                    self.bcftools_stats[s_name][field] = value
+                    # Parse key stats
+                    if s[0] == "SN" and len(s_names) > 0:
+                        s_name = s_names[int(s[1])]
+                        field = s[2].strip()[:-1]
+                        field = field.replace(' ', '_')
+                        value = float(s[3].strip())
+                        self.bcftools_stats[s_name][field] = value
 
-                # Parse transitions/transversions stats
-                if s[0] == "TSTV" and len(s_names) > 0:
-                    s_name = s_names[int(s[1])]
-                    fields = ['ts', 'tv', 'tstv', 'ts_1st_ALT', 'tv_1st_ALT', 'tstv_1st_ALT']
-                    for i, f in enumerate(fields):
-                        value = float(s[i+2].strip())
+                    # Parse transitions/transversions stats
+                    if s[0] == "TSTV" and len(s_names) > 0:
+                        s_name = s_names[int(s[1])]
+                        fields = ['ts', 'tv', 'tstv', 'ts_1st_ALT', 'tv_1st_ALT', 'tstv_1st_ALT']
+                        for i, k in enumerate(fields):
+                            value = float(s[i+2].strip())
 
-                        self.bcftools_stats[s_name][f] = value
+                            self.bcftools_stats[s_name][k] = value
 
-                # Parse substitution types
-                if s[0] == "ST" and len(s_names) > 0:
-                    s_name = s_names[int(s[1])]
+                    # Parse substitution types
+                    if s[0] == "ST" and len(s_names) > 0:
+                        s_name = s_names[int(s[1])]
 
-                    rc = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
-                    change = s[2].strip()
-                    if change not in types:
-                        change = '>'.join(rc[n] for n in change.split('>'))
+                        rc = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+                        change = s[2].strip()
+                        if change not in types:
+                            change = '>'.join(rc[n] for n in change.split('>'))
 
-                    field = 'substitution_type_{}'.format(change)
-                    value = float(s[3].strip())
-                    if field not in self.bcftools_stats[s_name]:
-                        self.bcftools_stats[s_name][field] = 0
-                    self.bcftools_stats[s_name][field] += value
+                        field = 'substitution_type_{}'.format(change)
+                        value = float(s[3].strip())
+                        if field not in self.bcftools_stats[s_name]:
+                            self.bcftools_stats[s_name][field] = 0
+                        self.bcftools_stats[s_name][field] += value
 
-                # Indel length distributions
-                if s[0] == "IDD" and len(s_names) > 0:
-                    s_name = s_names[int(s[1])]
-                    length = float(s[2].strip())
-                    count = float(s[3].strip())
-                    self.bcftools_stats_indels[s_name][length] = count
+                    # Indel length distributions
+                    if s[0] == "IDD" and len(s_names) > 0:
+                        s_name = s_names[int(s[1])]
+                        length = float(s[2].strip())
+                        count = float(s[3].strip())
+                        self.bcftools_stats_indels[s_name][length] = count
 
-                # Per-sample counts
-                if s[0] == "PSC" and len(s_names) > 0:
-                    s_name = s_names[int(s[1])]
-                    fields = ['variations_hom', 'variations_het']
-                    for i, f in enumerate(fields):
-                        self.bcftools_stats[s_name][f] = int(s[i + 4].strip())
+                    # Per-sample counts
+                    if s[0] == "PSC" and len(s_names) > 0:
+                        s_name = s_names[int(s[1])]
+                        fields = ['variations_hom', 'variations_het']
+                        for i, k in enumerate(fields):
+                            self.bcftools_stats[s_name][k] = int(s[i + 4].strip())
 
-                # Depth plots
-                if s[0] == "DP" and len(s_names) > 0:
-                    s_name = s_names[int(s[1])]
-                    bin_name = s[2].strip()
-                    percent_sites = float(s[-1].strip())
-                    depth_data[s_name][bin_name] = percent_sites
+                    # Depth plots
+                    if s[0] == "DP" and len(s_names) > 0:
+                        s_name = s_names[int(s[1])]
+                        bin_name = s[2].strip()
+                        percent_sites = float(s[-1].strip())
+                        depth_data[s_name][bin_name] = percent_sites
 
-                # Variant Qualities
-                if s[0] == "QUAL" and len(s_names) > 0:
-                    s_name = s_names[int(s[1])]
-                    quality = float(s[2].strip())
-                    self.bcftools_stats_vqc_snp[s_name][quality] = float(s[3].strip())
-                    self.bcftools_stats_vqc_transi[s_name][quality] = float(s[4].strip())
-                    self.bcftools_stats_vqc_transv[s_name][quality] = float(s[5].strip())
-                    self.bcftools_stats_vqc_indels[s_name][quality] = float(s[6].strip())
+                    # Variant Qualities
+                    if s[0] == "QUAL" and len(s_names) > 0:
+                        s_name = s_names[int(s[1])]
+                        quality = float(s[2].strip())
+                        self.bcftools_stats_vqc_snp[s_name][quality] = float(s[3].strip())
+                        self.bcftools_stats_vqc_transi[s_name][quality] = float(s[4].strip())
+                        self.bcftools_stats_vqc_transv[s_name][quality] = float(s[5].strip())
+                        self.bcftools_stats_vqc_indels[s_name][quality] = float(s[6].strip())
+            except UnicodeDecodeError as e:
+                # Don't keep anything parsed from this file so far
+                for s_name in s_names:
+                    for d in (self.bcftools_stats, self.bcftools_stats_indels, self.bcftools_stats_vqc_snp,
+                              self.bcftools_stats_vqc_transi, self.bcftools_stats_vqc_transv,
+                              self.bcftools_stats_vqc_indels, depth_data):
+                        d.pop(s_name, None)
+                if config.report_readerrors:
+                    log.debug("'{}' is not valid UTF-8 text, skipping\n{}".format(f['fn'], e))
+                continue
+            for s_name in s_names:
+                self.add_data_source(f, s_name, section='stats')
 
         # Filter to strip out ignored sample names
         self.bcftools_stats = self.ignore_samples(self.bcftools_stats)
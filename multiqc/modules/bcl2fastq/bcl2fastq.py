@@ -1,6 +1,7 @@
+from decimal import Decimal
+import heapq
 import json
 import logging
-import operator
 import os
 from collections import OrderedDict, defaultdict
 from itertools import islice
@@ -11,6 +12,27 @@ from multiqc.modules.base_module import BaseMultiqcModule
 
 log = logging.getLogger(__name__)
 
+# Stats.json files can be very big, so read them with an event-based parser if available
+try:
+    import ijson
+    JSON_ERRORS = (ValueError, ijson.common.JSONError)
+except ImportError:
+    ijson = None
+    JSON_ERRORS = (ValueError,)
+
+# Counts are summed for each lane and sample as flat lists, in this order
+COUNT_FIELDS = ['total', 'total_yield', 'perfectIndex', 'yieldQ30', 'qscore_sum',
+    'R1_yield', 'R2_yield', 'R1_Q30', 'R2_Q30', 'R1_trimmed_bases', 'R2_trimmed_bases']
+TOTAL, TOTAL_YIELD, PERFECT_INDEX, YIELD_Q30, QSCORE_SUM = range(5)
+# Read number: index of yield, Q30 yield and trimmed bases
+READ_FIELDS = {
+    1: (COUNT_FIELDS.index('R1_yield'), COUNT_FIELDS.index('R1_Q30'), COUNT_FIELDS.index('R1_trimmed_bases')),
+    2: (COUNT_FIELDS.index('R2_yield'), COUNT_FIELDS.index('R2_Q30'), COUNT_FIELDS.index('R2_trimmed_bases')),
+}
+# Order of the summed counts for each sample in the output
+SAMPLE_FIELDS = ['total', 'total_yield', 'R1_yield', 'R2_yield', 'perfectIndex', 'yieldQ30',
+    'R1_Q30', 'R2_Q30', 'R1_trimmed_bases', 'R2_trimmed_bases', 'qscore_sum']
+
 
 class MultiqcModule(BaseMultiqcModule):
     def __init__(self):
@@ -25,7 +47,7 @@ class MultiqcModule(BaseMultiqcModule):
 
         # Gather data from all json files
         self.bcl2fastq_data = dict()
-        for myfile in self.find_log_files('bcl2fastq'):
+        for myfile in self.find_log_files('bcl2fastq', filehandles=True):
             self.parse_file_as_json(myfile)
 
         # Collect counts by lane and sample (+source_files)
@@ -141,208 +163,66 @@ class MultiqcModule(BaseMultiqcModule):
         )
 
     def parse_file_as_json(self, myfile):
+        """ Add the counts from one Stats.json file. Read with an event-based
+        parser if ijson is installed, so that the file is never loaded as a
+        whole object tree. """
+        top_barcodes = getattr(config, 'bcl2fastq_top_unknown_barcodes', 20)
+        stats = Bcl2fastqStats(os.path.join(myfile['root'], myfile["fn"]), top_barcodes)
         try:
-            content = json.loads(myfile["f"])
-        except ValueError:
+            if ijson is not None:
+                parse_stats_events(myfile["f"].buffer, stats)
+            else:
+                parse_stats_tree(json.load(myfile["f"], object_pairs_hook=OrderedDict), stats)
+        except JSON_ERRORS:
             log.warn('Could not parse file as json: {}'.format(myfile["fn"]))
             return
-        runId = content["RunId"]
-        if runId not in self.bcl2fastq_data:
-            self.bcl2fastq_data[runId] = dict()
-        run_data = self.bcl2fastq_data[runId]
-        for conversionResult in content.get("ConversionResults", []):
-            l = conversionResult["LaneNumber"]
-            lane = 'L{}'.format(conversionResult["LaneNumber"])
-            if lane in run_data:
-                log.debug("Duplicate runId/lane combination found! Overwriting: {}".format(self.prepend_runid(runId, lane)))
-            run_data[lane] = {
-                "total": 0,
-                "total_yield": 0,
-                "perfectIndex": 0,
-                "samples": dict(),
-                "yieldQ30": 0,
-                "qscore_sum": 0
-            }
-            # simplify the population of dictionaries
-            rlane = run_data[lane]
-
-            # Add undetermined barcodes
-            try:
-                unknown_barcode = content['UnknownBarcodes'][l - 1]['Barcodes']
-            except IndexError:
-                unknown_barcode = next(
-                    (item['Barcodes'] for item in content['UnknownBarcodes'] if item['Lane'] == 8),
-                    None
-                )
-            run_data[lane]['unknown_barcodes'] = unknown_barcode
-
-            for demuxResult in conversionResult.get("DemuxResults", []):
-                if demuxResult["SampleName"] == demuxResult["SampleName"]:
-                    sample = demuxResult["SampleName"]
-                else:
-                    sample = "{}-{}".format(demuxResult["SampleId"], demuxResult["SampleName"])
-                if sample in run_data[lane]["samples"]:
-                    log.debug("Duplicate runId/lane/sample combination found! Overwriting: {}, {}".format(self.prepend_runid(runId, lane), sample))
-                run_data[lane]["samples"][sample] = {
-                    "total": 0,
-                    "total_yield": 0,
-                    "perfectIndex": 0,
-                    "filename": os.path.join(myfile['root'], myfile["fn"]),
-                    "yieldQ30": 0,
-                    "qscore_sum": 0,
-                    "R1_yield": 0,
-                    "R2_yield": 0,
-                    "R1_Q30": 0,
-                    "R2_Q30": 0,
-                    "R1_trimmed_bases": 0,
-                    "R2_trimmed_bases": 0
-                }
-                # simplify the population of dictionnaries
-                lsample = run_data[lane]["samples"][sample]
-                rlane["total"] += demuxResult["NumberReads"]
-                rlane["total_yield"] += demuxResult["Yield"]
-                lsample["total"] += demuxResult["NumberReads"]
-                lsample["total_yield"] += demuxResult["Yield"]
-                for indexMetric in demuxResult.get("IndexMetrics", []):
-                    rlane["perfectIndex"] += indexMetric["MismatchCounts"]["0"]
-                    lsample["perfectIndex"] += indexMetric["MismatchCounts"]["0"]
-                for readMetric in demuxResult.get("ReadMetrics", []):
-                    r = readMetric["ReadNumber"]
-                    rlane["yieldQ30"] += readMetric["YieldQ30"]
-                    rlane["qscore_sum"] += readMetric["QualityScoreSum"]
-                    lsample["yieldQ30"] += readMetric["YieldQ30"]
-                    lsample["qscore_sum"] += readMetric["QualityScoreSum"]
-                    lsample["R{}_yield".format(r)] += readMetric["Yield"]
-                    lsample["R{}_Q30".format(r)] += readMetric["YieldQ30"]
-                    lsample["R{}_trimmed_bases".format(r)] += readMetric["TrimmedBases"]
-            undeterminedYieldQ30 = 0
-            undeterminedQscoreSum = 0
-            undeterminedTrimmedBases = 0
-            if "Undetermined" in conversionResult:
-                for readMetric in conversionResult["Undetermined"]["ReadMetrics"]:
-                    undeterminedYieldQ30 += readMetric["YieldQ30"]
-                    undeterminedQscoreSum += readMetric["QualityScoreSum"]
-                    undeterminedTrimmedBases += readMetric["TrimmedBases"]
-                run_data[lane]["samples"]["undetermined"] = {
-                    "total": conversionResult["Undetermined"]["NumberReads"],
-                    "total_yield": conversionResult["Undetermined"]["Yield"],
-                    "perfectIndex": 0,
-                    "yieldQ30": undeterminedYieldQ30,
-                    "qscore_sum": undeterminedQscoreSum,
-                    "trimmed_bases": undeterminedTrimmedBases
-                }
-
-        # Calculate Percents and averages
-        for lane_id, lane in run_data.items():
-            try:
-                lane["percent_Q30"] = (float(lane["yieldQ30"])
-                    / float(lane["total_yield"])) * 100.0
-            except ZeroDivisionError:
-                lane["percent_Q30"] = "NA"
-            try:
-                lane["percent_perfectIndex"] = (float(lane["perfectIndex"])
-                    / float(lane["total"])) * 100.0
-            except ZeroDivisionError:
-                lane["percent_perfectIndex"] = "NA"
-            try:
-                lane["mean_qscore"] = float(lane["qscore_sum"]) / float(lane["total_yield"])
-            except ZeroDivisionError:
-                lane["mean_qscore"] = "NA"
-            for sample_id, sample in lane["samples"].items():
-                try:
-                    sample["percent_Q30"] = (float(sample["yieldQ30"])
-                        / float(sample["total_yield"])) * 100.0
-                except ZeroDivisionError:
-                    sample["percent_Q30"] = "NA"
-                try:
-                    sample["percent_perfectIndex"] = (float(sample["perfectIndex"])
-                        / float(sample["total"])) * 100.0
-                except ZeroDivisionError:
-                    sample["percent_perfectIndex"] = "NA"
-                try:
-                    sample["mean_qscore"] = float(sample["qscore_sum"]) / float(sample["total_yield"])
-                except ZeroDivisionError:
-                    sample["mean_qscore"] = "NA"
+        if stats.run_id is None:
+            log.warn('Could not find RunId in file: {}'.format(myfile["fn"]))
+            return
+        run_data = self.bcl2fastq_data.setdefault(stats.run_id, OrderedDict())
+        for lane_number, lane in stats.lanes.items():
+            lane_id = 'L{}'.format(lane_number)
+            if lane_id in run_data:
+                log.debug("Duplicate runId/lane combination found! Overwriting: {}".format(self.prepend_runid(stats.run_id, lane_id)))
+            lane['unknown_barcodes'] = stats.get_unknown_barcodes(lane_number)
+            run_data[lane_id] = lane
 
     def split_data_by_lane_and_sample(self):
+        sample_counts = OrderedDict()
         for run_id, r in self.bcl2fastq_data.items():
             for lane_id, lane in r.items():
                 uniqLaneName = self.prepend_runid(run_id, lane_id)
-                self.bcl2fastq_bylane[uniqLaneName] = {
-                    "total": lane["total"],
-                    "total_yield": lane["total_yield"],
-                    "perfectIndex": lane["perfectIndex"],
-                    "undetermined": lane["samples"].get("undetermined", {}).get("total", "NA"),
-                    "yieldQ30": lane["yieldQ30"],
-                    "qscore_sum": lane["qscore_sum"],
-                    "percent_Q30": lane["percent_Q30"],
-                    "percent_perfectIndex": lane["percent_perfectIndex"],
-                    "mean_qscore": lane["mean_qscore"],
-                    "unknown_barcodes": self.get_unknown_barcodes(lane['unknown_barcodes']),
-                }
-                for sample_id, sample in lane["samples"].items():
-                    if sample_id not in self.bcl2fastq_bysample:
-                        self.bcl2fastq_bysample[sample_id] = {
-                            "total": 0,
-                            "total_yield": 0,
-                            "R1_yield": 0,
-                            "R2_yield": 0,
-                            "perfectIndex": 0,
-                            "yieldQ30": 0,
-                            "R1_Q30": 0,
-                            "R2_Q30": 0,
-                            "R1_trimmed_bases": 0,
-                            "R2_trimmed_bases": 0,
-                            "qscore_sum": 0
-                        }
-                    s = self.bcl2fastq_bysample[sample_id]
-                    s["total"] += sample["total"]
-                    s["total_yield"] += sample["total_yield"]
-                    s["perfectIndex"] += sample["perfectIndex"]
-                    s["yieldQ30"] += sample["yieldQ30"]
-                    s["qscore_sum"] += sample["qscore_sum"]
-                    # Undetermined samples did not have R1 and R2 information
-                    try:
-                        s["R1_yield"] += sample["R1_yield"]
-                        s["R2_yield"] += sample["R2_yield"]
-                        s["R1_Q30"] += sample["R1_Q30"]
-                        s["R2_Q30"] += sample["R2_Q30"]
-                        s["R1_trimmed_bases"] += sample["R1_trimmed_bases"]
-                        s["R2_trimmed_bases"] += sample["R2_trimmed_bases"]
-                    except KeyError:
-                        pass
-                    try:
-                        s["percent_Q30"] = (float(s["yieldQ30"]) / float(s["total_yield"])) * 100.0
-                    except ZeroDivisionError:
-                        s["percent_Q30"] = "NA"
-                    try:
-                        s["percent_perfectIndex"] = (float(s["perfectIndex"]) / float(s["total"])) * 100.0
-                    except ZeroDivisionError:
-                        s["percent_perfectIndex"] = "NA"
-                    try:
-                        s["mean_qscore"] = (float(s["qscore_sum"]) / float(s["total_yield"]))
-                    except ZeroDivisionError:
-                        s["mean_qscore"] = "NA"
+                counts = lane["counts"]
+                undetermined = lane["samples"].get("undetermined")
+                bylane = OrderedDict()
+                bylane["total"] = counts[TOTAL]
+                bylane["total_yield"] = counts[TOTAL_YIELD]
+                bylane["perfectIndex"] = counts[PERFECT_INDEX]
+                bylane["undetermined"] = undetermined[TOTAL] if undetermined is not None else "NA"
+                bylane["yieldQ30"] = counts[YIELD_Q30]
+                bylane["qscore_sum"] = counts[QSCORE_SUM]
+                add_percentages(bylane)
+                bylane["unknown_barcodes"] = lane["unknown_barcodes"]
+                self.bcl2fastq_bylane[uniqLaneName] = bylane
+
+                # Sum counts for each sample across lanes and runs
+                for sample_id, counts in lane["samples"].items():
+                    if sample_id not in sample_counts:
+                        sample_counts[sample_id] = [0] * len(COUNT_FIELDS)
+                    totals = sample_counts[sample_id]
+                    for i, c in enumerate(counts):
+                        totals[i] += c
                     if sample_id != "undetermined":
                         if sample_id not in self.source_files:
                             self.source_files[sample_id] = []
-                        self.source_files[sample_id].append(sample["filename"])
+                        self.source_files[sample_id].append(lane["filename"])
 
-    def get_unknown_barcodes(self, lane_unknown_barcode):
-        """ Python 2.* dictionaries are not sorted.
-        This function return an `OrderedDict` sorted by barcode count.
-        """
-        try:
-            sorted_barcodes = OrderedDict(
-                sorted(
-                    lane_unknown_barcode.items(),
-                    key = operator.itemgetter(1),
-                    reverse = True
-                )
-            )
-        except AttributeError:
-            sorted_barcodes = None
-        return sorted_barcodes
+        for sample_id, totals in sample_counts.items():
+            s = OrderedDict()
+            for k in SAMPLE_FIELDS:
+                s[k] = totals[COUNT_FIELDS.index(k)]
+            add_percentages(s)
+            self.bcl2fastq_bysample[sample_id] = s
 
     def add_general_stats(self):
         data = dict()
@@ -505,3 +385,185 @@ class MultiqcModule(BaseMultiqcModule):
         return OrderedDict(
             (key, value) for key, value in islice(bar_data.items(), 20)
         )
+
+
+class Bcl2fastqStats(object):
+    """ Counts from one Stats.json file, added one result at a time so that
+    the whole file never needs to be held in memory """
+
+    def __init__(self, path, top_barcodes=20):
+        """
+        :param path: Path to the Stats.json file
+        :param top_barcodes: Number of unknown barcodes to keep for each lane
+        """
+        self.path = path
+        self.top_barcodes = top_barcodes
+        self.run_id = None
+        self.lanes = OrderedDict()
+        self.lane = None
+        self.unknown_barcodes = list()
+
+    def start_lane(self):
+        self.lane = {
+            "number": None,
+            "counts": [0] * len(COUNT_FIELDS),
+            "samples": OrderedDict(),
+            "filename": self.path
+        }
+
+    def set_lane_number(self, number):
+        self.lane["number"] = number
+
+    def end_lane(self):
+        self.lanes[self.lane.pop("number")] = self.lane
+        self.lane = None
+
+    def add_demux_result(self, demux_result):
+        """ Add the counts for one sample in the current lane """
+        sample = demux_result["SampleName"]
+        if sample in self.lane["samples"]:
+            log.debug("Duplicate lane/sample combination found! Overwriting: {}, L{}, {}".format(self.path, self.lane["number"], sample))
+        counts = [0] * len(COUNT_FIELDS)
+        counts[TOTAL] = demux_result["NumberReads"]
+        counts[TOTAL_YIELD] = demux_result["Yield"]
+        for index_metric in demux_result.get("IndexMetrics", []):
+            counts[PERFECT_INDEX] += index_metric["MismatchCounts"]["0"]
+        for read_metric in demux_result.get("ReadMetrics", []):
+            counts[YIELD_Q30] += read_metric["YieldQ30"]
+            counts[QSCORE_SUM] += read_metric["QualityScoreSum"]
+            if read_metric["ReadNumber"] in READ_FIELDS:
+                r_yield, r_q30, r_trimmed = READ_FIELDS[read_metric["ReadNumber"]]
+                counts[r_yield] += read_metric["Yield"]
+                counts[r_q30] += read_metric["YieldQ30"]
+                counts[r_trimmed] += read_metric["TrimmedBases"]
+        self.lane["samples"][sample] = counts
+        lane_counts = self.lane["counts"]
+        for i in (TOTAL, TOTAL_YIELD, PERFECT_INDEX, YIELD_Q30, QSCORE_SUM):
+            lane_counts[i] += counts[i]
+
+    def set_undetermined(self, undetermined):
+        """ Add the undetermined reads in the current lane, as a sample """
+        counts = [0] * len(COUNT_FIELDS)
+        counts[TOTAL] = undetermined["NumberReads"]
+        counts[TOTAL_YIELD] = undetermined["Yield"]
+        for read_metric in undetermined.get("ReadMetrics", []):
+            counts[YIELD_Q30] += read_metric["YieldQ30"]
+            counts[QSCORE_SUM] += read_metric["QualityScoreSum"]
+        self.lane["samples"]["undetermined"] = counts
+
+    def start_unknown_barcodes(self):
+        self.unknown_barcodes.append({ 'lane': None, 'heap': list(), 'seen': 0 })
+
+    def set_unknown_barcodes_lane(self, number):
+        self.unknown_barcodes[-1]['lane'] = number
+
+    def add_unknown_barcode(self, barcode, count):
+        """ Keep the most common unknown barcodes in a bounded heap.
+        Earlier barcodes win ties, as with a stable sort. """
+        ub = self.unknown_barcodes[-1]
+        item = (count, -ub['seen'], barcode)
+        ub['seen'] += 1
+        if len(ub['heap']) < self.top_barcodes:
+            heapq.heappush(ub['heap'], item)
+        elif item > ub['heap'][0]:
+            heapq.heapreplace(ub['heap'], item)
+
+    def get_unknown_barcodes(self, lane_number):
+        """ Most common unknown barcodes for a lane, as an OrderedDict
+        sorted by count. None if the lane has no unknown barcodes. """
+        lane_ubs = [ ub for ub in self.unknown_barcodes if ub['lane'] == lane_number ]
+        if len(lane_ubs) == 0:
+            # Fall back to the position in the list, as with old files
+            try:
+                lane_ubs = [ self.unknown_barcodes[int(lane_number) - 1] ]
+            except (IndexError, TypeError, ValueError):
+                return None
+        return OrderedDict( (barcode, count) for count, _, barcode in sorted(lane_ubs[0]['heap'], reverse=True) )
+
+
+def parse_stats_events(fh, stats):
+    """ Add the counts from a Stats.json file to a Bcl2fastqStats object,
+    one ijson event at a time. Only one sample result is built as a dict
+    at once, and unknown barcodes go straight into the bounded heaps.
+    :param fh: Binary file handle
+    :param stats: Bcl2fastqStats object
+    """
+    result_prefixes = {
+        'ConversionResults.item.DemuxResults.item': stats.add_demux_result,
+        'ConversionResults.item.Undetermined': stats.set_undetermined
+    }
+    barcodes_prefix = 'UnknownBarcodes.item.Barcodes'
+    barcode_start = len(barcodes_prefix) + 1
+    builder = None
+    for prefix, event, value in ijson.parse(fh):
+        if event == 'number' and isinstance(value, Decimal):
+            value = float(value)
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+                if depth == 0:
+                    add_result(builder.value)
+                    builder = None
+        elif prefix.startswith(barcodes_prefix):
+            if event == 'number':
+                stats.add_unknown_barcode(prefix[barcode_start:], value)
+        elif event == 'start_map' and prefix in result_prefixes:
+            builder = ijson.common.ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+            add_result = result_prefixes[prefix]
+        elif prefix == 'ConversionResults.item':
+            if event == 'start_map':
+                stats.start_lane()
+            elif event == 'end_map':
+                stats.end_lane()
+        elif prefix == 'ConversionResults.item.LaneNumber':
+            stats.set_lane_number(value)
+        elif prefix == 'UnknownBarcodes.item' and event == 'start_map':
+            stats.start_unknown_barcodes()
+        elif prefix == 'UnknownBarcodes.item.Lane':
+            stats.set_unknown_barcodes_lane(value)
+        elif prefix == 'RunId':
+            stats.run_id = value
+
+
+def parse_stats_tree(content, stats):
+    """ Add the counts from a parsed Stats.json file to a Bcl2fastqStats object.
+    Used when ijson is not installed.
+    :param content: Parsed JSON
+    :param stats: Bcl2fastqStats object
+    """
+    stats.run_id = content.get("RunId")
+    for conversion_result in content.get("ConversionResults", []):
+        stats.start_lane()
+        stats.set_lane_number(conversion_result["LaneNumber"])
+        for demux_result in conversion_result.get("DemuxResults", []):
+            stats.add_demux_result(demux_result)
+        if "Undetermined" in conversion_result:
+            stats.set_undetermined(conversion_result["Undetermined"])
+        stats.end_lane()
+    for unknown_barcodes in content.get("UnknownBarcodes", []):
+        stats.start_unknown_barcodes()
+        stats.set_unknown_barcodes_lane(unknown_barcodes.get("Lane"))
+        for barcode, count in unknown_barcodes.get("Barcodes", {}).items():
+            stats.add_unknown_barcode(barcode, count)
+
+
+def add_percentages(counts):
+    """ Add the Q30 and perfect index percentages and mean quality
+    score to a dict of summed counts """
+    try:
+        counts["percent_Q30"] = (float(counts["yieldQ30"]) / float(counts["total_yield"])) * 100.0
+    except ZeroDivisionError:
+        counts["percent_Q30"] = "NA"
+    try:
+        counts["percent_perfectIndex"] = (float(counts["perfectIndex"]) / float(counts["total"])) * 100.0
+    except ZeroDivisionError:
+        counts["percent_perfectIndex"] = "NA"
+    try:
+        counts["mean_qscore"] = float(counts["qscore_sum"]) / float(counts["total_yield"])
+    except ZeroDivisionError:
+        counts["mean_qscore"] = "NA"
@@ -5,7 +5,6 @@
 from __future__ import print_function
 from collections import OrderedDict
 import logging
-import re
 
 from multiqc import config
 from multiqc.plots import beeswarm, linegraph, bargraph
@@ -172,14 +171,8 @@ class MultiqcModule(BaseMultiqcModule):
 
     def parse_bismark_report(self, report, regexes):
         """ Search a bismark report with a set of regexes """
-        parsed_data = {}
-        for k, r in regexes.items():
-            r_search = re.search(r, report, re.MULTILINE)
-            if r_search:
-                try:
-                    parsed_data[k] = float(r_search.group(1))
-                except ValueError:
-                    parsed_data[k] = r_search.group(1) # NaN
+        # Non-numeric values (eg. NaN) are kept as strings
+        parsed_data = self.extract_values(report, regexes)
         if len(parsed_data) == 0: return None
         return parsed_data
 
@@ -121,6 +121,9 @@ class MultiqcModule(BaseMultiqcModule):
             }
         }
 
+        unpaired_regexes = self.compile_regexes(regexes['unpaired'], int)
+        paired_regexes = self.compile_regexes(regexes['paired'], int)
+
         # Go through log file line by line
         s_name = f['s_name']
         parsed_data = {}
@@ -146,10 +149,7 @@ class MultiqcModule(BaseMultiqcModule):
                 # Do nested loop whilst we have this level of indentation
                 l = f['f'].readline()
                 while l.startswith('    '):
-                    for k, r in regexes['unpaired'].items():
-                        match = re.search(r, l)
-                        if match:
-                            parsed_data[k] = int(match.group(1))
+                    parsed_data.update(unpaired_regexes.search(l))
                     l = f['f'].readline()
 
             # Paired end reads
@@ -161,10 +161,7 @@ class MultiqcModule(BaseMultiqcModule):
                 # Do nested loop whilst we have this level of indentation
                 l = f['f'].readline()
                 while l.startswith('    '):
-                    for k, r in regexes['paired'].items():
-                        match = re.search(r, l)
-                        if match:
-                            parsed_data[k] = int(match.group(1))
+                    parsed_data.update(paired_regexes.search(l))
                     l = f['f'].readline()
 
             # Overall alignment rate
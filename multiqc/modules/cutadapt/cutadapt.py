@@ -116,10 +116,7 @@ class MultiqcModule(BaseMultiqcModule):
                 self.add_data_source(f, s_name)
 
                 # Search regexes for overview stats
-                for k, r in regexes[cutadapt_version].items():
-                    match = re.search(r, l)
-                    if match:
-                        self.cutadapt_data[s_name][k] = int(match.group(1).replace(',', ''))
+                self.cutadapt_data[s_name].update(self.extract_values(l, regexes[cutadapt_version], int))
 
                 # Starting a new section
                 if '===' in l:
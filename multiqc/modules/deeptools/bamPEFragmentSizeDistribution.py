@@ -5,9 +5,13 @@
 import logging
 import re
 from collections import OrderedDict
+from itertools import groupby
+import numpy as np
 
 from multiqc import config
 from multiqc.plots import linegraph
+from multiqc.plots.series_object import xyseries
+from multiqc.utils.numeric_table import load_numeric_table
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -47,19 +51,32 @@ class bamPEFragmentSizeDistributionMixin():
         return len(self.deeptools_bamPEFragmentSizeDistribution)
 
     def parseBamPEFDistributionFile(self, f):
+        """ Parse a bamPEFragmentSize --outRawFragmentLengths file into an
+        xyseries of occurrences for each fragment size, for each sample """
+        lines = [ l for l in f['f'].splitlines() if len(l) > 0 and not l.startswith('#bamPEFragmentSize') and not l.startswith('Size\t') ]
+
+        # Size and occurrences, then the BAM file path
+        try:
+            matrix, _, paths = load_numeric_table(lines, trail_cols=1)
+            if len(matrix) > 0 and matrix.shape[1] != 2:
+                raise ValueError("Expected 2 columns of numbers, found {}".format(matrix.shape[1]))
+        except ValueError as e:
+            log.warning("Couldn't parse bamPEFragmentSize --outRawFragmentLengths file {}: {}".format(f['fn'], e))
+            return dict()
+        s_names = dict()
+        for p in set(p[0] for p in paths):
+            s_names[p] = self.clean_s_name(p.rstrip().split("/")[-1], f['root'])
+
+        # Each run of lines for a sample replaces any earlier lines for it
         d = dict()
-        lastsample = []
-        for line in f['f'].splitlines():
-            cols = line.rstrip().split("\t")
-            if cols[0] == "#bamPEFragmentSize":
-                continue
-            elif cols[0] == "Size":
-                continue
-            else:
-                s_name = self.clean_s_name(cols[2].rstrip().split("/")[-1], f['root'])
-                if s_name != lastsample:
-                    d[s_name] = dict()
-                    lastsample = s_name
-                d[s_name].update({int(cols[0]):int(cols[1])})
+        start = 0
+        for s_name, rows in groupby(s_names[p[0]] for p in paths):
+            end = start + len(list(rows))
+            sizes = matrix[start:end, 0].astype(int)[::-1]
+            counts = matrix[start:end, 1].astype(int)[::-1]
+            # Sorted by size, keeping the last occurrences for repeated sizes
+            sizes, idx = np.unique(sizes, return_index=True)
+            d[s_name] = xyseries(s_name, sizes, counts[idx])
+            start = end
 
         return d
@@ -8,6 +8,8 @@ from collections import OrderedDict
 
 from multiqc import config
 from multiqc.plots import table, linegraph
+from multiqc.plots.series_object import xyseries
+from multiqc.utils.numeric_table import load_numeric_table
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -168,39 +170,17 @@ class bamPEFragmentSizeTableMixin():
                 'ylab': "Read length (bases)",
                 'xlab': "Percentile"
             }
+            percentiles = [0, 10, 20, 25, 30, 40, 50, 60, 70, 75, 80, 90, 99, 100]
+            read_keys = ['Read Len. Min.', 'Read Len. 10%', 'Read Len. 20%', 'Read Len. 1st. Qu.', 'Read Len. 30%', 'Read Len. 40%', 'Read Len. Median',
+                         'Read Len. 60%', 'Read Len. 70%', 'Read Len. 3rd Qu.', 'Read Len. 80%', 'Read Len. 90%', 'Read Len. 99%', 'Read Len. Max']
+            frag_keys = [ k.replace('Read', 'Frag.') for k in read_keys ]
             SE = dict()
             PE = dict()
             for k, v in self.deeptools_bamPEFragmentSize.items():
-                SE[k] = {0: v['Read Len. Min.'],
-                         10: v['Read Len. 10%'],
-                         20: v['Read Len. 20%'],
-                         25: v['Read Len. 1st. Qu.'],
-                         30: v['Read Len. 30%'],
-                         40: v['Read Len. 40%'],
-                         50: v['Read Len. Median'],
-                         60: v['Read Len. 60%'],
-                         70: v['Read Len. 70%'],
-                         75: v['Read Len. 3rd Qu.'],
-                         80: v['Read Len. 80%'],
-                         90: v['Read Len. 90%'],
-                         99: v['Read Len. 99%'],
-                         100: v['Read Len. Max']}
+                SE[k] = xyseries(k, percentiles, [ v[h] for h in read_keys ])
                 if 'Frag. Len. Min.' not in v:
                     continue
-                PE[k] = {0: v['Frag. Len. Min.'],
-                         10: v['Frag. Len. 10%'],
-                         20: v['Frag. Len. 20%'],
-                         25: v['Frag. Len. 1st. Qu.'],
-                         30: v['Frag. Len. 30%'],
-                         40: v['Frag. Len. 40%'],
-                         50: v['Frag. Len. Median'],
-                         60: v['Frag. Len. 60%'],
-                         70: v['Frag. Len. 70%'],
-                         75: v['Frag. Len. 3rd Qu.'],
-                         80: v['Frag. Len. 80%'],
-                         90: v['Frag. Len. 90%'],
-                         99: v['Frag. Len. 99%'],
-                         100: v['Frag. Len. Max']}
+                PE[k] = xyseries(k, percentiles, [ v[h] for h in frag_keys ])
             self.add_section(
                 name = "Read/fragment length distribution",
                 anchor = "deeptools_fragmentlengths_dist",
@@ -210,28 +190,30 @@ class bamPEFragmentSizeTableMixin():
         return len(self.deeptools_bamPEFragmentSize)
 
     def parseBamPEFile(self, f):
+        """ Parse a bamPEFragmentSize --table file into a dict of metrics for each sample """
         d = {}
-        headers = None
-        for line in f['f'].splitlines():
-            cols = line.rstrip().split("\t")
-            if headers is None:
-                headers = cols
-            else:
-                s_name = None
-                for idx, h in enumerate(headers):
-                    if idx == 0:
-                        s_name = self.clean_s_name(cols[0], f['root'])
-                        if s_name in d:
-                            log.debug("Replacing duplicate sample {}.".format(s_name))
-                        d[s_name] = OrderedDict()
-                    else:
-                        if idx < 19 and cols[1] == "0":
-                            # Don't store fragment metrics for SE datasets, they're just 0.
-                            continue
-                        try:
-                            # Most values are ac
-                            d[s_name][h] = int(cols[idx])
-                        except ValueError:
-                            d[s_name][h] = float(cols[idx])
+        lines = f['f'].splitlines()
+        if len(lines) < 2:
+            return d
+        headers = lines[0].rstrip().split("\t")
+        try:
+            matrix, labels, _ = load_numeric_table(lines[1:], lead_cols=1)
+            if matrix.shape[1] != len(headers) - 1:
+                raise ValueError("Found {} headers but {} columns".format(len(headers) - 1, matrix.shape[1]))
+        except ValueError as e:
+            log.warning("Couldn't parse bamPEFragmentSize --table file {}: {}".format(f['fn'], e))
+            return d
+
+        for l, values in zip(labels, matrix.tolist()):
+            s_name = self.clean_s_name(l[0], f['root'])
+            if s_name in d:
+                log.debug("Replacing duplicate sample {}.".format(s_name))
+            d[s_name] = OrderedDict()
+            for idx, h in enumerate(headers[1:]):
+                if idx < 18 and values[0] == 0:
+                    # Don't store fragment metrics for SE datasets, they're just 0.
+                    continue
+                # Most values are whole numbers
+                d[s_name][h] = int(values[idx]) if values[idx].is_integer() else values[idx]
 
         return d
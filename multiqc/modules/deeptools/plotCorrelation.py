@@ -9,6 +9,7 @@ import numpy as np
 
 from multiqc import config
 from multiqc.plots import heatmap
+from multiqc.utils.numeric_table import load_numeric_table
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -17,13 +18,15 @@ class plotCorrelationMixin():
     def parse_plotCorrelation(self):
         """Find plotCorrelation output"""
         self.deeptools_plotCorrelationData = dict()
+        samples = []
         for f in self.find_log_files('deeptools/plotCorrelationData', filehandles=False):
-            parsed_data, samples = self.parsePlotCorrelationData(f)
+            parsed_data, file_samples = self.parsePlotCorrelationData(f)
             for k, v in parsed_data.items():
                 if k in self.deeptools_plotCorrelationData:
                     log.warning("Replacing duplicate sample {}.".format(k))
                 self.deeptools_plotCorrelationData[k] = v
             if len(parsed_data) > 0:
+                samples = file_samples
                 self.add_data_source(f, section='plotCorrelation')
 
         if len(self.deeptools_plotCorrelationData) > 0:
@@ -31,12 +34,8 @@ class plotCorrelationMixin():
                 'id': 'deeptools_correlation_plot',
                 'title': 'deeptools: Correlation Plot',
             }
-            data = []
-            for s_name in samples:
-                try:
-                    data.append(self.deeptools_plotCorrelationData[s_name])
-                except KeyError:
-                    pass
+            # Matrix rows for the samples in the last file
+            data = [ self.deeptools_plotCorrelationData[s_name] for s_name in samples if s_name in self.deeptools_plotCorrelationData ]
             if len(data) == 0:
                 log.debug('No valid data for correlation plot')
                 return None
@@ -45,25 +44,19 @@ class plotCorrelationMixin():
                 name="Correlation heatmap",
                 anchor="deeptools_correlation",
                 description="Pairwise correlations of samples based on distribution of sequence reads",
-                plot=heatmap.plot(data, samples, samples, config)
+                plot=heatmap.plot(np.vstack(data), samples, samples, config)
             )
 
         return len(self.deeptools_plotCorrelationData)
 
     def parsePlotCorrelationData(self, f):
-        d = dict()
-        samples = []
-        for line in f['f'].splitlines():
-            cols = line.split('\t')
-            if cols[0] == "#plotCorrelation --outFileCorMatrix":
-                continue
-            elif cols[0] == "":
-                continue
-            else:
-                c = str(cols[0]).strip("'")
-                s_name = self.clean_s_name(c, f['root'])
-                samples.append(s_name)
-                d[s_name] = []
-                for c in cols[1:len(cols)]:
-                    d[s_name].append(float(c))
-        return d, samples
+        """ Parse a plotCorrelation --outFileCorMatrix file into a row of
+        correlations (NumPy array) for each sample, and the sample order """
+        lines = [ l for l in f['f'].splitlines() if len(l) > 0 and not l.startswith('\t') and not l.startswith('#plotCorrelation') ]
+        try:
+            matrix, labels, _ = load_numeric_table(lines, lead_cols=1)
+        except ValueError as e:
+            log.warning("Couldn't parse plotCorrelation matrix {}: {}".format(f['fn'], e))
+            return dict(), []
+        samples = [ self.clean_s_name(l[0].strip("'"), f['root']) for l in labels ]
+        return dict(zip(samples, matrix)), samples
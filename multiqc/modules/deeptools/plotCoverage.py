@@ -5,9 +5,12 @@
 import logging
 import re
 from collections import OrderedDict
+import numpy as np
 
 from multiqc import config
 from multiqc.plots import table, linegraph
+from multiqc.plots.series_object import xyseries
+from multiqc.utils.numeric_table import load_numeric_table
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -132,42 +135,31 @@ class plotCoverageMixin():
         return d
 
     def parsePlotCoverageOutRawCounts(self, f):
+        """ Parse a plotCoverage --outRawCounts file into an xyseries for each
+        sample, of the fraction of sampled bases with each coverage """
         samples = []
-        d = {}
-        nCols = 0
-        nRows = 0
+        lines = []
         for line in f['f'].splitlines():
             if line.startswith('#plotCoverage'):
                 continue
-
-            cols = line.strip().split('\t')
-            if len(cols) < 4:
-                log.warning("{} was initially flagged as the output from plotCoverage --outRawCounts, but that seems to not be the case. Skipping...".format(f['fn']))
-                return dict()
-
-            if cols[0] == "#'chr'":
-                nCols = len(cols)
-                for col in cols[3:]:
-                    s_name = self.clean_s_name(col.strip("'"), f['root'])
-                    samples.append(s_name)
-                    d[s_name] = dict()
-                continue
-
-            if len(cols) != nCols:
-                log.warning("{} was initially flagged as the output from plotCoverage --outRawCounts, but that seems to not be the case. Skipping...".format(f['fn']))
-                return dict()
-
-            for i, v in enumerate(cols[3:]):
-                v = float(v)
-                if v not in d[samples[i]]:
-                    d[samples[i]][v] = 0
-                d[samples[i]][v] += 1
-            nRows += 1
-
-        # Convert values to a fraction
-        nRows = float(nRows)
-        for k, v in d.items():
-            for k2, v2 in v.items():
-                v[k2] /= nRows
-
+            elif line.startswith("#'chr'\t"):
+                samples = [ self.clean_s_name(col.strip("'"), f['root']) for col in line.strip().split('\t')[3:] ]
+            else:
+                lines.append(line)
+        if len(lines) == 0:
+            return dict()
+
+        # Chromosome, start and end, then the coverage for each sample
+        try:
+            coverage, _, _ = load_numeric_table(lines, lead_cols=3)
+            if coverage.shape[1] != len(samples):
+                raise ValueError("Found {} samples but {} columns".format(len(samples), coverage.shape[1]))
+        except ValueError:
+            log.warning("{} was initially flagged as the output from plotCoverage --outRawCounts, but that seems to not be the case. Skipping...".format(f['fn']))
+            return dict()
+
+        d = dict()
+        for i, s_name in enumerate(samples):
+            values, counts = np.unique(coverage[:, i], return_counts=True)
+            d[s_name] = xyseries(s_name, values, counts / float(len(coverage)))
         return d
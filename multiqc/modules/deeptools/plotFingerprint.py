@@ -9,6 +9,8 @@ import numpy as np
 
 from multiqc import config
 from multiqc.plots import linegraph
+from multiqc.plots.series_object import xyseries
+from multiqc.utils.numeric_table import load_numeric_table
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -113,38 +115,26 @@ class plotFingerprintMixin():
         return d
 
     def parsePlotFingerprintOutRawCounts(self, f):
-        d = dict()
-        samples = []
-        firstLine = True
-        for line in f['f'].splitlines():
-            cols = line.strip().split('\t')
-            if cols[0] == "#plotFingerprint --outRawCounts":
-                continue
-
-            if firstLine:
-                for c in cols:
-                    c = str(c).strip("'")
-                    s_name = self.clean_s_name(c, f['root'])
-                    d[s_name] = []
-                    samples.append(s_name)
-                firstLine = False
-                continue
-
-            for idx, c in enumerate(cols):
-                d[samples[idx]].append(int(c))
-
-        # Switch to numpy, get the normalized cumsum
-        x = np.linspace(0, len(d[samples[0]]) - 1, endpoint=True, num=100, dtype=int)  # The indices into the vectors that we'll actually return for plotting
-        xp = np.arange(len(d[samples[0]]) + 1) / float(len(d[samples[0]]) + 1)
-        for k, v in d.items():
-            v = np.array(v)
-            v = np.sort(v)
-            cs = np.cumsum(v)
-            cs = cs / float(cs[-1])
-            # Convert for plotting
-            v2 = dict()
-            v2[0.0] = 0.0
-            for _ in x:
-                v2[xp[_]] = cs[_]
-            d[k] = v2
-        return d
+        """ Parse a plotFingerprint --outRawCounts file into an xyseries for each
+        sample, of the normalised cumulative sum of the sorted bin counts """
+        lines = f['f'].splitlines()
+        if len(lines) > 0 and lines[0].startswith('#plotFingerprint --outRawCounts'):
+            lines = lines[1:]
+        if len(lines) < 2:
+            return dict()
+        samples = [ self.clean_s_name(str(c).strip("'"), f['root']) for c in lines[0].strip().split('\t') ]
+        try:
+            counts, _, _ = load_numeric_table(lines[1:])
+            if counts.shape[1] != len(samples):
+                raise ValueError("Found {} samples but {} columns".format(len(samples), counts.shape[1]))
+        except ValueError as e:
+            log.warning("Couldn't parse plotFingerprint --outRawCounts file {}: {}".format(f['fn'], e))
+            return dict()
+
+        # Normalized cumsum of the sorted counts for every sample at once
+        cs = np.cumsum(np.sort(counts, axis=0), axis=0)
+        cs = cs / cs[-1]
+        # The indices into the vectors that we'll actually return for plotting
+        x = np.unique(np.linspace(0, len(counts) - 1, endpoint=True, num=100, dtype=int))
+        xp = np.arange(len(counts) + 1) / float(len(counts) + 1)
+        return { s_name: xyseries(s_name, xp[x], cs[x, i]) for i, s_name in enumerate(samples) }
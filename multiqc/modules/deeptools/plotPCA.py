@@ -9,6 +9,7 @@ import numpy as np
 
 from multiqc import config
 from multiqc.plots import scatter
+from multiqc.utils.numeric_table import load_numeric_table
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -35,11 +36,9 @@ class plotPCAMixin():
                 'tt_label': 'PC1 {point.x:.2f}: PC2 {point.y:.2f}',
             }
             data = dict()
-            for s_name in self.deeptools_plotPCAData:
-                try:
-                    data[s_name] = {'x': self.deeptools_plotPCAData[s_name][1], 'y': self.deeptools_plotPCAData[s_name][2]}
-                except KeyError:
-                    pass
+            for s_name, pcs in self.deeptools_plotPCAData.items():
+                if len(pcs) >= 2:
+                    data[s_name] = {'x': float(pcs[0]), 'y': float(pcs[1])}
             if len(data) == 0:
                 log.debug('No valid data for PCA plot')
                 return None
@@ -54,22 +53,27 @@ class plotPCAMixin():
         return len(self.deeptools_plotPCAData)
 
     def parsePlotPCAData(self, f):
-        d = dict()
+        """ Parse a plotPCA --outFileNameData file into a NumPy array for each
+        sample, with the sample's value for each component in component order """
         samples = []
+        lines = []
         for line in f['f'].splitlines():
-            cols = line.strip().split('\t')
-            if cols[0] == "#plotPCA --outFileNameData":
+            if line.startswith('#plotPCA') or len(line.strip()) == 0:
                 continue
-            elif cols[0] == "Component":
-                for c in cols[1:(len(cols)-1)]:
-                    c = str(c).strip("'")
-                    s_name = self.clean_s_name(c, f['root'])
-                    d[s_name] = {}
-                    samples.append(s_name)
+            elif line.startswith('Component\t'):
+                samples = [ self.clean_s_name(c.strip("'"), f['root']) for c in line.strip().split('\t')[1:-1] ]
             else:
-                idx = 0
-                compo = cols[0]
-                for c in cols[1:(len(cols)-1)]:
-                    d[samples[idx]][int(compo)] = float(c)
-                    idx += 1
-        return d
+                lines.append(line)
+        try:
+            matrix, _, _ = load_numeric_table(lines)
+        except ValueError as e:
+            log.warning("Couldn't parse plotPCA data {}: {}".format(f['fn'], e))
+            return dict()
+        if len(matrix) == 0:
+            matrix = np.empty((0, len(samples) + 2))
+        # Columns are the component number, a value for each sample, then the eigenvalue
+        if matrix.shape[1] != len(samples) + 2:
+            log.warning("Couldn't parse plotPCA data {}: found {} samples but {} columns".format(f['fn'], len(samples), matrix.shape[1]))
+            return dict()
+        matrix = matrix[np.argsort(matrix[:, 0], kind='mergesort')]
+        return { s_name: matrix[:, i + 1] for i, s_name in enumerate(samples) }
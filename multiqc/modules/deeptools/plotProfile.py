@@ -5,9 +5,12 @@
 import logging
 import re
 from collections import OrderedDict
+import numpy as np
 
 from multiqc import config
 from multiqc.plots import linegraph
+from multiqc.plots.series_object import xyseries
+from multiqc.utils.numeric_table import load_numeric_table
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -17,12 +20,13 @@ class plotProfileMixin():
         """Find plotProfile output"""
         self.deeptools_plotProfile = dict()
         for f in self.find_log_files('deeptools/plotProfile', filehandles=False):
-            parsed_data, bin_labels, converted_bin_labels = self.parsePlotProfileData(f)
+            parsed_data, file_bin_labels, file_converted_bin_labels = self.parsePlotProfileData(f)
             for k, v in parsed_data.items():
                 if k in self.deeptools_plotProfile:
                     log.warning("Replacing duplicate sample {}.".format(k))
                 self.deeptools_plotProfile[k] = v
             if len(parsed_data) > 0:
+                bin_labels, converted_bin_labels = file_bin_labels, file_converted_bin_labels
                 self.add_data_source(f, section='plotProfile')
 
         if len(self.deeptools_plotProfile) > 0:
@@ -50,41 +54,55 @@ class plotProfileMixin():
                 plot=linegraph.plot(self.deeptools_plotProfile, config)
             )
 
-        return len(self.deeptools_bamPEFragmentSizeDistribution)
+        return len(self.deeptools_plotProfile)
 
     def parsePlotProfileData(self, f):
+        """ Parse a plotProfile --outFileNameData file into an xyseries for each
+        sample, with distances from the gene start as x values """
         d = dict()
         bin_labels = []
         bins = []
+        lines = []
         for line in f['f'].splitlines():
-            cols = line.rstrip().split("\t")
+            cols = line.rstrip().split("\t", 1)
             if cols[0] == "bin labels":
-                for col in cols[2:len(cols)]:
+                for col in line.rstrip().split("\t")[2:]:
                     if col not in list(filter(None,bin_labels)):
                         bin_labels.append(col)
                     else:
                         break
             elif cols[0] == "bins":
-                for col in cols[2:len(cols)]:
+                for col in line.rstrip().split("\t")[2:]:
                     if len(bins)!=len(bin_labels):
                         bins.append(int(col))
                     else:
                         break
             else:
-                s_name = self.clean_s_name(cols[0], f['root'])
-                d[s_name] = dict()
+                lines.append(line)
+        if len(lines) == 0:
+            return d, bin_labels, None
 
-                factors = {'Kb': 1e3, 'Mb': 1e6, 'Gb': 1e9}
-                convert_factor = 1
-                for k, v in factors.items():
-                    if k in bin_labels[0]:
-                        convert_factor *= v
-                        start = float(bin_labels[0].strip(k)) * convert_factor
-                step = int(abs(start/bin_labels.index('TSS')))
-                end = step*(len(bin_labels)-bin_labels.index('TSS')-1)
-                converted_bin_labels = range((int(start)+step), (int(end)+step), step)
+        # Sample name and region group, then a value for each bin
+        try:
+            matrix, labels, _ = load_numeric_table(lines, lead_cols=2)
+        except ValueError as e:
+            log.warning("Couldn't parse plotProfile data {}: {}".format(f['fn'], e))
+            return d, bin_labels, None
 
-                for i in bins:
-                    d[s_name].update({converted_bin_labels[i-1]:float(cols[i+1])})
+        factors = {'Kb': 1e3, 'Mb': 1e6, 'Gb': 1e9}
+        convert_factor = 1
+        for k, v in factors.items():
+            if k in bin_labels[0]:
+                convert_factor *= v
+                start = float(bin_labels[0].strip(k)) * convert_factor
+        step = int(abs(start/bin_labels.index('TSS')))
+        end = step*(len(bin_labels)-bin_labels.index('TSS')-1)
+        converted_bin_labels = range((int(start)+step), (int(end)+step), step)
+
+        cols = np.array(bins, dtype=int) - 1
+        x = np.array(converted_bin_labels)[cols]
+        for l, values in zip(labels, matrix):
+            s_name = self.clean_s_name(l[0], f['root'])
+            d[s_name] = xyseries(s_name, x, values[cols])
 
         return d, bin_labels, converted_bin_labels
@@ -15,14 +15,30 @@ c_height = 0;
 ypos = 0;
 max_bp = 0;
 current_single_plot = undefined;
+sample_data = {};
+fastqc_seq_content_data = undefined;
 
 // Function to plot heatmap
 function fastqc_seq_content_heatmap() {
 
+    // Get the data from the compressed plot data, or from multiqc serve
+    if(fastqc_seq_content_data === undefined){
+        var data_key = 'fastqc_per_base_sequence_content_data';
+        if(mqc_plots[data_key] !== undefined){
+            fastqc_seq_content_data = mqc_plots[data_key];
+        } else if(typeof mqc_serve_load_plot == 'function'){
+            mqc_serve_load_plot(data_key, fastqc_seq_content_heatmap);
+            return;
+        } else {
+            $(document).one('mqc_plotdata_loaded', fastqc_seq_content_heatmap);
+            return;
+        }
+    }
+
     // Get sample names, rename and skip hidden samples
     sample_names = [];
     sample_statuses = [];
-    var p_data = {};
+    sample_data = {};
     var hidden_samples = 0;
     $.each(fastqc_seq_content_data, function(s_name, data){
         // rename sample names
@@ -36,7 +52,7 @@ function fastqc_seq_content_heatmap() {
             }
         });
         sample_statuses[s_name] = t_status;
-        p_data[s_name] = JSON.parse(JSON.stringify(data)); // clone data
+        sample_data[s_name] = data;
 
         var hide_sample = false;
         for (i = 0; i < window.mqc_hide_f_texts.length; i++) {
@@ -92,14 +108,11 @@ function fastqc_seq_content_heatmap() {
         max_bp = 0;
         labels = [];
         $.each(sample_names, function(idx, s_name){
-            var s = p_data[s_name];
+            var pos = sample_data[s_name]['pos'];
             labels.push(s_name);
-            $.each(s, function(bp, v){
-                bp = parseInt(bp);
-                if(bp > max_bp){
-                    max_bp = bp;
-                }
-            });
+            if(pos.length > 0 && pos[pos.length-1] > max_bp){
+                max_bp = pos[pos.length-1];
+            }
         });
         ypos = 0;
         $.each(sample_names, function(idx, s_name){
@@ -120,29 +133,21 @@ function fastqc_seq_content_heatmap() {
             ctx.fillRect (0, ypos+1, 5, s_height-2);
 
             // Plot the squares for the heatmap
-            var s = p_data[s_name];
+            var s = sample_data[s_name];
             var xpos = 6;
             var last_bp = 0;
-            $.each(s, function(bp, v){
-                bp = parseInt(bp);
+            for (var i = 0; i < s['pos'].length; i++){
+                var bp = s['pos'][i];
                 var this_width = (bp - last_bp) * (c_width / max_bp);
                 last_bp = bp;
-                // Very old versions of FastQC give counts instead of percentages
-                if(v['t'] > 100){
-                    var t = v['t'] + v['a'] + v['c'] + v['g'];
-                    v['t'] = (v['t']/t)*100;
-                    v['a'] = (v['a']/t)*100;
-                    v['c'] = (v['c']/t)*100;
-                    v['g'] = (v['g']/t)*100;
-                }
-                var r = Math.round((v['t'] / 100)*255);
-                var g = Math.round((v['a'] / 100)*255);
-                var b = Math.round((v['c'] / 100)*255);
+                var r = Math.round((s['t'][i] / 100)*255);
+                var g = Math.round((s['a'][i] / 100)*255);
+                var b = Math.round((s['c'][i] / 100)*255);
                 ctx.fillStyle = 'rgb('+r+','+g+','+b+')';
                 // width+1 to avoid vertical white line gaps.
                 ctx.fillRect (xpos, ypos, this_width+1, s_height);
                 xpos += this_width;
-            });
+            }
             // Draw a line under this row if we don't have too many samples
             if(num_samples <= 20){
                 ctx.beginPath();
@@ -337,29 +342,19 @@ $(function () {
 
         // Update the key with the raw data for this position
         var hover_bp = Math.max(1, Math.floor((x/c_width)*max_bp));
-        var thispoint = fastqc_seq_content_data[s_name][hover_bp];
-        if(!thispoint){
-            var nearestkey = 0;
-            var guessdata = null;
-            $.each(fastqc_seq_content_data[s_name], function(bp, v){
-                bp = parseInt(bp);
-                if(bp < hover_bp && bp > nearestkey){
-                    nearestkey = bp;
-                    guessdata = v;
-                }
-            });
-            if(guessdata === null){
-                console.error("Couldn't guess key for "+hover_bp);
-                return false;
-            } else {
-                thispoint = guessdata;
-            }
+        // Positions are sorted, so use the last one at or before the cursor
+        var s = sample_data[s_name];
+        var i = s['pos'].length - 1;
+        while(i >= 0 && s['pos'][i] > hover_bp){ i--; }
+        if(i < 0){
+            console.error("Couldn't guess key for "+hover_bp);
+            return false;
         }
-        $('#fastqc_seq_heatmap_key_t span').text(thispoint['t'].toFixed(0)+'%');
-        $('#fastqc_seq_heatmap_key_c span').text(thispoint['c'].toFixed(0)+'%');
-        $('#fastqc_seq_heatmap_key_a span').text(thispoint['a'].toFixed(0)+'%');
-        $('#fastqc_seq_heatmap_key_g span').text(thispoint['g'].toFixed(0)+'%');
-        $('#fastqc_seq_heatmap_key_pos').text(thispoint['base']+' bp');
+        $('#fastqc_seq_heatmap_key_t span').text(s['t'][i].toFixed(0)+'%');
+        $('#fastqc_seq_heatmap_key_c span').text(s['c'][i].toFixed(0)+'%');
+        $('#fastqc_seq_heatmap_key_a span').text(s['a'][i].toFixed(0)+'%');
+        $('#fastqc_seq_heatmap_key_g span').text(s['g'][i].toFixed(0)+'%');
+        $('#fastqc_seq_heatmap_key_pos').text(s['base'][i]+' bp');
     });
 
     // Remove sample name again when mouse leaves
@@ -397,14 +392,13 @@ $(function () {
         current_single_plot = s_name;
         // Prep the new plot data
         var plot_data = [[],[],[],[]];
-        var bases = Object.keys(fastqc_seq_content_data[s_name]).sort(function (a, b) {  return a - b;  });
-        for (i=0; i<bases.length; i++){
-          var base = fastqc_seq_content_data[s_name][bases[i]]['base'].toString().split('-');
-          base = parseFloat(base[0]);
-          plot_data[0].push([base, fastqc_seq_content_data[s_name][bases[i]]['t']]);
-          plot_data[1].push([base, fastqc_seq_content_data[s_name][bases[i]]['c']]);
-          plot_data[2].push([base, fastqc_seq_content_data[s_name][bases[i]]['a']]);
-          plot_data[3].push([base, fastqc_seq_content_data[s_name][bases[i]]['g']]);
+        var s = sample_data[s_name];
+        for (i=0; i<s['pos'].length; i++){
+          var base = parseFloat(s['base'][i].toString().split('-')[0]);
+          plot_data[0].push([base, s['t'][i]]);
+          plot_data[1].push([base, s['c'][i]]);
+          plot_data[2].push([base, s['a'][i]]);
+          plot_data[3].push([base, s['g'][i]]);
         }
         // Update the chart
         var hc = $('#fastqc_sequence_content_single').highcharts();
@@ -435,22 +429,19 @@ $(function () {
 
 function plot_single_seqcontent(s_name){
   current_single_plot = s_name;
-  var data = fastqc_seq_content_data[s_name];
+  var s = sample_data[s_name];
   var plot_data = [
     {'name': '% T', 'data':[]},
     {'name': '% C', 'data':[]},
     {'name': '% A', 'data':[]},
     {'name': '% G', 'data':[]}
   ];
-  var bases = Object.keys(data).sort(function (a, b) {  return a - b;  });
-  for (i=0; i<bases.length; i++){
-    var d = bases[i];
-    var base = data[d]['base'].toString().split('-');
-    base = parseFloat(base[0]);
-    plot_data[0]['data'].push({x:base, y:data[d]['t'], name:data[d]['base']});
-    plot_data[1]['data'].push({x:base, y:data[d]['c'], name:data[d]['base']});
-    plot_data[2]['data'].push({x:base, y:data[d]['a'], name:data[d]['base']});
-    plot_data[3]['data'].push({x:base, y:data[d]['g'], name:data[d]['base']});
+  for (i=0; i<s['pos'].length; i++){
+    var base = parseFloat(s['base'][i].toString().split('-')[0]);
+    plot_data[0]['data'].push({x:base, y:s['t'][i], name:s['base'][i]});
+    plot_data[1]['data'].push({x:base, y:s['c'][i], name:s['base'][i]});
+    plot_data[2]['data'].push({x:base, y:s['a'][i], name:s['base'][i]});
+    plot_data[3]['data'].push({x:base, y:s['g'][i], name:s['base'][i]});
   }
 
   // Create plot div if it doesn't exist, and hide overview
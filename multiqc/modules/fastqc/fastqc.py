@@ -12,14 +12,19 @@
 
 from __future__ import print_function
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 import io
 import json
 import logging
+import multiprocessing
 import os
 import re
 import zipfile
 
+import numpy as np
+
 from multiqc import config
+from multiqc.utils import report
 from multiqc.plots import linegraph, bargraph
 from multiqc.modules.base_module import BaseMultiqcModule
 
@@ -39,33 +44,14 @@ class MultiqcModule(BaseMultiqcModule):
         self.fastqc_data = dict()
 
         # Find and parse unzipped FastQC reports
-        for f in self.find_log_files('fastqc/data'):
+        for f, parsed in self.map_log_files('fastqc/data', parse_fastqc_data_file):
             s_name = self.clean_s_name(os.path.basename(f['root']), os.path.dirname(f['root']))
-            self.parse_fastqc_report(f['f'], s_name, f)
+            self.add_fastqc_report(parsed, s_name, f)
 
         # Find and parse zipped FastQC reports
-        for f in self.find_log_files('fastqc/zip', filecontents=False):
-            s_name = f['fn']
-            if s_name.endswith('_fastqc.zip'):
-                s_name = s_name[:-11]
-            # Skip if we already have this report - parsing zip files is slow..
-            if s_name in self.fastqc_data.keys():
-                log.debug("Skipping '{}' as already parsed '{}'".format(f['fn'], s_name))
-                continue
-            try:
-                fqc_zip = zipfile.ZipFile(os.path.join(f['root'], f['fn']))
-            except Exception as e:
-                log.warn("Couldn't read '{}' - Bad zip file".format(f['fn']))
-                log.debug("Bad zip file error:\n{}".format(e))
-                continue
-            # FastQC zip files should have just one directory inside, containing report
-            d_name = fqc_zip.namelist()[0]
-            try:
-                with fqc_zip.open(os.path.join(d_name, 'fastqc_data.txt')) as fh:
-                    r_data = fh.read().decode('utf8')
-                    self.parse_fastqc_report(r_data, s_name, f)
-            except KeyError:
-                log.warning("Error - can't find fastqc_raw_data.txt in {}".format(f))
+        zip_files = [ f for f in self.find_log_files('fastqc/zip', filecontents=False) ]
+        if len(zip_files) > 0:
+            self.parse_fastqc_zips(zip_files)
 
         # Filter to strip out ignored sample names
         self.fastqc_data = self.ignore_samples(self.fastqc_data)
@@ -118,74 +104,90 @@ class MultiqcModule(BaseMultiqcModule):
         """ Takes contents from a fastq_data.txt file and parses out required
         statistics and data. Returns a dict with keys 'stats' and 'data'.
         Data is for plotting graphs, stats are for top table. """
+        self.add_fastqc_report(parse_fastqc_data(file_contents), s_name, f)
+
+    def add_fastqc_report(self, parsed, s_name=None, f=None):
+        """ Add one report from parse_fastqc_data() to self.fastqc_data """
 
         # Make the sample name from the input filename if we find it
-        fn_search = re.search(r"Filename\s+(.+)", file_contents)
-        if fn_search:
-            s_name = self.clean_s_name(fn_search.group(1) , f['root'])
+        if parsed['filename'] is not None:
+            s_name = self.clean_s_name(parsed['filename'], f['root'])
 
         if s_name in self.fastqc_data.keys():
             log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
         self.add_data_source(f, s_name)
-        self.fastqc_data[s_name] = { 'statuses': dict() }
-
-        # Parse the report
-        section = None
-        s_headers = None
-        self.dup_keys = []
-        for l in file_contents.splitlines():
-            if l == '>>END_MODULE':
-                section = None
-                s_headers = None
-            elif l.startswith('>>'):
-                (section, status) = l[2:].split("\t", 1)
-                section = section.lower().replace(' ', '_')
-                self.fastqc_data[s_name]['statuses'][section] = status
-            elif section is not None:
-                if l.startswith('#'):
-                    s_headers = l[1:].split("\t")
-                    # Special case: Total Deduplicated Percentage header line
-                    if s_headers[0] == 'Total Deduplicated Percentage':
-                        self.fastqc_data[s_name]['basic_statistics'].append({
-                            'measure': 'total_deduplicated_percentage',
-                            'value': float(s_headers[1])
-                        })
+        self.fastqc_data[s_name] = parsed['data']
+        self.dup_keys = parsed['dup_keys']
+
+    def parse_fastqc_zips(self, zip_files):
+        """ Read and parse zipped FastQC reports, a batch at a time.
+        Reports are read from the zip files by a pool of threads and parsed
+        by a pool of processes. Only one batch of reports is held in memory.
+        Reports are added in the same order as they were found, so the results
+        are the same as reading and parsing each report in turn.
+        :param zip_files: List of found files from find_log_files()
+        """
+        fqc_config = getattr(config, 'fastqc_config', {})
+        batch_size = max(1, int(fqc_config.get('zip_batch_size', 100)))
+        num_threads = max(1, int(fqc_config.get('zip_threads', 4)))
+        num_procs = int(fqc_config.get('zip_processes') or 0)
+        # Starting processes is only worth it for more than one batch
+        if num_procs == 0:
+            num_procs = multiprocessing.cpu_count() if len(zip_files) > batch_size else 1
+
+        threads = ThreadPool(min(num_threads, len(zip_files)))
+        procs = None
+        if num_procs > 1:
+            try:
+                procs = multiprocessing.Pool(num_procs)
+            except (OSError, ImportError) as e:
+                log.debug("Couldn't start processes to parse FastQC reports, parsing one at a time: {}".format(e))
+        log.debug("Parsing {} FastQC zip files in batches of {} ({} threads, {} processes)".format(
+            len(zip_files), batch_size, num_threads, num_procs if procs is not None else 1))
+
+        try:
+            for i in range(0, len(zip_files), batch_size):
+                # Skip if we already have this report - parsing zip files is slow..
+                batch = [ f for f in zip_files[i:i+batch_size] if not self.zip_already_parsed(f) ]
+                contents = threads.map(read_fastqc_zip, [ os.path.join(f['root'], f['fn']) for f in batch ])
+                r_data = [ c[0] for c in contents if c[0] is not None ]
+                if procs is not None:
+                    parsed = iter(procs.map(parse_fastqc_data, r_data, chunksize=max(1, len(r_data) // (num_procs * 4))))
+                else:
+                    parsed = (parse_fastqc_data(d) for d in r_data)
+                # Add the reports in order, checking for names from earlier in this batch
+                for f, (data, error) in zip(batch, contents):
+                    report.last_found_file = os.path.join(f['root'], f['fn'])
+                    if data is not None:
+                        result = next(parsed)
+                    if self.zip_already_parsed(f):
+                        continue
+                    if isinstance(error, zipfile.BadZipfile) or isinstance(error, IOError):
+                        log.warn("Couldn't read '{}' - Bad zip file".format(f['fn']))
+                        log.debug("Bad zip file error:\n{}".format(error))
+                    elif isinstance(error, KeyError):
+                        log.warning("Error - can't find fastqc_raw_data.txt in {}".format(f))
                     else:
-                        # Special case: Rename dedup header in old versions of FastQC (v10)
-                        if s_headers[1] == 'Relative count':
-                            s_headers[1] = 'Percentage of total'
-                        s_headers = [s.lower().replace(' ', '_') for s in s_headers]
-                        self.fastqc_data[s_name][section] = list()
-
-                elif s_headers is not None:
-                    s = l.split("\t")
-                    row = dict()
-                    for (i, v) in enumerate(s):
-                        v.replace('NaN','0')
-                        try:
-                            v = float(v)
-                        except ValueError:
-                            pass
-                        row[s_headers[i]] = v
-                    self.fastqc_data[s_name][section].append(row)
-                    # Special case - need to remember order of duplication keys
-                    if section == 'sequence_duplication_levels':
-                        try:
-                            self.dup_keys.append(float(s[0]))
-                        except ValueError:
-                            self.dup_keys.append(s[0])
-
-        # Tidy up the Basic Stats
-        self.fastqc_data[s_name]['basic_statistics'] = {d['measure']: d['value'] for d in self.fastqc_data[s_name]['basic_statistics']}
-
-        # Calculate the average sequence length (Basic Statistics gives a range)
-        length_bp = 0
-        total_count = 0
-        for d in self.fastqc_data[s_name].get('sequence_length_distribution', {}):
-            length_bp += d['count'] * self.avg_bp_from_range(d['length'])
-            total_count += d['count']
-        if total_count > 0:
-            self.fastqc_data[s_name]['basic_statistics']['avg_sequence_length'] = length_bp / total_count
+                        self.add_fastqc_report(result, self.zip_s_name(f), f)
+        finally:
+            threads.terminate()
+            if procs is not None:
+                procs.terminate()
+
+    def zip_s_name(self, f):
+        """ Sample name from a FastQC zip file name """
+        s_name = f['fn']
+        if s_name.endswith('_fastqc.zip'):
+            s_name = s_name[:-11]
+        return s_name
+
+    def zip_already_parsed(self, f):
+        """ True if a report with the zip file's sample name has already been parsed """
+        s_name = self.zip_s_name(f)
+        if s_name in self.fastqc_data.keys():
+            log.debug("Skipping '{}' as already parsed '{}'".format(f['fn'], s_name))
+            return True
+        return False
 
     def fastqc_general_stats(self):
         """ Add some single-number stats to the basic statistics
@@ -417,24 +419,17 @@ class MultiqcModule(BaseMultiqcModule):
     def sequence_content_plot (self):
         """ Create the epic HTML for the FastQC sequence content heatmap """
 
-        # Prep the data
+        # Prep the data - dense arrays of percentages for each sample,
+        # sent to the browser with the rest of the compressed plot data
         data = OrderedDict()
         for s_name in sorted(self.fastqc_data.keys()):
-            try:
-                data[s_name] = {self.avg_bp_from_range(d['base']): d for d in self.fastqc_data[s_name]['per_base_sequence_content']}
-            except KeyError:
-                pass
-            # Old versions of FastQC give counts instead of percentages
-            for b in data[s_name]:
-                tot = sum([data[s_name][b][base] for base in ['a','c','t','g']])
-                if tot == 100.0:
-                    break
-                else:
-                    for base in ['a','c','t','g']:
-                        data[s_name][b][base] = (float(data[s_name][b][base])/float(tot)) * 100.0
+            rows = self.fastqc_data[s_name].get('per_base_sequence_content')
+            if rows:
+                data[s_name] = seq_content_arrays(rows)
         if len(data) == 0:
             log.debug('sequence_content not found in FastQC reports')
             return None
+        report.plot_data['fastqc_per_base_sequence_content_data'] = data
 
         html = '''<div id="fastqc_per_base_sequence_content_plot_div">
             <div class="alert alert-info">
@@ -458,9 +453,8 @@ class MultiqcModule(BaseMultiqcModule):
             <div class="clearfix"></div>
         </div>
         <script type="text/javascript">
-            fastqc_seq_content_data = {d};
-            $(function () {{ fastqc_seq_content_heatmap(); }});
-        </script>'''.format(d=json.dumps(data))
+            $(function () { fastqc_seq_content_heatmap(); });
+        </script>'''
 
         self.add_section (
             name = 'Per Base Sequence Content',
@@ -940,15 +934,7 @@ class MultiqcModule(BaseMultiqcModule):
         """ Helper function - FastQC often gives base pair ranges (eg. 10-15)
         which are not helpful when plotting. This returns the average from such
         ranges as an int, which is helpful. If not a range, just returns the int """
-
-        try:
-            if '-' in bp:
-                maxlen = float(bp.split("-",1)[1])
-                minlen = float(bp.split("-",1)[0])
-                bp = ((maxlen - minlen)/2) + minlen
-        except TypeError:
-            pass
-        return(int(bp))
+        return avg_bp_from_range(bp)
 
     def get_status_cols(self, section):
         """ Helper function - returns a list of colours according to the FastQC
@@ -958,3 +944,134 @@ class MultiqcModule(BaseMultiqcModule):
             status = self.fastqc_data[s_name]['statuses'].get(section, 'default')
             colours[s_name] = self.status_colours[status]
         return colours
+
+
+def read_fastqc_zip(path):
+    """ Read fastqc_data.txt from a zipped FastQC report. Runs in a thread,
+    so errors are returned instead of raised.
+    :param path: Path to the zip file
+    :return: Tuple of the report text (or None) and the error (or None)
+    """
+    try:
+        with zipfile.ZipFile(path) as fqc_zip:
+            # FastQC zip files should have just one directory inside, containing report
+            d_name = fqc_zip.namelist()[0]
+            with fqc_zip.open(os.path.join(d_name, 'fastqc_data.txt')) as fh:
+                return fh.read().decode('utf8'), None
+    except (zipfile.BadZipfile, IOError, KeyError) as e:
+        return None, e
+
+def parse_fastqc_data_file(f):
+    """ Parse a found fastqc_data.txt file, for map_log_files()
+    :param f: Found file dict, with the file contents
+    :return: Parsed report from parse_fastqc_data()
+    """
+    return parse_fastqc_data(f['f'])
+
+def parse_fastqc_data(file_contents):
+    """ Parse the text of a fastqc_data.txt file. Doesn't use the module
+    object, so that reports can be parsed in other processes.
+    :param file_contents: Text of the report
+    :return: Dict with the 'filename' given in the report (or None), the
+             parsed 'data' for fastqc_data and the sequence duplication 'dup_keys'
+    """
+    data = { 'statuses': dict() }
+    dup_keys = []
+
+    # Make the sample name from the input filename if we find it
+    fn_search = re.search(r"Filename\s+(.+)", file_contents)
+
+    # Parse the report
+    section = None
+    s_headers = None
+    for l in file_contents.splitlines():
+        if l == '>>END_MODULE':
+            section = None
+            s_headers = None
+        elif l.startswith('>>'):
+            (section, status) = l[2:].split("\t", 1)
+            section = section.lower().replace(' ', '_')
+            data['statuses'][section] = status
+        elif section is not None:
+            if l.startswith('#'):
+                s_headers = l[1:].split("\t")
+                # Special case: Total Deduplicated Percentage header line
+                if s_headers[0] == 'Total Deduplicated Percentage':
+                    data['basic_statistics'].append({
+                        'measure': 'total_deduplicated_percentage',
+                        'value': float(s_headers[1])
+                    })
+                else:
+                    # Special case: Rename dedup header in old versions of FastQC (v10)
+                    if s_headers[1] == 'Relative count':
+                        s_headers[1] = 'Percentage of total'
+                    s_headers = [s.lower().replace(' ', '_') for s in s_headers]
+                    data[section] = list()
+
+            elif s_headers is not None:
+                s = l.split("\t")
+                row = dict()
+                for (i, v) in enumerate(s):
+                    v.replace('NaN','0')
+                    try:
+                        v = float(v)
+                    except ValueError:
+                        pass
+                    row[s_headers[i]] = v
+                data[section].append(row)
+                # Special case - need to remember order of duplication keys
+                if section == 'sequence_duplication_levels':
+                    try:
+                        dup_keys.append(float(s[0]))
+                    except ValueError:
+                        dup_keys.append(s[0])
+
+    # Tidy up the Basic Stats
+    data['basic_statistics'] = {d['measure']: d['value'] for d in data['basic_statistics']}
+
+    # Calculate the average sequence length (Basic Statistics gives a range)
+    length_bp = 0
+    total_count = 0
+    for d in data.get('sequence_length_distribution', {}):
+        length_bp += d['count'] * avg_bp_from_range(d['length'])
+        total_count += d['count']
+    if total_count > 0:
+        data['basic_statistics']['avg_sequence_length'] = length_bp / total_count
+
+    return {
+        'filename': fn_search.group(1) if fn_search else None,
+        'data': data,
+        'dup_keys': dup_keys
+    }
+
+def seq_content_arrays(rows):
+    """ Per base sequence content for one sample, as arrays for the heatmap.
+    Old versions of FastQC give counts instead of percentages, so each
+    position is scaled to add up to 100%.
+    :param rows: List of parsed rows, with base, a, c, t and g keys
+    :return: Dict with the positions, base labels and one list of
+             percentages for each base, sorted by position
+    """
+    rows = sorted(rows, key=lambda d: avg_bp_from_range(d['base']))
+    counts = np.array([ [d[b] for b in 'tcag'] for d in rows ], dtype=float)
+    totals = counts.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1
+    pcts = np.round(counts / totals * 100.0, 2)
+    data = OrderedDict()
+    data['pos'] = [ avg_bp_from_range(d['base']) for d in rows ]
+    data['base'] = [ d['base'] for d in rows ]
+    for i, b in enumerate('tcag'):
+        data[b] = pcts[:,i].tolist()
+    return data
+
+def avg_bp_from_range(bp):
+    """ FastQC often gives base pair ranges (eg. 10-15). Returns the
+    average of such ranges as an int, or the int if not a range """
+    try:
+        if '-' in bp:
+            maxlen = float(bp.split("-",1)[1])
+            minlen = float(bp.split("-",1)[0])
+            bp = ((maxlen - minlen)/2) + minlen
+    except TypeError:
+        pass
+    return(int(bp))
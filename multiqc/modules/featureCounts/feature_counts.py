@@ -28,7 +28,7 @@ class MultiqcModule(BaseMultiqcModule):
         # Find and load any featureCounts reports
         self.featurecounts_data = dict()
         self.featurecounts_keys = list()
-        for f in self.find_log_files('featurecounts'):
+        for f in self.find_log_files('featurecounts', filemap=True):
             self.parse_featurecounts_report(f)
 
         # Filter to strip out ignored sample names
@@ -53,29 +53,38 @@ class MultiqcModule(BaseMultiqcModule):
         """ Parse the featureCounts log file. """
 
         file_names = list()
+        keys = list()
         parsed_data = dict()
-        for l in f['f'].splitlines():
-            thisrow = list()
-            s = l.split("\t")
-            if len(s) < 2:
-                continue
-            if s[0] == 'Status':
-                for f_name in s[1:]:
-                    file_names.append(f_name)
-            else:
-                k = s[0]
-                if k not in self.featurecounts_keys:
-                    self.featurecounts_keys.append(k)
-                for val in s[1:]:
-                    try:
-                        thisrow.append(int(val))
-                    except ValueError:
-                        pass
-            if len(thisrow) > 0:
-                parsed_data[k] = thisrow
+        try:
+            for l in f['f'].lines():
+                thisrow = list()
+                s = l.split("\t")
+                if len(s) < 2:
+                    continue
+                if s[0] == 'Status':
+                    for f_name in s[1:]:
+                        file_names.append(f_name)
+                else:
+                    k = s[0]
+                    if k not in keys:
+                        keys.append(k)
+                    for val in s[1:]:
+                        try:
+                            thisrow.append(int(val))
+                        except ValueError:
+                            pass
+                if len(thisrow) > 0:
+                    parsed_data[k] = thisrow
+        except UnicodeDecodeError as e:
+            if config.report_readerrors:
+                log.debug("'{}' is not valid UTF-8 text, skipping\n{}".format(f['fn'], e))
+            return None
         # Check that this actually is a featureCounts file, as format and parsing is quite general
         if 'Assigned' not in parsed_data.keys():
             return None
+        for k in keys:
+            if k not in self.featurecounts_keys:
+                self.featurecounts_keys.append(k)
         for idx, f_name in enumerate(file_names):
 
             # Clean up sample name
@@ -71,6 +71,8 @@ class MultiqcModule(BaseMultiqcModule):
     		'paired_aligned_discord_one': r"Aligned discordantly 1 time: (\d+) \([\d\.]+%\)",
         }
 
+        hisat2_regexes = self.compile_regexes(regexes, int)
+
         # Go through log file line by line
         s_name = f['s_name']
         parsed_data = {}
@@ -84,10 +86,7 @@ class MultiqcModule(BaseMultiqcModule):
                 log.debug("Found a HISAT2 command, updating sample name to '{}'".format(s_name))
 
             # Run through all regexes
-            for k, r in regexes.items():
-                match = re.search(r, l)
-                if match:
-                    parsed_data[k] = int(match.group(1))
+            parsed_data.update(hisat2_regexes.search(l))
 
             # Overall alignment rate
             overall = re.search(r"Overall alignment rate: ([\d\.]+)%", l)
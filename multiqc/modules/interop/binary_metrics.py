@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+
+""" Read the InterOp binary metric files written to an Illumina run folder,
+and summarise them in the same way as the InterOp `summary` and `index-summary`
+executables. Fixed-width records are memory-mapped as NumPy structured arrays,
+so that the summaries are worked out per tile without a Python loop over records. """
+
+from __future__ import division
+from collections import OrderedDict
+import io
+import logging
+import os
+import struct
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Tile metric codes (TileMetricsOut.bin version 2)
+TILE_DENSITY = 100
+TILE_DENSITY_PF = 101
+TILE_CLUSTERS = 102
+TILE_CLUSTERS_PF = 103
+TILE_PHASING = 200
+TILE_ALIGNED = 300
+
+# Record layouts for each file version: (header size, dtype)
+TILE_DTYPES = {
+    2: (2, np.dtype([('lane', '<u2'), ('tile', '<u2'), ('code', '<u2'), ('value', '<f4')])),
+    # Version 3 records are either cluster counts ('t') or aligned percentages ('r'), with
+    # the read number in place of the first value for 't'. The header also has the tile area.
+    3: (6, np.dtype({
+        'names': ['lane', 'tile', 'code', 'read', 'value1', 'value2'],
+        'formats': ['<u2', '<u4', 'u1', '<u4', '<f4', '<f4'],
+        'offsets': [0, 2, 6, 7, 7, 11],
+        'itemsize': 15 })),
+}
+ERROR_DTYPES = {
+    3: np.dtype({ 'names': ['lane', 'tile', 'cycle', 'error_rate'], 'formats': ['<u2', '<u2', '<u2', '<f4'], 'offsets': [0, 2, 4, 6] }),
+    4: np.dtype({ 'names': ['lane', 'tile', 'cycle', 'error_rate'], 'formats': ['<u2', '<u4', '<u2', '<f4'], 'offsets': [0, 2, 6, 8] }),
+}
+ERROR_DTYPES[5] = ERROR_DTYPES[6] = ERROR_DTYPES[4]
+
+# Read lengths that per-lane error rates are also given for, as in the InterOp summary
+ERROR_CYCLES = [35, 75, 100]
+
+
+def parse_run_folder(run_info_path):
+    """ Summarise the InterOp binary files of a run folder
+    :param run_info_path: Path to the RunInfo.xml file in the run folder
+    :return: Tuple of (run ID, run summary, index summary, bytes read). The
+             summaries are in the same format as returned by parse_summary_csv()
+             and parse_index_summary_csv(), or None if there are no files for them.
+    """
+    run_id, reads = read_run_info(run_info_path)
+    interop_dir = os.path.join(os.path.dirname(run_info_path), 'InterOp')
+    paths = dict()
+    for name in ['Tile', 'Q', 'Error', 'Index']:
+        path = os.path.join(interop_dir, '{}MetricsOut.bin'.format(name))
+        if os.path.isfile(path):
+            paths[name] = path
+    run_summary = None
+    index_summary = None
+    if 'Tile' not in paths:
+        return run_id, run_summary, index_summary, 0
+
+    tiles = read_tile_metrics(paths['Tile'])
+    q_metrics = None
+    error_metrics = None
+    if 'Q' in paths:
+        q_metrics = read_q_metrics(paths['Q'])
+    if 'Error' in paths:
+        error_metrics = read_error_metrics(paths['Error'])
+    if q_metrics is not None or error_metrics is not None:
+        run_summary = summarise_run(reads, tiles, q_metrics, error_metrics)
+    if 'Index' in paths:
+        index_summary = summarise_index(tiles, read_index_metrics(paths['Index']))
+    bytes_read = sum([ os.path.getsize(p) for p in paths.values() ])
+    return run_id, run_summary, index_summary, bytes_read
+
+
+def read_run_info(path):
+    """ Read the run ID and reads from RunInfo.xml
+    :param path: Path to RunInfo.xml
+    :return: Tuple of (run ID, list of read dicts with the read number,
+             number of cycles, whether it is an index read and its first and last cycle)
+    """
+    root = ET.parse(path).getroot()
+    run = root.find('Run')
+    if run is None:
+        raise ValueError("No Run element in {}".format(path))
+    reads = []
+    for r in run.iter('Read'):
+        reads.append({
+            'number': int(r.get('Number')),
+            'cycles': int(r.get('NumCycles')),
+            'is_index': r.get('IsIndexedRead') == 'Y'
+        })
+    reads.sort(key=lambda r: r['number'])
+    first = 1
+    for r in reads:
+        r['first'] = first
+        r['last'] = first + r['cycles'] - 1
+        first += r['cycles']
+    return run.get('Id'), reads
+
+
+def read_tile_metrics(path):
+    """ Read TileMetricsOut.bin into one value per tile
+    :param path: Path to TileMetricsOut.bin
+    :return: Dict with arrays of tile keys ('tiles', see tile_keys()) and the lane of each tile,
+             arrays of cluster counts and densities per tile, and dicts of read number: array
+             of aligned, phasing and prephasing percentages per tile
+    """
+    header = _read_header(path, 6)
+    version = header[0]
+    records = _map_records(path, TILE_DTYPES, version, header[1])
+    keys = tile_keys(records['lane'], records['tile'])
+    tiles, idx = np.unique(keys, return_inverse=True)
+    metrics = {
+        'tiles': tiles,
+        'lane': (tiles >> np.uint64(32)).astype(np.int64),
+        'aligned': dict(),
+        'phasing': dict(),
+        'prephasing': dict()
+    }
+
+    def per_tile(sel, values):
+        a = np.full(len(tiles), np.nan)
+        a[idx[sel]] = values[sel]
+        return a
+
+    code = records['code']
+    if version == 2:
+        value = records['value']
+        metrics['density'] = per_tile(code == TILE_DENSITY, value)
+        metrics['density_pf'] = per_tile(code == TILE_DENSITY_PF, value)
+        metrics['clusters'] = per_tile(code == TILE_CLUSTERS, value)
+        metrics['clusters_pf'] = per_tile(code == TILE_CLUSTERS_PF, value)
+        # Phasing and prephasing are stored as fractions, two codes per read from 200
+        for c in np.unique(code[(code >= TILE_PHASING) & (code < TILE_ALIGNED)]):
+            read = (c - TILE_PHASING) // 2 + 1
+            key = 'phasing' if (c - TILE_PHASING) % 2 == 0 else 'prephasing'
+            metrics[key][read] = per_tile(code == c, value) * 100
+        for c in np.unique(code[(code >= TILE_ALIGNED) & (code < TILE_ALIGNED + 100)]):
+            metrics['aligned'][c - TILE_ALIGNED + 1] = per_tile(code == c, value)
+    else:
+        area = struct.unpack('<f', bytes(header[2:6]))[0]
+        counts = code == ord('t')
+        metrics['clusters'] = per_tile(counts, records['value1'])
+        metrics['clusters_pf'] = per_tile(counts, records['value2'])
+        if not np.isfinite(area) or area <= 0:
+            area = np.nan
+        metrics['density'] = metrics['clusters'] / area
+        metrics['density_pf'] = metrics['clusters_pf'] / area
+        aligned = code == ord('r')
+        for read in np.unique(records['read'][aligned]):
+            metrics['aligned'][int(read)] = per_tile(aligned & (records['read'] == read), records['value2'])
+    return metrics
+
+
+def read_q_metrics(path):
+    """ Read the quality score histograms from QMetricsOut.bin
+    :param path: Path to QMetricsOut.bin
+    :return: Tuple of (structured array of lane, tile, cycle and hist per record,
+             array of the quality score for each histogram bin)
+    """
+    header = _read_header(path, 4 + 3 * 255)
+    version = header[0]
+    if version < 4 or version > 7:
+        raise ValueError("Unsupported QMetricsOut.bin version {}".format(version))
+    header_size = 2
+    qscores = np.arange(1, 51)
+    num_bins = 50
+    if version >= 5:
+        header_size = 3
+        if header[2] == 1:
+            n = header[3]
+            header_size = 4 + 3 * n
+            # Binned files from version 6 only have a count for each bin. The bins are
+            # given as arrays of lower, upper and remapped scores, or from version 7
+            # as lower, upper and remapped score for each bin in turn.
+            if version >= 6:
+                num_bins = n
+                if version == 6:
+                    qscores = np.array(header[4 + 2 * n:4 + 3 * n])
+                else:
+                    qscores = np.array(header[6:4 + 3 * n:3])
+    tile_type = '<u4' if version >= 7 else '<u2'
+    dtype = np.dtype([('lane', '<u2'), ('tile', tile_type), ('cycle', '<u2'), ('hist', '<u4', (num_bins,))])
+    records = _map_records(path, {version: (header_size, dtype)}, version, header[1])
+    return records, qscores
+
+
+def read_error_metrics(path):
+    """ Read the PhiX error rates from ErrorMetricsOut.bin
+    :param path: Path to ErrorMetricsOut.bin
+    :return: Structured array of lane, tile, cycle and error_rate per record
+    """
+    header = _read_header(path, 6)
+    version = header[0]
+    header_size = 2
+    if version == 6:
+        # Version 6 headers list the adapter sequences that rates are given for
+        num_adapters, adapter_length = struct.unpack('<HH', bytes(header[2:6]))
+        header_size = 6 + num_adapters * adapter_length
+    if version in ERROR_DTYPES:
+        dtype = ERROR_DTYPES[version]
+        dtype = np.dtype({
+            'names': dtype.names,
+            'formats': [ dtype.fields[n][0] for n in dtype.names ],
+            'offsets': [ dtype.fields[n][1] for n in dtype.names ],
+            'itemsize': header[1] })
+        return _map_records(path, {version: (header_size, dtype)}, version, header[1])
+    raise ValueError("Unsupported ErrorMetricsOut.bin version {}".format(version))
+
+
+def read_index_metrics(path):
+    """ Read the index counts from IndexMetricsOut.bin. Records have
+    variable length strings, so are read one at a time.
+    :param path: Path to IndexMetricsOut.bin
+    :return: List of (lane, tile, read, index sequence, count, sample ID, project) tuples
+    """
+    with io.open(path, 'rb') as fh:
+        buf = fh.read()
+    if len(buf) == 0:
+        return []
+    version = bytearray(buf[:1])[0]
+    if version == 1:
+        head_fmt, count_fmt = '<HHH', '<I'
+    elif version == 2:
+        head_fmt, count_fmt = '<HIH', '<Q'
+    else:
+        raise ValueError("Unsupported IndexMetricsOut.bin version {}".format(version))
+    head_size = struct.calcsize(head_fmt)
+    count_size = struct.calcsize(count_fmt)
+
+    def read_string(pos):
+        n = struct.unpack_from('<H', buf, pos)[0]
+        return buf[pos + 2:pos + 2 + n].decode('utf-8'), pos + 2 + n
+
+    records = []
+    pos = 1
+    while pos < len(buf):
+        lane, tile, read = struct.unpack_from(head_fmt, buf, pos)
+        index_name, pos = read_string(pos + head_size)
+        count = struct.unpack_from(count_fmt, buf, pos)[0]
+        sample, pos = read_string(pos + count_size)
+        project, pos = read_string(pos)
+        records.append((lane, tile, read, index_name, count, sample, project))
+    return records
+
+
+def summarise_run(reads, tiles, q_metrics, error_metrics):
+    """ Summary and per-lane metrics for each read, as from the InterOp summary
+    :param reads: List of read dicts from read_run_info()
+    :param tiles: Tile metrics from read_tile_metrics()
+    :param q_metrics: Tuple from read_q_metrics(), or None
+    :param error_metrics: Array from read_error_metrics(), or None
+    :return: Dict with 'summary' and 'details' dicts, as from parse_summary_csv()
+    """
+    lanes, tile_lane = np.unique(tiles['lane'], return_inverse=True)
+    num_lanes = len(lanes)
+
+    # As in the InterOp summary, the last cycle of each read is left out of the
+    # yields, Q30 and error rates, as it is only used to correct phasing.
+
+    # Bases and bases >= Q30 for each record
+    if q_metrics is not None:
+        q_records, qscores = q_metrics
+        q_cycle = q_records['cycle']
+        q_lane = np.searchsorted(lanes, q_records['lane'])
+        q_ok = q_lane < num_lanes
+        q_lane[~q_ok] = 0
+        q_ok &= lanes[q_lane] == q_records['lane']
+        hist = q_records['hist']
+        q_total = hist.sum(axis=1, dtype=np.uint64).astype(np.float64)
+        q_q30 = hist[:, qscores >= 30].sum(axis=1, dtype=np.uint64).astype(np.float64)
+
+    # Error rates are averaged per tile first
+    if error_metrics is not None:
+        e_cycle = error_metrics['cycle']
+        e_tile, e_ok = tile_index(tiles['tiles'], error_metrics['lane'], error_metrics['tile'])
+        e_rate = error_metrics['error_rate']
+        e_ok &= np.isfinite(e_rate)
+
+    summary = OrderedDict()
+    details = OrderedDict()
+    totals = []
+    for read in reads:
+        read_name = 'Read {}'.format(read['number'])
+        if read['is_index']:
+            read_name += ' (I)'
+        s = {
+            'is_index': read['is_index'],
+            'Yield': np.nan,
+            'Projected Yield': np.nan,
+            'Aligned': np.nan,
+            'Error Rate': np.nan,
+            'bases': 0,
+            'bases_q30': 0
+        }
+        lane_data = [ OrderedDict() for l in lanes ]
+        for i, l in enumerate(lane_data):
+            l['Tiles'] = np.sum(tile_lane == i)
+            l['Density'] = _nanmean(tiles['density'][tile_lane == i]) / 1000
+            l['Cluster PF'] = _nanmean((tiles['clusters_pf'] / tiles['clusters'])[tile_lane == i]) * 100
+            for key, name in [('phasing', 'Phased'), ('prephasing', 'Prephased')]:
+                if read['number'] in tiles[key]:
+                    l[name] = _nanmean(tiles[key][read['number']][tile_lane == i])
+            l['Reads'] = np.nansum(tiles['clusters'][tile_lane == i]) / 1000000
+            l['Reads PF'] = np.nansum(tiles['clusters_pf'][tile_lane == i]) / 1000000
+
+        if q_metrics is not None:
+            sel = q_ok & (q_cycle >= read['first']) & (q_cycle < read['last'])
+            if np.any(sel):
+                bases = np.bincount(q_lane[sel], weights=q_total[sel], minlength=num_lanes)
+                bases_q30 = np.bincount(q_lane[sel], weights=q_q30[sel], minlength=num_lanes)
+                # Scale up to the full read length while the run is still going
+                cycles_done = q_cycle[sel].max() - read['first'] + 1
+                usable_cycles = read['cycles'] - 1
+                s['bases'] = bases.sum()
+                s['bases_q30'] = bases_q30.sum()
+                s['Yield'] = s['bases'] / 1000000000
+                s['Projected Yield'] = s['Yield'] * usable_cycles / cycles_done
+                for i, l in enumerate(lane_data):
+                    l['%>=Q30'] = _percent(bases_q30[i], bases[i])
+                    l['Yield'] = bases[i] / 1000000000
+
+        if error_metrics is not None:
+            sel = e_ok & (e_cycle >= read['first']) & (e_cycle < read['last'])
+            tile_error = _tile_mean(e_tile[sel], e_rate[sel], len(tiles['tiles']))
+            s['Error Rate'] = _nanmean(tile_error)
+            cycles_error = np.zeros(num_lanes, dtype=np.int64)
+            if np.any(sel):
+                np.maximum.at(cycles_error, tile_lane[e_tile[sel]], e_cycle[sel] - read['first'] + 1)
+            tile_error_n = dict()
+            for n in ERROR_CYCLES:
+                if read['cycles'] >= n:
+                    n_sel = sel & (e_cycle < read['first'] + n)
+                    tile_error_n[n] = _tile_mean(e_tile[n_sel], e_rate[n_sel], len(tiles['tiles']))
+                    # Only tiles with an error rate for every cycle
+                    num_cycles = np.bincount(e_tile[n_sel], minlength=len(tiles['tiles']))
+                    tile_error_n[n][num_cycles < n] = np.nan
+            for i, l in enumerate(lane_data):
+                l['Cycles Error'] = cycles_error[i]
+                if read['number'] in tiles['aligned']:
+                    l['Aligned'] = _nanmean(tiles['aligned'][read['number']][tile_lane == i])
+                l['Error'] = _nanmean(tile_error[tile_lane == i])
+                for n in tile_error_n:
+                    l['Error ({})'.format(n)] = _nanmean(tile_error_n[n][tile_lane == i])
+        if read['number'] in tiles['aligned']:
+            s['Aligned'] = _nanmean(tiles['aligned'][read['number']])
+
+        for lane, l in zip(lanes, lane_data):
+            details['Lane {} - {}'.format(lane, read_name)] = _finite(l)
+        totals.append(s)
+        summary[read_name] = s
+
+    for level, level_reads in [
+            ('Non-indexed Total', [ s for s in totals if not s['is_index'] ]),
+            ('Total', totals) ]:
+        summary[level] = {
+            'Yield': np.nansum([ s['Yield'] for s in level_reads ]),
+            'Projected Yield': np.nansum([ s['Projected Yield'] for s in level_reads ]),
+            'Aligned': _nanmean([ s['Aligned'] for s in level_reads ]),
+            'Error Rate': _nanmean([ s['Error Rate'] for s in level_reads ]),
+            'bases': sum([ s['bases'] for s in level_reads ]),
+            'bases_q30': sum([ s['bases_q30'] for s in level_reads ])
+        }
+    for level, s in summary.items():
+        s['%>=Q30'] = _percent(s.pop('bases_q30'), s.pop('bases'))
+        s.pop('is_index', None)
+        summary[level] = _finite(s)
+
+    return { 'summary': summary, 'details': details }
+
+
+def summarise_index(tiles, index_records):
+    """ Per-lane and per-sample index counts, as from the InterOp index-summary
+    :param tiles: Tile metrics from read_tile_metrics()
+    :param index_records: List of records from read_index_metrics()
+    :return: Dict with 'summary' and 'details' dicts, as from parse_index_summary_csv()
+    """
+    # Sum the counts over tiles, keeping samples in the order they are first seen
+    counts = OrderedDict()
+    for lane, tile, read, index_name, count, sample, project in index_records:
+        key = (lane, sample, project, index_name)
+        counts[key] = counts.get(key, 0) + count
+
+    summary = OrderedDict()
+    details = OrderedDict()
+    for lane in sorted(set([ k[0] for k in counts ])):
+        in_lane = tiles['lane'] == lane
+        total_reads = np.nansum(tiles['clusters'][in_lane])
+        pf_reads = np.nansum(tiles['clusters_pf'][in_lane])
+        lane_counts = [ (k, c) for k, c in counts.items() if k[0] == lane ]
+        pct = np.array([ _percent(c, pf_reads) for k, c in lane_counts ])
+        lane_name = 'Lane {}'.format(lane)
+        summary[lane_name] = _finite(OrderedDict([
+            ('Total Reads', total_reads),
+            ('PF Reads', pf_reads),
+            ('% Read Identified (PF)', _percent(sum([ c for k, c in lane_counts ]), pf_reads)),
+            ('CV', np.std(pct, ddof=1) / np.mean(pct) if len(pct) > 1 else np.nan),
+            ('Min', np.min(pct)),
+            ('Max', np.max(pct))
+        ]))
+        for (k, c), p in zip(lane_counts, pct):
+            indexes = k[3].split('-', 1)
+            details['{} - {}'.format(k[1], lane_name)] = _finite(OrderedDict([
+                ('Project', k[2]),
+                ('Index 1 (I7)', indexes[0]),
+                ('Index 2 (I5)', indexes[1] if len(indexes) > 1 else ''),
+                ('% Read Identified (PF)', p)
+            ]))
+    return { 'summary': summary, 'details': details }
+
+
+def tile_keys(lane, tile):
+    """ One integer for each lane and tile number, to find tiles with np.unique() """
+    return (lane.astype(np.uint64) << np.uint64(32)) | tile.astype(np.uint64)
+
+
+def tile_index(tiles, lane, tile):
+    """ Position of each lane and tile in the sorted array of tile keys
+    :return: Tuple of (array of positions, boolean array of whether each tile was found)
+    """
+    keys = tile_keys(lane, tile)
+    idx = np.searchsorted(tiles, keys)
+    found = idx < len(tiles)
+    idx[~found] = 0
+    found &= tiles[idx] == keys
+    return idx, found
+
+
+def _read_header(path, size):
+    """ First bytes of a file, with the version and record size """
+    with io.open(path, 'rb') as fh:
+        header = bytearray(fh.read(size))
+    if len(header) < 2:
+        raise ValueError("{} is too short for an InterOp file".format(os.path.basename(path)))
+    return header
+
+
+def _map_records(path, dtypes, version, record_size):
+    """ Memory-map the fixed-width records of an InterOp file
+    :param dtypes: Dict of version: (header size, record dtype)
+    :param version: File version, from the header
+    :param record_size: Record size, from the header
+    :return: Structured array of records
+    """
+    fn = os.path.basename(path)
+    if version not in dtypes:
+        raise ValueError("Unsupported {} version {}".format(fn, version))
+    header_size, dtype = dtypes[version]
+    if dtype.itemsize != record_size:
+        raise ValueError("Unexpected {} record size {} for version {}".format(fn, record_size, version))
+    num_records = (os.path.getsize(path) - header_size) // record_size
+    if num_records <= 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=header_size, shape=(num_records,))
+
+
+def _tile_mean(idx, values, num_tiles):
+    """ Mean of the values for each tile, NaN for tiles with no values """
+    total = np.bincount(idx, weights=values, minlength=num_tiles)
+    n = np.bincount(idx, minlength=num_tiles)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / n
+
+
+def _nanmean(values):
+    """ Mean of the values that aren't NaN, or NaN if there are none """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    return values.mean() if len(values) > 0 else np.nan
+
+
+def _percent(count, total):
+    return count / total * 100 if total > 0 else np.nan
+
+
+def _finite(d):
+    """ Drop values that couldn't be worked out, and use Python numbers """
+    result = OrderedDict()
+    for k, v in d.items():
+        if isinstance(v, np.generic):
+            v = v.item()
+        if isinstance(v, float) and not np.isfinite(v):
+            continue
+        result[k] = v
+    return result
@@ -2,11 +2,15 @@ from multiqc.modules.base_module import BaseMultiqcModule
 import logging
 import os
 import csv
+import struct
 from collections import OrderedDict
 from multiqc import config
 from multiqc.plots import table
+from multiqc.utils import report
 import re
 
+from .binary_metrics import parse_run_folder
+
 log = logging.getLogger(__name__)
 
 class MultiqcModule(BaseMultiqcModule):
@@ -29,6 +33,9 @@ class MultiqcModule(BaseMultiqcModule):
             parsed_data = self.parse_index_summary_csv(f['f'])
             if max(len(parsed_data['summary']), len(parsed_data['details'])) > 0:
                 self.indexSummary[f['s_name']] = parsed_data
+        # Run folders with InterOp binary files, read without the InterOp executables
+        for f in self.find_log_files('interop/runinfo', filecontents=False):
+            self.parse_run_folder(f)
 
         # No samples
         if max(len(self.runSummary), len(self.indexSummary)) == 0:
@@ -62,6 +69,27 @@ class MultiqcModule(BaseMultiqcModule):
                 plot = self.index_metrics_details_table(self.indexSummary)
             )
 
+    def parse_run_folder(self, f):
+        """ Summarise the binary files in the InterOp folder next to RunInfo.xml """
+        try:
+            run_id, run_summary, index_summary, bytes_read = parse_run_folder(os.path.join(f['root'], f['fn']))
+        except (IOError, OSError, ValueError, SyntaxError, struct.error) as e:
+            log.warning("Couldn't read InterOp files for '{}': {}".format(os.path.join(f['root'], f['fn']), e))
+            return
+        report.bytes_read[self.name] += bytes_read
+        s_name = self.clean_s_name(run_id, f['root']) if run_id else f['s_name']
+        found = False
+        if run_summary is not None and max(len(run_summary['summary']), len(run_summary['details'])) > 0:
+            if s_name in self.runSummary:
+                log.debug("Duplicate sample name found! Overwriting: {}".format(s_name))
+            self.runSummary[s_name] = run_summary
+            found = True
+        if index_summary is not None and max(len(index_summary['summary']), len(index_summary['details'])) > 0:
+            self.indexSummary[s_name] = index_summary
+            found = True
+        if found:
+            self.add_data_source(f, s_name)
+
     def parse_summary_csv(self,f):
         metrics = {
                 'summary': {},
@@ -254,7 +282,7 @@ class MultiqcModule(BaseMultiqcModule):
         headers['Prephased'] = {
             'title': 'Prephased (%)',
             'description': 'The value used by RTA for the percentage of molecules in a cluster for which sequencing falls behind (phasing) or jumps ahead (prephasing) the current cycle within a read.',
-            'format': '{:.,2f}',
+            'format': '{:,.2f}',
             'min': 0,
             'max': 100,
             'suffix': '%',
@@ -275,7 +303,7 @@ class MultiqcModule(BaseMultiqcModule):
         headers['Cycles Error'] = {
             'title': 'Cycles Error',
             'description': 'The number of cycles that have been error-rated using PhiX, starting at cycle 1.',
-            'format': '{:.,0f}',
+            'format': '{:,.0f}',
         }
         headers['Yield'] = {
             'title': '{}p Yield'.format(config.base_count_prefix),
@@ -378,7 +406,7 @@ class MultiqcModule(BaseMultiqcModule):
         headers['CV'] = {
             'title': 'CV',
             'description': 'The coefficient of variation for the number of counts across all indexes.',
-            'format': '{:.,2f}',
+            'format': '{:,.2f}',
         }
         headers['Min'] = {
             'title': 'Min',
@@ -14,56 +14,66 @@ log = logging.getLogger(__name__)
 
 def parse_reports(self):
     """ Find Picard AlignmentSummaryMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/alignment_metrics', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard AlignmentSummaryMetrics data """
     self.picard_alignment_metrics = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/alignment_metrics', filehandles=True):
-        parsed_data = dict()
-        s_name = None
-        keys = None
-        for l in f['f']:
-            # New log starting
-            if 'AlignmentSummaryMetrics' in l and 'INPUT' in l:
-                s_name = None
-                keys = None
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-                    parsed_data[s_name] = dict()
-
-            if s_name is not None:
-                if 'AlignmentSummaryMetrics' in l and '## METRICS CLASS' in l:
-                    keys = f['f'].readline().strip("\n").split("\t")
-                elif keys:
-                    vals = l.strip("\n").split("\t")
-                    if len(vals) == len(keys):
-                        # Ignore the FIRST_OF_PAIR / SECOND_OF_PAIR data to simplify things
-                        if vals[0] == 'PAIR' or vals[0] == 'UNPAIRED':
-                            for i, k in enumerate(keys):
-                                try:
-                                    parsed_data[s_name][k] = float(vals[i])
-                                except ValueError:
-                                    parsed_data[s_name][k] = vals[i]
-                    else:
-                        s_name = None
-                        keys = None
-
-        # Remove empty dictionaries
-        for s_name in list(parsed_data.keys()):
-            if len(parsed_data[s_name]) == 0:
-                parsed_data.pop(s_name, None)
-
-        # Manipulate sample names if multiple baits found
-        for s_name in parsed_data.keys():
-            if s_name in self.picard_alignment_metrics:
-                log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-            self.add_data_source(f, s_name, section='AlignmentSummaryMetrics')
-            self.picard_alignment_metrics[s_name] = parsed_data[s_name]
 
+def parse_file(self, f):
+    """ Parse Picard AlignmentSummaryMetrics from one file, or one metrics section of a file """
+    parsed_data = dict()
+    s_name = None
+    keys = None
+    for l in f['f']:
+        # New log starting
+        if 'AlignmentSummaryMetrics' in l and 'INPUT' in l:
+            s_name = None
+            keys = None
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+                parsed_data[s_name] = dict()
+
+        if s_name is not None:
+            if 'AlignmentSummaryMetrics' in l and '## METRICS CLASS' in l:
+                keys = f['f'].readline().strip("\n").split("\t")
+            elif keys:
+                vals = l.strip("\n").split("\t")
+                if len(vals) == len(keys):
+                    # Ignore the FIRST_OF_PAIR / SECOND_OF_PAIR data to simplify things
+                    if vals[0] == 'PAIR' or vals[0] == 'UNPAIRED':
+                        for i, k in enumerate(keys):
+                            try:
+                                parsed_data[s_name][k] = float(vals[i])
+                            except ValueError:
+                                parsed_data[s_name][k] = vals[i]
+                else:
+                    s_name = None
+                    keys = None
+
+    # Remove empty dictionaries
+    for s_name in list(parsed_data.keys()):
+        if len(parsed_data[s_name]) == 0:
+            parsed_data.pop(s_name, None)
+
+    # Manipulate sample names if multiple baits found
+    for s_name in parsed_data.keys():
+        if s_name in self.picard_alignment_metrics:
+            log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+        self.add_data_source(f, s_name, section='AlignmentSummaryMetrics')
+        self.picard_alignment_metrics[s_name] = parsed_data[s_name]
+
+
+def add_results(self):
+    """ Add parsed Picard AlignmentSummaryMetrics data to the report """
     # Filter to strip out ignored sample names
     self.picard_alignment_metrics = self.ignore_samples(self.picard_alignment_metrics)
 
@@ -83,78 +83,86 @@ def read_base_distrib_data(line_iter):
 
 def parse_reports(self):
     """ Find Picard BaseDistributionByCycleMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/basedistributionbycycle', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
 
-    # Set up vars
+
+def setup_data(self):
+    """ Set up vars for Picard BaseDistributionByCycleMetrics data """
     self.picard_baseDistributionByCycle_data = dict()
     self.picard_baseDistributionByCycle_samplestats = dict()
 
-    # Go through logs and find Metrics
-    base_dist_files = self.find_log_files('picard/basedistributionbycycle', filehandles=True)
-
-    for f in base_dist_files:
-        try:
-            lines = iter(f['f'])
-
-            # read through the header of the file to obtain the
-            # sample name
-            clean_fn = lambda n: self.clean_s_name(n, f['root'])
-            s_name = read_sample_name(lines, clean_fn)
-            assert s_name is not None
-
-            # pull out the data
-            data = read_base_distrib_data(lines)
-            assert data is not None
-
-            # data should be a hierarchical dict
-            # data[read_end][cycle]
-            assert not (set(data) - set([1, 2]))
-
-            # set up the set of s_names
-            if 2 in set(data):
-                s_names = {
-                    1:"%s_R1" % s_name,
-                    2:"%s_R2" % s_name
-                }
-            else:
-                s_names = { 1:s_name }
-
-            previously_used = (
-                set(s_names.values())&set(self.picard_baseDistributionByCycle_data)
-            )
 
-            if previously_used:
-                for duped_name in previously_used:
-                    log.debug(
-                        "Duplicate sample name found in {}! "
-                        "Overwriting: {}".format(f['fn'], duped_name)
-                    )
-            for name in s_names.values():
-                self.add_data_source(f, name, section='BaseDistributionByCycle')
-
-            for read_end in s_names:
-                data_by_cycle = data[read_end]
-                s_name = s_names[read_end]
-                self.picard_baseDistributionByCycle_data[s_name] = data_by_cycle
-                samplestats = {
-                    'sum_pct_a':0,
-                    'sum_pct_c':0,
-                    'sum_pct_g':0,
-                    'sum_pct_t':0,
-                    'sum_pct_n':0,
-                    'cycle_count':0,
-                }
-                self.picard_baseDistributionByCycle_samplestats[s_name] = samplestats
-                for c, row in data_by_cycle.items():
-                    pct_a, pct_c, pct_g, pct_t, pct_n = row
-                    samplestats['sum_pct_a'] += pct_a
-                    samplestats['sum_pct_c'] += pct_c
-                    samplestats['sum_pct_g'] += pct_g
-                    samplestats['sum_pct_t'] += pct_t
-                    samplestats['sum_pct_n'] += pct_n
-                samplestats['cycle_count'] += len(data_by_cycle.keys())
-        except AssertionError:
-            pass
+def parse_file(self, f):
+    """ Parse Picard BaseDistributionByCycleMetrics from one file, or one metrics section of a file """
+    try:
+        lines = iter(f['f'])
+
+        # read through the header of the file to obtain the
+        # sample name
+        clean_fn = lambda n: self.clean_s_name(n, f['root'])
+        s_name = read_sample_name(lines, clean_fn)
+        assert s_name is not None
+
+        # pull out the data
+        data = read_base_distrib_data(lines)
+        assert data is not None
+
+        # data should be a hierarchical dict
+        # data[read_end][cycle]
+        assert not (set(data) - set([1, 2]))
+
+        # set up the set of s_names
+        if 2 in set(data):
+            s_names = {
+                1:"%s_R1" % s_name,
+                2:"%s_R2" % s_name
+            }
+        else:
+            s_names = { 1:s_name }
 
+        previously_used = (
+            set(s_names.values())&set(self.picard_baseDistributionByCycle_data)
+        )
+
+        if previously_used:
+            for duped_name in previously_used:
+                log.debug(
+                    "Duplicate sample name found in {}! "
+                    "Overwriting: {}".format(f['fn'], duped_name)
+                )
+        for name in s_names.values():
+            self.add_data_source(f, name, section='BaseDistributionByCycle')
+
+        for read_end in s_names:
+            data_by_cycle = data[read_end]
+            s_name = s_names[read_end]
+            self.picard_baseDistributionByCycle_data[s_name] = data_by_cycle
+            samplestats = {
+                'sum_pct_a':0,
+                'sum_pct_c':0,
+                'sum_pct_g':0,
+                'sum_pct_t':0,
+                'sum_pct_n':0,
+                'cycle_count':0,
+            }
+            self.picard_baseDistributionByCycle_samplestats[s_name] = samplestats
+            for c, row in data_by_cycle.items():
+                pct_a, pct_c, pct_g, pct_t, pct_n = row
+                samplestats['sum_pct_a'] += pct_a
+                samplestats['sum_pct_c'] += pct_c
+                samplestats['sum_pct_g'] += pct_g
+                samplestats['sum_pct_t'] += pct_t
+                samplestats['sum_pct_n'] += pct_n
+            samplestats['cycle_count'] += len(data_by_cycle.keys())
+    except AssertionError:
+        pass
+
+
+def add_results(self):
+    """ Add parsed Picard BaseDistributionByCycleMetrics data to the report """
     # Calculate summed mean values for all read orientations
     for s_name, v in self.picard_baseDistributionByCycle_samplestats.items():
         v['mean_pct_a'] = v['sum_pct_a'] / v['cycle_count']
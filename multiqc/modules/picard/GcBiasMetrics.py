@@ -14,75 +14,84 @@ log = logging.getLogger(__name__)
 
 def parse_reports(self):
     """ Find Picard InsertSizeMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/gcbias', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard GcBiasMetrics data """
     self.picard_GCbias_data = dict()
     self.picard_GCbiasSummary_data = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/gcbias', filehandles=True):
-        s_name = None
-        gc_col = None
-        cov_col = None
-        for l in f['f']:
-            # New log starting
-            if 'GcBiasMetrics' in l and 'INPUT' in l:
-                s_name = None
-
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-
-            if s_name is not None:
-                if gc_col is not None and cov_col is not None :
-                    try:
-                        # Note that GC isn't always the first column.
-                        s = l.strip("\n").split("\t")
-                        self.picard_GCbias_data[s_name][ int(s[gc_col]) ] = float(s[cov_col])
-                    except IndexError:
-                        s_name = None
-                        gc_col = None
-                        cov_col = None
-
-                if 'GcBiasDetailMetrics' in l and '## METRICS CLASS' in l:
-                    if s_name in self.picard_GCbias_data:
-                        log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.add_data_source(f, s_name, section='GcBiasDetailMetrics')
-                    self.picard_GCbias_data[s_name] = dict()
-                    # Get header - find columns with the data we want
-                    l = f['f'].readline()
-                    s = l.strip("\n").split("\t")
-                    gc_col = s.index('GC')
-                    cov_col = s.index('NORMALIZED_COVERAGE')
-
-                if 'GcBiasSummaryMetrics' in l and '## METRICS CLASS' in l:
-                    if s_name in self.picard_GCbias_data:
-                        log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.add_data_source(f, s_name, section='GcBiasSummaryMetrics')
-                    self.picard_GCbiasSummary_data[s_name] = dict()
 
-                    keys = f['f'].readline().rstrip("\n").split("\t")
-                    vals = f['f'].readline().rstrip("\n").split("\t")
-                    for i, k in enumerate(keys):
-                        try:
-                            self.picard_GCbiasSummary_data[s_name][k] = float(vals[i])
-                        except ValueError:
-                            self.picard_GCbiasSummary_data[s_name][k] = vals[i]
+def parse_file(self, f):
+    """ Parse Picard GcBiasMetrics from one file, or one metrics section of a file """
+    s_name = None
+    gc_col = None
+    cov_col = None
+    for l in f['f']:
+        # New log starting
+        if 'GcBiasMetrics' in l and 'INPUT' in l:
+            s_name = None
+
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+
+        if s_name is not None:
+            if gc_col is not None and cov_col is not None :
+                try:
+                    # Note that GC isn't always the first column.
+                    s = l.strip("\n").split("\t")
+                    self.picard_GCbias_data[s_name][ int(s[gc_col]) ] = float(s[cov_col])
+                except IndexError:
+                    s_name = None
+                    gc_col = None
+                    cov_col = None
+
+            if 'GcBiasDetailMetrics' in l and '## METRICS CLASS' in l:
+                if s_name in self.picard_GCbias_data:
+                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                self.add_data_source(f, s_name, section='GcBiasDetailMetrics')
+                self.picard_GCbias_data[s_name] = dict()
+                # Get header - find columns with the data we want
+                l = f['f'].readline()
+                s = l.strip("\n").split("\t")
+                gc_col = s.index('GC')
+                cov_col = s.index('NORMALIZED_COVERAGE')
+
+            if 'GcBiasSummaryMetrics' in l and '## METRICS CLASS' in l:
+                if s_name in self.picard_GCbias_data:
+                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                self.add_data_source(f, s_name, section='GcBiasSummaryMetrics')
+                self.picard_GCbiasSummary_data[s_name] = dict()
+
+                keys = f['f'].readline().rstrip("\n").split("\t")
+                vals = f['f'].readline().rstrip("\n").split("\t")
+                for i, k in enumerate(keys):
+                    try:
+                        self.picard_GCbiasSummary_data[s_name][k] = float(vals[i])
+                    except ValueError:
+                        self.picard_GCbiasSummary_data[s_name][k] = vals[i]
 
 
-        for s_name in list(self.picard_GCbias_data.keys()):
-            if len(self.picard_GCbias_data[s_name]) == 0:
-                self.picard_GCbias_data.pop(s_name, None)
-                log.debug("Removing {} as no data parsed".format(s_name))
+    for s_name in list(self.picard_GCbias_data.keys()):
+        if len(self.picard_GCbias_data[s_name]) == 0:
+            self.picard_GCbias_data.pop(s_name, None)
+            log.debug("Removing {} as no data parsed".format(s_name))
 
-        for s_name in list(self.picard_GCbiasSummary_data.keys()):
-            if len(self.picard_GCbiasSummary_data[s_name]) == 0:
-                self.picard_GCbiasSummary_data.pop(s_name, None)
-                log.debug("Removing {} as no data parsed".format(s_name))
+    for s_name in list(self.picard_GCbiasSummary_data.keys()):
+        if len(self.picard_GCbiasSummary_data[s_name]) == 0:
+            self.picard_GCbiasSummary_data.pop(s_name, None)
+            log.debug("Removing {} as no data parsed".format(s_name))
 
 
+def add_results(self):
+    """ Add parsed Picard GcBiasMetrics data to the report """
     # Filter to strip out ignored sample names
     self.picard_GCbias_data = self.ignore_samples(self.picard_GCbias_data)
 
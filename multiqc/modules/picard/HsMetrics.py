@@ -57,79 +57,88 @@ DESC = {
 
 def parse_reports(self):
     """ Find Picard HsMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/hsmetrics', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard HsMetrics data """
     self.picard_HsMetrics_data = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/hsmetrics', filehandles=True):
-        parsed_data = dict()
-        s_name = None
-        keys = None
-        commadecimal = None
-        for l in f['f']:
-            # New log starting
-            if 'CalculateHsMetrics' in l or 'CollectHsMetrics' in l and 'INPUT' in l:
-                s_name = None
-                keys = None
 
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-                    parsed_data[s_name] = dict()
+def parse_file(self, f):
+    """ Parse Picard HsMetrics from one file, or one metrics section of a file """
+    parsed_data = dict()
+    s_name = None
+    keys = None
+    commadecimal = None
+    for l in f['f']:
+        # New log starting
+        if 'CalculateHsMetrics' in l or 'CollectHsMetrics' in l and 'INPUT' in l:
+            s_name = None
+            keys = None
+
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+                parsed_data[s_name] = dict()
 
-            if s_name is not None:
-                if 'HsMetrics' in l and '## METRICS CLASS' in l:
-                    keys = f['f'].readline().strip("\n").split("\t")
-                elif keys:
-                    vals = l.strip("\n").split("\t")
-                    if len(vals) == len(keys):
-                        j = 'NA'
-                        if keys[0] == 'BAIT_SET':
-                            j = vals[0]
-                        parsed_data[s_name][j] = dict()
-                        # Check that we're not using commas for decimal places
-                        if commadecimal is None:
-                            for i, k in enumerate(keys):
-                                if k.startswith('PCT_'):
-                                    if ',' in vals[i]:
-                                        commadecimal = True
-                                    else:
-                                        commadecimal = False
+        if s_name is not None:
+            if 'HsMetrics' in l and '## METRICS CLASS' in l:
+                keys = f['f'].readline().strip("\n").split("\t")
+            elif keys:
+                vals = l.strip("\n").split("\t")
+                if len(vals) == len(keys):
+                    j = 'NA'
+                    if keys[0] == 'BAIT_SET':
+                        j = vals[0]
+                    parsed_data[s_name][j] = dict()
+                    # Check that we're not using commas for decimal places
+                    if commadecimal is None:
                         for i, k in enumerate(keys):
-                            try:
-                                if commadecimal:
-                                    vals[i] = vals[i].replace('.', '')
-                                    vals[i] = vals[i].replace(',', '.')
-                                parsed_data[s_name][j][k] = float(vals[i])
-                            except ValueError:
-                                parsed_data[s_name][j][k] = vals[i]
-                    else:
-                        s_name = None
-                        keys = None
+                            if k.startswith('PCT_'):
+                                if ',' in vals[i]:
+                                    commadecimal = True
+                                else:
+                                    commadecimal = False
+                    for i, k in enumerate(keys):
+                        try:
+                            if commadecimal:
+                                vals[i] = vals[i].replace('.', '')
+                                vals[i] = vals[i].replace(',', '.')
+                            parsed_data[s_name][j][k] = float(vals[i])
+                        except ValueError:
+                            parsed_data[s_name][j][k] = vals[i]
+                else:
+                    s_name = None
+                    keys = None
 
-        # Remove empty dictionaries
-        for s_name in list(parsed_data.keys()):
-            for j in parsed_data[s_name].keys():
-                if len(parsed_data[s_name][j]) == 0:
-                    parsed_data[s_name].pop(j, None)
-            if len(parsed_data[s_name]) == 0:
-                parsed_data.pop(s_name, None)
+    # Remove empty dictionaries
+    for s_name in list(parsed_data.keys()):
+        for j in parsed_data[s_name].keys():
+            if len(parsed_data[s_name][j]) == 0:
+                parsed_data[s_name].pop(j, None)
+        if len(parsed_data[s_name]) == 0:
+            parsed_data.pop(s_name, None)
 
-        # Manipulate sample names if multiple baits found
-        for s_name in parsed_data.keys():
-            for j in parsed_data[s_name].keys():
-                this_s_name = s_name
-                if(len(parsed_data[s_name]) > 1):
-                    this_s_name = "{}: {}".format(s_name, j)
-                if this_s_name in self.picard_HsMetrics_data:
-                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], this_s_name))
-                self.add_data_source(f, this_s_name, section='HsMetrics')
-                self.picard_HsMetrics_data[this_s_name] = parsed_data[s_name][j]
+    # Manipulate sample names if multiple baits found
+    for s_name in parsed_data.keys():
+        for j in parsed_data[s_name].keys():
+            this_s_name = s_name
+            if(len(parsed_data[s_name]) > 1):
+                this_s_name = "{}: {}".format(s_name, j)
+            if this_s_name in self.picard_HsMetrics_data:
+                log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], this_s_name))
+            self.add_data_source(f, this_s_name, section='HsMetrics')
+            self.picard_HsMetrics_data[this_s_name] = parsed_data[s_name][j]
 
 
+def add_results(self):
+    """ Add parsed Picard HsMetrics data to the report """
     # Filter to strip out ignored sample names
     self.picard_HsMetrics_data = self.ignore_samples(self.picard_HsMetrics_data)
 
@@ -9,6 +9,7 @@ import re
 
 from multiqc import config
 from multiqc.plots import linegraph
+from multiqc.utils.histogram import Histogram
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -16,100 +17,107 @@ log = logging.getLogger(__name__)
 
 def parse_reports(self):
     """ Find Picard InsertSizeMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/insertsize', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard InsertSizeMetrics data """
     self.picard_insertSize_data = dict()
     self.picard_insertSize_histogram = dict()
     self.picard_insertSize_samplestats = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/insertsize', filehandles=True):
-        s_name = None
-        in_hist = False
-        for l in f['f']:
-
-            # Catch the histogram values
-            if s_name is not None and in_hist is True:
-                try:
-                    sections = l.split("\t")
-                    ins = int(sections[0])
-                    tot_count = sum( [int(x) for x in sections[1:]] )
-                    self.picard_insertSize_histogram[s_name][ins] = tot_count
-                    self.picard_insertSize_samplestats[s_name]['total_count'] += tot_count
-                except ValueError:
-                    # Reset in case we have more in this log file
-                    s_name = None
-                    in_hist = False
-
-            # New log starting
-            if 'InsertSizeMetrics' in l and 'INPUT' in l:
+
+def parse_file(self, f):
+    """ Parse Picard InsertSizeMetrics from one file, or one metrics section of a file """
+    s_name = None
+    in_hist = False
+    for l in f['f']:
+
+        # Catch the histogram values
+        if s_name is not None and in_hist is True:
+            try:
+                sections = l.split("\t")
+                ins = int(sections[0])
+                tot_count = sum( [int(x) for x in sections[1:]] )
+                self.picard_insertSize_histogram[s_name][ins] = tot_count
+                self.picard_insertSize_samplestats[s_name]['total_count'] += tot_count
+            except ValueError:
+                # Reset in case we have more in this log file
                 s_name = None
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-
-            if s_name is not None:
-                if 'InsertSizeMetrics' in l and '## METRICS CLASS' in l:
-                    if s_name in self.picard_insertSize_data:
-                        log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.add_data_source(f, s_name, section='InsertSizeMetrics')
-                    keys = f['f'].readline().strip("\n").split("\t")
-                    vals = f['f'].readline().strip("\n").split("\t")
-                    self.picard_insertSize_samplestats[s_name] = {'total_count': 0, 'meansum':0, 'total_pairs':0 }
-                    orientation_idx = keys.index('PAIR_ORIENTATION')
-                    while len(vals) == len(keys):
-                        pair_orientation = vals[orientation_idx]
-                        rowkey = '{}_{}'.format(s_name, pair_orientation)
-                        self.picard_insertSize_data[rowkey] = OrderedDict()
-                        self.picard_insertSize_data[rowkey]['SAMPLE_NAME'] = s_name
-                        for i, k in enumerate(keys):
+                in_hist = False
+
+        # New log starting
+        if 'InsertSizeMetrics' in l and 'INPUT' in l:
+            s_name = None
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+
+        if s_name is not None:
+            if 'InsertSizeMetrics' in l and '## METRICS CLASS' in l:
+                if s_name in self.picard_insertSize_data:
+                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                self.add_data_source(f, s_name, section='InsertSizeMetrics')
+                keys = f['f'].readline().strip("\n").split("\t")
+                vals = f['f'].readline().strip("\n").split("\t")
+                self.picard_insertSize_samplestats[s_name] = {'total_count': 0, 'meansum':0, 'total_pairs':0 }
+                orientation_idx = keys.index('PAIR_ORIENTATION')
+                while len(vals) == len(keys):
+                    pair_orientation = vals[orientation_idx]
+                    rowkey = '{}_{}'.format(s_name, pair_orientation)
+                    self.picard_insertSize_data[rowkey] = OrderedDict()
+                    self.picard_insertSize_data[rowkey]['SAMPLE_NAME'] = s_name
+                    for i, k in enumerate(keys):
+                        try:
+                            self.picard_insertSize_data[rowkey][k] = float(vals[i])
+                        except ValueError:
                             try:
-                                self.picard_insertSize_data[rowkey][k] = float(vals[i])
+                                self.picard_insertSize_data[rowkey][k] = float(vals[i].replace(',','.'))
+                                log.debug("Switching commas for points in '{}': {} - {}".format(f['fn'], vals[i], vals[i].replace(',','.')))
                             except ValueError:
-                                try:
-                                    self.picard_insertSize_data[rowkey][k] = float(vals[i].replace(',','.'))
-                                    log.debug("Switching commas for points in '{}': {} - {}".format(f['fn'], vals[i], vals[i].replace(',','.')))
-                                except ValueError:
-                                    self.picard_insertSize_data[rowkey][k] = vals[i]
-                            except IndexError:
-                                pass # missing data
-                        # Add to mean sums
-                        rp = self.picard_insertSize_data[rowkey]['READ_PAIRS']
-                        mis = self.picard_insertSize_data[rowkey]['MEAN_INSERT_SIZE']
-                        self.picard_insertSize_samplestats[s_name]['meansum'] += (rp * mis)
-                        self.picard_insertSize_samplestats[s_name]['total_pairs'] += rp
-
-                        vals = f['f'].readline().strip("\n").split("\t")
-
-                    # Skip lines on to histogram
-                    l = f['f'].readline().strip("\n")
-                    l = f['f'].readline().strip("\n")
-
-                    self.picard_insertSize_histogram[s_name] = OrderedDict()
-                    in_hist = True
-
-        for key in list(self.picard_insertSize_data.keys()):
-            if len(self.picard_insertSize_data[key]) == 0:
-                self.picard_insertSize_data.pop(key, None)
-        for s_name in list(self.picard_insertSize_histogram.keys()):
-            if len(self.picard_insertSize_histogram[s_name]) == 0:
-                self.picard_insertSize_histogram.pop(s_name, None)
-                log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
+                                self.picard_insertSize_data[rowkey][k] = vals[i]
+                        except IndexError:
+                            pass # missing data
+                    # Add to mean sums
+                    rp = self.picard_insertSize_data[rowkey]['READ_PAIRS']
+                    mis = self.picard_insertSize_data[rowkey]['MEAN_INSERT_SIZE']
+                    self.picard_insertSize_samplestats[s_name]['meansum'] += (rp * mis)
+                    self.picard_insertSize_samplestats[s_name]['total_pairs'] += rp
+
+                    vals = f['f'].readline().strip("\n").split("\t")
+
+                # Skip lines on to histogram
+                l = f['f'].readline().strip("\n")
+                l = f['f'].readline().strip("\n")
+
+                self.picard_insertSize_histogram[s_name] = OrderedDict()
+                in_hist = True
+
+    for key in list(self.picard_insertSize_data.keys()):
+        if len(self.picard_insertSize_data[key]) == 0:
+            self.picard_insertSize_data.pop(key, None)
+    for s_name in list(self.picard_insertSize_histogram.keys()):
+        if len(self.picard_insertSize_histogram[s_name]) == 0:
+            self.picard_insertSize_histogram.pop(s_name, None)
+            log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
+
 
+def add_results(self):
+    """ Add parsed Picard InsertSizeMetrics data to the report """
     # Calculate summed mean values for all read orientations
     for s_name, v in self.picard_insertSize_samplestats.items():
         self.picard_insertSize_samplestats[s_name]['summed_mean'] = v['meansum'] / v['total_pairs']
 
     # Calculate summed median values for all read orientations
-    for s_name in self.picard_insertSize_histogram:
-        j = 0
-        for idx, c in self.picard_insertSize_histogram[s_name].items():
-            j += c
-            if j > (self.picard_insertSize_samplestats[s_name]['total_count'] / 2):
-                self.picard_insertSize_samplestats[s_name]['summed_median'] = idx
-                break
+    for s_name, hist in self.picard_insertSize_histogram.items():
+        summed_median = Histogram.from_dict(hist).median(inclusive=False)
+        if summed_median is not None:
+            self.picard_insertSize_samplestats[s_name]['summed_median'] = summed_median
 
 
     # Filter to strip out ignored sample names
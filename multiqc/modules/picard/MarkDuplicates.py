@@ -23,50 +23,64 @@ def parse_reports(self,
     """ Find Picard MarkDuplicates reports and parse their dataself.
     This function is also used by the biobambam2 module, hence the parameters.
     """
+    setup_data(self)
+    for f in self.find_log_files(log_key, filehandles=True):
+        parse_file(self, f)
+    return add_results(self, section_name, section_anchor, plot_title, plot_id, data_filename)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard MarkDuplicates data """
     self.picard_dupMetrics_data = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files(log_key, filehandles=True):
-        s_name = f['s_name']
-        for l in f['f']:
-            # New log starting
-            if 'markduplicates' in l.lower() and 'input' in l.lower():
+
+def parse_file(self, f):
+    """ Parse Picard MarkDuplicates from one file, or one metrics section of a file """
+    s_name = f['s_name']
+    for l in f['f']:
+        # New log starting
+        if 'markduplicates' in l.lower() and 'input' in l.lower():
+            s_name = None
+
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+
+        if s_name is not None:
+            if 'UNPAIRED_READ_DUPLICATES' in l:
+                if s_name in self.picard_dupMetrics_data:
+                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                self.add_data_source(f, s_name, section='DuplicationMetrics')
+                self.picard_dupMetrics_data[s_name] = dict()
+                keys = l.rstrip("\n").split("\t")
+                vals = f['f'].readline().rstrip("\n").split("\t")
+                for i, k in enumerate(keys):
+                    try:
+                        self.picard_dupMetrics_data[s_name][k] = float(vals[i])
+                    except ValueError:
+                        self.picard_dupMetrics_data[s_name][k] = vals[i]
+                # Check that this sample had some reads
+                if self.picard_dupMetrics_data[s_name].get('READ_PAIRS_EXAMINED', 0) == 0 and \
+                   self.picard_dupMetrics_data[s_name].get('UNPAIRED_READS_EXAMINED', 0) == 0:
+                    self.picard_dupMetrics_data.pop(s_name, None)
+                    log.warn("Skipping MarkDuplicates sample '{}' as log contained no reads".format(s_name))
                 s_name = None
 
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-
-            if s_name is not None:
-                if 'UNPAIRED_READ_DUPLICATES' in l:
-                    if s_name in self.picard_dupMetrics_data:
-                        log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.add_data_source(f, s_name, section='DuplicationMetrics')
-                    self.picard_dupMetrics_data[s_name] = dict()
-                    keys = l.rstrip("\n").split("\t")
-                    vals = f['f'].readline().rstrip("\n").split("\t")
-                    for i, k in enumerate(keys):
-                        try:
-                            self.picard_dupMetrics_data[s_name][k] = float(vals[i])
-                        except ValueError:
-                            self.picard_dupMetrics_data[s_name][k] = vals[i]
-                    # Check that this sample had some reads
-                    if self.picard_dupMetrics_data[s_name].get('READ_PAIRS_EXAMINED', 0) == 0 and \
-                       self.picard_dupMetrics_data[s_name].get('UNPAIRED_READS_EXAMINED', 0) == 0:
-                        self.picard_dupMetrics_data.pop(s_name, None)
-                        log.warn("Skipping MarkDuplicates sample '{}' as log contained no reads".format(s_name))
-                    s_name = None
-
-        for s_name in list(self.picard_dupMetrics_data.keys()):
-            if len(self.picard_dupMetrics_data[s_name]) == 0:
-                self.picard_dupMetrics_data.pop(s_name, None)
-                log.debug("Removing {} as no data parsed".format(s_name))
+    for s_name in list(self.picard_dupMetrics_data.keys()):
+        if len(self.picard_dupMetrics_data[s_name]) == 0:
+            self.picard_dupMetrics_data.pop(s_name, None)
+            log.debug("Removing {} as no data parsed".format(s_name))
 
 
+def add_results(self,
+    section_name='Mark Duplicates',
+    section_anchor='picard-markduplicates',
+    plot_title='Picard: Deduplication Stats',
+    plot_id='picard_deduplication',
+    data_filename='multiqc_picard_dups'):
+    """ Add parsed Picard MarkDuplicates data to the report """
     # Filter to strip out ignored sample names
     self.picard_dupMetrics_data = self.ignore_samples(self.picard_dupMetrics_data)
 
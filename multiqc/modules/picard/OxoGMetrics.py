@@ -12,64 +12,73 @@ log = logging.getLogger(__name__)
 
 def parse_reports(self):
     """ Find Picard OxoGMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/oxogmetrics', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
 
-    # Set up vars
-    self.picard_OxoGMetrics_data = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/oxogmetrics', filehandles=True):
-        # We use lists to make sure that we don't overwrite when no data will be parsed
-        parsed_data = list()
-        sample_names = list()
-        s_files = list()
-        s_name = None
-        keys = None
-        for l in f['f']:
-            # New log starting
-            if 'CollectOxoGMetrics' in l and 'INPUT' in l:
-                s_name = None
-                keys = None
-                context_col = None
-
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-                    parsed_data.append(dict())
-                    sample_names.append(s_name)
-                    s_files.append(f)
-
-
-            if s_name is not None:
-                if 'CollectOxoGMetrics$CpcgMetrics' in l and '## METRICS CLASS' in l:
-                    keys = f['f'].readline().strip("\n").split("\t")
-                    context_col = keys.index('CONTEXT')
-                elif keys:
-                    vals = l.strip("\n").split("\t")
-                    if len(vals) == len(keys) and context_col is not None:
-                        context = vals[context_col]
-                        parsed_data[-1][context] = dict()
-                        for i, k in enumerate(keys):
-                            k = k.strip()
-                            try:
-                                parsed_data[-1][context][k] = float(vals[i])
-                            except ValueError:
-                                vals[i] = vals[i].strip()
-                                parsed_data[-1][context][k] = vals[i]
-                    else:
-                        s_name = None
-                        keys = None
-
-        # Remove empty dictionaries
-        for idx, s_name in enumerate(sample_names):
-            if len(parsed_data[idx]) > 0:
-                if s_name in self.picard_OxoGMetrics_data:
-                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(s_files[idx], s_name))
-                self.add_data_source(s_files[idx], s_name, section='OxoGMetrics')
-                self.picard_OxoGMetrics_data[s_name] = parsed_data[idx]
+def setup_data(self):
+    """ Set up vars for Picard OxoGMetrics data """
+    self.picard_OxoGMetrics_data = dict()
 
 
+def parse_file(self, f):
+    """ Parse Picard OxoGMetrics from one file, or one metrics section of a file """
+    # We use lists to make sure that we don't overwrite when no data will be parsed
+    parsed_data = list()
+    sample_names = list()
+    s_files = list()
+    s_name = None
+    keys = None
+    for l in f['f']:
+        # New log starting
+        if 'CollectOxoGMetrics' in l and 'INPUT' in l:
+            s_name = None
+            keys = None
+            context_col = None
+
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+                parsed_data.append(dict())
+                sample_names.append(s_name)
+                s_files.append(f)
+
+
+        if s_name is not None:
+            if 'CollectOxoGMetrics$CpcgMetrics' in l and '## METRICS CLASS' in l:
+                keys = f['f'].readline().strip("\n").split("\t")
+                context_col = keys.index('CONTEXT')
+            elif keys:
+                vals = l.strip("\n").split("\t")
+                if len(vals) == len(keys) and context_col is not None:
+                    context = vals[context_col]
+                    parsed_data[-1][context] = dict()
+                    for i, k in enumerate(keys):
+                        k = k.strip()
+                        try:
+                            parsed_data[-1][context][k] = float(vals[i])
+                        except ValueError:
+                            vals[i] = vals[i].strip()
+                            parsed_data[-1][context][k] = vals[i]
+                else:
+                    s_name = None
+                    keys = None
+
+    # Remove empty dictionaries
+    for idx, s_name in enumerate(sample_names):
+        if len(parsed_data[idx]) > 0:
+            if s_name in self.picard_OxoGMetrics_data:
+                log.debug("Duplicate sample name found in {}! Overwriting: {}".format(s_files[idx], s_name))
+            self.add_data_source(s_files[idx], s_name, section='OxoGMetrics')
+            self.picard_OxoGMetrics_data[s_name] = parsed_data[idx]
+
+
+def add_results(self):
+    """ Add parsed Picard OxoGMetrics data to the report """
     # Filter to strip out ignored sample names
     self.picard_OxoGMetrics_data = self.ignore_samples(self.picard_OxoGMetrics_data)
 
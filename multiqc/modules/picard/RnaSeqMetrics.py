@@ -15,77 +15,87 @@ log = logging.getLogger(__name__)
 
 def parse_reports(self):
     """ Find Picard RnaSeqMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/rnaseqmetrics', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard RnaSeqMetrics data """
     self.picard_RnaSeqMetrics_data = dict()
     self.picard_RnaSeqMetrics_histogram = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/rnaseqmetrics', filehandles=True):
-        s_name = None
-        in_hist = False
-        for l in f['f']:
-            # Catch the histogram values
-            if s_name is not None and in_hist is True:
-                try:
-                    sections = l.split("\t")
-                    pos = int(sections[0])
-                    coverage = float(sections[1])
-                    self.picard_RnaSeqMetrics_histogram[s_name][pos] = coverage
-                except ValueError:
-                    # Reset in case we have more in this log file
-                    s_name = None
-                    in_hist = False
-
-            # New log starting
-            if 'rnaseqmetrics' in l.lower() and 'INPUT' in l:
+
+def parse_file(self, f):
+    """ Parse Picard RnaSeqMetrics from one file, or one metrics section of a file """
+    s_name = None
+    in_hist = False
+    for l in f['f']:
+        # Catch the histogram values
+        if s_name is not None and in_hist is True:
+            try:
+                sections = l.split("\t")
+                pos = int(sections[0])
+                coverage = float(sections[1])
+                self.picard_RnaSeqMetrics_histogram[s_name][pos] = coverage
+            except ValueError:
+                # Reset in case we have more in this log file
                 s_name = None
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-
-            if s_name is not None:
-                if 'rnaseqmetrics' in l.lower() and '## METRICS CLASS' in l:
-                    if s_name in self.picard_RnaSeqMetrics_data:
-                        log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.picard_RnaSeqMetrics_data[s_name] = dict()
-                    self.picard_RnaSeqMetrics_histogram[s_name] = dict()
-                    self.add_data_source(f, s_name, section='RnaSeqMetrics')
-                    keys = f['f'].readline().strip("\n").split("\t")
-                    vals = f['f'].readline().strip("\n").split("\t")
-                    for i, k in enumerate(keys):
-                        # Multiply percentages by 100
-                        if k.startswith('PCT_'):
-                            try:
-                                vals[i] = float(vals[i]) * 100.0
-                            except (ValueError, IndexError):
-                                pass
-                        # Save the key:value pairs
-                        try:
-                            self.picard_RnaSeqMetrics_data[s_name][k] = float(vals[i])
-                        except ValueError:
-                            self.picard_RnaSeqMetrics_data[s_name][k] = vals[i]
-                        except IndexError:
-                            pass # missing data
-                    # Calculate some extra numbers
-                    if 'PF_BASES' in keys and 'PF_ALIGNED_BASES' in keys:
-                        self.picard_RnaSeqMetrics_data[s_name]['PF_NOT_ALIGNED_BASES'] = \
-                            self.picard_RnaSeqMetrics_data[s_name]['PF_BASES'] - self.picard_RnaSeqMetrics_data[s_name]['PF_ALIGNED_BASES']
-
-            if s_name is not None and 'normalized_position	All_Reads.normalized_coverage' in l:
+                in_hist = False
+
+        # New log starting
+        if 'rnaseqmetrics' in l.lower() and 'INPUT' in l:
+            s_name = None
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+
+        if s_name is not None:
+            if 'rnaseqmetrics' in l.lower() and '## METRICS CLASS' in l:
+                if s_name in self.picard_RnaSeqMetrics_data:
+                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                self.picard_RnaSeqMetrics_data[s_name] = dict()
                 self.picard_RnaSeqMetrics_histogram[s_name] = dict()
-                in_hist = True
-
-        for key in list(self.picard_RnaSeqMetrics_data.keys()):
-            if len(self.picard_RnaSeqMetrics_data[key]) == 0:
-                self.picard_RnaSeqMetrics_data.pop(key, None)
-        for s_name in list(self.picard_RnaSeqMetrics_histogram.keys()):
-            if len(self.picard_RnaSeqMetrics_histogram[s_name]) == 0:
-                self.picard_RnaSeqMetrics_histogram.pop(s_name, None)
-                log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
-
+                self.add_data_source(f, s_name, section='RnaSeqMetrics')
+                keys = f['f'].readline().strip("\n").split("\t")
+                vals = f['f'].readline().strip("\n").split("\t")
+                for i, k in enumerate(keys):
+                    # Multiply percentages by 100
+                    if k.startswith('PCT_'):
+                        try:
+                            vals[i] = float(vals[i]) * 100.0
+                        except (ValueError, IndexError):
+                            pass
+                    # Save the key:value pairs
+                    try:
+                        self.picard_RnaSeqMetrics_data[s_name][k] = float(vals[i])
+                    except ValueError:
+                        self.picard_RnaSeqMetrics_data[s_name][k] = vals[i]
+                    except IndexError:
+                        pass # missing data
+                # Calculate some extra numbers
+                if 'PF_BASES' in keys and 'PF_ALIGNED_BASES' in keys:
+                    self.picard_RnaSeqMetrics_data[s_name]['PF_NOT_ALIGNED_BASES'] = \
+                        self.picard_RnaSeqMetrics_data[s_name]['PF_BASES'] - self.picard_RnaSeqMetrics_data[s_name]['PF_ALIGNED_BASES']
+
+        if s_name is not None and 'normalized_position	All_Reads.normalized_coverage' in l:
+            self.picard_RnaSeqMetrics_histogram[s_name] = dict()
+            in_hist = True
+
+    for key in list(self.picard_RnaSeqMetrics_data.keys()):
+        if len(self.picard_RnaSeqMetrics_data[key]) == 0:
+            self.picard_RnaSeqMetrics_data.pop(key, None)
+    for s_name in list(self.picard_RnaSeqMetrics_histogram.keys()):
+        if len(self.picard_RnaSeqMetrics_histogram[s_name]) == 0:
+            self.picard_RnaSeqMetrics_histogram.pop(s_name, None)
+            log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
+
+
+def add_results(self):
+    """ Add parsed Picard RnaSeqMetrics data to the report """
     # Filter to strip out ignored sample names
     self.picard_RnaSeqMetrics_data = self.ignore_samples(self.picard_RnaSeqMetrics_data)
 
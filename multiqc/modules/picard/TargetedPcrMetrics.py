@@ -15,42 +15,52 @@ log = logging.getLogger(__name__)
 
 def parse_reports(self):
     """ Find Picard TargetedPcrMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/pcr_metrics', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard TargetedPcrMetrics data """
     self.picard_pcrmetrics_data = dict()
     self.picard_pcrmetrics_samplestats = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/pcr_metrics', filehandles=True):
-        s_name = None
-        for l in f['f']:
-            # New log starting
-            if 'TargetedPcrMetrics' in l and 'INPUT' in l:
-                s_name = None
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-
-            if s_name is not None:
-                if 'TargetedPcrMetrics' in l and '## METRICS CLASS' in l:
-                    keys = f['f'].readline().strip("\n").split("\t")
-                    vals = f['f'].readline().strip("\n").split("\t")
-                    if len(vals) == len(keys):
-                        if s_name in self.picard_pcrmetrics_data:
-                            log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                        self.add_data_source(f, s_name, section='TargetedPcrMetrics')
-                        self.picard_pcrmetrics_data[s_name] = dict()
-                        for i, k in enumerate(keys):
-                            try:
-                                # Multiply percentages by 100
-                                if k.startswith('PCT_'):
-                                    vals[i] = float(vals[i]) * 100.0
-                                self.picard_pcrmetrics_data[s_name][k] = float(vals[i])
-                            except ValueError:
-                                self.picard_pcrmetrics_data[s_name][k] = vals[i]
 
+def parse_file(self, f):
+    """ Parse Picard TargetedPcrMetrics from one file, or one metrics section of a file """
+    s_name = None
+    for l in f['f']:
+        # New log starting
+        if 'TargetedPcrMetrics' in l and 'INPUT' in l:
+            s_name = None
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+
+        if s_name is not None:
+            if 'TargetedPcrMetrics' in l and '## METRICS CLASS' in l:
+                keys = f['f'].readline().strip("\n").split("\t")
+                vals = f['f'].readline().strip("\n").split("\t")
+                if len(vals) == len(keys):
+                    if s_name in self.picard_pcrmetrics_data:
+                        log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                    self.add_data_source(f, s_name, section='TargetedPcrMetrics')
+                    self.picard_pcrmetrics_data[s_name] = dict()
+                    for i, k in enumerate(keys):
+                        try:
+                            # Multiply percentages by 100
+                            if k.startswith('PCT_'):
+                                vals[i] = float(vals[i]) * 100.0
+                            self.picard_pcrmetrics_data[s_name][k] = float(vals[i])
+                        except ValueError:
+                            self.picard_pcrmetrics_data[s_name][k] = vals[i]
+
+
+def add_results(self):
+    """ Add parsed Picard TargetedPcrMetrics data to the report """
     # Filter to strip out ignored sample names
     self.picard_pcrmetrics_data = self.ignore_samples(self.picard_pcrmetrics_data)
 
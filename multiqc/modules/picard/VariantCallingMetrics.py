@@ -12,12 +12,36 @@ log = logging.getLogger(__name__)
 
 def parse_reports(parent_module):
     """ Find Picard VariantCallingMetrics reports and process their data """
+    setup_data(parent_module)
+    for file_meta in parent_module.find_log_files('picard/variant_calling_metrics', filehandles=True):
+        parse_file(parent_module, file_meta)
+    return add_results(parent_module)
+
+
+def setup_data(parent_module):
+    """ Set up vars for Picard VariantCallingMetrics data """
+    parent_module.picard_variantCalling_data = dict()
+
+
+def parse_file(parent_module, file_meta):
+    """ Parse Picard VariantCallingMetrics from one file, or one metrics section of a file """
+    data = parent_module.picard_variantCalling_data
+    s_name = None
+    for header, value in table_in(file_meta['f'], pre_header_string='## METRICS CLASS'):
+        if header == 'SAMPLE_ALIAS':
+            s_name = value
+            if s_name in data:
+                log.debug("Duplicate sample name found in {}! Overwriting: {}".format(file_meta['fn'], s_name))
+            data[s_name] = OrderedDict()
+        else:
+            data[s_name][header] = value
 
-    # get data
-    data = collect_data(parent_module)
+
+def add_results(parent_module):
+    """ Add parsed Picard VariantCallingMetrics data to the report """
 
     # Filter to strip out ignored sample names
-    data = parent_module.ignore_samples(data)
+    data = parent_module.ignore_samples(parent_module.picard_variantCalling_data)
 
     # Reference data in parent module
     parent_module.picard_variantCalling_data = data
@@ -115,23 +139,6 @@ def parse_reports(parent_module):
     return len(data)
 
 
-def collect_data(parent_module):
-    """ Find Picard VariantCallingMetrics reports and parse their data """
-
-    data = dict()
-    for file_meta in parent_module.find_log_files('picard/variant_calling_metrics', filehandles=True):
-        s_name = None
-        for header, value in table_in(file_meta['f'], pre_header_string='## METRICS CLASS'):
-            if header == 'SAMPLE_ALIAS':
-                s_name = value
-                if s_name in data:
-                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(file_meta['fn'], s_name))
-                data[s_name] = OrderedDict()
-            else:
-                data[s_name][header] = value
-    return data
-
-
 def table_in(filehandle, pre_header_string):
     """ Generator that assumes a table starts the line after a given string """
 
@@ -9,6 +9,7 @@ import re
 
 from multiqc import config
 from multiqc.plots import linegraph, bargraph
+from multiqc.utils.histogram import Histogram
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -16,70 +17,80 @@ log = logging.getLogger(__name__)
 
 def parse_reports(self):
     """ Find Picard WgsMetrics reports and parse their data """
+    setup_data(self)
+    for f in self.find_log_files('picard/wgs_metrics', filehandles=True):
+        parse_file(self, f)
+    return add_results(self)
+
 
-    # Set up vars
+def setup_data(self):
+    """ Set up vars for Picard WgsMetrics data """
     self.picard_wgsmetrics_data = dict()
     self.picard_wgsmetrics_histogram = dict()
     self.picard_wgsmetrics_samplestats = dict()
 
-    # Go through logs and find Metrics
-    for f in self.find_log_files('picard/wgs_metrics', filehandles=True):
-        s_name = None
-        in_hist = False
-        for l in f['f']:
-
-            # Catch the histogram values
-            if s_name is not None and in_hist is True:
-                try:
-                    sections = l.split("\t")
-                    cov = int(sections[0])
-                    count = int(sections[1])
-                    self.picard_wgsmetrics_histogram[s_name][cov] = count
-                except ValueError:
-                    # Reset in case we have more in this log file
-                    s_name = None
-                    in_hist = False
 
-            # New log starting
-            if 'WgsMetrics' in l and 'INPUT' in l:
+def parse_file(self, f):
+    """ Parse Picard WgsMetrics from one file, or one metrics section of a file """
+    s_name = None
+    in_hist = False
+    for l in f['f']:
+
+        # Catch the histogram values
+        if s_name is not None and in_hist is True:
+            try:
+                sections = l.split("\t")
+                cov = int(sections[0])
+                count = int(sections[1])
+                self.picard_wgsmetrics_histogram[s_name][cov] = count
+            except ValueError:
+                # Reset in case we have more in this log file
                 s_name = None
-                # Pull sample name from input
-                fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
-                if fn_search:
-                    s_name = os.path.basename(fn_search.group(1).strip('[]'))
-                    s_name = self.clean_s_name(s_name, f['root'])
-
-            if s_name is not None:
-                if 'CollectWgsMetrics$WgsMetrics' in l and '## METRICS CLASS' in l:
-                    if s_name in self.picard_wgsmetrics_data:
-                        log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
-                    self.add_data_source(f, s_name, section='WgsMetrics')
-                    self.picard_wgsmetrics_data[s_name] = dict()
-                    keys = f['f'].readline().strip("\n").split("\t")
-                    vals = f['f'].readline().strip("\n").split("\t")
-                    if len(vals) == len(keys):
-                        for i, k in enumerate(keys):
-                            try:
-                                self.picard_wgsmetrics_data[s_name][k] = float(vals[i])
-                            except ValueError:
-                                self.picard_wgsmetrics_data[s_name][k] = vals[i]
-
-                    # Skip lines on to histogram
-                    next(f['f'])
-                    next(f['f'])
-                    next(f['f'])
-
-                    self.picard_wgsmetrics_histogram[s_name] = OrderedDict()
-                    in_hist = True
-
-        for key in list(self.picard_wgsmetrics_data.keys()):
-            if len(self.picard_wgsmetrics_data[key]) == 0:
-                self.picard_wgsmetrics_data.pop(key, None)
-        for s_name in list(self.picard_wgsmetrics_histogram.keys()):
-            if len(self.picard_wgsmetrics_histogram[s_name]) == 0:
-                self.picard_wgsmetrics_histogram.pop(s_name, None)
-                log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
-
+                in_hist = False
+
+        # New log starting
+        if 'WgsMetrics' in l and 'INPUT' in l:
+            s_name = None
+            # Pull sample name from input
+            fn_search = re.search(r"INPUT(?:=|\s+)(\[?[^\s]+\]?)", l, flags=re.IGNORECASE)
+            if fn_search:
+                s_name = os.path.basename(fn_search.group(1).strip('[]'))
+                s_name = self.clean_s_name(s_name, f['root'])
+
+        if s_name is not None:
+            if 'CollectWgsMetrics$WgsMetrics' in l and '## METRICS CLASS' in l:
+                if s_name in self.picard_wgsmetrics_data:
+                    log.debug("Duplicate sample name found in {}! Overwriting: {}".format(f['fn'], s_name))
+                self.add_data_source(f, s_name, section='WgsMetrics')
+                self.picard_wgsmetrics_data[s_name] = dict()
+                keys = f['f'].readline().strip("\n").split("\t")
+                vals = f['f'].readline().strip("\n").split("\t")
+                if len(vals) == len(keys):
+                    for i, k in enumerate(keys):
+                        try:
+                            self.picard_wgsmetrics_data[s_name][k] = float(vals[i])
+                        except ValueError:
+                            self.picard_wgsmetrics_data[s_name][k] = vals[i]
+
+                # Skip lines on to histogram
+                next(f['f'])
+                next(f['f'])
+                next(f['f'])
+
+                self.picard_wgsmetrics_histogram[s_name] = OrderedDict()
+                in_hist = True
+
+    for key in list(self.picard_wgsmetrics_data.keys()):
+        if len(self.picard_wgsmetrics_data[key]) == 0:
+            self.picard_wgsmetrics_data.pop(key, None)
+    for s_name in list(self.picard_wgsmetrics_histogram.keys()):
+        if len(self.picard_wgsmetrics_histogram[s_name]) == 0:
+            self.picard_wgsmetrics_histogram.pop(s_name, None)
+            log.debug("Ignoring '{}' histogram as no data parsed".format(s_name))
+
+
+def add_results(self):
+    """ Add parsed Picard WgsMetrics data to the report """
     # Filter to strip out ignored sample names
     self.picard_wgsmetrics_data = self.ignore_samples(self.picard_wgsmetrics_data)
 
@@ -134,42 +145,48 @@ def parse_reports(self):
                 'modify': lambda x: self.multiply_hundred(x)
             }
 
+        histograms = dict()
+        for s_name, samp in self.picard_wgsmetrics_histogram.items():
+            histograms[s_name] = Histogram.from_dict(samp)
+
         for s_name in self.picard_wgsmetrics_data:
             if s_name not in self.general_stats_data:
                 self.general_stats_data[s_name] = dict()
             self.general_stats_data[s_name].update( self.picard_wgsmetrics_data[s_name] )
+            # Work out coverage levels that Picard doesn't report from the histogram
+            missing_covs = [ c for c in covs if 'PCT_{}X'.format(c) not in self.picard_wgsmetrics_data[s_name] ]
+            if len(missing_covs) > 0 and s_name in histograms:
+                try:
+                    fracs = histograms[s_name].fraction_at_least([ float(c) for c in missing_covs ])
+                except ValueError:
+                    fracs = None
+                if fracs is not None:
+                    for c, frac in zip(missing_covs, fracs.tolist()):
+                        self.general_stats_data[s_name]['PCT_{}X'.format(c)] = frac
 
         # Section with histogram plot
         if len(self.picard_wgsmetrics_histogram) > 0:
 
             # Figure out where to cut histogram tail
             max_cov = 10
-            for s_name, samp in self.picard_wgsmetrics_histogram.items():
-                total = float( sum( samp.values() ) )
-                running_total = 0
-                for k, v in samp.items():
-                    running_total += v
-                    if running_total > total * 0.99:
-                        max_cov = max(k, max_cov)
-                        break
+            for s_name, hist in histograms.items():
+                cov_99 = hist.quantile(0.99, inclusive=False)
+                if cov_99 is not None:
+                    max_cov = max(cov_99, max_cov)
 
             # Cut histogram tail and make a normalised percentage version of the data plus dropoff
             data = {}
             data_percent = {}
             maxval = 0
-            for s_name, samp in self.picard_wgsmetrics_histogram.items():
-                data[s_name] = OrderedDict()
-                data_percent[s_name] = OrderedDict()
-                total = float( sum( samp.values() ) )
-                cumulative = 0
-                for k, v in samp.items():
-                    if k <= max_cov:
-                        cumulative += v
-                        data[s_name][k] = v
-                        maxval = max(maxval, v)
-                        data_percent[s_name][k] = 100 - (cumulative/total)*100
-                    else:
-                        break
+            for s_name, hist in histograms.items():
+                num_covs = hist.values.searchsorted(max_cov, side='right')
+                covs_shown = hist.values[:num_covs].tolist()
+                samp = self.picard_wgsmetrics_histogram[s_name]
+                data[s_name] = OrderedDict([ (k, samp[k]) for k in covs_shown ])
+                if num_covs > 0:
+                    maxval = max(maxval, max(data[s_name].values()))
+                dropoff = 100 - (hist.cumulative[:num_covs] / hist.total) * 100
+                data_percent[s_name] = OrderedDict(zip(covs_shown, dropoff.tolist()))
 
             # Plot the data and add section
             pconfig = {
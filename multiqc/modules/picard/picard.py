@@ -4,10 +4,13 @@
 
 from __future__ import print_function
 from collections import OrderedDict
+import io
 import logging
+import os
 
 from multiqc import config
 from multiqc.modules.base_module import BaseMultiqcModule
+from multiqc.utils import report
 
 # Import the Picard submodules
 from . import AlignmentSummaryMetrics
@@ -28,6 +31,23 @@ from . import WgsMetrics
 # Initialise the logger
 log = logging.getLogger(__name__)
 
+# Submodules that parse Picard metrics files, with the search pattern for their
+# files and the metrics classes that they parse (matched case-insensitively)
+METRICS_SUBMODULES = OrderedDict([
+    ('AlignmentMetrics', (AlignmentSummaryMetrics, 'picard/alignment_metrics', ['AlignmentSummaryMetrics'])),
+    ('BaseDistributionByCycleMetrics', (BaseDistributionByCycleMetrics, 'picard/basedistributionbycycle', ['BaseDistributionByCycle'])),
+    ('GcBiasMetrics', (GcBiasMetrics, 'picard/gcbias', ['GcBias'])),
+    ('HsMetrics', (HsMetrics, 'picard/hsmetrics', ['HsMetrics'])),
+    ('InsertSizeMetrics', (InsertSizeMetrics, 'picard/insertsize', ['InsertSizeMetrics'])),
+    ('MarkDuplicates', (MarkDuplicates, 'picard/markdups', ['DuplicationMetrics'])),
+    ('OxoGMetrics', (OxoGMetrics, 'picard/oxogmetrics', ['CpcgMetrics'])),
+    ('RnaSeqMetrics', (RnaSeqMetrics, 'picard/rnaseqmetrics', ['RnaSeqMetrics'])),
+    ('RrbsSummaryMetrics', (RrbsSummaryMetrics, 'picard/rrbs_metrics', ['RrbsSummaryMetrics'])),
+    ('TargetedPcrMetrics', (TargetedPcrMetrics, 'picard/pcr_metrics', ['TargetedPcrMetrics'])),
+    ('VariantCallingMetrics', (VariantCallingMetrics, 'picard/variant_calling_metrics', ['VariantCalling'])),
+    ('WgsMetrics', (WgsMetrics, 'picard/wgs_metrics', ['WgsMetrics'])),
+])
+
 class MultiqcModule(BaseMultiqcModule):
     """ Picard is a collection of scripts. This MultiQC module
     supports some but not all. The code for each script is split
@@ -47,48 +67,53 @@ class MultiqcModule(BaseMultiqcModule):
         self.general_stats_data = dict()
         n = dict()
 
+        # Read each metrics file once, giving each metrics section to its submodule
+        for submodule, sp_key, metrics_classes in METRICS_SUBMODULES.values():
+            submodule.setup_data(self)
+        self.parse_metrics_files()
+
         # Call submodule functions
-        n['AlignmentMetrics'] = AlignmentSummaryMetrics.parse_reports(self)
+        n['AlignmentMetrics'] = AlignmentSummaryMetrics.add_results(self)
         if n['AlignmentMetrics'] > 0:
             log.info("Found {} AlignmentSummaryMetrics reports".format(n['AlignmentMetrics']))
 
-        n['BaseDistributionByCycleMetrics'] = BaseDistributionByCycleMetrics.parse_reports(self)
+        n['BaseDistributionByCycleMetrics'] = BaseDistributionByCycleMetrics.add_results(self)
         if n['BaseDistributionByCycleMetrics'] > 0:
             log.info("Found {} BaseDistributionByCycleMetrics reports".format(n['BaseDistributionByCycleMetrics']))
 
-        n['GcBiasMetrics'] = GcBiasMetrics.parse_reports(self)
+        n['GcBiasMetrics'] = GcBiasMetrics.add_results(self)
         if n['GcBiasMetrics'] > 0:
             log.info("Found {} GcBiasMetrics reports".format(n['GcBiasMetrics']))
 
-        n['HsMetrics'] = HsMetrics.parse_reports(self)
+        n['HsMetrics'] = HsMetrics.add_results(self)
         if n['HsMetrics'] > 0:
             log.info("Found {} HsMetrics reports".format(n['HsMetrics']))
 
-        n['InsertSizeMetrics'] = InsertSizeMetrics.parse_reports(self)
+        n['InsertSizeMetrics'] = InsertSizeMetrics.add_results(self)
         if n['InsertSizeMetrics'] > 0:
             log.info("Found {} InsertSizeMetrics reports".format(n['InsertSizeMetrics']))
 
-        n['MarkDuplicates'] = MarkDuplicates.parse_reports(self)
+        n['MarkDuplicates'] = MarkDuplicates.add_results(self)
         if n['MarkDuplicates'] > 0:
             log.info("Found {} MarkDuplicates reports".format(n['MarkDuplicates']))
 
-        n['OxoGMetrics'] = OxoGMetrics.parse_reports(self)
+        n['OxoGMetrics'] = OxoGMetrics.add_results(self)
         if n['OxoGMetrics'] > 0:
             log.info("Found {} OxoGMetrics reports".format(n['OxoGMetrics']))
 
-        n['RnaSeqMetrics'] = RnaSeqMetrics.parse_reports(self)
+        n['RnaSeqMetrics'] = RnaSeqMetrics.add_results(self)
         if n['RnaSeqMetrics'] > 0:
             log.info("Found {} RnaSeqMetrics reports".format(n['RnaSeqMetrics']))
 
-        n['RrbsSummaryMetrics'] = RrbsSummaryMetrics.parse_reports(self)
+        n['RrbsSummaryMetrics'] = RrbsSummaryMetrics.add_results(self)
         if n['RrbsSummaryMetrics'] > 0:
             log.info("Found {} RrbsSummaryMetrics reports".format(n['RrbsSummaryMetrics']))
 
-        n['TargetedPcrMetrics'] = TargetedPcrMetrics.parse_reports(self)
+        n['TargetedPcrMetrics'] = TargetedPcrMetrics.add_results(self)
         if n['TargetedPcrMetrics'] > 0:
             log.info("Found {} TargetedPcrMetrics reports".format(n['TargetedPcrMetrics']))
 
-        n['VariantCallingMetrics'] = VariantCallingMetrics.parse_reports(self)
+        n['VariantCallingMetrics'] = VariantCallingMetrics.add_results(self)
         if n['VariantCallingMetrics'] > 0:
             log.info("Found {} VariantCallingMetrics reports".format(n['VariantCallingMetrics']))
 
@@ -96,7 +121,7 @@ class MultiqcModule(BaseMultiqcModule):
         if n['ValidateSamFile'] > 0:
             log.info("Found {} ValidateSamFile reports".format(n['ValidateSamFile']))
 
-        n['WgsMetrics'] = WgsMetrics.parse_reports(self)
+        n['WgsMetrics'] = WgsMetrics.add_results(self)
         if n['WgsMetrics'] > 0:
             log.info("Found {} WgsMetrics reports".format(n['WgsMetrics']))
 
@@ -107,6 +132,49 @@ class MultiqcModule(BaseMultiqcModule):
         # Add to the General Stats table (has to be called once per MultiQC module)
         self.general_stats_addcols(self.general_stats_data, self.general_stats_headers)
 
+    def parse_metrics_files(self):
+        """ Read each file found for the Picard submodules once, and give each
+        '## METRICS CLASS' section to the submodules that parse that class.
+        Files are read in the order that they were found, one at a time. """
+
+        # Submodules for each file, found in the same way as by find_log_files()
+        found = OrderedDict()
+        for name, (submodule, sp_key, metrics_classes) in METRICS_SUBMODULES.items():
+            for f in self.find_log_files(sp_key, filecontents=False):
+                path = os.path.join(f['root'], f['fn'])
+                if path not in found:
+                    found[path] = (f, list())
+                found[path][1].append(name)
+        search_order = dict()
+        if len(found) > 1:
+            search_order = { path: idx for idx, path in enumerate(report.file_index.by_path) if path in found }
+
+        for path in sorted(found, key=lambda p: search_order.get(p, len(search_order))):
+            f, names = found[path]
+            report.last_found_file = path
+            try:
+                with io.open(path, 'r', encoding='utf-8') as fh:
+                    lines = fh.readlines()
+                    report.bytes_read[self.name] += fh.buffer.tell()
+            except (IOError, OSError, ValueError, UnicodeDecodeError) as e:
+                if config.report_readerrors:
+                    log.debug("Couldn't read file: {}\n{}".format(f['fn'], e))
+                continue
+            sections = split_metrics_sections(lines)
+            for name in names:
+                submodule, sp_key, metrics_classes = METRICS_SUBMODULES[name]
+                metrics_classes = [ c.lower() for c in metrics_classes ]
+                # Files without any metrics class lines are given to the submodules whole
+                if len(sections) == 0:
+                    section_lines = [lines]
+                else:
+                    section_lines = [ s_lines for class_line, s_lines in sections
+                        if any([ c in class_line.lower() for c in metrics_classes ]) ]
+                for s_lines in section_lines:
+                    s_f = dict(f)
+                    s_f['f'] = io.StringIO(u''.join(s_lines))
+                    submodule.parse_file(self, s_f)
+
     # Helper functions
     def multiply_hundred(self, val):
         try:
@@ -115,3 +183,31 @@ class MultiqcModule(BaseMultiqcModule):
             pass
         return val
 
+
+
+def split_metrics_sections(lines):
+    """ Split the lines of a Picard metrics file into its '## METRICS CLASS'
+    sections. Each section starts with the header lines of the log that it
+    comes from (with the command line and input file), and runs to the next
+    log or metrics class, so includes any histogram after the metrics.
+    :param lines: List of lines from the file
+    :return: List of (metrics class line, list of section lines) tuples
+    """
+    sections = list()
+    header = list()
+    section = None
+    for l in lines:
+        if l.startswith('## METRICS CLASS'):
+            section = header + [l]
+            sections.append((l, section))
+        elif l.startswith('#') and not l.startswith('## HISTOGRAM'):
+            # Header lines after a section are the start of a new log
+            if section is not None:
+                header = list()
+                section = None
+            header.append(l)
+        elif section is not None:
+            section.append(l)
+        else:
+            header.append(l)
+    return sections
@@ -29,7 +29,7 @@ class MultiqcModule(BaseMultiqcModule):
         # Find and load any Preseq reports
         data_is_bases = None
         data = dict()
-        for f in self.find_log_files('preseq'):
+        for f in self.find_log_files('preseq', filemap=True):
             sample_data_raw, sample_data_is_bases = _parse_preseq_logs(f)
             if sample_data_raw is None:
                 continue
@@ -188,8 +188,18 @@ class MultiqcModule(BaseMultiqcModule):
 def _parse_preseq_logs(f):
     """ Go through log file looking for preseq output """
 
-    lines = f['f'].splitlines()
-    header = lines.pop(0)
+    try:
+        return _parse_preseq_lines(f['f'].lines(), f['fn'])
+    except UnicodeDecodeError as e:
+        if config.report_readerrors:
+            log.debug("'{}' is not valid UTF-8 text, skipping\n{}".format(f['fn'], e))
+        return None, None
+
+
+def _parse_preseq_lines(lines, fn):
+    """ Parse the lines of a preseq log file """
+
+    header = next(lines, '')
 
     data_is_bases = False
     if header.startswith('TOTAL_READS	EXPECTED_DISTINCT'):
@@ -199,7 +209,7 @@ def _parse_preseq_logs(f):
     elif header.startswith('total_reads	distinct_reads'):
         pass
     else:
-        log.debug("First line of preseq file {} did not look right".format(f['fn']))
+        log.debug("First line of preseq file {} did not look right".format(fn))
         return None, None
 
     data = dict()
@@ -10,6 +10,7 @@ from collections import OrderedDict
 
 from multiqc import config
 from multiqc.plots import linegraph
+from multiqc.utils.histogram import Histogram
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -125,29 +126,23 @@ def parse_coverage(self, f):
     # Typical path: <sample name>/raw_data_qualimapReport/coverage_histogram.txt
     s_name = self.get_s_name(f)
 
-    d = dict()
+    coverages = list()
+    counts = list()
     for l in f['f']:
         if l.startswith('#'):
             continue
         coverage, count = l.split(None, 1)
-        coverage = int(round(float(coverage)))
-        count = float(count)
-        d[coverage] = count
+        coverages.append(int(round(float(coverage))))
+        counts.append(float(count))
 
-    if len(d) == 0:
+    if len(coverages) == 0:
         log.debug("Couldn't parse contents of coverage histogram file {}".format(f['fn']))
         return None
 
-    # Find median without importing anything to do it for us
-    num_counts = sum(d.values())
-    cum_counts = 0
-    median_coverage = None
-    for thiscov, thiscount in d.items():
-        cum_counts += thiscount
-        if cum_counts >= num_counts/2:
-            median_coverage = thiscov
-            break
-    self.general_stats_data[s_name]['median_coverage'] = median_coverage
+    # Sorted by coverage, so that the median is right for unsorted files
+    hist = Histogram(coverages, counts)
+    d = OrderedDict(zip(hist.values.tolist(), hist.counts.tolist()))
+    self.general_stats_data[s_name]['median_coverage'] = hist.median()
 
     # Save results
     if s_name in self.qualimap_bamqc_coverage_hist:
@@ -161,30 +156,22 @@ def parse_insert_size(self, f):
     # Typical path: <sample name>/raw_data_qualimapReport/insert_size_histogram.txt
     s_name = self.get_s_name(f)
 
-    d = dict()
-    zero_insertsize = 0
+    insertsizes = list()
+    counts = list()
     for l in f['f']:
         if l.startswith('#'):
             continue
         insertsize, count = l.split(None, 1)
         insertsize = int(round(float(insertsize)))
-        count = float(count) / 1000000
-        if(insertsize == 0):
-            zero_insertsize = count
-        else:
-            d[insertsize] = count
-
-    # Find median without importing anything to do it for us
-    num_counts = sum(d.values())
-    cum_counts = 0
-    median_insert_size = None
-    for thisins, thiscount in d.items():
-        cum_counts += thiscount
-        if cum_counts >= num_counts/2:
-            median_insert_size = thisins
-            break
+        if insertsize != 0:
+            insertsizes.append(insertsize)
+            counts.append(float(count) / 1000000)
+
+    # Sorted by insert size, so that the median is right for unsorted files
+    hist = Histogram(insertsizes, counts)
+    d = OrderedDict(zip(hist.values.tolist(), hist.counts.tolist()))
     # Add the median insert size to the general stats table
-    self.general_stats_data[s_name]['median_insert_size'] = median_insert_size
+    self.general_stats_data[s_name]['median_insert_size'] = hist.median()
 
     # Save results
     if s_name in self.qualimap_bamqc_insert_size_hist:
@@ -237,33 +224,30 @@ def report_sections(self):
         # Chew back on histogram to prevent long flat tail
         # (find a sensible max x - lose 1% of longest tail)
         max_x = 0
-        total_bases_by_sample = dict()
+        histograms = dict()
         for s_name, d in self.qualimap_bamqc_coverage_hist.items():
-            total_bases_by_sample[s_name] = sum(d.values())
-            cumulative = 0
-            for count in sorted(d.keys(), reverse=True):
-                cumulative += d[count]
-                if cumulative / total_bases_by_sample[s_name] > 0.01:
-                    max_x = max(max_x, count)
-                    break
+            histograms[s_name] = Histogram.from_dict(d)
+            # Highest depth with more than 1% of bases at or above it
+            frac_above = histograms[s_name].fraction_at_least(histograms[s_name].values)
+            if frac_above is not None and (frac_above > 0.01).any():
+                max_x = max(max_x, histograms[s_name].values[frac_above > 0.01][-1].item())
+
+        # Make a range of depths that isn't stupidly huge for high coverage expts
+        depth_range = list(range(0, max_x + 1, math.ceil(float(max_x)/400.0) if max_x > 0 else 1))
+        # Check that we have our specified coverages in the list
+        for c in self.covs:
+            if int(c) not in depth_range:
+                depth_range.append(int(c))
 
         rates_within_threshs = dict()
-        for s_name, hist in self.qualimap_bamqc_coverage_hist.items():
-            total = total_bases_by_sample[s_name]
-            # Make a range of depths that isn't stupidly huge for high coverage expts
-            depth_range = list(range(0, max_x + 1, math.ceil(float(max_x)/400.0) if max_x > 0 else 1))
-            # Check that we have our specified coverages in the list
-            for c in self.covs:
-                if int(c) not in depth_range:
-                    depth_range.append(int(c))
+        for s_name, hist in histograms.items():
             # Calculate the coverage rates for this range of coverages
-            rates_within_threshs[s_name] = _calculate_bases_within_thresholds(hist, total, depth_range)
+            rates = hist.percent_at_least(depth_range)
+            rates = rates.tolist() if rates is not None else [None] * len(depth_range)
+            rates_within_threshs[s_name] = OrderedDict(zip(depth_range, rates))
             # Add requested coverage levels to the General Statistics table
             for c in self.covs:
-                if int(c) in rates_within_threshs[s_name]:
-                    self.general_stats_data[s_name]['{}_x_pc'.format(c)] = rates_within_threshs[s_name][int(c)]
-                else:
-                    self.general_stats_data[s_name]['{}_x_pc'.format(c)] = 0
+                self.general_stats_data[s_name]['{}_x_pc'.format(c)] = rates_within_threshs[s_name][int(c)]
 
         # Section 1 - BamQC Coverage Histogram
         coverage_histogram_helptext = '''
@@ -558,26 +542,3 @@ def general_stats_headers (self):
         'format': '{0:.2f}',
         'hidden': True
     }
-
-def _calculate_bases_within_thresholds(bases_by_depth, total_size, depth_thresholds):
-    bases_within_threshs = OrderedDict((depth, 0) for depth in depth_thresholds)
-    rates_within_threshs = OrderedDict((depth, None) for depth in depth_thresholds)
-
-    dt = sorted(depth_thresholds, reverse=True)
-    c = 0
-    for depth in sorted(bases_by_depth.keys(), reverse=True):
-        while depth < dt[c]:
-            c += 1
-            bases_within_threshs[dt[c]] = bases_within_threshs[dt[c - 1]]
-        if depth >= dt[c]:
-            bases_within_threshs[dt[c]] += bases_by_depth[depth]
-    while c + 1 < len(dt):
-        c += 1
-        bases_within_threshs[dt[c]] = total_size
-    for t in dt:
-        bs = bases_within_threshs[t]
-        if total_size > 0:
-            rate = 100.0 * bases_within_threshs[t] / total_size
-            assert rate <= 100, 'Error: rate is > 1: rate = ' + str(rate) + ', bases = ' + str(bs) + ', size = ' + str(total_size)
-            rates_within_threshs[t] = rate
-    return rates_within_threshs
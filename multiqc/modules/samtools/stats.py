@@ -4,9 +4,11 @@
 """ MultiQC submodule to parse output from Samtools stats """
 
 import logging
+import numpy as np
 from collections import OrderedDict
 from multiqc import config
-from multiqc.plots import beeswarm, bargraph
+from multiqc.plots import beeswarm, bargraph, linegraph
+from multiqc.plots.series_object import xyseries
 
 # Initialise the logger
 log = logging.getLogger(__name__)
@@ -19,16 +21,15 @@ class StatsReportMixin():
         """ Find Samtools stats logs and parse their data """
 
         self.samtools_stats = dict()
-        for f in self.find_log_files('samtools/stats'):
-            parsed_data = dict()
-            for line in f['f'].splitlines():
-                if not line.startswith("SN"):
-                    continue
-                sections = line.split("\t")
-                field = sections[1].strip()[:-1]
-                field = field.replace(' ', '_')
-                value = float(sections[2].strip())
-                parsed_data[field] = value
+        hist_sections = stats_histogram_sections()
+        self.samtools_stats_hists = { k: dict() for k in hist_sections }
+        for f in self.find_log_files('samtools/stats', filemap=True):
+            try:
+                parsed_data, hists = parse_stats_file(f['f'].lines(), hist_sections)
+            except UnicodeDecodeError as e:
+                if config.report_readerrors:
+                    log.debug("'{}' is not valid UTF-8 text, skipping\n{}".format(f['fn'], e))
+                continue
 
             if len(parsed_data) > 0:
                 # Work out some percentages
@@ -42,9 +43,13 @@ class StatsReportMixin():
                               .format(f['s_name']))
                 self.add_data_source(f, section='stats')
                 self.samtools_stats[f['s_name']] = parsed_data
+                for k, arr in hists.items():
+                    self.samtools_stats_hists[k][f['s_name']] = arr
 
         # Filter to strip out ignored sample names
         self.samtools_stats = self.ignore_samples(self.samtools_stats)
+        for k in self.samtools_stats_hists:
+            self.samtools_stats_hists[k] = self.ignore_samples(self.samtools_stats_hists[k])
 
         if len(self.samtools_stats) > 0:
 
@@ -153,10 +158,99 @@ class StatsReportMixin():
                 plot = beeswarm.plot(self.samtools_stats, keys, {'id': 'samtools-stats-dp'})
             )
 
+            # Histograms, if collected
+            self.stats_histogram_sections()
+
         # Return the number of logs that were found
         return len(self.samtools_stats)
 
 
+    def stats_histogram_sections(self):
+        """ Plot the histogram sections of samtools stats files that were
+        collected with the samtools_stats_histograms config option """
+        hists = self.samtools_stats_hists
+
+        if len(hists.get('COV', {})) > 0:
+            self.add_section (
+                name = 'Coverage',
+                anchor = 'samtools-stats-coverage',
+                description = "Number of reference bases at each read depth, from the <code>COV</code> section of <code>samtools stats</code>.",
+                plot = linegraph.plot({ s: xyseries(s, a[:,0], a[:,1]) for s, a in hists['COV'].items() }, {
+                    'id': 'samtools-stats-coverage-plot',
+                    'title': 'Samtools stats: Coverage',
+                    'xlab': 'Depth',
+                    'ylab': 'Number of bases',
+                    'xDecimals': False,
+                    'ymin': 0,
+                    'tt_label': '<b>{point.x}X</b>: {point.y:.0f} bases'
+                })
+            )
+
+        if len(hists.get('IS', {})) > 0:
+            self.add_section (
+                name = 'Insert size',
+                anchor = 'samtools-stats-insert-size',
+                description = "Number of read pairs with each insert size, from the <code>IS</code> section of <code>samtools stats</code>.",
+                plot = linegraph.plot({ s: xyseries(s, a[:,0], a[:,1]) for s, a in hists['IS'].items() }, {
+                    'id': 'samtools-stats-insert-size-plot',
+                    'title': 'Samtools stats: Insert size',
+                    'xlab': 'Insert size (bp)',
+                    'ylab': 'Number of pairs',
+                    'xDecimals': False,
+                    'ymin': 0,
+                    'tt_label': '<b>{point.x} bp</b>: {point.y:.0f} pairs'
+                })
+            )
+
+        if len(hists.get('RL', {})) > 0:
+            self.add_section (
+                name = 'Read length',
+                anchor = 'samtools-stats-read-length',
+                description = "Number of reads with each length, from the <code>RL</code> section of <code>samtools stats</code>.",
+                plot = linegraph.plot({ s: xyseries(s, a[:,0], a[:,1]) for s, a in hists['RL'].items() }, {
+                    'id': 'samtools-stats-read-length-plot',
+                    'title': 'Samtools stats: Read length',
+                    'xlab': 'Read length (bp)',
+                    'ylab': 'Number of reads',
+                    'xDecimals': False,
+                    'ymin': 0,
+                    'tt_label': '<b>{point.x} bp</b>: {point.y:.0f} reads'
+                })
+            )
+
+        quals = [ (k, name) for k, name in [('FFQ', 'First fragments'), ('LFQ', 'Last fragments')] if len(hists.get(k, {})) > 0 ]
+        if len(quals) > 0:
+            self.add_section (
+                name = 'Per-cycle quality',
+                anchor = 'samtools-stats-cycle-quality',
+                description = "Mean base quality at each cycle, from the <code>FFQ</code> / <code>LFQ</code> sections of <code>samtools stats</code>.",
+                plot = linegraph.plot([ { s: cycle_mean_quality(s, a) for s, a in hists[k].items() } for k, name in quals ], {
+                    'id': 'samtools-stats-cycle-quality-plot',
+                    'title': 'Samtools stats: Per-cycle quality',
+                    'xlab': 'Cycle',
+                    'ylab': 'Mean quality',
+                    'xDecimals': False,
+                    'ymin': 0,
+                    'tt_label': '<b>Cycle {point.x}</b>: {point.y:.2f}',
+                    'data_labels': [ {'name': name} for k, name in quals ]
+                })
+            )
+
+        if len(hists.get('GCD', {})) > 0:
+            self.add_section (
+                name = 'GC-depth',
+                anchor = 'samtools-stats-gc-depth',
+                description = "Median read depth for each GC content, from the <code>GCD</code> section of <code>samtools stats</code>.",
+                plot = linegraph.plot({ s: xyseries(s, a[:,0], a[:,4]) for s, a in hists['GCD'].items() }, {
+                    'id': 'samtools-stats-gc-depth-plot',
+                    'title': 'Samtools stats: GC-depth',
+                    'xlab': '% GC',
+                    'ylab': 'Median depth',
+                    'ymin': 0,
+                    'tt_label': '<b>{point.x}% GC</b>: {point.y:.2f}X'
+                })
+            )
+
     def alignment_section(self, samples_data):
         bedgraph_data = {}
         for sample_id, data in samples_data.items():
@@ -200,3 +294,82 @@ def alignment_chart(data):
         'cpswitch_counts_label': 'Number of Reads'
     }
     return bargraph.plot(data, keys, plot_conf)
+
+
+# Histogram sections that can be collected, with the number of leading non-numeric columns
+STATS_HISTOGRAMS = OrderedDict([
+    ('COV', 1), # [range] (skipped), depth, count
+    ('IS', 0),  # insert size, pairs total, inward, outward, other
+    ('RL', 0),  # read length, count
+    ('FFQ', 0), # cycle, count for each quality
+    ('LFQ', 0),
+    ('GCD', 0), # GC, unique sequence percentile, 10th, 25th, 50th, 75th, 90th depth percentiles
+])
+
+def stats_histogram_sections():
+    """ Histogram sections to collect, from the samtools_stats_histograms config option """
+    sections = getattr(config, 'samtools_stats_histograms', [])
+    if not isinstance(sections, list):
+        sections = [sections]
+    sections = [ str(k).upper() for k in sections ]
+    for k in sections:
+        if k not in STATS_HISTOGRAMS:
+            log.warning("Unknown samtools stats histogram section '{}' - should be one of: {}".format(k, ', '.join(STATS_HISTOGRAMS)))
+    return [ k for k in STATS_HISTOGRAMS if k in sections ]
+
+def parse_stats_file(lines, hist_sections=()):
+    """ Parse the summary numbers (SN) and, optionally, some histogram
+    sections from a samtools stats file. Stops reading as soon as everything
+    that is needed has been read - by default, at the end of the SN block.
+    :param lines: Iterator over the lines of the file
+    :param hist_sections: Histogram sections to collect, eg. ['COV', 'IS']
+    :return: Dict of summary numbers and dict of section: 2D NumPy array of
+             numeric columns (one row per line)
+    """
+    parsed_data = dict()
+    rows = { k: list() for k in hist_sections }
+    todo = set(['SN']) | set(hist_sections)
+    current = None
+    for line in lines:
+        if line.startswith('#'):
+            continue
+        tag = line.split('\t', 1)[0]
+        if tag != current:
+            # Sections are written in blocks, so the last one is finished
+            todo.discard(current)
+            if len(todo) == 0:
+                break
+            current = tag
+        if tag == 'SN':
+            sections = line.split("\t")
+            field = sections[1].strip()[:-1]
+            field = field.replace(' ', '_')
+            value = float(sections[2].strip())
+            parsed_data[field] = value
+        elif tag in rows:
+            rows[tag].append(line.split('\t')[1 + STATS_HISTOGRAMS[tag]:])
+
+    hists = dict()
+    for k, r in rows.items():
+        if len(r) > 0:
+            hists[k] = histogram_array(r)
+    return parsed_data, hists
+
+def histogram_array(rows):
+    """ 2D float array from rows of number strings. Short rows are filled with zeros. """
+    width = max([ len(r) for r in rows ])
+    if all([ len(r) == width for r in rows ]):
+        return np.array(rows, dtype=float)
+    arr = np.zeros((len(rows), width), dtype=float)
+    for i, r in enumerate(rows):
+        arr[i, :len(r)] = np.array(r, dtype=float)
+    return arr
+
+def cycle_mean_quality(s_name, counts):
+    """ Mean quality at each cycle, from FFQ / LFQ rows of cycle
+    followed by the number of bases with each quality (from 0) """
+    quals = counts[:, 1:]
+    totals = quals.sum(axis=1)
+    keep = totals > 0
+    means = np.dot(quals[keep], np.arange(quals.shape[1])) / totals[keep]
+    return xyseries(s_name, counts[keep, 0], means)
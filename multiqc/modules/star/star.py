@@ -6,7 +6,6 @@ from __future__ import print_function
 from collections import OrderedDict
 import logging
 import os
-import re
 
 from multiqc import config
 from multiqc.plots import bargraph
@@ -125,11 +124,7 @@ class MultiqcModule(BaseMultiqcModule):
             'unmapped_tooshort_percent':    r"% of reads unmapped: too short \|\s+([\d\.]+)",
             'unmapped_other_percent':       r"% of reads unmapped: other \|\s+([\d\.]+)",
         }
-        parsed_data = {}
-        for k, r in regexes.items():
-            r_search = re.search(r, raw_data, re.MULTILINE)
-            if r_search:
-                parsed_data[k] = float(r_search.group(1))
+        parsed_data = self.extract_values(raw_data, regexes)
         # Figure out the numbers for unmapped as for some reason only the percentages are given
         try:
             total_mapped = parsed_data['uniquely_mapped'] + parsed_data['multimapped'] + parsed_data['multimapped_toomany']
@@ -0,0 +1,874 @@
+#!/usr/bin/env python
+
+""" MultiQC: A modular tool to aggregate results from bioinformatics analyses across many samples into a single report
+
+The command line tool is defined by run_cli(). The same pipeline can be
+run from within Python using run(), for example:
+
+    import multiqc
+    result = multiqc.run(['/path/to/analysis'], title='My report')
+"""
+
+from __future__ import print_function
+
+import click
+from distutils import version
+import errno
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import traceback
+
+try:
+    from urllib.request import urlopen #py3
+except ImportError:
+    from urllib2 import urlopen #py2
+    # Use UTF-8 encoding by default
+    reload(sys)
+    sys.setdefaultencoding('utf8')
+
+try:
+    from importlib import reload #py3
+except ImportError:
+    pass #py2 - reload is a builtin
+
+from multiqc import __version__
+from multiqc.plots import bargraph, linegraph, table
+from multiqc.utils import report, plugin_hooks, megaqc, util_functions, lint_helpers, config, log, template_assets
+from multiqc.utils import watch as watch_mode
+logger = config.logger
+
+# Only check for new MultiQC versions once per Python process
+version_checked = False
+# Template modules that have been loaded by a previous run in this process
+loaded_templates = set()
+
+@click.command(
+    context_settings = dict( help_option_names = ['-h', '--help'] )
+)
+@click.argument('analysis_dir',
+                    type = click.Path(exists=True),
+                    nargs = -1,
+                    required = True,
+                    metavar = "<analysis directory>"
+)
+@click.option('-f', '--force',
+                    is_flag = True,
+                    help = "Overwrite any existing reports"
+)
+@click.option('-d', '--dirs',
+                    is_flag = True,
+                    help = "Prepend directory to sample names"
+)
+@click.option('-dd', '--dirs-depth', 'dirs_depth',
+                    type = int,
+                    help = "Prepend [INT] directories to sample names. Negative number to take from start of path."
+)
+@click.option('-s', '--fullnames', 'no_clean_sname',
+                    is_flag = True,
+                    help = "Do not clean the sample names (leave as full file name)"
+)
+@click.option('-i', '--title',
+                    type = str,
+                    help = "Report title. Printed as page header, used for filename if not otherwise specified."
+)
+@click.option('-b', '--comment', 'report_comment',
+                    type = str,
+                    help = "Custom comment, will be printed at the top of the report."
+)
+@click.option('-n', '--filename',
+                    type = str,
+                    help = "Report filename. Use 'stdout' to print to standard out."
+)
+@click.option('-o', '--outdir',
+                    type = str,
+                    help = "Create report in the specified output directory."
+)
+@click.option('-t', '--template',
+                    type = click.Choice(config.avail_templates),
+                    help = "Report template to use."
+)
+@click.option( '--tag', 'module_tag',
+                    type = str,
+                    multiple = True,
+                    help = "Use only modules which tagged with this keyword, eg. RNA"
+)
+@click.option( '--view-tags', '--view_tags',
+                    is_flag = True,
+                    callback = util_functions.view_all_tags,
+                    expose_value = False,
+                    is_eager = True,
+                    help = "View the available tags and which modules they load"
+)
+@click.option('-x', '--ignore',
+                    type = str,
+                    multiple = True,
+                    help = "Ignore analysis files (glob expression)"
+)
+@click.option('--ignore-samples', 'ignore_samples',
+                    type = str,
+                    multiple = True,
+                    help = "Ignore sample names (glob expression)"
+)
+@click.option('--ignore-symlinks', 'ignore_symlinks',
+                    is_flag = True,
+                    help = "Ignore symlinked directories and files"
+)
+@click.option('--sample-names', 'sample_names',
+                    type = click.Path(exists=True, readable=True),
+                    help = "File containing alternative sample names"
+)
+@click.option('-l', '--file-list',
+                    is_flag = True,
+                    help = "Supply a file containing a list of file paths to be searched, one per row"
+)
+@click.option('-e', '--exclude', metavar='[module name]',
+                    type = click.Choice(sorted(['general_stats']+list(config.avail_modules.keys()))),
+                    multiple = True,
+                    help = "Do not use this module. Can specify multiple times."
+)
+@click.option('-m', '--module', metavar='[module name]',
+                    type = click.Choice(sorted(config.avail_modules.keys())),
+                    multiple = True,
+                    help = "Use only this module. Can specify multiple times."
+)
+@click.option('--data-dir', 'make_data_dir',
+                    is_flag = True,
+                    help = "Force the parsed data directory to be created."
+)
+@click.option('--no-data-dir', 'no_data_dir',
+                    is_flag = True,
+                    help = "Prevent the parsed data directory from being created."
+)
+@click.option('-k', '--data-format', 'data_format',
+                    type = click.Choice(config.data_format_extensions.keys()),
+                    help = "Output parsed data in a different format. Default: {}".format(config.data_format)
+)
+@click.option('-z', '--zip-data-dir', 'zip_data_dir',
+                    is_flag = True,
+                    help = "Compress the data directory."
+)
+@click.option('-p', '--export', 'export_plots',
+                    is_flag = True,
+                    help = "Export plots as static images in addition to the report"
+)
+@click.option('-fp', '--flat', 'plots_flat',
+                    is_flag = True,
+                    help = "Use only flat plots (static images)"
+)
+@click.option('-ip', '--interactive', 'plots_interactive',
+                    is_flag = True,
+                    help = "Use only interactive plots (HighCharts Javascript)"
+)
+@click.option('--lint', 'lint',
+                    is_flag = True,
+                    help = "Use strict linting (validation) to help code development"
+)
+@click.option('--pdf', 'make_pdf',
+                    is_flag = True,
+                    help = "Creates PDF report with 'simple' template. Requires Pandoc to be installed."
+)
+@click.option('--no-megaqc-upload', 'no_megaqc_upload',
+                    is_flag = True,
+                    help = "Don't upload generated report to MegaQC, even if MegaQC options are found"
+)
+@click.option('-c', '--config', 'config_file',
+                    type = click.Path(exists=True, readable=True),
+                    multiple=True,
+                    help = "Specific config file to load, after those in MultiQC dir / home dir / working dir."
+)
+@click.option('--cl-config', '--cl_config',
+                    type = str,
+                    multiple = True,
+                    help = "Specify MultiQC config YAML on the command line"
+)
+@click.option('-w', '--watch', 'watch',
+                    is_flag = True,
+                    help = "Keep running and rebuild the report when input files change. Implies --force."
+)
+@click.option('-v', '--verbose',
+                    count = True,
+                    default = 0,
+                    help = "Increase output verbosity."
+)
+@click.option('-q', '--quiet',
+                    is_flag = True,
+                    help = "Only show log warnings"
+)
+@click.version_option(__version__)
+
+def run_cli(analysis_dir, dirs, dirs_depth, no_clean_sname, title, report_comment, template, module_tag, module, exclude, outdir,
+ignore, ignore_samples, sample_names, file_list, filename, make_data_dir, no_data_dir, data_format, zip_data_dir, force, ignore_symlinks,
+export_plots, plots_flat, plots_interactive, lint, make_pdf, no_megaqc_upload, config_file, cl_config, watch, verbose, quiet, **kwargs):
+    """MultiQC aggregates results from bioinformatics analyses across many samples into a single report.
+
+        It searches a given directory for analysis logs and compiles a HTML report.
+        It's a general use tool, perfect for summarising the output from numerous
+        bioinformatics tools.
+
+        To run, supply with one or more directory to scan for analysis results.
+        To run here, use 'multiqc .'
+
+        See http://multiqc.info for more details.
+
+        Author: Phil Ewels (http://phil.ewels.co.uk)
+    """
+
+    run_kwargs = dict(
+        analysis_dir = analysis_dir,
+        dirs = dirs,
+        dirs_depth = dirs_depth,
+        no_clean_sname = no_clean_sname,
+        title = title,
+        report_comment = report_comment,
+        template = template,
+        module_tag = module_tag,
+        module = module,
+        exclude = exclude,
+        outdir = outdir,
+        ignore = ignore,
+        ignore_samples = ignore_samples,
+        sample_names = sample_names,
+        file_list = file_list,
+        filename = filename,
+        make_data_dir = make_data_dir,
+        no_data_dir = no_data_dir,
+        data_format = data_format,
+        zip_data_dir = zip_data_dir,
+        force = force,
+        ignore_symlinks = ignore_symlinks,
+        export_plots = export_plots,
+        plots_flat = plots_flat,
+        plots_interactive = plots_interactive,
+        lint = lint,
+        make_pdf = make_pdf,
+        no_megaqc_upload = no_megaqc_upload,
+        config_file = config_file,
+        cl_config = cl_config,
+        verbose = verbose,
+        quiet = quiet,
+        plugin_options = kwargs
+    )
+    if watch:
+        multiqc_run = watch_mode.watch(run, **run_kwargs)
+    else:
+        multiqc_run = run(**run_kwargs)
+
+    # Exit with an error code if a module broke
+    sys.exit(multiqc_run['sys_exit_code'])
+
+
+def run(analysis_dir, dirs=False, dirs_depth=None, no_clean_sname=False, title=None, report_comment=None, template=None,
+module_tag=(), module=(), exclude=(), outdir=None, ignore=(), ignore_samples=(), sample_names=None, file_list=False,
+filename=None, make_data_dir=False, no_data_dir=False, data_format=None, zip_data_dir=False, force=False, ignore_symlinks=False,
+export_plots=False, plots_flat=False, plots_interactive=False, lint=False, make_pdf=False, no_megaqc_upload=False,
+config_file=(), cl_config=(), verbose=0, quiet=False, return_html=False, html_stream=None, plugin_options=None,
+module_cache=None, discovery_cache=None, **config_overrides):
+    """ Run MultiQC within the current Python process.
+
+    Takes the same arguments as the command line tool (see run_cli()).
+    Global report and config state is reset at the start of every call,
+    so this can safely be called many times from a long-lived process.
+
+    :param analysis_dir: List of files and / or directories to search
+    :param return_html: Set to True to return the rendered report HTML as a string
+    :param html_stream: Writable file-like object to print the report to instead
+                        of writing a report file (no data directory is created)
+    :param plugin_options: Dict of extra command line options for plugins (config.kwargs)
+    :param module_cache: Optional dict kept between runs. Module results are saved here and
+                         reused if none of the files found for that module have changed.
+    :param discovery_cache: Optional dict kept between runs, see report.get_filelist()
+    :param config_overrides: Any other keyword arguments are set as config variables,
+                             after all config files have been loaded. eg. `data_format='json'`
+    :return: Dict with the exit code (sys_exit_code) and references to the populated report
+             data: modules_output, general_stats_data, general_stats_headers, plot_data,
+             saved_raw_data, data_sources, bytes_read (per module), plus output_fn, data_dir and html (if requested).
+             These objects are not modified by subsequent runs.
+    """
+
+    # Clean up any state left behind by a previous run in this process
+    config.reset()
+    report.init()
+    bargraph._template_mod = None
+    linegraph._template_mod = None
+    if isinstance(analysis_dir, str):
+        analysis_dir = [analysis_dir]
+    if isinstance(filename, str) and filename == 'stdout':
+        html_stream = sys.stdout
+    to_stream = html_stream is not None
+
+    # Set up logging level
+    loglevel = log.LEVELS.get(min(verbose,1), "INFO")
+    if quiet:
+        loglevel = 'WARNING'
+    log.init_log(logger, loglevel=loglevel)
+
+    # Load config files
+    plugin_hooks.mqc_trigger('before_config')
+    config.mqc_load_userconfig(config_file)
+    plugin_hooks.mqc_trigger('config_loaded')
+
+    # Command-line config YAML
+    if len(cl_config) > 0:
+        config.mqc_cl_config(cl_config)
+
+    # Config variables given as keyword arguments to run()
+    if len(config_overrides) > 0:
+        logger.debug("Found config from function arguments: {}".format(config_overrides))
+        config.mqc_add_config(config_overrides)
+
+    # Log the command used to launch MultiQC
+    report.multiqc_command = " ".join(sys.argv)
+    logger.debug("Command used: {}".format(report.multiqc_command))
+
+    # Check that we're running the latest version of MultiQC
+    global version_checked
+    if config.no_version_check is not True and not version_checked:
+        version_checked = True
+        try:
+            response = urlopen('http://multiqc.info/version.php?v={}'.format(config.short_version), timeout=5)
+            remote_version = response.read().decode('utf-8').strip()
+            if version.StrictVersion(re.sub('[^0-9\.]','', remote_version)) > version.StrictVersion(re.sub('[^0-9\.]','', config.short_version)):
+                logger.warn('MultiQC Version {} now available!'.format(remote_version))
+            else:
+                logger.debug('Latest MultiQC version is {}'.format(remote_version))
+        except Exception as e:
+            logger.debug('Could not connect to multiqc.info for version check: {}'.format(e))
+
+    # Set up key variables (overwrite config vars from command line)
+    if template is not None:
+        config.template = template
+    if title is not None:
+        config.title = title
+    if report_comment is not None:
+        config.report_comment = report_comment
+    if dirs is True:
+        config.prepend_dirs = dirs
+    if dirs_depth is not None:
+        config.prepend_dirs = True
+        config.prepend_dirs_depth = dirs_depth
+    config.analysis_dir = analysis_dir
+    if outdir is not None:
+        config.output_dir = outdir
+    if no_clean_sname:
+        config.fn_clean_sample_names = False
+        logger.info("Not cleaning sample names")
+    if make_data_dir:
+        config.make_data_dir = True
+    if no_data_dir:
+        config.make_data_dir = False
+    if force:
+        config.force = True
+    if ignore_symlinks:
+        config.ignore_symlinks = True
+    if zip_data_dir:
+        config.zip_data_dir = True
+    if data_format is not None:
+        config.data_format = data_format
+    if export_plots:
+        config.export_plots = True
+    if plots_flat:
+        config.plots_force_flat = True
+    if plots_interactive:
+        config.plots_force_interactive = True
+    if lint:
+        config.lint = True
+        lint_helpers.run_tests()
+    if make_pdf:
+        config.template = 'simple'
+    if no_megaqc_upload:
+        config.megaqc_upload = False
+    else:
+        config.megaqc_upload = True
+    if sample_names:
+        config.load_sample_names(sample_names)
+    if module_tag is not None:
+        config.module_tag = module_tag
+    config.kwargs = plugin_options if plugin_options is not None else {} # Plugin command line options
+
+    plugin_hooks.mqc_trigger('execution_start')
+
+    logger.info("This is MultiQC v{}".format(__version__))
+    logger.debug("Command     : {}".format(' '.join(sys.argv)))
+    logger.debug("Working dir : {}".format(os.getcwd()))
+    if make_pdf:
+        logger.info('--pdf specified. Using non-interactive HTML template.')
+    logger.info("Template    : {}".format(config.template))
+    if lint:
+        logger.info('--lint specified. Being strict with validation.')
+
+    # Add files if --file-list option is given
+    if file_list:
+        if len(analysis_dir) > 1:
+            raise ValueError("If --file-list is giving, analysis_dir should have only one plain text file.")
+        config.analysis_dir = []
+        with (open(analysis_dir[0])) as in_handle:
+            for line in in_handle:
+                if os.path.exists(line.strip()):
+                    path = os.path.abspath(line.strip())
+                    config.analysis_dir.append(path)
+        if len(config.analysis_dir) == 0:
+            logger.error("No files or directories were added from {} using --file-list option.".format(analysis_dir[0]))
+            logger.error("Please, check that {} contains correct paths.".format(analysis_dir[0]))
+            raise ValueError("Any files or directories to be searched.")
+
+    if len(ignore) > 0:
+        logger.debug("Ignoring files, directories and paths that match: {}".format(", ".join(ignore)))
+        config.fn_ignore_files.extend(ignore)
+        config.fn_ignore_dirs.extend(ignore)
+        config.fn_ignore_paths.extend(ignore)
+    if len(ignore_samples) > 0:
+        logger.debug("Ignoring sample names that match: {}".format(", ".join(ignore_samples)))
+        config.sample_names_ignore.extend(ignore_samples)
+    if to_stream:
+        config.output_fn = html_stream
+        if html_stream is sys.stdout:
+            logger.info("Printing report to stdout")
+    else:
+        if title is not None and filename is None:
+            filename = re.sub('[^\w\.-]', '', re.sub('[-\s]+', '-', title) ).strip()
+            filename += '_multiqc_report'
+        if filename is not None:
+            if filename.endswith('.html'):
+                filename = filename[:-5]
+            config.output_fn_name = filename
+            config.data_dir_name = '{}_data'.format(filename)
+        if not config.output_fn_name.endswith('.html'):
+            config.output_fn_name = '{}.html'.format(config.output_fn_name)
+
+    # Print some status updates
+    if config.title is not None:
+        logger.info("Report title: {}".format(config.title))
+    if dirs:
+        logger.info("Prepending directory to sample names")
+    for d in config.analysis_dir:
+        logger.info("Searching '{}'".format(d))
+
+    # Prep module configs
+    config.top_modules = [ m if type(m) is dict else {m:{}} for m in config.top_modules ]
+    config.module_order = [ m if type(m) is dict else {m:{}} for m in config.module_order ]
+    mod_keys = [ list(m.keys())[0] for m in config.module_order ]
+
+    # Lint the module configs
+    if config.lint:
+        for m in config.avail_modules.keys():
+            if m not in mod_keys:
+                errmsg = "LINT: Module '{}' not found in config.module_order".format(m)
+                logger.error(errmsg)
+                report.lint_errors.append(errmsg)
+            else:
+                for mo in config.module_order:
+                    if m != 'custom_content' and m in mo.keys() and 'module_tag' not in mo[m]:
+                        errmsg = "LINT: Module '{}' in config.module_order did not have 'module_tag' config".format(m)
+                        logger.error(errmsg)
+                        report.lint_errors.append(errmsg)
+
+    # Get the avaiable tags to decide which modules to run.
+    modules_from_tags = set()
+    if config.module_tag is not None:
+        tags = config.module_tag
+        for m in config.module_order:
+            module_name = list(m.keys())[0] # only one name in each dict
+            for tag in tags:
+                for t in m[module_name].get('module_tag', []):
+                    if tag.lower() == t.lower():
+                        modules_from_tags.add(module_name)
+
+    # Get the list of modules we want to run, in the order that we want them
+    run_modules = [ m for m in config.top_modules if list(m.keys())[0] in config.avail_modules.keys() ]
+    run_modules.extend( [ {m:{}} for m in config.avail_modules.keys() if m not in mod_keys and m not in run_modules ] )
+    run_modules.extend( [ m for m in config.module_order if list(m.keys())[0] in config.avail_modules.keys() and list(m.keys())[0] not in [list(rm.keys())[0] for rm in run_modules] ] )
+
+    if module:
+        run_modules = [ m for m in run_modules if list(m.keys())[0] in module ]
+        logger.info('Only using modules {}'.format(', '.join(module)))
+    elif modules_from_tags:
+        run_modules = [ m for m in run_modules if list(m.keys())[0] in modules_from_tags ]
+        logger.info("Only using modules with '{}' tag".format(', '.join(module_tag)))
+    if exclude:
+        logger.info("Excluding modules '{}'".format("', '".join(exclude)))
+        if 'general_stats' in exclude:
+            config.skip_generalstats = True
+            exclude = tuple(x for x in exclude if x != 'general_stats')
+        run_modules = [m for m in run_modules if list(m.keys())[0] not in exclude]
+    if len(run_modules) == 0:
+        logger.critical('No analysis modules specified!')
+        return {'sys_exit_code': 1}
+    run_module_names = [ list(m.keys())[0] for m in run_modules ]
+    logger.debug("Analysing modules: {}".format(', '.join(run_module_names)))
+
+    # Create the temporary working directories
+    tmp_dir = tempfile.mkdtemp()
+    logger.debug('Using temporary directory for creating report: {}'.format(tmp_dir))
+    config.data_tmp_dir = os.path.join(tmp_dir, 'multiqc_data')
+    if not to_stream and config.make_data_dir == True:
+        config.data_dir = config.data_tmp_dir
+        os.makedirs(config.data_dir)
+    else:
+        config.data_dir = None
+    config.plots_tmp_dir = os.path.join(tmp_dir, 'multiqc_plots')
+    if not to_stream and config.export_plots == True:
+        config.plots_dir = config.plots_tmp_dir
+        os.makedirs(config.plots_dir)
+
+    # Load the template
+    # Template modules can change config when imported, so re-import on later runs
+    template_mod = config.avail_templates[config.template].load()
+    if config.template in loaded_templates:
+        template_mod = reload(template_mod)
+    loaded_templates.add(config.template)
+
+    # Add an output subdirectory if specified by template
+    try:
+        config.output_dir = os.path.join(config.output_dir, template_mod.output_subdir)
+    except AttributeError:
+        pass # No subdirectory variable given
+
+
+    # Add custom content section names
+    try:
+        if 'custom_content' in run_module_names:
+            run_module_names.extend(config.custom_data.keys())
+    except AttributeError:
+        pass # custom_data not in config
+
+    # Get the list of files to search
+    report.get_filelist(run_module_names, discovery_cache)
+
+    # Run the modules!
+    plugin_hooks.mqc_trigger('before_modules')
+    report.modules_output = list()
+    sys_exit_code = 0
+    for mod_idx, mod_dict in enumerate(run_modules):
+        try:
+            this_module = list(mod_dict.keys())[0]
+            mod_cust_config = list(mod_dict.values())[0]
+
+            # Reuse the results from a previous run if this module's files haven't changed
+            if module_cache is not None:
+                cache_key = (mod_idx, this_module)
+                sig_names = [this_module]
+                if this_module == 'custom_content':
+                    sig_names.extend(getattr(config, 'custom_data', {}).keys())
+                mod_signature = report.module_files_signature(sig_names)
+                cached = module_cache.get(cache_key)
+                if cached is not None and cached['signature'] == mod_signature:
+                    logger.debug("Files not changed since last run, reusing results: {}".format(this_module))
+                    report.modules_output.extend(cached['output'])
+                    report.restore_module_state(cached['state'])
+                    continue
+                module_cache.pop(cache_key, None)
+                mod_marker = report.module_state_marker()
+                mod_search_keys = set(report.files.keys())
+
+            mod = config.avail_modules[this_module].load()
+            mod.mod_cust_config = mod_cust_config # feels bad doing this, but seems to work
+            output = mod()
+            if type(output) != list:
+                output = [output]
+            for m in output:
+                report.modules_output.append(m)
+
+            # Modules using old-style search patterns add to report.files, so can't be reused
+            if module_cache is not None and set(report.files.keys()) == mod_search_keys:
+                module_cache[cache_key] = {'signature': mod_signature, 'output': output, 'state': report.module_state_since(mod_marker)}
+
+        except UserWarning:
+            logger.debug("No samples found: {}".format(list(mod_dict.keys())[0]))
+            if module_cache is not None:
+                module_cache[cache_key] = {'signature': mod_signature, 'output': [], 'state': report.module_state_since(mod_marker)}
+        except KeyboardInterrupt:
+            shutil.rmtree(tmp_dir)
+            logger.critical(
+                    "User Cancelled Execution!\n{eq}\n{tb}{eq}\n"
+                    .format(eq=('='*60), tb=traceback.format_exc())+
+                    "User Cancelled Execution!\nExiting MultiQC...")
+            return {'sys_exit_code': 1}
+        except:
+            # Flag the error, but carry on
+            logger.error("Oops! The '{}' MultiQC module broke... \n".format(this_module) + \
+                      "  Please copy the following traceback and report it at " + \
+                      "https://github.com/ewels/MultiQC/issues \n" + \
+                      "  If possible, please include a log file that triggers the error - " + \
+                      "the last file found was:\n" + \
+                      "    {}\n".format(report.last_found_file) + \
+                      ('='*60)+"\nModule {} raised an exception: {}".format(
+                          this_module, traceback.format_exc()) + ('='*60))
+            sys_exit_code = 1
+
+    # Log how much of the log files each module read
+    for mod_name, nbytes in report.bytes_read.items():
+        logger.debug("{}: read {:,} bytes from log files".format(mod_name, nbytes))
+
+    # Did we find anything?
+    if len(report.modules_output) == 0:
+        logger.warn("No analysis results found. Cleaning up..")
+        shutil.rmtree(tmp_dir)
+        logger.info("MultiQC complete")
+        # Exit with an error code if a module broke
+        return {'sys_exit_code': sys_exit_code}
+
+    # Sort the report sections if we have a config
+    if len(getattr(config, 'report_section_order', {})) > 0:
+        section_id_order = {}
+        idx = 10
+        for mod in reversed(report.modules_output):
+            section_id_order[mod.anchor] = idx
+            idx += 10
+        for anchor, ss in config.report_section_order.items():
+            if anchor not in section_id_order.keys():
+                continue
+            if ss.get('order') is not None:
+                section_id_order[anchor] = ss['order']
+            if ss.get('after') in section_id_order.keys():
+                section_id_order[anchor] = section_id_order[ss['after']] + 1
+            if ss.get('before') in section_id_order.keys():
+                section_id_order[anchor] = section_id_order[ss['before']] - 1
+        sorted_ids = sorted(section_id_order, key=section_id_order.get)
+        report.modules_output = [ mod for i in reversed(sorted_ids) for mod in report.modules_output if mod.anchor == i ]
+
+    plugin_hooks.mqc_trigger('after_modules')
+
+    # Remove empty data sections from the General Stats table
+    empty_keys = [i for i, d in enumerate(report.general_stats_data[:]) if len(d) == 0]
+    empty_keys.sort(reverse=True)
+    for i in empty_keys:
+        del report.general_stats_data[i]
+        del report.general_stats_headers[i]
+    # Add general-stats IDs to table row headers
+    for idx, h in enumerate(report.general_stats_headers):
+        for k in h.keys():
+            if 'rid' not in h[k]:
+                h[k]['rid'] = re.sub(r'\W+', '_', k).strip().strip('_')
+            ns_html = re.sub(r'\W+', '_', h[k]['namespace']).strip().strip('_').lower()
+            report.general_stats_headers[idx][k]['rid'] = report.save_htmlid('mqc-generalstats-{}-{}'.format(ns_html, h[k]['rid']))
+    # Generate the General Statistics HTML & write to file
+    if len(report.general_stats_data) > 0:
+        pconfig = {
+            'id': 'general_stats_table',
+            'table_title': 'General Statistics',
+            'save_file': True,
+            'raw_data_fn':'multiqc_general_stats'
+        }
+        report.general_stats_html = table.plot(report.general_stats_data, report.general_stats_headers, pconfig)
+    else:
+        config.skip_generalstats = True
+
+    # Write the report sources to disk
+    if config.data_dir is not None:
+        report.data_sources_tofile()
+    # Compress the report plot JSON data
+    logger.info("Compressing plot data")
+    report.plot_compressed_json = report.compress_json(report.plot_data)
+
+    plugin_hooks.mqc_trigger('before_report_generation')
+
+    # Data Export / MegaQC integration - save report data to file or send report data to an API endpoint
+    if (config.data_dump_file or config.megaqc_url) and config.megaqc_upload:
+        multiqc_json_dump = megaqc.multiqc_dump_json(report)
+        if config.data_dump_file:
+            util_functions.write_data_file(multiqc_json_dump, 'multiqc_data', False, 'json')
+        if config.megaqc_url:
+            megaqc.multiqc_api_post(multiqc_json_dump)
+
+    # Make the final report path & data directories
+    if not to_stream:
+        config.output_fn = os.path.join(config.output_dir, config.output_fn_name)
+        config.data_dir = os.path.join(config.output_dir, config.data_dir_name)
+        # Check for existing reports and remove if -f was specified
+        if os.path.exists(config.output_fn) or (config.make_data_dir and os.path.exists(config.data_dir)):
+            if config.force:
+                # Old files are replaced once the new ones are ready, so there is always a report
+                if os.path.exists(config.output_fn):
+                    logger.warning("Overwriting : {}   (-f was specified)".format(os.path.relpath(config.output_fn)))
+                if config.make_data_dir and os.path.exists(config.data_dir):
+                    logger.warning("Overwriting : {}   (-f was specified)".format(os.path.relpath(config.data_dir)))
+            else:
+                # Set up the base names of the report and the data dir
+                report_num = 1
+                report_base, report_ext = os.path.splitext(config.output_fn_name)
+                dir_base = os.path.basename(config.data_dir)
+
+                # Iterate through appended numbers until we find one that's free
+                while os.path.exists(config.output_fn) or (config.make_data_dir and os.path.exists(config.data_dir)):
+                    config.output_fn = os.path.join(config.output_dir, "{}_{}{}".format(report_base, report_num, report_ext) )
+                    config.data_dir = os.path.join(config.output_dir, "{}_{}".format(dir_base, report_num) )
+                    report_num += 1
+
+                config.output_fn_name = os.path.basename(config.output_fn)
+                config.data_dir_name = os.path.basename(config.data_dir)
+                logger.warning("Previous MultiQC output found! Adjusting filenames..")
+                logger.warning("Use -f or --force to overwrite existing reports instead")
+
+        # Make directories for report if needed
+        if not os.path.exists(os.path.dirname(config.output_fn)):
+            os.makedirs(os.path.dirname(config.output_fn))
+        logger.info("Report      : {}".format(os.path.relpath(config.output_fn)))
+
+        if config.make_data_dir == False:
+            logger.info("Data        : None")
+        else:
+            logger.info("Data        : {}".format(os.path.relpath(config.data_dir)))
+            # Modules have run, so data directory should be complete by now.
+            # Move it next to the report, then swap it with any old data directory.
+            data_dir_new = '{}.tmp'.format(config.data_dir)
+            if os.path.exists(data_dir_new):
+                shutil.rmtree(data_dir_new)
+            logger.debug("Moving data directory from '{}' to '{}'".format(config.data_tmp_dir, config.data_dir))
+            shutil.move(config.data_tmp_dir, data_dir_new)
+            util_functions.replace_path(data_dir_new, config.data_dir)
+
+        # Copy across the static plot images if requested
+        if config.export_plots:
+            config.plots_dir = os.path.join(config.output_dir, config.plots_dir_name)
+            if os.path.exists(config.plots_dir):
+                if config.force:
+                    logger.warning("Overwriting : {}   (-f was specified)".format(os.path.relpath(config.plots_dir)))
+                else:
+                    logger.error("Output directory {} already exists.".format(config.plots_dir))
+                    logger.info("Use -f or --force to overwrite existing reports")
+                    shutil.rmtree(tmp_dir)
+                    return {'sys_exit_code': 1}
+            logger.info("Plots       : {}".format(os.path.relpath(config.plots_dir)))
+
+            # Modules have run, so plots directory should be complete by now.
+            # Move it next to the report, then swap it with any old plots directory.
+            plots_dir_new = '{}.tmp'.format(config.plots_dir)
+            if os.path.exists(plots_dir_new):
+                shutil.rmtree(plots_dir_new)
+            logger.debug("Moving plots directory from '{}' to '{}'".format(config.plots_tmp_dir, config.plots_dir))
+            shutil.move(config.plots_tmp_dir, plots_dir_new)
+            util_functions.replace_path(plots_dir_new, config.plots_dir)
+
+    plugin_hooks.mqc_trigger('before_template')
+
+    # Template files are read from where they are installed instead of
+    # being copied to the temporary directory first. Child theme files
+    # are found before parent theme files with the same path.
+    template_dirs = [template_mod.template_dir]
+    try:
+        parent_template = config.avail_templates[template_mod.template_parent].load()
+        template_dirs.append(parent_template.template_dir)
+    except AttributeError:
+        pass # Not a child theme
+
+    # Function to include file contents in Jinja template
+    # Template assets are cached, so are only read and encoded once per process
+    include_file = template_assets.include_file_function(config.template, template_dirs)
+
+    # Load the report template
+    try:
+        env = template_assets.get_environment(config.template, template_dirs)
+        env.globals['include_file'] = include_file
+        j_template = env.get_template(template_mod.base_fn)
+    except:
+        raise IOError ("Could not load {} template file '{}'".format(config.template, template_mod.base_fn))
+
+    # Use jinja2 to render the template and overwrite
+    config.analysis_dir = [os.path.realpath(d) for d in config.analysis_dir]
+    report_output = j_template.render(report=report, config=config)
+    if to_stream:
+        if html_stream is sys.stdout:
+            print(report_output.encode('utf-8'), file = sys.stdout)
+        else:
+            print(report_output, file = html_stream)
+    else:
+        try:
+            # Write to a temporary file first, so that the report is replaced in one step
+            with io.open ('{}.tmp'.format(config.output_fn), "w", encoding='utf-8') as f:
+                print(report_output, file=f)
+            util_functions.replace_path('{}.tmp'.format(config.output_fn), config.output_fn)
+        except (IOError, OSError) as e:
+            raise IOError ("Could not print report to '{}' - {}".format(config.output_fn, IOError(e)))
+
+        # Copy over files if requested by the theme
+        try:
+            template_assets.copy_files(template_mod.copy_files, template_dirs, report.modules_output, os.path.dirname(config.output_fn))
+        except AttributeError:
+            pass # No files to copy
+
+    # Clean up temporary directory
+    shutil.rmtree(tmp_dir)
+
+    # Zip the data directory if requested
+    if config.zip_data_dir and config.data_dir is not None:
+        shutil.make_archive(config.data_dir, 'zip', config.data_dir)
+        shutil.rmtree(config.data_dir)
+
+    # Try to create a PDF if requested
+    if make_pdf:
+        try:
+            pdf_fn_name = config.output_fn.replace('.html', '.pdf')
+            pandoc_call = [
+                'pandoc',
+                '--standalone',
+                config.output_fn,
+                '--output', pdf_fn_name,
+                '--pdf-engine=xelatex',
+                '-V', 'documentclass=article',
+                '-V', 'geometry=margin=1in',
+                '-V', 'title='
+            ]
+            if config.pandoc_template is not None:
+                pandoc_call.append('--template={}'.format(config.pandoc_template))
+            logger.debug("Attempting Pandoc conversion to PDF with following command:\n{}".format(' '.join(pandoc_call)))
+            pdf_exit_code = subprocess.call(pandoc_call)
+            if pdf_exit_code != 0:
+                logger.error("Error creating PDF! Pandoc returned a non-zero exit code.")
+            else:
+                logger.info("PDF Report  : {}".format(pdf_fn_name))
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                logger.error('Error creating PDF - pandoc not found. Is it installed? http://pandoc.org/')
+            else:
+                logger.error("Error creating PDF! Something went wrong when creating the PDF\n"+
+                    ('='*60)+"\n{}\n".format(traceback.format_exc()) + ('='*60))
+
+    plugin_hooks.mqc_trigger('execution_finish')
+
+    logger.info("MultiQC complete")
+
+    if lint and len(report.lint_errors) > 0:
+        logger.error("Found {} linting errors!\n{}".format(len(report.lint_errors), "\n".join(report.lint_errors)))
+        sys_exit_code = 1
+
+    # Move the log file into the data directory
+    log.move_tmp_log(logger)
+
+    multiqc_run = {
+        'sys_exit_code': sys_exit_code,
+        'modules_output': report.modules_output,
+        'general_stats_data': report.general_stats_data,
+        'general_stats_headers': report.general_stats_headers,
+        'plot_data': report.plot_data,
+        'saved_raw_data': report.saved_raw_data,
+        'data_sources': report.data_sources,
+        'bytes_read': dict(report.bytes_read),
+        'output_fn': None if to_stream else config.output_fn,
+        'data_dir': config.data_dir if config.make_data_dir and not to_stream else None
+    }
+    if return_html:
+        multiqc_run['html'] = report_output
+    return multiqc_run
+
+
+def modify_usage_error(main_command):
+    ''' Function to modify the default click error handling.
+    Used here to tell the user about how to find additional help.
+    With thanks to this Stack Overflow answer: http://stackoverflow.com/a/43922088/713980
+    :param main_command: top-level group or command object constructed by click wrapper
+    :return: None
+    '''
+    def show(self, file=None):
+        if file is None:
+            file = click._compat.get_text_stderr()
+        color = None
+        if self.ctx is not None:
+            color = self.ctx.color
+            click.utils.echo(self.ctx.get_usage() + '\n', file=file, color=color)
+        click.utils.echo('Error: %s\n\nThis is MultiQC v{}\n\nFor more help, run \'multiqc --help\' or visit http://multiqc.info\n'.format(__version__) % self.format_message(), file=file, color=color)
+    click.exceptions.UsageError.show = show
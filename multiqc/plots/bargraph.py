@@ -9,6 +9,7 @@ import inspect
 import io
 import logging
 import math
+import numpy as np
 import os
 import random
 import re
@@ -128,35 +129,41 @@ def plot (data, cats = None, pconfig = None):
             hc_samples = list(d.keys())
         else:
             hc_samples = sorted(list(d.keys()))
-        hc_data = list()
-        sample_dcount = dict()
-        for c in cats[idx].keys():
-            thisdata = list()
-            catcount = 0
-            for s in hc_samples:
-                if s not in sample_dcount:
-                    sample_dcount[s] = 0
-                try:
-                    thisdata.append(float(d[s][c]))
-                    catcount += 1
-                    sample_dcount[s] += 1
-                except (KeyError, ValueError):
-                    # Pad with NaNs when we have missing categories in a sample
-                    thisdata.append(float('nan'))
-            if catcount > 0:
-                if pconfig.get('hide_zero_cats', True) is False or max(x for x in thisdata if not math.isnan(x)) > 0:
-                    thisdict = { 'name': cats[idx][c]['name'], 'data': thisdata }
-                    if 'color' in cats[idx][c]:
-                        thisdict['color'] = cats[idx][c]['color']
-                    hc_data.append(thisdict)
+        cat_keys = list(cats[idx].keys())
+        cat_idx = { c: i for i, c in enumerate(cat_keys) }
+
+        # Category x sample matrix, padded with NaNs when we have missing categories in a sample
+        values = np.full((len(cat_keys), len(hc_samples)), np.nan)
+        found = np.zeros(values.shape, dtype=bool)
+        for s_idx, s in enumerate(hc_samples):
+            for c, v in d[s].items():
+                c_idx = cat_idx.get(c)
+                if c_idx is not None:
+                    try:
+                        values[c_idx, s_idx] = float(v)
+                        found[c_idx, s_idx] = True
+                    except ValueError:
+                        pass
+
+        # Keep categories with data, and a value above zero unless hide_zero_cats is False
+        keep_cats = found.any(axis=1)
+        if pconfig.get('hide_zero_cats', True) is not False:
+            with np.errstate(invalid='ignore'):
+                keep_cats &= (values > 0).any(axis=1)
 
         # Remove empty samples
-        for s, c in sample_dcount.items():
-            if c == 0:
-                idx = hc_samples.index(s)
-                del hc_samples[idx]
-                for j, d in enumerate(hc_data):
-                    del hc_data[j]['data'][idx]
+        keep_samples = found.any(axis=0)
+        if not keep_samples.all():
+            hc_samples = [ s for s, keep in zip(hc_samples, keep_samples) if keep ]
+            values = values[:, keep_samples]
+
+        hc_data = list()
+        for c_idx in np.flatnonzero(keep_cats):
+            c = cat_keys[c_idx]
+            thisdict = { 'name': cats[idx][c]['name'], 'data': values[c_idx].tolist() }
+            if 'color' in cats[idx][c]:
+                thisdict['color'] = cats[idx][c]['color']
+            hc_data.append(thisdict)
         if len(hc_data) > 0:
             plotsamples.append(hc_samples)
             plotdata.append(hc_data)
@@ -197,7 +204,7 @@ def highcharts_bargraph (plotdata, plotsamples=None, pconfig=None):
     # Sanitise plot ID and check for duplicates
     pconfig['id'] = report.save_htmlid(pconfig['id'])
 
-    html = '<div class="mqc_hcplot_plotgroup">'
+    html = ['<div class="mqc_hcplot_plotgroup">']
 
     # Counts / Percentages / Log Switches
     if pconfig.get('cpswitch') is not False or pconfig.get('logswitch') is True:
@@ -217,20 +224,20 @@ def highcharts_bargraph (plotdata, plotsamples=None, pconfig=None):
         c_label = pconfig.get('cpswitch_counts_label', 'Counts')
         p_label = pconfig.get('cpswitch_percent_label', 'Percentages')
         l_label = pconfig.get('logswitch_label', 'Log10')
-        html += '<div class="btn-group hc_switch_group"> \n'
-        html += '<button class="btn btn-default btn-sm {c_a}" data-action="set_numbers" data-target="{id}" data-ylab="{c_l}">{c_l}</button> \n'.format(id=pconfig['id'], c_a=c_active, c_l=c_label)
+        html.append('<div class="btn-group hc_switch_group"> \n')
+        html.append('<button class="btn btn-default btn-sm {c_a}" data-action="set_numbers" data-target="{id}" data-ylab="{c_l}">{c_l}</button> \n'.format(id=pconfig['id'], c_a=c_active, c_l=c_label))
         if pconfig.get('cpswitch', True) is True:
-            html += '<button class="btn btn-default btn-sm {p_a}" data-action="set_percent" data-target="{id}" data-ylab="{p_l}">{p_l}</button> \n'.format(id=pconfig['id'], p_a=p_active, p_l=p_label)
+            html.append('<button class="btn btn-default btn-sm {p_a}" data-action="set_percent" data-target="{id}" data-ylab="{p_l}">{p_l}</button> \n'.format(id=pconfig['id'], p_a=p_active, p_l=p_label))
         if pconfig.get('logswitch') is True:
-            html += '<button class="btn btn-default btn-sm {l_a}" data-action="set_log" data-target="{id}" data-ylab="{l_l}">{l_l}</button> \n'.format(id=pconfig['id'], l_a=l_active, l_l=l_label)
+            html.append('<button class="btn btn-default btn-sm {l_a}" data-action="set_log" data-target="{id}" data-ylab="{l_l}">{l_l}</button> \n'.format(id=pconfig['id'], l_a=l_active, l_l=l_label))
             pconfig['reversedStacks'] = True
-        html += '</div> '
+        html.append('</div> ')
         if len(plotdata) > 1:
-            html += ' &nbsp; &nbsp; '
+            html.append(' &nbsp; &nbsp; ')
 
     # Buttons to cycle through different datasets
     if len(plotdata) > 1:
-        html += '<div class="btn-group hc_switch_group">\n'
+        html.append('<div class="btn-group hc_switch_group">\n')
         for k, p in enumerate(plotdata):
             active = 'active' if k == 0 else ''
             try:
@@ -248,13 +255,13 @@ def highcharts_bargraph (plotdata, plotsamples=None, pconfig=None):
                 ymax = 'data-ymax="{}"'.format(pconfig['data_labels'][k]['ymax'])
             except:
                 ymax = ''
-            html += '<button class="btn btn-default btn-sm {a}" data-action="set_data" {y} {ym} data-newdata="{k}" data-target="{id}">{n}</button>\n'.format(a=active, id=pconfig['id'], n=name, y=ylab, ym=ymax, k=k)
-        html += '</div>\n\n'
+            html.append('<button class="btn btn-default btn-sm {a}" data-action="set_data" {y} {ym} data-newdata="{k}" data-target="{id}">{n}</button>\n'.format(a=active, id=pconfig['id'], n=name, y=ylab, ym=ymax, k=k))
+        html.append('</div>\n\n')
 
     # Plot HTML
-    html += """<div class="hc-plot-wrapper">
+    html.append("""<div class="hc-plot-wrapper">
         <div id="{id}" class="hc-plot not_rendered hc-bar-plot"><small>loading..</small></div>
-    </div></div>""".format(id=pconfig['id']);
+    </div></div>""".format(id=pconfig['id']))
 
     report.num_hc_plots += 1
 
@@ -265,7 +272,7 @@ def highcharts_bargraph (plotdata, plotsamples=None, pconfig=None):
         'config': pconfig
     }
 
-    return html
+    return ''.join(html)
 
 
 def matplotlib_bargraph (plotdata, plotsamples, pconfig=None):
@@ -354,9 +361,12 @@ def matplotlib_bargraph (plotdata, plotsamples, pconfig=None):
         if pconfig.get('cpswitch') is not False:
             plot_pcts = [False, True]
 
+        # Series x sample matrix of values
         # Switch out NaN for 0s so that MatPlotLib doesn't ignore stuff
+        counts = np.zeros((len(pdata), len(plotsamples[pidx])))
         for idx, d in enumerate(pdata):
-            pdata[idx]['data'] = [x if not math.isnan(x) else 0 for x in d['data'] ]
+            counts[idx, :len(d['data'])] = d['data']
+        counts[np.isnan(counts)] = 0
 
         for plot_pct in plot_pcts:
 
@@ -381,35 +391,20 @@ def matplotlib_bargraph (plotdata, plotsamples, pconfig=None):
             axes = fig.add_subplot(111)
             y_ind = range(len(plotsamples[pidx]))
 
-            # Count totals for each sample
+            # Plot percentages of the sample totals
+            values = counts
             if plot_pct is True:
-                s_totals = [0 for _ in pdata[0]['data']]
-                for series_idx, d in enumerate(pdata):
-                    for sample_idx, v in enumerate(d['data']):
-                        s_totals[sample_idx] += v
+                s_totals = counts.sum(axis=0)
+                values = np.zeros(counts.shape)
+                np.divide(counts * 100, s_totals, out=values, where=(s_totals != 0))
+
+            # Get offsets for stacked bars
+            offsets = np.zeros(values.shape)
+            np.cumsum(values[:-1], axis=0, out=offsets[1:])
 
             # Plot bars
             dlabels = []
-            prev_values = None
             for idx, d in enumerate(pdata):
-                # Plot percentages
-                values = [x for x in d['data']]
-                if len(values) < len(y_ind):
-                    values.extend([0] * (len(y_ind) - len(values)))
-                if plot_pct is True:
-                    for (key,var) in enumerate(values):
-                        s_total = s_totals[key]
-                        if s_total == 0:
-                            values[key] = 0
-                        else:
-                            values[key] = (float(var+0.0)/float(s_total))*100
-
-                # Get offset for stacked bars
-                if idx == 0:
-                    prevdata = [0] * len(plotsamples[pidx])
-                else:
-                    for i, p in enumerate(prevdata):
-                        prevdata[i] += prev_values[i]
                 # Default colour index
                 cidx = idx
                 while cidx >= len(default_colors):
@@ -419,14 +414,13 @@ def matplotlib_bargraph (plotdata, plotsamples, pconfig=None):
                 # Add the series of bars to the plot
                 axes.barh(
                     y_ind,
-                    values,
+                    values[idx],
                     bar_width,
-                    left = prevdata,
+                    left = offsets[idx],
                     color = d.get('color', default_colors[cidx]),
                     align = 'center',
                     linewidth = pconfig.get('borderWidth', 0)
                 )
-                prev_values = values
 
             # Tidy up axes
             axes.tick_params(labelsize=8, direction='out', left=False, right=False, top=False, bottom=False)
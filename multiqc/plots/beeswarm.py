@@ -2,7 +2,9 @@
 
 """ MultiQC functions to plot a beeswarm group """
 
+from collections import OrderedDict
 import logging
+import numpy as np
 import random
 
 from multiqc.utils import config, report
@@ -44,8 +46,10 @@ def make_plot(dt):
     bs_id = report.save_htmlid(bs_id)
 
     categories = []
-    s_names = []
+    s_names = OrderedDict() # Sample names shared by all categories, with their index
+    sample_idx = []
     data = []
+    positions = []
     for idx, hs in enumerate(dt.headers):
         for k, header in hs.items():
 
@@ -63,23 +67,17 @@ def make_plot(dt):
             });
 
             # Add the data
-            thisdata = []
-            these_snames = []
-            for (s_name, samp) in dt.data[idx].items():
-                if k in samp:
-
-                    val = samp[k]
-
-                    if 'modify' in header and callable(header['modify']):
-                        val = header['modify'](val)
-
-                    thisdata.append(val)
-                    these_snames.append(s_name)
-
+            these_snames, thisdata = dt.get_column(idx, k)
             data.append(thisdata)
-            s_names.append(these_snames)
+            sample_idx.append([ s_names.setdefault(s_name, len(s_names)) for s_name in these_snames ])
 
-    if len(s_names) == 0:
+            # Lay out large categories here, so that the browser doesn't have to
+            if config.beeswarm_layout_samples > 0 and len(thisdata) > config.beeswarm_layout_samples:
+                positions.append(swarm_positions(thisdata, header['dmin'], header['dmax']))
+            else:
+                positions.append(None)
+
+    if len(categories) == 0:
         logger.warning('Tried to make beeswarm plot, but had no data')
         return '<p class="text-danger">Error - was not able to plot data.</p>'
 
@@ -92,9 +90,62 @@ def make_plot(dt):
 
     report.plot_data[bs_id] = {
         'plot_type': 'beeswarm',
-        'samples': s_names,
+        'samples': list(s_names.keys()),
+        'sample_idx': sample_idx,
         'datasets': data,
         'categories': categories
     }
+    if any(p is not None for p in positions):
+        report.plot_data[bs_id]['positions'] = positions
 
     return html
+
+
+def swarm_positions(values, minx, maxx):
+    """ Vertical positions for the points of one beeswarm category, the same
+    as the browser would calculate. Points are binned along the x axis, and
+    points in the same bin alternate above and below the middle of the plot.
+    :param values: List of values
+    :param minx: Minimum of the x axis
+    :param maxx: Maximum of the x axis
+    :return: List of y positions between -1 and 1, in the same order as values.
+             None if the values aren't all numbers.
+    """
+    x = np.array(values)
+    if len(values) == 0 or x.dtype.kind not in 'iuf' or x.ndim != 1:
+        return None
+    x = x.astype(float)
+    try:
+        sep = (float(maxx) - float(minx))
+    except (TypeError, ValueError):
+        return None
+    if not np.isfinite(x).all() or not np.isfinite(sep) or sep <= 0:
+        return None
+
+    # Size and spacing options, as used in the browser
+    yspace = 70
+    ysep = 10
+    if len(x) > 50:
+        yspace = 50
+        ysep = 20
+    if len(x) > 200:
+        yspace = 30
+        ysep = 30
+    sep = sep / yspace
+
+    # Count along each run of points in the same bin, in value order
+    order = np.argsort(x, kind='mergesort')
+    bins = np.floor(x[order] / sep)
+    n = np.arange(len(bins))
+    run_start = np.where(np.concatenate(([True], bins[1:] != bins[:-1])), n, 0)
+    side = n - np.maximum.accumulate(run_start) + 1
+
+    # Alternate above and below the middle, squashing jitter that gets too big
+    offset = ((side // 2) * np.where(side % 2 == 0, 1, -1)).astype(float)
+    y = offset / ysep
+    squash = np.abs(y) > 1
+    y[squash] = offset[squash] / (ysep * (np.floor(np.abs(y[squash])) + 1))
+
+    positions = np.empty(len(y))
+    positions[order] = np.round(y, 4)
+    return positions.tolist()
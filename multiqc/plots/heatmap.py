@@ -4,6 +4,7 @@
 
 from __future__ import print_function
 import logging
+import numpy as np
 import random
 
 from multiqc.utils import config, report
@@ -14,7 +15,7 @@ letters = 'abcdefghijklmnopqrstuvwxyz'
 
 def plot (data, xcats, ycats=None, pconfig=None):
     """ Plot a 2D heatmap.
-    :param data: List of lists, each a representing a row of values.
+    :param data: List of lists, each a representing a row of values, or a 2D NumPy array.
     :param xcats: Labels for x axis
     :param ycats: Labels for y axis. Defaults to same as x.
     :param pconfig: optional dict with config key:value pairs.
@@ -32,6 +33,10 @@ def plot (data, xcats, ycats=None, pconfig=None):
     if ycats is None:
         ycats = xcats
 
+    # Reorder rows and columns by similarity
+    if pconfig.get('cluster_rows') or pconfig.get('cluster_cols'):
+        data, xcats, ycats = cluster_data(data, xcats, ycats, pconfig)
+
     # Make a plot
     return highcharts_heatmap(data, xcats, ycats, pconfig)
 
@@ -45,11 +50,8 @@ def highcharts_heatmap (data, xcats, ycats, pconfig=None):
     if pconfig is None:
         pconfig = {}
 
-    # Reformat the data for highcharts
-    pdata = []
-    for i, arr in enumerate(data):
-        for j, val in enumerate(arr):
-            pdata.append([j,i,val])
+    # Compact version of the matrix, expanded to [x, y, value] points by the browser
+    pdata = encode_matrix(data)
 
     # Get the plot ID
     if pconfig.get('id') is None:
@@ -59,17 +61,17 @@ def highcharts_heatmap (data, xcats, ycats, pconfig=None):
     pconfig['id'] = report.save_htmlid(pconfig['id'])
 
     # Build the HTML for the page
-    html = '<div class="mqc_hcplot_plotgroup">'
+    html = ['<div class="mqc_hcplot_plotgroup">']
 
     # The 'sort by highlights button'
-    html += """<div class="btn-group hc_switch_group">
+    html.append("""<div class="btn-group hc_switch_group">
         <button type="button" class="mqc_heatmap_sortHighlight btn btn-default btn-sm" data-target="#{id}" disabled="disabled">
             <span class="glyphicon glyphicon-sort-by-attributes-alt"></span> Sort by highlight
         </button>
-    </div>""".format(id=pconfig['id'])
+    </div>""".format(id=pconfig['id']))
 
     # The plot div
-    html += '<div class="hc-plot-wrapper"><div id="{id}" class="hc-plot not_rendered hc-heatmap"><small>loading..</small></div></div></div> \n'.format(id=pconfig['id'])
+    html.append('<div class="hc-plot-wrapper"><div id="{id}" class="hc-plot not_rendered hc-heatmap"><small>loading..</small></div></div></div> \n'.format(id=pconfig['id']))
 
     report.num_hc_plots += 1
 
@@ -81,4 +83,124 @@ def highcharts_heatmap (data, xcats, ycats, pconfig=None):
         'config': pconfig
     }
 
-    return html
+    return ''.join(html)
+
+
+def encode_matrix (data):
+    """
+    Encode a heatmap matrix for the report plot data. Dense matrices are saved
+    as a flat row-major list of values. If most cells have the same value
+    (missing or zero), only the other cells are saved with their row and column.
+    Cells without a fill value are not drawn (rows of different lengths).
+    :param data: List of lists, each representing a row of values, or a 2D NumPy array
+    :return: dict with the matrix shape and values
+    """
+    if isinstance(data, np.ndarray):
+        values = data
+        # NaN cells are missing values
+        if values.dtype.kind == 'f' and np.isnan(values).any():
+            values = values.astype(object)
+            values[np.isnan(data)] = None
+        padded = np.zeros(values.shape, dtype=bool)
+    else:
+        ncols = max([len(row) for row in data]) if len(data) > 0 else 0
+        values = np.empty((len(data), ncols), dtype=object)
+        padded = np.zeros(values.shape, dtype=bool)
+        for i, row in enumerate(data):
+            values[i, :len(row)] = row
+            padded[i, len(row):] = True
+
+    def sparse(keep, **fill):
+        rows, cols = np.nonzero(keep)
+        return dict({
+            'shape': list(values.shape),
+            'rows': rows.tolist(),
+            'cols': cols.tolist(),
+            'values': values[rows, cols].tolist()
+        }, **fill)
+
+    if padded.any():
+        return sparse(~padded)
+
+    # Sparse if that's less than a third of the size
+    if values.dtype == object:
+        missing = np.equal(values, None)
+    else:
+        missing = np.zeros(values.shape, dtype=bool)
+    zeros = (values == 0) & ~missing
+    for fill, is_fill in [(None, missing), (0, zeros)]:
+        if np.count_nonzero(~is_fill) * 3 < values.size:
+            return sparse(~is_fill, fill=fill)
+    return {
+        'shape': list(values.shape),
+        'values': values.ravel().tolist()
+    }
+
+
+def cluster_data (data, xcats, ycats, pconfig):
+    """
+    Reorder heatmap rows and / or columns so that similar ones are next to each other.
+    Square matrices with the same x and y categories keep the same order for both.
+    :param data: List of lists, each representing a row of values, or a 2D NumPy array
+    :param xcats: Labels for the columns
+    :param ycats: Labels for the rows
+    :param pconfig: Plot config, with cluster_rows and cluster_cols
+    :return: Reordered data, xcats and ycats
+    """
+    try:
+        if isinstance(data, np.ndarray):
+            matrix = data.astype(float)
+        else:
+            matrix = np.array([ [ np.nan if v is None else float(v) for v in row ] for row in data ], dtype=float)
+    except (TypeError, ValueError):
+        logger.warning("Can't cluster heatmap '{}' - values aren't all numeric".format(pconfig.get('id')))
+        return data, xcats, ycats
+    if matrix.ndim != 2 or matrix.size == 0:
+        return data, xcats, ycats
+
+    row_order = list(range(matrix.shape[0]))
+    col_order = list(range(matrix.shape[1]))
+    if pconfig.get('cluster_rows'):
+        row_order = cluster_order(matrix)
+    if pconfig.get('cluster_cols'):
+        if pconfig.get('cluster_rows') and matrix.shape[0] == matrix.shape[1] and list(xcats) == list(ycats):
+            col_order = row_order
+        else:
+            col_order = cluster_order(matrix.T)
+
+    if isinstance(data, np.ndarray):
+        data = data[np.ix_(row_order, col_order)]
+    else:
+        data = [ [ data[i][j] for j in col_order ] for i in row_order ]
+    return data, [ xcats[j] for j in col_order ], [ ycats[i] for i in row_order ]
+
+
+def cluster_order (matrix):
+    """
+    Leaf order of an average linkage hierarchical clustering of matrix rows,
+    using Euclidean distances. Missing values are counted as zero.
+    :param matrix: 2D NumPy array
+    :return: List of row indices
+    """
+    n = matrix.shape[0]
+    if n < 3:
+        return list(range(n))
+    m = np.nan_to_num(matrix)
+    sq = (m ** 2).sum(axis=1)
+    dist = np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2 * m.dot(m.T), 0))
+    np.fill_diagonal(dist, np.inf)
+    sizes = np.ones(n)
+    members = [ [i] for i in range(n) ]
+    for _ in range(n - 1):
+        a, b = sorted(divmod(int(np.argmin(dist)), n))
+        # Distances to the merged cluster are the size-weighted means of the two
+        merged = (dist[a] * sizes[a] + dist[b] * sizes[b]) / (sizes[a] + sizes[b])
+        dist[a, :] = merged
+        dist[:, a] = merged
+        dist[a, a] = np.inf
+        dist[b, :] = np.inf
+        dist[:, b] = np.inf
+        sizes[a] += sizes[b]
+        members[a] = members[a] + members[b]
+        members[b] = None
+    return members[a]
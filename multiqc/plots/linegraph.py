@@ -7,10 +7,12 @@ from collections import OrderedDict
 import base64
 import io
 import logging
+import numpy as np
 import os
 import random
 import sys
 
+from multiqc.plots.series_object import xyseries
 from multiqc.utils import config, report, util_functions
 logger = logging.getLogger(__name__)
 
@@ -39,7 +41,8 @@ def get_template_mod():
 
 def plot (data, pconfig=None):
     """ Plot a line graph with X,Y data.
-    :param data: 2D dict, first keys as sample names, then x:y data pairs
+    :param data: 2D dict, first keys as sample names, then x:y data pairs.
+                 Sample values can also be xyseries objects, with sorted x values.
     :param pconfig: optional dict with config key:value pairs. See CONTRIBUTING.md
     :return: HTML and JS, ready to be inserted into the page
     """
@@ -88,38 +91,30 @@ def plot (data, pconfig=None):
     for data_index, d in enumerate(data):
         thisplotdata = list()
 
-        for s in sorted(d.keys()):
-
-            # Ensure any overwritting conditionals from data_labels (e.g. ymax) are taken in consideration
+        # Ensure any overwritting conditionals from data_labels (e.g. ymax) are taken in consideration
+        series_config = pconfig
+        if 'data_labels' in pconfig and type(pconfig['data_labels'][data_index]) is dict:  # if not a dict: only dataset name is provided
             series_config = pconfig.copy()
-            if 'data_labels' in pconfig and type(pconfig['data_labels'][data_index]) is dict:  # if not a dict: only dataset name is provided
-                series_config.update(pconfig['data_labels'][data_index])
+            series_config.update(pconfig['data_labels'][data_index])
+
+        for s in sorted(d.keys()):
 
-            pairs = list()
-            maxval = 0
             if 'categories' in series_config:
+                pairs = list()
+                maxval = 0
                 pconfig['categories'] = list()
                 for k in d[s].keys():
                     pconfig['categories'].append(k)
                     pairs.append(d[s][k])
                     maxval = max(maxval, d[s][k])
             else:
-                for k in sorted(d[s].keys()):
-                    if k is not None:
-                        if 'xmax' in series_config and float(k) > float(series_config['xmax']):
-                            continue
-                        if 'xmin' in series_config and float(k) < float(series_config['xmin']):
-                            continue
-                    if d[s][k] is not None:
-                        if 'ymax' in series_config and float(d[s][k]) > float(series_config['ymax']):
-                            continue
-                        if 'ymin' in series_config and float(d[s][k]) < float(series_config['ymin']):
-                            continue
-                    pairs.append([k, d[s][k]])
-                    try:
-                        maxval = max(maxval, d[s][k])
-                    except TypeError:
-                        pass
+                if isinstance(d[s], xyseries):
+                    series = xyseries(s, d[s].x, d[s].y, d[s].points)
+                else:
+                    series = xyseries.from_dict(s, d[s])
+                series.clip(series_config.get('xmin'), series_config.get('xmax'), series_config.get('ymin'), series_config.get('ymax'))
+                pairs = series.line_data()
+                maxval = max(0, series.max_y())
             if maxval > 0 or series_config.get('hide_empty') is not True:
                 this_series = { 'name': s, 'data': pairs }
                 try:
@@ -178,11 +173,11 @@ def highcharts_linegraph (plotdata, pconfig=None):
     pconfig['id'] = report.save_htmlid(pconfig['id'])
 
     # Build the HTML for the page
-    html = '<div class="mqc_hcplot_plotgroup">'
+    html = ['<div class="mqc_hcplot_plotgroup">']
 
     # Buttons to cycle through different datasets
     if len(plotdata) > 1:
-        html += '<div class="btn-group hc_switch_group">\n'
+        html.append('<div class="btn-group hc_switch_group">\n')
         for k, p in enumerate(plotdata):
             active = 'active' if k == 0 else ''
             try:
@@ -201,21 +196,37 @@ def highcharts_linegraph (plotdata, pconfig=None):
                 xlab = 'data-xlab="{}"'.format(pconfig['data_labels'][k]['xlab'])
             except:
                 xlab = ''
-            html += '<button class="btn btn-default btn-sm {a}" data-action="set_data" {y} {ym} {x} data-newdata="{k}" data-target="{id}">{n}</button>\n'.format(a=active, id=pconfig['id'], n=name, y=ylab, ym=ymax, x=xlab, k=k)
-        html += '</div>\n\n'
+            html.append('<button class="btn btn-default btn-sm {a}" data-action="set_data" {y} {ym} {x} data-newdata="{k}" data-target="{id}">{n}</button>\n'.format(a=active, id=pconfig['id'], n=name, y=ylab, ym=ymax, x=xlab, k=k))
+        html.append('</div>\n\n')
 
     # The plot div
-    html += '<div class="hc-plot-wrapper"><div id="{id}" class="hc-plot not_rendered hc-line-plot"><small>loading..</small></div></div></div> \n'.format(id=pconfig['id'])
+    html.append('<div class="hc-plot-wrapper"><div id="{id}" class="hc-plot not_rendered hc-line-plot"><small>loading..</small></div></div></div> \n'.format(id=pconfig['id']))
 
     report.num_hc_plots += 1
 
+    # Reduce the number of points in very long series, which the browser struggles to draw
+    max_points = pconfig.get('max_points', config.plots_max_line_points)
+    method = pconfig.get('downsample_method', config.plots_line_downsample_method)
+    hcdata = [ [ downsample_series(d, max_points, method) for d in pdata ] for pdata in plotdata ]
+    if any(d is not od for pdata, opdata in zip(hcdata, plotdata) for d, od in zip(pdata, opdata)):
+        logger.debug("Downsampled line plot '{}' to {} points per series with {}".format(pconfig['id'], max_points, method))
+        # Keep the full resolution data, unless the MatPlotLib plot function already saved it
+        if config.data_dir is not None and not config.export_plots:
+            for pidx, pdata in enumerate(plotdata):
+                try:
+                    name = pconfig['data_labels'][pidx]['name']
+                except:
+                    name = pidx+1
+                pid = report.save_htmlid('mqc_{}_{}'.format(pconfig['id'], name), skiplint=True)
+                write_plot_data_file(pdata, pid, pconfig)
+
     report.plot_data[pconfig['id']] = {
         'plot_type': "xy_line",
-        'datasets': plotdata,
+        'datasets': hcdata,
         'config': pconfig
     }
 
-    return html
+    return ''.join(html)
 
 
 def matplotlib_linegraph (plotdata, pconfig=None):
@@ -274,37 +285,7 @@ def matplotlib_linegraph (plotdata, pconfig=None):
         pid = pids[pidx]
 
         # Save plot data to file
-        fdata = OrderedDict()
-        lastcats = None
-        sharedcats = True
-        for d in pdata:
-            fdata[d['name']] = OrderedDict()
-            for i, x in enumerate(d['data']):
-                if type(x) is list:
-                    fdata[d['name']][str(x[0])] = x[1]
-                    # Check to see if all categories are the same
-                    if lastcats is None:
-                        lastcats = [x[0] for x in d['data']]
-                    elif lastcats != [x[0] for x in d['data']]:
-                        sharedcats = False
-                else:
-                    try:
-                        fdata[d['name']][pconfig['categories'][i]] = x
-                    except (KeyError, IndexError):
-                        fdata[d['name']][str(i)] = x
-
-        # Custom tsv output if the x axis varies
-        if not sharedcats and config.data_format == 'tsv':
-            fout = ''
-            for d in pdata:
-                fout += "\t"+"\t".join([str(x[0]) for x in d['data']])
-                fout += "\n{}\t".format(d['name'])
-                fout += "\t".join([str(x[1]) for x in d['data']])
-                fout += "\n"
-            with io.open (os.path.join(config.data_dir, '{}.txt'.format(pid)), 'w', encoding='utf-8') as f:
-                print( fout.encode('utf-8', 'ignore').decode('utf-8'), file=f )
-        else:
-            util_functions.write_data_file(fdata, pid)
+        write_plot_data_file(pdata, pid, pconfig)
 
         # Set up figure
         fig = plt.figure(figsize=(14, 6), frameon=False)
@@ -454,36 +435,164 @@ def matplotlib_linegraph (plotdata, pconfig=None):
     return html
 
 
+def write_plot_data_file(pdata, pid, pconfig):
+    """
+    Save the data for one line graph dataset to the data directory.
+    Uses a custom tsv layout if the series don't share their x values.
+    """
+    fdata = OrderedDict()
+    lastcats = None
+    sharedcats = True
+    for d in pdata:
+        fdata[d['name']] = OrderedDict()
+        # Check to see if all categories are the same
+        if len(d['data']) > 0 and type(d['data'][0]) is list:
+            cats = [x[0] for x in d['data']]
+            if lastcats is None:
+                lastcats = cats
+            elif lastcats != cats:
+                sharedcats = False
+        for i, x in enumerate(d['data']):
+            if type(x) is list:
+                fdata[d['name']][str(x[0])] = x[1]
+            else:
+                try:
+                    fdata[d['name']][pconfig['categories'][i]] = x
+                except (KeyError, IndexError):
+                    fdata[d['name']][str(i)] = x
+
+    # Custom tsv output if the x axis varies
+    if not sharedcats and config.data_format == 'tsv':
+        fout = ''
+        for d in pdata:
+            fout += "\t"+"\t".join([str(x[0]) for x in d['data']])
+            fout += "\n{}\t".format(d['name'])
+            fout += "\t".join([str(x[1]) for x in d['data']])
+            fout += "\n"
+        with io.open (os.path.join(config.data_dir, '{}.txt'.format(pid)), 'w', encoding='utf-8') as f:
+            print( fout.encode('utf-8', 'ignore').decode('utf-8'), file=f )
+    else:
+        util_functions.write_data_file(fdata, pid)
+
+
+def downsample_series(series, max_points, method='lttb'):
+    """
+    Reduce the number of points in a line graph series, keeping its shape.
+    :param series: Series dict with 'data' as a list of [x, y] pairs
+    :param max_points: Maximum number of points to keep. None or 0 to not downsample.
+    :param method: 'lttb' (Largest-Triangle-Three-Buckets) or 'minmax'
+                   (the lowest and highest points in each bucket)
+    :return: The same series dict if it's short enough or can't be downsampled,
+             otherwise a copy with fewer points.
+    """
+    if not max_points or len(series.get('data', [])) <= max_points:
+        return series
+    # Only numeric x / y pairs, without gaps, can be downsampled
+    try:
+        if any(type(p) is not list or len(p) != 2 for p in series['data']):
+            return series
+        xy = np.array(series['data'], dtype=float)
+    except (TypeError, ValueError):
+        return series
+    if not np.isfinite(xy).all():
+        return series
+    if method == 'minmax':
+        keep = minmax_indices(xy[:,1], max_points)
+    else:
+        keep = lttb_indices(xy[:,0], xy[:,1], max_points)
+    downsampled = series.copy()
+    downsampled['data'] = [ series['data'][i] for i in keep ]
+    return downsampled
+
+def lttb_indices(x, y, numpoints):
+    """
+    Largest-Triangle-Three-Buckets downsampling (Steinarsson, 2013).
+    Keeps the first and last points, then picks one point from each bucket:
+    the one making the largest triangle with the point picked in the
+    previous bucket and the average of the next bucket.
+    :param x: NumPy array of x values, sorted
+    :param y: NumPy array of y values
+    :param numpoints: Number of points to keep, at least 3
+    :return: NumPy array of the indices of the points to keep
+    """
+    n = len(x)
+    numpoints = max(3, numpoints)
+    if n <= numpoints:
+        return np.arange(n)
+    # Bucket boundaries for all points except the first and last
+    edges = np.linspace(1, n - 1, numpoints - 1).astype(int)
+    keep = np.zeros(numpoints, dtype=int)
+    keep[-1] = n - 1
+    a = 0
+    for i in range(numpoints - 2):
+        start, end = edges[i], edges[i+1]
+        # Average point of the next bucket, or the last point
+        if i < numpoints - 3:
+            next_start, next_end = edges[i+1], edges[i+2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Twice the triangle areas, for every point in this bucket
+        areas = np.abs( (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]) )
+        a = start + int(np.argmax(areas))
+        keep[i+1] = a
+    return keep
+
+def minmax_indices(y, numpoints):
+    """
+    Min / max downsampling. Keeps the lowest and highest points in
+    each bucket, so that peaks and troughs are never lost.
+    :param y: NumPy array of y values
+    :param numpoints: Maximum number of points to keep
+    :return: NumPy array of the indices of the points to keep, sorted
+    """
+    n = len(y)
+    if n <= numpoints:
+        return np.arange(n)
+    nbuckets = max(1, numpoints // 2)
+    edges = np.linspace(0, n, nbuckets + 1).astype(int)
+    keep = set([0, n - 1])
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            keep.add(start + int(np.argmin(y[start:end])))
+            keep.add(start + int(np.argmax(y[start:end])))
+    return np.array(sorted(keep))
+
+
 def smooth_line_data(data, numpoints, sumcounts=True):
     """
     Function to take an x-y dataset and use binning to
-    smooth to a maximum number of datapoints.
+    smooth to a maximum number of datapoints. Each bin is
+    labelled with its first x value. xyseries objects are
+    smoothed as arrays and returned as xyseries objects.
     """
     smoothed = {}
     for s_name, d in data.items():
-
         # Check that we need to smooth this data
         if len(d) <= numpoints:
             smoothed[s_name] = d
             continue
 
-        smoothed[s_name] = OrderedDict();
-        p = 0
-        binsize = len(d) / numpoints
-        if binsize < 1:
-            binsize = 1
-        binvals = []
-        for x in sorted(d):
-            y = d[x]
-            if p < binsize:
-                binvals.append(y)
-                p += 1
-            else:
-                if sumcounts is True:
-                    v = sum(binvals)
-                else:
-                    v = sum(binvals) / binsize
-                smoothed[s_name][x] = v
-                p = 0
-                binvals = []
+        if isinstance(d, xyseries):
+            order = np.argsort(d.x, kind='mergesort')
+            xs = d.x[order]
+            ys = d.y[order].astype(float)
+        else:
+            xs = sorted(d)
+            ys = np.array([d[x] for x in xs], dtype=float)
+        binsize = max(1.0, len(xs) / float(numpoints))
+        # Bin number for every point. The last bin may have fewer points.
+        bins = (np.arange(len(xs)) / binsize).astype(int)
+        sums = np.bincount(bins, weights=ys)
+        if sumcounts is not True:
+            sums = sums / np.bincount(bins)
+        firsts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+
+        if isinstance(d, xyseries):
+            smoothed[s_name] = xyseries(s_name, xs[firsts], sums)
+            continue
+        smoothed[s_name] = OrderedDict()
+        for b, i in enumerate(firsts):
+            smoothed[s_name][xs[i]] = float(sums[b])
     return smoothed
@@ -5,6 +5,7 @@
 import logging
 import random
 
+from multiqc.plots.series_object import xyseries
 from multiqc.utils import config, report
 
 logger = logging.getLogger(__name__)
@@ -33,38 +34,34 @@ def plot (data, pconfig=None):
     plotdata = list()
     for data_index, ds in enumerate(data):
         d = list()
-        for s_name in ds:
-            # Ensure any overwritting conditionals from data_labels (e.g. ymax) are taken in consideration
+
+        # Ensure any overwritting conditionals from data_labels (e.g. ymax) are taken in consideration
+        series_config = pconfig
+        if 'data_labels' in pconfig and type(pconfig['data_labels'][data_index]) is dict:  # if not a dict: only dataset name is provided
             series_config = pconfig.copy()
-            if 'data_labels' in pconfig and type(pconfig['data_labels'][data_index]) is dict:  # if not a dict: only dataset name is provided
-                series_config.update(pconfig['data_labels'][data_index])
+            series_config.update(pconfig['data_labels'][data_index])
 
+        for s_name in ds:
             if type(ds[s_name]) is not list:
                 ds[s_name] = [ ds[s_name] ]
+            points = list()
             for k in ds[s_name]:
-                if k['x'] is not None:
-                    if 'xmax' in series_config and float(k['x']) > float(series_config['xmax']):
-                        continue
-                    if 'xmin' in series_config and float(k['x']) < float(series_config['xmin']):
-                        continue
-                if k['y'] is not None:
-                    if 'ymax' in series_config and float(k['y']) > float(series_config['ymax']):
-                        continue
-                    if 'ymin' in series_config and float(k['y']) < float(series_config['ymin']):
-                        continue
-                this_series = { 'x': k['x'], 'y': k['y'] }
+                point = dict()
                 try:
-                    this_series['name'] = "{}: {}".format(s_name, k['name'])
+                    point['name'] = "{}: {}".format(s_name, k['name'])
                 except KeyError:
-                    this_series['name'] = s_name
+                    point['name'] = s_name
                 try:
-                    this_series['color'] = k['color']
+                    point['color'] = k['color']
                 except KeyError:
                     try:
-                        this_series['color'] = series_config['colors'][s_name]
+                        point['color'] = series_config['colors'][s_name]
                     except KeyError:
                         pass
-                d.append(this_series)
+                points.append(point)
+            series = xyseries(s_name, [k['x'] for k in ds[s_name]], [k['y'] for k in ds[s_name]], points)
+            series.clip(series_config.get('xmin'), series_config.get('xmax'), series_config.get('ymin'), series_config.get('ymax'))
+            d.extend(series.scatter_data())
         plotdata.append(d)
 
     # Add on annotation data series
@@ -100,11 +97,11 @@ def highcharts_scatter_plot (plotdata, pconfig=None):
     pconfig['id'] = report.save_htmlid(pconfig['id'])
 
     # Build the HTML for the page
-    html = '<div class="mqc_hcplot_plotgroup">'
+    html = ['<div class="mqc_hcplot_plotgroup">']
 
     # Buttons to cycle through different datasets
     if len(plotdata) > 1:
-        html += '<div class="btn-group hc_switch_group">\n'
+        html.append('<div class="btn-group hc_switch_group">\n')
         for k, p in enumerate(plotdata):
             active = 'active' if k == 0 else ''
             try:
@@ -119,11 +116,11 @@ def highcharts_scatter_plot (plotdata, pconfig=None):
                 ymax = 'data-ymax="{}"'.format(pconfig['data_labels'][k]['ymax'])
             except:
                 ymax = ''
-            html += '<button class="btn btn-default btn-sm {a}" data-action="set_data" {y} {ym} data-newdata="{k}" data-target="{id}">{n}</button>\n'.format(a=active, id=pconfig['id'], n=name, y=ylab, ym=ymax, k=k)
-        html += '</div>\n\n'
+            html.append('<button class="btn btn-default btn-sm {a}" data-action="set_data" {y} {ym} data-newdata="{k}" data-target="{id}">{n}</button>\n'.format(a=active, id=pconfig['id'], n=name, y=ylab, ym=ymax, k=k))
+        html.append('</div>\n\n')
 
     # The plot div
-    html += '<div class="hc-plot-wrapper"><div id="{id}" class="hc-plot not_rendered hc-scatter-plot"><small>loading..</small></div></div></div> \n'.format(id=pconfig['id'])
+    html.append('<div class="hc-plot-wrapper"><div id="{id}" class="hc-plot not_rendered hc-scatter-plot"><small>loading..</small></div></div></div> \n'.format(id=pconfig['id']))
 
     report.num_hc_plots += 1
 
@@ -133,4 +130,4 @@ def highcharts_scatter_plot (plotdata, pconfig=None):
         'config': pconfig
     }
 
-    return html
+    return ''.join(html)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+""" MultiQC xyseries class, used by line graphs and scatter plots """
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class xyseries (object):
+    """ X / Y data for one plot series, held as NumPy arrays.
+    Numeric values are kept in typed arrays. Anything else (strings, None)
+    is kept in object arrays, so that values are written out unchanged. """
+
+    __slots__ = ['name', 'x', 'y', 'points']
+
+    def __init__ (self, name, x, y, points=None):
+        """
+        :param name: Series name, usually the sample name
+        :param x: List or array of x values
+        :param y: List or array of y values, the same length as x
+        :param points: Optional list of extra dicts for each point (scatter plots)
+        """
+        self.name = name
+        self.x = _to_array(x)
+        self.y = _to_array(y)
+        self.points = points
+
+    @classmethod
+    def from_dict (cls, name, d):
+        """ Make a series from a dict of x: y pairs, sorted by x """
+        x = _to_array(list(d.keys()))
+        y = _to_array(list(d.values()))
+        if x.dtype.kind in 'iuf':
+            order = np.argsort(x, kind='mergesort')
+        else:
+            order = np.array(sorted(range(len(x)), key=x.__getitem__), dtype=int)
+        if len(order) > 0:
+            x = x[order]
+            y = y[order]
+        return cls(name, x, y)
+
+    def __len__ (self):
+        return len(self.x)
+
+    def clip (self, xmin=None, xmax=None, ymin=None, ymax=None):
+        """ Remove points outside the given limits, in place.
+        Missing (None) values are never removed. """
+        keep = np.ones(len(self.x), dtype=bool)
+        for values, lower, upper in [(self.x, xmin, xmax), (self.y, ymin, ymax)]:
+            if lower is None and upper is None:
+                continue
+            fvalues = _to_float(values)
+            with np.errstate(invalid='ignore'):
+                if upper is not None:
+                    keep &= ~(fvalues > float(upper))
+                if lower is not None:
+                    keep &= ~(fvalues < float(lower))
+        if not keep.all():
+            self.x = self.x[keep]
+            self.y = self.y[keep]
+            if self.points is not None:
+                self.points = [p for p, k in zip(self.points, keep) if k]
+        return self
+
+    def max_y (self):
+        """ Largest y value, ignoring anything that isn't a number. 0 if empty. """
+        try:
+            fy = _to_float(self.y)
+        except (TypeError, ValueError):
+            return 0
+        fy = fy[~np.isnan(fy)]
+        return fy.max() if len(fy) > 0 else 0
+
+    def line_data (self):
+        """ [x, y] pairs, as used by HighCharts line series """
+        pairs = np.empty((len(self.x), 2), dtype=object)
+        pairs[:,0] = self.x
+        pairs[:,1] = self.y
+        return pairs.tolist()
+
+    def scatter_data (self):
+        """ Point dicts with x and y (plus any extra point keys), as used by HighCharts
+        scatter plots. The x and y values are added to the extra point dicts if given. """
+        if self.points is None:
+            return [ {'x': x, 'y': y} for x, y in zip(self.x.tolist(), self.y.tolist()) ]
+        for x, y, point in zip(self.x.tolist(), self.y.tolist(), self.points):
+            point['x'] = x
+            point['y'] = y
+        return self.points
+
+
+def _to_array (values):
+    """ Typed NumPy array for numbers, object array for anything else """
+    if isinstance(values, np.ndarray):
+        return values
+    arr = np.array(values)
+    # Mixed ints and floats are kept as they are, so that ints are written without decimals
+    mixed = arr.dtype.kind == 'f' and int in set(map(type, values))
+    if arr.dtype.kind not in 'iuf' or arr.ndim != 1 or mixed:
+        arr = np.empty(len(values), dtype=object)
+        arr[:] = values
+    return arr
+
+def _to_float (arr):
+    """ Float copy of an array, with None as NaN """
+    if arr.dtype.kind in 'iuf':
+        return arr.astype(float)
+    return np.array([ np.nan if v is None else float(v) for v in arr ], dtype=float)
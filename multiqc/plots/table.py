@@ -4,6 +4,7 @@
 
 from collections import defaultdict, OrderedDict
 import logging
+import math
 import random
 
 from multiqc.utils import config, report, util_functions, mqc_colour
@@ -46,13 +47,18 @@ def plot (data, headers=None, pconfig=None):
             ' data-toggle="tooltip"></span> Showing {} samples.</p>'.format(len(s_names))
         return warning + beeswarm.make_plot( dt )
     else:
-        return make_table ( dt )
+        # Static reports (simple template, PDFs, flat plots) can't draw rows with JavaScript
+        virtual = config.table_virtual_rows > 0 and len(s_names) > config.table_virtual_rows \
+            and not config.simple_output and not config.plots_force_flat
+        return make_table ( dt, virtual )
 
 
-def make_table (dt):
+def make_table (dt, virtual=False):
     """
     Build the HTML needed for a MultiQC table.
     :param data: MultiQC datatable object
+    :param virtual: Only build the table header, with the cell values saved to
+                    the report plot data. Rows are drawn in the browser as they are scrolled into view.
     """
 
     table_id = dt.pconfig.get('id', 'table_{}'.format(''.join(random.sample(letters, 4))) )
@@ -63,6 +69,16 @@ def make_table (dt):
     dt.raw_vals = defaultdict(lambda: dict())
     empty_cells = dict()
     hidden_cols = 1
+    fcache = dict()
+    vcache = dict()
+    vcolumns = OrderedDict()
+    cf_types = list(OrderedDict.fromkeys( cfck for cfc in config.table_cond_formatting_colours for cfck in cfc ))
+
+    # This is horrible, but Python locale settings are worse
+    if config.thousandsSep_format is None:
+        config.thousandsSep_format = '<span class="mqc_thousandSep"></span>'
+    if config.decimalPoint_format is None:
+        config.decimalPoint_format = '.'
     table_title = dt.pconfig.get('table_title')
     if table_title is None:
         table_title = table_id.replace("_", " ").title()
@@ -96,6 +112,14 @@ def make_table (dt):
 
         empty_cells[rid] = '<td class="data-coloured {rid} {h}"></td>'.format(rid=rid, h=hide)
 
+        vcolumns[rid] = {
+            'rid': rid,
+            'scale': bool(header['scale']),
+            'dmin': header['dmin'],
+            'dmax': header['dmax'],
+            'suffix': header.get('suffix', '')
+        }
+
         # Build the modal table row
         t_modal_headers[rid] = """
         <tr class="{rid}{muted}" style="background-color: rgba({col}, 0.15);">
@@ -127,104 +151,81 @@ def make_table (dt):
         else:
             c_scale = mqc_colour.mqc_colour_scale(header['scale'], header['dmin'], header['dmax'])
 
+        # Conditional formatting rules for this column: general rules followed by column-specific rules
+        cf_rules = [ (ftype, cmp)
+            for cfk in ['all_columns', rid] if cfk in config.table_cond_formatting_rules
+            for ftype in cf_types
+            for cmp in config.table_cond_formatting_rules[cfk].get(ftype, []) ]
+
+        # Cell HTML either side of the value, the same for every row
+        kname = '{}_{}'.format(header['namespace'], rid)
+        suffix = header.get('suffix', '')
+        modify = header['modify'] if callable(header.get('modify')) else None
+        dmin = header['dmin']
+        dmax = header['dmax']
+        if not header['scale']:
+            cell_start = '<td class="{rid} {h}">'.format(rid=rid, h=hide)
+            cell_end = '</td>'
+        else:
+            cell_start = '<td class="data-coloured {rid} {h}"><div class="wrapper"><span class="bar" style="width:'.format(rid=rid, h=hide)
+            cell_val = '"></span><span class="val">'
+            cell_end = '</span></div></td>'
+
         # Add the data table cells
         for (s_name, samp) in dt.data[idx].items():
             if k in samp:
                 val = samp[k]
-                kname = '{}_{}'.format(header['namespace'], rid)
                 dt.raw_vals[s_name][kname] = val
 
-                if 'modify' in header and callable(header['modify']):
-                    val = header['modify'](val)
-
-                try:
-                    dmin = header['dmin']
-                    dmax = header['dmax']
-                    percentage = ((float(val) - dmin) / (dmax - dmin)) * 100
-                    percentage = min(percentage, 100)
-                    percentage = max(percentage, 0)
-                except (ZeroDivisionError,ValueError):
-                    percentage = 0
-
-                try:
-                    valstring = str(header['format'].format(val))
-                except ValueError:
+                if modify is not None:
+                    val = modify(val)
+
+                bgcol = None
+                if len(cf_rules) > 0:
+                    bgcol = cond_formatting_colour(val, cf_rules)
+
+                if s_name not in t_rows:
+                    t_rows[s_name] = dict()
+
+                # Save the cell values for the browser to build the HTML
+                if virtual:
                     try:
-                        valstring = str(header['format'].format(float(val)))
-                    except ValueError:
-                        valstring = str(val)
-                except:
-                    valstring = str(val)
-
-                # This is horrible, but Python locale settings are worse
-                if config.thousandsSep_format is None:
-                    config.thousandsSep_format = '<span class="mqc_thousandSep"></span>'
-                if config.decimalPoint_format is None:
-                    config.decimalPoint_format = '.'
-                valstring = valstring.replace('.', 'DECIMAL').replace(',', 'THOUSAND')
-                valstring = valstring.replace('DECIMAL', config.decimalPoint_format).replace('THOUSAND', config.thousandsSep_format)
-
-                # Percentage suffixes etc
-                valstring += header.get('suffix', '')
+                        fval = float(val)
+                        if math.isnan(fval) or math.isinf(fval):
+                            fval = None
+                    except (TypeError, ValueError):
+                        fval = None
+                    colour = c_scale.get_colour(val) if c_scale is not None else None
+                    t_rows[s_name][rid] = (format_value(header['format'], val, vcache, False), fval, colour, bgcol)
+                    continue
+
+                valstring = format_value(header['format'], val, fcache) + suffix
 
                 # Conditional formatting
-                cmatches = { cfck: False for cfc in config.table_cond_formatting_colours for cfck in cfc }
-                # Find general rules followed by column-specific rules
-                for cfk in ['all_columns', rid]:
-                    if cfk in config.table_cond_formatting_rules:
-                        # Loop through match types
-                        for ftype in cmatches.keys():
-                            # Loop through array of comparison types
-                            for cmp in config.table_cond_formatting_rules[cfk].get(ftype, []):
-                                try:
-                                    # Each comparison should be a dict with single key: val
-                                    if 's_eq' in cmp and str(cmp['s_eq']).lower() == str(val).lower():
-                                        cmatches[ftype] = True
-                                    if 's_contains' in cmp and str(cmp['s_contains']).lower() in str(val).lower():
-                                        cmatches[ftype] = True
-                                    if 's_ne' in cmp and str(cmp['s_ne']).lower() != str(val).lower():
-                                        cmatches[ftype] = True
-                                    if 'eq' in cmp and float(cmp['eq']) == float(val):
-                                        cmatches[ftype] = True
-                                    if 'ne' in cmp and float(cmp['ne']) != float(val):
-                                        cmatches[ftype] = True
-                                    if 'gt' in cmp and float(cmp['gt']) < float(val):
-                                        cmatches[ftype] = True
-                                    if 'lt' in cmp and float(cmp['lt']) > float(val):
-                                        cmatches[ftype] = True
-                                except:
-                                    logger.warn("Not able to apply table conditional formatting to '{}' ({})".format(val, cmp))
-                # Apply HTML in order of config keys
-                bgcol = None
-                for cfc in config.table_cond_formatting_colours:
-                    for cfck in cfc: # should always be one, but you never know
-                        if cmatches[cfck]:
-                            bgcol = cfc[cfck]
                 if bgcol is not None:
                     valstring = '<span class="badge" style="background-color:{}">{}</span>'.format(bgcol, valstring)
 
                 # Build HTML
                 if not header['scale']:
-                    if s_name not in t_rows:
-                        t_rows[s_name] = dict()
-                    t_rows[s_name][rid] = '<td class="{rid} {h}">{v}</td>'.format(rid=rid, h=hide, v=valstring)
+                    t_rows[s_name][rid] = cell_start + valstring + cell_end
                 else:
+                    try:
+                        percentage = ((float(val) - dmin) / (dmax - dmin)) * 100
+                        percentage = min(percentage, 100)
+                        percentage = max(percentage, 0)
+                    except (ZeroDivisionError,ValueError):
+                        percentage = 0
                     if c_scale is not None:
                         col = ' background-color:{};'.format(c_scale.get_colour(val))
                     else:
                         col = ''
-                    bar_html = '<span class="bar" style="width:{}%;{}"></span>'.format(percentage, col)
-                    val_html = '<span class="val">{}</span>'.format(valstring)
-                    wrapper_html = '<div class="wrapper">{}{}</div>'.format(bar_html, val_html)
-
-                    if s_name not in t_rows:
-                        t_rows[s_name] = dict()
-                    t_rows[s_name][rid] = '<td class="data-coloured {rid} {h}">{c}</td>'.format(rid=rid, h=hide, c=wrapper_html)
+                    t_rows[s_name][rid] = '{}{}%;{}{}{}{}'.format(cell_start, percentage, col, cell_val, valstring, cell_end)
 
         # Remove header if we don't have any filled cells for it
-        if sum([len(rows) for rows in t_rows.values()]) == 0:
+        if len(t_rows) == 0:
             t_headers.pop(rid, None)
             t_modal_headers.pop(rid, None)
+            vcolumns.pop(rid, None)
             logger.debug('Removing header {} from general stats table, as no data'.format(k))
 
     #
@@ -232,76 +233,91 @@ def make_table (dt):
     #
 
     # Buttons above the table
-    html = ''
+    html = list()
     if not config.simple_output:
 
         # Copy Table Button
-        html += """
+        if virtual:
+            html.append("""
+        <button type="button" class="mqc_vtable_copy_btn btn btn-default btn-sm" data-target="#{tid}">
+            <span class="glyphicon glyphicon-copy"></span> Copy table
+        </button>
+        """.format(tid=table_id))
+        else:
+            html.append("""
         <button type="button" class="mqc_table_copy_btn btn btn-default btn-sm" data-clipboard-target="#{tid}">
             <span class="glyphicon glyphicon-copy"></span> Copy table
         </button>
-        """.format(tid=table_id)
+        """.format(tid=table_id))
 
         # Configure Columns Button
         if len(t_headers) > 1:
-            html += """
+            html.append("""
             <button type="button" class="mqc_table_configModal_btn btn btn-default btn-sm" data-toggle="modal" data-target="#{tid}_configModal">
                 <span class="glyphicon glyphicon-th"></span> Configure Columns
             </button>
-            """.format(tid=table_id)
+            """.format(tid=table_id))
 
         # Sort By Highlight button
-        html += """
+        html.append("""
         <button type="button" class="mqc_table_sortHighlight btn btn-default btn-sm" data-target="#{tid}" data-direction="desc" style="display:none;">
             <span class="glyphicon glyphicon-sort-by-attributes-alt"></span> Sort by highlight
         </button>
-        """.format(tid=table_id)
+        """.format(tid=table_id))
 
         # Scatter Plot Button
         if len(t_headers) > 1:
-            html += """
+            html.append("""
             <button type="button" class="mqc_table_makeScatter btn btn-default btn-sm" data-toggle="modal" data-target="#tableScatterModal" data-table="#{tid}">
                 <span class="glyphicon glyphicon glyphicon-stats"></span> Plot
             </button>
-            """.format(tid=table_id)
+            """.format(tid=table_id))
 
         # "Showing x of y columns" text
-        html += """
+        html.append("""
         <small id="{tid}_numrows_text" class="mqc_table_numrows_text">Showing <sup id="{tid}_numrows" class="mqc_table_numrows">{nrows}</sup>/<sub>{nrows}</sub> rows and <sup id="{tid}_numcols" class="mqc_table_numcols">{ncols_vis}</sup>/<sub>{ncols}</sub> columns.</small>
-        """.format(tid=table_id, nrows=len(t_rows), ncols_vis = (len(t_headers)+1)-hidden_cols, ncols=len(t_headers))
+        """.format(tid=table_id, nrows=len(t_rows), ncols_vis = (len(t_headers)+1)-hidden_cols, ncols=len(t_headers)))
 
     # Build the table itself
     collapse_class = 'mqc-table-collapse' if len(t_rows) > 10 and config.collapse_tables else ''
-    html += """
+    table_class = ''
+    if virtual:
+        # Virtual tables scroll within a fixed height
+        collapse_class = 'mqc-table-collapse'
+        table_class = ' mqc_vtable'
+    html.append("""
         <div id="{tid}_container" class="mqc_table_container">
             <div class="table-responsive mqc-table-responsive {cc}">
-                <table id="{tid}" class="table table-condensed mqc_table" data-title="{title}">
-        """.format( tid=table_id, title=table_title, cc=collapse_class)
+                <table id="{tid}" class="table table-condensed mqc_table{tc}" data-title="{title}">
+        """.format( tid=table_id, title=table_title, cc=collapse_class, tc=table_class))
 
     # Build the header row
     col1_header = dt.pconfig.get('col1_header', 'Sample Name')
-    html += '<thead><tr><th class="rowheader">{}</th>{}</tr></thead>'.format(col1_header, ''.join(t_headers.values()))
+    html.append('<thead><tr><th class="rowheader">{}</th>{}</tr></thead>'.format(col1_header, ''.join(t_headers.values())))
 
     # Build the table body
-    html += '<tbody>'
+    html.append('<tbody>')
     t_row_keys = t_rows.keys()
     if dt.pconfig.get('sortRows') is not False:
         t_row_keys = sorted(t_row_keys)
+    if virtual:
+        save_virtual_table(table_id, t_row_keys, t_rows, [ vcolumns[rid] for rid in t_headers ])
+        t_row_keys = []
+    row_cols = [ (k, empty_cells[k]) for k in t_headers ]
     for s_name in t_row_keys:
-        html += '<tr>'
-        # Sample name row header
-        html += '<th class="rowheader" data-original-sn="{sn}">{sn}</th>'.format(sn=s_name)
-        for k in t_headers:
-            html += t_rows[s_name].get(k, empty_cells[k])
-        html += '</tr>'
-    html += '</tbody></table></div>'
-    if len(t_rows) > 10 and config.collapse_tables:
-        html += '<div class="mqc-table-expand"><span class="glyphicon glyphicon-chevron-down" aria-hidden="true"></span></div>'
-    html += '</div>'
+        row = t_rows[s_name]
+        # Sample name row header, then the cells in column order
+        html.append('<tr><th class="rowheader" data-original-sn="{sn}">{sn}</th>'.format(sn=s_name))
+        html.append(''.join([ row.get(k, empty) for k, empty in row_cols ]))
+        html.append('</tr>')
+    html.append('</tbody></table></div>')
+    if len(t_rows) > 10 and config.collapse_tables and not virtual:
+        html.append('<div class="mqc-table-expand"><span class="glyphicon glyphicon-chevron-down" aria-hidden="true"></span></div>')
+    html.append('</div>')
 
     # Build the bootstrap modal to customise columns and order
     if not config.simple_output:
-        html += """
+        html.append("""
     <!-- MultiQC Table Columns Modal -->
     <div class="modal fade" id="{tid}_configModal" tabindex="-1">
       <div class="modal-dialog modal-lg">
@@ -334,7 +350,7 @@ def make_table (dt):
             </table>
         </div>
         <div class="modal-footer"> <button type="button" class="btn btn-default" data-dismiss="modal">Close</button> </div>
-    </div> </div> </div>""".format( tid=table_id, title=table_title, trows=''.join(t_modal_headers.values()) )
+    </div> </div> </div>""".format( tid=table_id, title=table_title, trows=''.join(t_modal_headers.values()) ))
 
     # Save the raw values to a file if requested
     if dt.pconfig.get('save_file') is True:
@@ -342,4 +358,106 @@ def make_table (dt):
         util_functions.write_data_file(dt.raw_vals, fn )
         report.saved_raw_data[fn] = dt.raw_vals
 
-    return html
+    return ''.join(html)
+
+
+def save_virtual_table (table_id, s_names, t_rows, columns):
+    """
+    Save the cell values of a virtual table to the report plot data,
+    as one list per column with a value for every sample (row).
+    :param table_id: HTML ID of the table
+    :param s_names: Sample names, in row order
+    :param t_rows: Dict of cell values for each sample, keyed on column ID.
+                   Each cell is a tuple of text, numeric value, colour and badge colour.
+    :param columns: List of dicts describing the table columns, in column order
+    """
+    s_names = list(s_names)
+    for col in columns:
+        cells = [ t_rows[s_name].get(col['rid']) for s_name in s_names ]
+        col['text'] = [ c[0] if c is not None else None for c in cells ]
+        col['values'] = [ c[1] if c is not None else None for c in cells ]
+        if col['scale']:
+            col['colours'] = [ c[2] if c is not None else None for c in cells ]
+        badges = [ c[3] if c is not None else None for c in cells ]
+        if any(b is not None for b in badges):
+            col['badges'] = badges
+    report.plot_data[table_id] = {
+        'plot_type': 'table',
+        'samples': s_names,
+        'columns': columns,
+        'decimalPoint_format': config.decimalPoint_format,
+        'thousandsSep_format': config.thousandsSep_format
+    }
+
+
+def format_value (fmt, val, fcache, separators=True):
+    """
+    Format a table cell value, with the report decimal point and thousands separator.
+    Columns repeat the same values a lot, so results are cached in fcache.
+    :param fmt: Format string for the column
+    :param val: Cell value
+    :param fcache: dict of previously formatted values, keyed on (format, type, value)
+    :param separators: Swap in the report decimal point and thousands separator
+    :return: Formatted value string
+    """
+    key = (fmt, type(val), val)
+    try:
+        return fcache[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # Can't hash the value, don't cache
+        key = None
+
+    try:
+        valstring = str(fmt.format(val))
+    except ValueError:
+        try:
+            valstring = str(fmt.format(float(val)))
+        except ValueError:
+            valstring = str(val)
+    except:
+        valstring = str(val)
+
+    if separators:
+        valstring = valstring.replace('.', 'DECIMAL').replace(',', 'THOUSAND')
+        valstring = valstring.replace('DECIMAL', config.decimalPoint_format).replace('THOUSAND', config.thousandsSep_format)
+    if key is not None:
+        fcache[key] = valstring
+    return valstring
+
+
+def cond_formatting_colour (val, cf_rules):
+    """
+    Find the conditional formatting colour for a table cell value
+    :param val: Cell value
+    :param cf_rules: list of (match type, comparison dict) tuples for the column
+    :return: Background colour, or None if no rules match
+    """
+    cmatches = set()
+    for ftype, cmp in cf_rules:
+        try:
+            # Each comparison should be a dict with single key: val
+            if 's_eq' in cmp and str(cmp['s_eq']).lower() == str(val).lower():
+                cmatches.add(ftype)
+            if 's_contains' in cmp and str(cmp['s_contains']).lower() in str(val).lower():
+                cmatches.add(ftype)
+            if 's_ne' in cmp and str(cmp['s_ne']).lower() != str(val).lower():
+                cmatches.add(ftype)
+            if 'eq' in cmp and float(cmp['eq']) == float(val):
+                cmatches.add(ftype)
+            if 'ne' in cmp and float(cmp['ne']) != float(val):
+                cmatches.add(ftype)
+            if 'gt' in cmp and float(cmp['gt']) < float(val):
+                cmatches.add(ftype)
+            if 'lt' in cmp and float(cmp['lt']) > float(val):
+                cmatches.add(ftype)
+        except:
+            logger.warn("Not able to apply table conditional formatting to '{}' ({})".format(val, cmp))
+    # Apply HTML in order of config keys
+    bgcol = None
+    for cfc in config.table_cond_formatting_colours:
+        for cfck in cfc: # should always be one, but you never know
+            if cfck in cmatches:
+                bgcol = cfc[cfck]
+    return bgcol
@@ -4,6 +4,7 @@
 
 from collections import defaultdict, OrderedDict
 import logging
+import numpy as np
 import re
 
 from multiqc.utils import config, report
@@ -223,3 +224,39 @@ class datatable (object):
             for idx, k in self.headers_in_order[bucket]:
                 res.append( (idx, k, self.headers[idx][k]) )
         return res
+
+    def get_column(self, idx, k):
+        """ Values for one column, with the header's modify function applied.
+        :param idx: Index of the table section
+        :param k: Column key
+        :return: List of sample names and list of values, for samples with data in this column
+        """
+        s_names = [ s_name for s_name, samp in self.data[idx].items() if k in samp ]
+        values = [ self.data[idx][s_name][k] for s_name in s_names ]
+        modify = self.headers[idx][k].get('modify')
+        if callable(modify):
+            values = modify_values(modify, values)
+        return s_names, values
+
+
+def modify_values(modify, values):
+    """ Apply a modify function to a list of values. Numeric columns are passed to
+    the function as one NumPy array, which works for simple arithmetic such as
+    `lambda x: x * 100`. Anything that doesn't give back an array of numbers the same
+    length (conditionals, math functions, string formatting) is called once per value.
+    :param modify: Function from the column header
+    :param values: List of values
+    :return: List of modified values
+    """
+    arr = np.array(values)
+    # Mixed ints and floats are done one by one, so that ints stay as ints
+    mixed = arr.dtype.kind == 'f' and int in set(map(type, values))
+    if len(values) > 1 and arr.dtype.kind in 'iuf' and arr.ndim == 1 and not mixed:
+        try:
+            with np.errstate(all='ignore'):
+                result = modify(arr)
+            if isinstance(result, np.ndarray) and result.shape == arr.shape and result.dtype.kind in 'iuf':
+                return result.tolist()
+        except Exception:
+            pass
+    return [ modify(val) for val in values ]
@@ -6,7 +6,7 @@
 $(function () {
 
     // Switch between counts and percentages in a bar plot
-    $('.mqc_mplplot_bargraph_setcountspcnt button').click(function(e){
+    $(document).on('click', '.mqc_mplplot_bargraph_setcountspcnt button', function(e){
         e.preventDefault();
         if(!$(this).hasClass('active')){
             $(this).siblings('button.active').removeClass('active');
@@ -24,7 +24,7 @@ $(function () {
     });
 
     // Switch datasets in a bar plot
-    $('.mqc_mplplot_bargraph_switchds button').click(function(e){
+    $(document).on('click', '.mqc_mplplot_bargraph_switchds button', function(e){
         e.preventDefault();
         if(!$(this).hasClass('active')){
             $(this).siblings('button.active').removeClass('active');
@@ -25,6 +25,7 @@ $(function () {
 
   // Decompress the JSON plot data
   mqc_plots = JSON.parse(LZString.decompressFromBase64(mqc_compressed_plotdata));
+  $(document).trigger('mqc_plotdata_loaded');
 
   // HighCharts Defaults
   window.HCDefaults = $.extend(true, {}, Highcharts.getOptions(), {});
@@ -106,7 +107,7 @@ $(function () {
   });
 
   // Switch a HighCharts axis or data source
-  $('.hc_switch_group button').click(function(e){
+  $(document).on('click', '.hc_switch_group button', function(e){
     e.preventDefault();
     $(this).siblings('button.active').removeClass('active');
     $(this).addClass('active');
@@ -154,16 +155,8 @@ $(function () {
 
   // Make HighCharts divs height-draggable
   // http://jsfiddle.net/Lkwb86c8/
-  $('.hc-plot:not(.no-handle)').each(function(){
-    if(!$(this).parent().hasClass('hc-plot-wrapper')){
-      $(this).wrap('<div class="hc-plot-wrapper"></div>');
-    }
-    if(!$(this).siblings().hasClass('hc-plot-handle')){
-      $(this).after('<div class="hc-plot-handle"><span></span><span></span><span></span></div>');
-    }
-    $(this).css({ height: 'auto', top: 0, bottom: '10px', position: 'absolute' });
-  });
-  $('.hc-plot-handle').on('mousedown', function(e){
+  mqc_plot_handles(document);
+  $(document).on('mousedown', '.hc-plot-handle', function(e){
     var wrapper = $(this).parent();
     var handle = $(this);
     var startHeight = wrapper.height();
@@ -181,14 +174,14 @@ $(function () {
     });
   });
   // Trigger HighCharts reflow when a plot is resized
-  $('.hc-plot, .beeswarm-plot').on('mqc_plotresize', function(e){
+  $(document).on('mqc_plotresize', '.hc-plot, .beeswarm-plot', function(e){
     if($(this).highcharts()) {
       $(this).highcharts().reflow();
     }
   });
 
   // Switch a y axis limit on or off
-  $('.mqc_hcplot_plotgroup').on('click', '.mqc_hcplot_yaxis_limit_toggle .mqc_switch_wrapper', function(){
+  $(document).on('click', '.mqc_hcplot_plotgroup .mqc_hcplot_yaxis_limit_toggle .mqc_switch_wrapper', function(){
     var target = $( $(this).data('target') ).highcharts();
     var ymax = $(this).data('ymax');
     var ymin = $(this).data('ymin');
@@ -205,7 +198,7 @@ $(function () {
   });
 
   // Sort a heatmap by highlighted names
-  $('.mqc_heatmap_sortHighlight').click(function(e){
+  $(document).on('click', '.mqc_heatmap_sortHighlight', function(e){
     e.preventDefault();
     var target = $(this).data('target').substr(1);
     if(mqc_plots[target]['config']['sortHighlights'] == true){
@@ -221,6 +214,20 @@ $(function () {
 
 });
 
+// Wrap plots with a handle to drag their height. Called on page load
+// and for report content that is added to the page later.
+function mqc_plot_handles(container){
+  $(container).find('.hc-plot:not(.no-handle)').each(function(){
+    if(!$(this).parent().hasClass('hc-plot-wrapper')){
+      $(this).wrap('<div class="hc-plot-wrapper"></div>');
+    }
+    if(!$(this).siblings().hasClass('hc-plot-handle')){
+      $(this).after('<div class="hc-plot-handle"><span></span><span></span><span></span></div>');
+    }
+    $(this).css({ height: 'auto', top: 0, bottom: '10px', position: 'absolute' });
+  });
+}
+
 // Call to render any plot
 function plot_graph(target, ds, max_num){
   if(mqc_plots[target] === undefined){ return false; }
@@ -254,7 +261,7 @@ function plot_graph(target, ds, max_num){
     }
     // Beeswarm graphs
     else if(mqc_plots[target]['plot_type'] == 'beeswarm'){
-      if(max_num === undefined || mqc_plots[target]['samples'][0].length < max_num){
+      if(max_num === undefined || mqc_plots[target]['samples'].length < max_num){
         plot_beeswarm_graph(target, ds);
         $('#'+target).removeClass('not_rendered');
       } else {
@@ -857,23 +864,28 @@ function plot_beeswarm_graph(target, ds){
 
   // Make a clone of the data, so that we can mess with it,
   // while keeping the original data in tact
+  // Sample names are given once, with a list of indexes for each category
   var datasets = JSON.parse(JSON.stringify(mqc_plots[target]['datasets']));
-  var samples = JSON.parse(JSON.stringify(mqc_plots[target]['samples']));
+  var all_samples = mqc_plots[target]['samples'].slice();
+  var sample_idx = JSON.parse(JSON.stringify(mqc_plots[target]['sample_idx']));
   var categories = JSON.parse(JSON.stringify(mqc_plots[target]['categories']));
+  // Point positions for large categories, worked out by MultiQC
+  var positions = [];
+  if(mqc_plots[target]['positions'] !== undefined){
+    positions = mqc_plots[target]['positions'].slice();
+  }
 
   // Rename samples
   if(window.mqc_rename_f_texts.length > 0){
-    for (i=0; i < samples.length; i++) {
-      for (j=0; j < samples[i].length; j++) {
-        $.each(window.mqc_rename_f_texts, function(idx, f_text){
-          if(window.mqc_rename_regex_mode){
-            var re = new RegExp(f_text,"g");
-            samples[i][j] = samples[i][j].replace(re, window.mqc_rename_t_texts[idx]);
-          } else {
-            samples[i][j] = samples[i][j].replace(f_text, window.mqc_rename_t_texts[idx]);
-          }
-        });
-      }
+    for (i=0; i < all_samples.length; i++) {
+      $.each(window.mqc_rename_f_texts, function(idx, f_text){
+        if(window.mqc_rename_regex_mode){
+          var re = new RegExp(f_text,"g");
+          all_samples[i] = all_samples[i].replace(re, window.mqc_rename_t_texts[idx]);
+        } else {
+          all_samples[i] = all_samples[i].replace(f_text, window.mqc_rename_t_texts[idx]);
+        }
+      });
     }
   }
 
@@ -882,14 +894,12 @@ function plot_beeswarm_graph(target, ds){
   var seriesColours = {};
   if(window.mqc_highlight_f_texts.length > 0){
     baseColour = 'rgb(80,80,80)'; // Grey points if no highlight
-    for (i=0; i < samples.length; i++) {
-      for (j=0; j < samples[i].length; j++) {
-        $.each(window.mqc_highlight_f_texts, function(idx, f_text){
-          if((window.mqc_highlight_regex_mode && samples[i][j].match(f_text)) || (!window.mqc_highlight_regex_mode && samples[i][j].indexOf(f_text) > -1)){
-            seriesColours[samples[i][j]] = window.mqc_highlight_f_cols[idx];
-          }
-        });
-      }
+    for (i=0; i < all_samples.length; i++) {
+      $.each(window.mqc_highlight_f_texts, function(idx, f_text){
+        if((window.mqc_highlight_regex_mode && all_samples[i].match(f_text)) || (!window.mqc_highlight_regex_mode && all_samples[i].indexOf(f_text) > -1)){
+          seriesColours[all_samples[i]] = window.mqc_highlight_f_cols[idx];
+        }
+      });
     }
   }
 
@@ -897,32 +907,39 @@ function plot_beeswarm_graph(target, ds){
   $('#'+target).closest('.hc-plot-wrapper').parent().find('.samples-hidden-warning').remove();
   $('#'+target).closest('.hc-plot-wrapper').show();
   if(window.mqc_hide_f_texts.length > 0){
+    var hidden = [];
+    for (i=0; i < all_samples.length; i++) {
+      var match = false;
+      for (k = 0; k < window.mqc_hide_f_texts.length; k++) {
+        var f_text = window.mqc_hide_f_texts[k];
+        if(window.mqc_hide_regex_mode){
+          if(all_samples[i].match(f_text)){ match = true; }
+        } else {
+          if(all_samples[i].indexOf(f_text) > -1){ match = true; }
+        }
+      }
+      if(window.mqc_hide_mode == 'show'){
+        match = !match;
+      }
+      hidden.push(match);
+    }
     var num_hidden = 0;
     var num_total = 0;
-    for (i=0; i < samples.length; i++) {
-      num_total = Math.max(num_total, samples[i].length);
-      var j = samples[i].length;
+    for (i=0; i < sample_idx.length; i++) {
+      num_total = Math.max(num_total, sample_idx[i].length);
+      var j = sample_idx[i].length;
       var hidden_here = 0;
       while (j--) {
-        var s_name = samples[i][j];
-        var match = false;
-        for (k = 0; k < window.mqc_hide_f_texts.length; k++) {
-          var f_text = window.mqc_hide_f_texts[k];
-          if(window.mqc_hide_regex_mode){
-            if(s_name.match(f_text)){ match = true; }
-          } else {
-            if(s_name.indexOf(f_text) > -1){ match = true; }
-          }
-        }
-        if(window.mqc_hide_mode == 'show'){
-          match = !match;
-        }
-        if(match){
-          samples[i].splice(j, 1);
+        if(hidden[sample_idx[i][j]]){
+          sample_idx[i].splice(j, 1);
           datasets[i].splice(j, 1);
           hidden_here += 1;
         }
       };
+      // Lay out the remaining points again
+      if(hidden_here > 0){
+        positions[i] = null;
+      }
       num_hidden = Math.max(num_hidden, hidden_here);
     };
     // Some series hidden. Show a warning text string.
@@ -956,7 +973,7 @@ function plot_beeswarm_graph(target, ds){
     }
 
     var data = datasets[i];
-    var s_names = samples[i];
+    var s_idx = sample_idx[i];
     if (categories[i]['namespace'] == ''){
       var label = categories[i]['title'];
       var label_long = categories[i]['description'];
@@ -990,46 +1007,42 @@ function plot_beeswarm_graph(target, ds){
     if (minx == undefined){
     	minx = Math.max.apply(null, data);
     }
-    var range = maxx-minx;
-    var sep = range/yspace;
-    // Get an array of indexes from a sorted data array
-    // Leaves the data order in tact so we don't lose s_name association
-    var indices = new Array(data.length);
-    for (var n = 0; n < data.length; n++) { indices[n] = n; }
-    indices.sort(function (a, b) {
-      return data[a] < data[b] ? -1 : data[a] > data[b] ? 1 : 0;
-    });
     var xydata = [];
-    var last = undefined;
-    var side = 1;
-    for (var s_idx = 0; s_idx < indices.length; s_idx++) {
-      row = indices[s_idx];
-      s_name = s_names[row];
-      d = data[row];
-      if (Math.floor(d/sep) !== last){
-        last = Math.floor(d/sep);
-        side = 1;
-      } else {
-        side += 1;
-      }
-      multiplier = (side % 2 == 0) ? 1 : -1;
-      var y = (Math.floor(side/2) * multiplier)/ysep;
-      // Don't let jitter get too big
-      while(y > 1 || y < -1){
-        var n = Math.floor(Math.abs(y)) + 1;
-        y = (Math.floor(side/2) * multiplier)/(ysep*n);
+    // Use the point positions from MultiQC if we have them
+    if(positions[i] !== undefined && positions[i] !== null){
+      for (var row = 0; row < data.length; row++) {
+        xydata.push(beeswarm_point(data[row], positions[i][row], all_samples[s_idx[row]], seriesColours, baseColour));
       }
-      // Get the point colour
-      var thisCol = baseColour;
-      if(s_name in seriesColours) {
-        thisCol = seriesColours[s_name];
-      }
-      xydata.push({
-        'x':d,
-        'y':y,
-        'name':s_name,
-        'color': thisCol
+    } else {
+      var range = maxx-minx;
+      var sep = range/yspace;
+      // Get an array of indexes from a sorted data array
+      // Leaves the data order in tact so we don't lose s_name association
+      var indices = new Array(data.length);
+      for (var n = 0; n < data.length; n++) { indices[n] = n; }
+      indices.sort(function (a, b) {
+        return data[a] < data[b] ? -1 : data[a] > data[b] ? 1 : 0;
       });
+      var last = undefined;
+      var side = 1;
+      for (var n = 0; n < indices.length; n++) {
+        var row = indices[n];
+        var d = data[row];
+        if (Math.floor(d/sep) !== last){
+          last = Math.floor(d/sep);
+          side = 1;
+        } else {
+          side += 1;
+        }
+        var multiplier = (side % 2 == 0) ? 1 : -1;
+        var y = (Math.floor(side/2) * multiplier)/ysep;
+        // Don't let jitter get too big
+        while(y > 1 || y < -1){
+          var jn = Math.floor(Math.abs(y)) + 1;
+          y = (Math.floor(side/2) * multiplier)/(ysep*jn);
+        }
+        xydata.push(beeswarm_point(d, y, all_samples[s_idx[row]], seriesColours, baseColour));
+      }
     }
 
     $('<div class="beeswarm-plot" />')
@@ -1157,7 +1170,53 @@ function plot_beeswarm_graph(target, ds){
   }
 }
 
+// One beeswarm point, coloured if the sample is highlighted
+function beeswarm_point(x, y, s_name, seriesColours, baseColour){
+  var thisCol = baseColour;
+  if(s_name in seriesColours) {
+    thisCol = seriesColours[s_name];
+  }
+  return {
+    'x': x,
+    'y': y,
+    'name': s_name,
+    'color': thisCol
+  };
+}
+
 // Heatmap plot
+// Expand the compact heatmap matrix from the plot data to HighCharts [x, y, value] points.
+// Dense matrices have a flat list of values for every cell, row by row. Sparse
+// matrices list the row, column and value of cells that aren't the fill value.
+function heatmap_points(matrix){
+  var nrows = matrix['shape'][0];
+  var ncols = matrix['shape'][1];
+  var points = [];
+  if(matrix['rows'] === undefined){
+    for (var i = 0; i < nrows; i++){
+      for (var j = 0; j < ncols; j++){
+        points.push([j, i, matrix['values'][(i * ncols) + j]]);
+      }
+    }
+  } else if(matrix['fill'] === undefined){
+    for (var n = 0; n < matrix['values'].length; n++){
+      points.push([matrix['cols'][n], matrix['rows'][n], matrix['values'][n]]);
+    }
+  } else {
+    var values = [];
+    for (var n = 0; n < nrows * ncols; n++){ values.push(matrix['fill']); }
+    for (var n = 0; n < matrix['values'].length; n++){
+      values[(matrix['rows'][n] * ncols) + matrix['cols'][n]] = matrix['values'][n];
+    }
+    for (var i = 0; i < nrows; i++){
+      for (var j = 0; j < ncols; j++){
+        points.push([j, i, values[(i * ncols) + j]]);
+      }
+    }
+  }
+  return points;
+}
+
 function plot_heatmap(target, ds){
   if(mqc_plots[target] === undefined || mqc_plots[target]['plot_type'] !== 'heatmap'){
     return false;
@@ -1168,7 +1227,7 @@ function plot_heatmap(target, ds){
 
   // Make a clone of the data, so that we can mess with it,
   // while keeping the original data in tact
-  var data = JSON.parse(JSON.stringify(mqc_plots[target]['data']));
+  var data = heatmap_points(mqc_plots[target]['data']);
   var xcats = JSON.parse(JSON.stringify(mqc_plots[target]['xcats']));
   var ycats = JSON.parse(JSON.stringify(mqc_plots[target]['ycats']));
 
@@ -1220,7 +1279,7 @@ function plot_heatmap(target, ds){
         });
       }
       // Reshape the data - needs deepcopy as indexes are updated
-      var newdata = JSON.parse(JSON.stringify(mqc_plots[target]['data']));
+      var newdata = heatmap_points(mqc_plots[target]['data']);
       var new_xcats = [], new_ycats = [];
       var xidx = 0, yidx = 0;
       for (hl = window.mqc_highlight_f_texts.length; hl >= 0; hl--){
@@ -13,11 +13,8 @@ $(function () {
 
   if($('.mqc_table').length > 0){
 
-    // Enable tablesorter on MultiQC tables
-    var strip_non_numeric = function(node){
-      return node.innerText.replace(/[^\d.-]/g, '');
-    }
-    $('.mqc_table').tablesorter({sortInitialOrder: 'desc', textExtraction: strip_non_numeric});
+    // Enable tablesorter, floating headers, tooltips and row sorting
+    mqc_table_init(document);
 
     // Update tablesorter if samples renamed
     $(document).on('mqc_renamesamples', function(e, f_texts, t_texts, regex_mode){
@@ -27,7 +24,11 @@ $(function () {
     // Copy table contents to clipboard
     var clipboard = new Clipboard('.mqc_table_copy_btn');
     clipboard.on('success', function(e) { e.clearSelection(); });
-    $('.mqc_table_copy_btn').click(function(){
+    // Virtual tables don't have all rows on the page, so copy text made from the data
+    new Clipboard('.mqc_vtable_copy_btn', {
+      text: function(trigger) { return mqc_vtable_tsv($(trigger).data('target').replace(/^#/, '')); }
+    });
+    $(document).on('click', '.mqc_table_copy_btn, .mqc_vtable_copy_btn', function(){
       var btn = $(this);
       btn.addClass('active').html('<span class="glyphicon glyphicon-copy"></span> Copied!');
       setTimeout(function(){
@@ -35,17 +36,8 @@ $(function () {
       }, 2000);
     });
 
-    // Make table headers fixed when table body scrolls (use CSS transforms)
-    // http://stackoverflow.com/a/25902860/713980
-    $('.mqc-table-responsive').scroll(function() {
-      $(this).find('thead').css('transform', "translate(0,"+$(this).scrollTop()+"px)");
-    });
-
-    // Table header-specific bootstrap tooltips
-    $('.mqc_table_tooltip').tooltip({ container: 'body' });
-
     // Expand tables to full height
-    $('.mqc-table-expand').click(function(){
+    $(document).on('click', '.mqc-table-expand', function(){
       if($(this).find('span').hasClass('glyphicon-chevron-down')){
         $(this).parent().find('.mqc-table-responsive').css('max-height', 'none');
         $(this).find('span').removeClass('glyphicon-chevron-down').addClass('glyphicon-chevron-up');
@@ -57,12 +49,12 @@ $(function () {
 
     /////// COLUMN CONFIG
     // show + hide columns
-    $('.mqc_table_col_visible').change(function(){
+    $(document).on('change', '.mqc_table_col_visible', function(){
       var target = $(this).data('target');
       mqc_table_col_updateVisible(target);
     });
     // Bulk set visible / hidden
-    $('.mqc_configModal_bulkVisible').click(function(e){
+    $(document).on('click', '.mqc_configModal_bulkVisible', function(e){
       e.preventDefault();
       var target = $(this).data('target');
       var visible = $(this).data('action') == 'showAll';
@@ -80,6 +72,10 @@ $(function () {
           $(target+'_configModal_table .'+cclass).addClass('text-muted');
         }
       });
+      if($(target).hasClass('mqc_vtable')){
+        mqc_vtable_update(target.replace(/^#/, ''));
+        return;
+      }
       // Hide empty rows
       $(target+' tbody tr').show();
       $(target+' tbody tr').each(function(){
@@ -98,20 +94,8 @@ $(function () {
       $(target+'_numcols').text( $(target+' thead th:visible').length - 1 );
     }
 
-    // Make rows in MultiQC tables sortable
-    $('.mqc_table.mqc_sortable tbody').sortable({
-      handle: '.sorthandle',
-      helper: function fixWidthHelper(e, ui) {
-        ui.children().each(function() { $(this).width($(this).width()); });
-        return ui;
-      }
-    });
-
     // Change order of columns
-    $('.mqc_configModal_table').on('sortstop', function(e, ui){
-      change_mqc_table_col_order( $(this) );
-    });
-    $('.mqc_configModal_table').bind('sortEnd',function() { 
+    $(document).on('sortstop sortEnd', '.mqc_configModal_table', function(e, ui){
       change_mqc_table_col_order( $(this) );
     });
 
@@ -137,9 +121,14 @@ $(function () {
     });
 
     // Sort MultiQC tables by highlight
-    $('.mqc_table_sortHighlight').click(function(e){
+    $(document).on('click', '.mqc_table_sortHighlight', function(e){
       e.preventDefault();
       var target = $(this).data('target');
+      if($(target).hasClass('mqc_vtable')){
+        mqc_vtable_sort_highlight(target.replace(/^#/, ''), $(this).data('direction'));
+        $(this).data('direction', $(this).data('direction') == 'desc' ? 'asc' : 'desc');
+        return;
+      }
       // collect highlighted rows
       var hrows = $(target+' tbody th.highlighted').parent().detach();
       hrows = hrows.sort(function (a, b) {
@@ -175,7 +164,7 @@ $(function () {
     $(document).on('mqc_hidesamples', function(e, f_texts, regex_mode){
 
       // Hide rows in MultiQC tables
-      $(".mqc_table tbody th").each(function(){
+      $(".mqc_table:not(.mqc_vtable) tbody th").each(function(){
         var match = false;
         var hfilter = $(this).text();
         $.each(f_texts, function(idx, f_text){
@@ -194,11 +183,12 @@ $(function () {
       });
       $('.mqc_table_numrows').each(function(){
         var tid = $(this).attr('id').replace('_numrows','');
+        if(mqc_vtables[tid] !== undefined){ return true; }
         $(this).text( $('#'+tid+' tbody tr:visible').length );
       });
 
       // Hide empty columns
-      $('.mqc_table').each(function(){
+      $('.mqc_table:not(.mqc_vtable)').each(function(){
         var table = $(this);
         var gsthidx = 0;
         table.find("thead th, tbody tr td").show();
@@ -219,17 +209,56 @@ $(function () {
       });
       $('.mqc_table_numcols').each(function(){
         var tid = $(this).attr('id').replace('_numcols','');
+        if(mqc_vtables[tid] !== undefined){ return true; }
         $(this).text( $('#'+tid+' thead th:visible').length - 1 );
       });
     });
 
+    // VIRTUAL TABLES
+
+    // Set up virtual tables once the plot data has been decompressed
+    $(document).on('mqc_plotdata_loaded', function(){
+      mqc_vtable_init(document);
+    });
+
+    // Sort when a column header is clicked
+    $(document).on('click', '.mqc_vtable thead th', function(){
+      var tid = $(this).closest('.mqc_vtable').attr('id');
+      if(mqc_vtables[tid] === undefined){ return; }
+      var rid = $(this).hasClass('rowheader') ? 'rowheader' : $(this).attr('id').replace(/^header_/, '');
+      var asc = mqc_vtables[tid]['sort_col'] == rid ? !mqc_vtables[tid]['sort_asc'] : false;
+      mqc_vtable_sort(tid, rid, asc);
+    });
+
+    // Toolbox filters
+    $(document).on('mqc_highlights', function(e, f_texts, f_cols, regex_mode){
+      $.each(mqc_vtables, function(tid, state){
+        if(mqc_vtable_highlight(state, f_texts, f_cols, regex_mode)){
+          $('.mqc_table_sortHighlight[data-target="#'+tid+'"]').show();
+        }
+        mqc_vtable_draw(tid, true);
+      });
+    });
+    $(document).on('mqc_renamesamples', function(e, f_texts, t_texts, regex_mode){
+      $.each(mqc_vtables, function(tid, state){
+        mqc_vtable_rename(state, f_texts, t_texts, regex_mode);
+        mqc_vtable_draw(tid, true);
+      });
+    });
+    $(document).on('mqc_hidesamples', function(e, f_texts, regex_mode){
+      $.each(mqc_vtables, function(tid, state){
+        mqc_vtable_hide(state, f_texts, regex_mode);
+        mqc_vtable_update(tid);
+      });
+    });
+
   } // End of check for table
 
   // Table Scatter Modal
   $('#tableScatterForm').submit(function(e){
     e.preventDefault();
   });
-  $('.mqc_table_makeScatter').click(function(e){
+  $(document).on('click', '.mqc_table_makeScatter', function(e){
     // Reset dropdowns
     if($('#tableScatter_tid').val() != $(this).data('table')){
       $('#tableScatter_col1, #tableScatter_col2').html('<option value="">Select Column</option>');
@@ -281,7 +310,21 @@ $(function () {
         },
         'datasets': [[]]
       };
-      $(tid+' tbody tr').each(function(e){
+      if(mqc_vtables[tid.replace(/^#/, '')] !== undefined){
+        var state = mqc_vtables[tid.replace(/^#/, '')];
+        var vals_1 = state['data']['columns'][state['col_idx'][col1]]['values'];
+        var vals_2 = state['data']['columns'][state['col_idx'][col2]]['values'];
+        $.each(state['rows'], function(idx, i){
+          if(vals_1[i] !== null && vals_2[i] !== null){
+            mqc_plots['tableScatterPlot']['datasets'][0].push({
+              'name': state['names'][i],
+              'x': vals_1[i],
+              'y': vals_2[i]
+            });
+          }
+        });
+      }
+      $(tid+':not(.mqc_vtable) tbody tr').each(function(e){
         var s_name = $(this).children('th.rowheader').text();
         var val_1 = $(this).children('td.'+col1).text().replace(/[^\d\.]/g,'');
         var val_2 = $(this).children('td.'+col2).text().replace(/[^\d\.]/g,'');
@@ -312,6 +355,33 @@ $(function () {
 
 });
 
+// Enable tablesorter, floating headers, tooltips and row sorting on MultiQC tables.
+// Called on page load and for report content that is added to the page later.
+function mqc_table_init(container){
+  var strip_non_numeric = function(node){
+    return node.innerText.replace(/[^\d.-]/g, '');
+  }
+  $(container).find('.mqc_table:not(.mqc_vtable)').tablesorter({sortInitialOrder: 'desc', textExtraction: strip_non_numeric});
+
+  // Make table headers fixed when table body scrolls (use CSS transforms)
+  // http://stackoverflow.com/a/25902860/713980
+  $(container).find('.mqc-table-responsive').scroll(function() {
+    $(this).find('thead').css('transform', "translate(0,"+$(this).scrollTop()+"px)");
+  });
+
+  // Table header-specific bootstrap tooltips
+  $(container).find('.mqc_table_tooltip').tooltip({ container: 'body' });
+
+  // Make rows in MultiQC tables sortable
+  $(container).find('.mqc_table.mqc_sortable tbody').sortable({
+    handle: '.sorthandle',
+    helper: function fixWidthHelper(e, ui) {
+      ui.children().each(function() { $(this).width($(this).width()); });
+      return ui;
+    }
+  });
+}
+
 // Reorder columns in MultiQC tables.
 // Note: Don't have to worry about floating headers, as 'Configure Columns'
 // button is only visible when this is hidden. Ace!
@@ -347,4 +417,301 @@ function change_mqc_table_col_order(table){
       }
     }
   });
+  if(mqc_vtables[target] !== undefined){
+    mqc_vtable_update(target);
+  }
+}
+
+////////////////////////////////////////////////
+// Virtual tables
+// Tables with lots of rows are built from the report plot data instead of
+// HTML. Only the rows scrolled into view are drawn. Sorting, filtering and
+// highlighting are done on the arrays, then the visible rows are drawn again.
+////////////////////////////////////////////////
+
+// State for each virtual table, keyed by table ID
+mqc_vtables = {};
+
+// Set up virtual tables in an element, if their data has been loaded
+function mqc_vtable_init(container){
+  $(container).find('.mqc_vtable').each(function(){
+    var tid = $(this).attr('id');
+    if(mqc_vtables[tid] !== undefined || mqc_plots[tid] === undefined){ return true; }
+    var data = mqc_plots[tid];
+    var state = {
+      'tid': tid,
+      'data': data,
+      'table': $(this),
+      'wrapper': $(this).closest('.mqc-table-responsive'),
+      'names': data['samples'].slice(),
+      'hl_idx': [],
+      'hl_col': [],
+      'hidden': [],
+      'order': [],
+      'rows': [],
+      'empty_cols': {},
+      'col_idx': {},
+      'sort_col': null,
+      'sort_asc': false,
+      'row_height': 30,
+      'drawn': null
+    };
+    for (var i = 0; i < data['samples'].length; i++){
+      state['hl_idx'].push(-1);
+      state['hl_col'].push('#333');
+      state['hidden'].push(false);
+      state['order'].push(i);
+    }
+    $.each(data['columns'], function(idx, col){
+      state['col_idx'][col['rid']] = idx;
+      col['dmin'] = parseFloat(col['dmin']);
+      col['dmax'] = parseFloat(col['dmax']);
+    });
+    mqc_vtables[tid] = state;
+
+    // Pick up any toolbox filters that were applied before this table was loaded
+    mqc_vtable_rename(state, window.mqc_rename_f_texts, window.mqc_rename_t_texts, window.mqc_rename_regex_mode);
+    mqc_vtable_highlight(state, window.mqc_highlight_f_texts, window.mqc_highlight_f_cols, window.mqc_highlight_regex_mode);
+    mqc_vtable_hide(state, window.mqc_hide_f_texts, window.mqc_hide_regex_mode);
+
+    // Draw rows when scrolled
+    var draw_queued = false;
+    state['wrapper'].on('scroll', function(){
+      if(draw_queued){ return; }
+      draw_queued = true;
+      window.requestAnimationFrame(function(){
+        draw_queued = false;
+        mqc_vtable_draw(tid);
+      });
+    });
+    mqc_vtable_update(tid);
+  });
+}
+
+// Visible columns, in the order of the table header
+function mqc_vtable_columns(state){
+  var cols = [];
+  state['table'].find('thead th').each(function(){
+    if($(this).hasClass('rowheader') || $(this).hasClass('hidden')){ return true; }
+    var idx = state['col_idx'][$(this).attr('id').replace(/^header_/, '')];
+    if(idx !== undefined && state['empty_cols'][idx] !== true){
+      cols.push(idx);
+    }
+  });
+  return cols;
+}
+
+// Filter and sort the rows, then redraw the table
+function mqc_vtable_update(tid){
+  var state = mqc_vtables[tid];
+  var cols = mqc_vtable_columns(state);
+  // Hide rows that are filtered out, or that don't have any visible values
+  state['rows'] = state['order'].filter(function(i){
+    if(state['hidden'][i]){ return false; }
+    for (var c = 0; c < cols.length; c++){
+      var text = state['data']['columns'][cols[c]]['text'][i];
+      if(text !== null && text !== ''){ return true; }
+    }
+    return false;
+  });
+  // Update counts
+  $('#'+tid+'_numrows').text( state['rows'].length );
+  $('#'+tid+'_numcols').text( state['table'].find('thead th:visible').length - 1 );
+  mqc_vtable_draw(tid, true);
+}
+
+// Draw the rows that are on screen, with a spacer row above and below to keep the scroll height
+function mqc_vtable_draw(tid, force){
+  var state = mqc_vtables[tid];
+  var rh = state['row_height'];
+  var buffer = 10;
+  var first = Math.max(0, Math.floor(state['wrapper'].scrollTop() / rh) - buffer);
+  var last = Math.min(state['rows'].length, first + Math.ceil(state['wrapper'].height() / rh) + (buffer * 2));
+  if(!force && state['drawn'] !== null && state['drawn'][0] == first && state['drawn'][1] == last){
+    return;
+  }
+  state['drawn'] = [first, last];
+  var cols = mqc_vtable_columns(state);
+  var colspan = cols.length + 1;
+  var html = [];
+  html.push('<tr class="mqc_vtable_spacer"><td colspan="'+colspan+'" style="height:'+(first * rh)+'px; padding:0; border:0;"></td></tr>');
+  for (var r = first; r < last; r++){
+    var i = state['rows'][r];
+    var hl = state['hl_idx'][i] >= 0 ? ' highlighted' : '';
+    html.push('<tr><th class="rowheader'+hl+'" data-original-sn="'+state['data']['samples'][i]+'" style="color:'+state['hl_col'][i]+';">'+state['names'][i]+'</th>');
+    for (var c = 0; c < cols.length; c++){
+      html.push(mqc_vtable_cell(state, cols[c], i));
+    }
+    html.push('</tr>');
+  }
+  html.push('<tr class="mqc_vtable_spacer"><td colspan="'+colspan+'" style="height:'+((state['rows'].length - last) * rh)+'px; padding:0; border:0;"></td></tr>');
+  state['table'].find('tbody').html(html.join(''));
+
+  // Measure the real row height once rows have been drawn
+  var row = state['table'].find('tbody tr:not(.mqc_vtable_spacer)').first();
+  if(row.length > 0 && Math.abs(row.outerHeight() - rh) > 1){
+    state['row_height'] = row.outerHeight();
+    mqc_vtable_draw(tid, true);
+  }
+}
+
+// Formatted value for one cell, with the report decimal point and thousands separator
+function mqc_vtable_text(state, col, i){
+  var text = col['text'][i];
+  if(text === null){ return null; }
+  text = text.replace(/\./g, 'DECIMAL').replace(/,/g, 'THOUSAND');
+  text = text.replace(/DECIMAL/g, state['data']['decimalPoint_format']).replace(/THOUSAND/g, state['data']['thousandsSep_format']);
+  return text + col['suffix'];
+}
+
+// HTML for one table cell
+function mqc_vtable_cell(state, c, i){
+  var col = state['data']['columns'][c];
+  var text = mqc_vtable_text(state, col, i);
+  if(text === null){
+    return '<td class="data-coloured '+col['rid']+'"></td>';
+  }
+  if(col['badges'] !== undefined && col['badges'][i] !== null){
+    text = '<span class="badge" style="background-color:'+col['badges'][i]+'">'+text+'</span>';
+  }
+  if(!col['scale']){
+    return '<td class="'+col['rid']+'">'+text+'</td>';
+  }
+  var percentage = 0;
+  var val = col['values'][i];
+  if(val !== null && col['dmax'] != col['dmin']){
+    percentage = Math.max(0, Math.min(100, ((val - col['dmin']) / (col['dmax'] - col['dmin'])) * 100));
+  }
+  var bgcol = '';
+  if(col['colours'] !== undefined && col['colours'][i]){
+    bgcol = ' background-color:'+col['colours'][i]+';';
+  }
+  return '<td class="data-coloured '+col['rid']+'"><div class="wrapper"><span class="bar" style="width:'+percentage+'%;'+bgcol+'"></span><span class="val">'+text+'</span></div></td>';
+}
+
+// Sort rows by a column. Missing values always go to the bottom.
+function mqc_vtable_sort(tid, rid, asc){
+  var state = mqc_vtables[tid];
+  var order = state['order'].slice().sort(function(a, b){ return a - b; });
+  if(rid == 'rowheader'){
+    order.sort(function(a, b){
+      var cmp = state['names'][a].localeCompare(state['names'][b]);
+      return (asc ? cmp : -cmp) || a - b;
+    });
+  } else {
+    var values = state['data']['columns'][state['col_idx'][rid]]['values'];
+    order.sort(function(a, b){
+      if(values[a] === null || values[b] === null){
+        return (values[a] === null) - (values[b] === null) || a - b;
+      }
+      return (asc ? values[a] - values[b] : values[b] - values[a]) || a - b;
+    });
+  }
+  state['order'] = order;
+  state['sort_col'] = rid;
+  state['sort_asc'] = asc;
+  state['table'].find('thead th').removeClass('headerSortUp headerSortDown');
+  var th = rid == 'rowheader' ? state['table'].find('thead th.rowheader') : $('#header_'+rid);
+  th.addClass(asc ? 'headerSortDown' : 'headerSortUp');
+  mqc_vtable_update(tid);
+}
+
+// Move highlighted rows to the top (desc) or bottom (asc) of the table
+function mqc_vtable_sort_highlight(tid, direction){
+  var state = mqc_vtables[tid];
+  var hrows = state['order'].filter(function(i){ return state['hl_idx'][i] >= 0; });
+  var others = state['order'].filter(function(i){ return state['hl_idx'][i] < 0; });
+  hrows.sort(function(a, b){ return state['hl_idx'][a] - state['hl_idx'][b]; });
+  if(direction == 'desc'){
+    state['order'] = hrows.reverse().concat(others);
+  } else {
+    state['order'] = others.concat(hrows);
+  }
+  state['table'].find('thead th').removeClass('headerSortUp headerSortDown');
+  mqc_vtable_update(tid);
+}
+
+// Apply the toolbox sample renaming to the displayed names
+function mqc_vtable_rename(state, f_texts, t_texts, regex_mode){
+  state['names'] = state['data']['samples'].map(function(s_name){
+    $.each(f_texts, function(idx, f_text){
+      if(regex_mode){
+        var re = new RegExp(f_text,"g");
+        s_name = s_name.replace(re, t_texts[idx]);
+      } else {
+        s_name = s_name.replace(f_text, t_texts[idx]);
+      }
+    });
+    return s_name;
+  });
+}
+
+// Apply the toolbox highlights. Returns true if any samples were highlighted.
+function mqc_vtable_highlight(state, f_texts, f_cols, regex_mode){
+  var any_highlighted = false;
+  $.each(state['names'], function(i, s_name){
+    state['hl_idx'][i] = -1;
+    state['hl_col'][i] = '#333';
+    $.each(f_texts, function(idx, f_text){
+      if((regex_mode && s_name.match(f_text)) || (!regex_mode && s_name.indexOf(f_text) > -1)){
+        state['hl_idx'][i] = idx;
+        state['hl_col'][i] = f_cols[idx];
+        any_highlighted = true;
+      }
+    });
+  });
+  return any_highlighted;
+}
+
+// Apply the toolbox hidden samples, then hide columns that have no values left
+function mqc_vtable_hide(state, f_texts, regex_mode){
+  $.each(state['names'], function(i, s_name){
+    var match = false;
+    $.each(f_texts, function(idx, f_text){
+      if((regex_mode && s_name.match(f_text)) || (!regex_mode && s_name.indexOf(f_text) > -1)){
+        match = true;
+      }
+    });
+    if(window.mqc_hide_mode == 'show'){
+      match = !match;
+    }
+    state['hidden'][i] = match;
+  });
+  state['empty_cols'] = {};
+  $.each(state['data']['columns'], function(c, col){
+    var th = $('#header_'+col['rid']);
+    th.show();
+    var count = 0;
+    var empties = 0;
+    for (var i = 0; i < col['text'].length; i++){
+      if(state['hidden'][i]){ continue; }
+      count += 1;
+      if(col['text'][i] === null || col['text'][i] === ''){ empties += 1; }
+    }
+    if(count > 0 && count == empties){
+      state['empty_cols'][c] = true;
+      th.hide();
+    }
+  });
+}
+
+// Tab-separated text of the visible table, for copying to the clipboard
+function mqc_vtable_tsv(tid){
+  var state = mqc_vtables[tid];
+  var cols = mqc_vtable_columns(state);
+  var lines = [];
+  var header = [state['table'].find('thead th.rowheader').text()];
+  $.each(cols, function(idx, c){
+    header.push($('#header_'+state['data']['columns'][c]['rid']).text());
+  });
+  lines.push(header.join('\t'));
+  $.each(state['rows'], function(idx, i){
+    var line = [state['names'][i]];
+    $.each(cols, function(cidx, c){
+      var text = mqc_vtable_text(state, state['data']['columns'][c], i);
+      line.push(text === null ? '' : text.replace(/<[^>]*>/g, ''));
+    });
+    lines.push(line.join('\t'));
+  });
+  return lines.join('\n');
 }
@@ -271,15 +271,17 @@ $(function () {
                 datastring += sep+mqc_plots[target]['categories'][j]['description'];
               }
               datastring += "\n";
-              // This assumes that the same samples are in all rows
-              // TODO: Check and throw error if this isn't the case
+              // One row per sample, blank where a sample has no value for a category
               var rows = Array();
-              for(var j=0; j<mqc_plots[target]['samples'][0].length; j++){
-                rows[j]=Array(mqc_plots[target]['samples'][0][j]);
+              for(var j=0; j<mqc_plots[target]['samples'].length; j++){
+                rows[j]=Array(mqc_plots[target]['samples'][j]);
+                for(var k=0; k<mqc_plots[target]['datasets'].length; k++){
+                  rows[j].push('');
+                }
               }
               for(var j=0; j<mqc_plots[target]['datasets'].length; j++){
                 for(var k=0; k<mqc_plots[target]['datasets'][j].length; k++){
-                  rows[k].push(mqc_plots[target]['datasets'][j][k]);
+                  rows[mqc_plots[target]['sample_idx'][j][k]][j+1] = mqc_plots[target]['datasets'][j][k];
                 }
               }
               for(var j=0; j<rows.length; j++){
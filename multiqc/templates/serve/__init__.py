@@ -0,0 +1,19 @@
+"""
+=======
+ serve
+=======
+
+Template used by `multiqc serve`. The page only contains the report
+shell - the navigation, toolbox and General Statistics table. Module
+sections and plot data are fetched from the MultiQC server when they
+are scrolled into view, so that very large reports open quickly.
+
+This template only works when the report is viewed through the server.
+
+"""
+import os
+
+template_parent = 'default'
+
+template_dir = os.path.dirname(__file__)
+base_fn = 'base.html'
@@ -0,0 +1,119 @@
+////////////////////////////////////////////////
+// MultiQC Serve Javascript Code
+// Loads report sections and plot data from the
+// MultiQC server as they are scrolled into view
+////////////////////////////////////////////////
+
+// Plots that are being fetched, with functions to call when they arrive
+mqc_serve_plot_callbacks = {};
+
+// Execute when page load has finished loading
+$(function () {
+
+  // Plots in the report shell (eg. General Statistics)
+  mqc_serve_render_plots(document);
+
+  // Load sections when they get close to the screen
+  var scroll_timer;
+  $(window).on('scroll resize', function(){
+    clearTimeout(scroll_timer);
+    scroll_timer = setTimeout(mqc_serve_load_visible, 100);
+  });
+  mqc_serve_load_visible();
+
+  // Plots hidden behind a 'Show plot' button need their data first
+  $('body').on('click', '.render_plot', function(e){
+    var target = $(this).parent().attr('id');
+    if(mqc_plots[target] === undefined){
+      mqc_serve_load_plot(target, function(){ plot_graph(target); });
+    }
+  });
+
+  // Ask the server to look for new and changed files
+  $('#mqc-serve-refresh').click(function(e){
+    e.preventDefault();
+    var btn = $(this);
+    btn.prop('disabled', true);
+    $.post('api/refresh', function(data){
+      if(data['changed']){
+        location.reload();
+      } else {
+        btn.prop('disabled', false);
+        btn.closest('.mqc-serve-status').find('.mqc-serve-message').remove();
+        btn.after('<span class="mqc-serve-message pull-right text-muted" style="margin-right:10px;">No changes found</span>');
+      }
+    }, 'json').fail(function(){
+      btn.prop('disabled', false);
+      alert('Could not refresh the report - is MultiQC still running?');
+    });
+  });
+
+});
+
+// Load all sections that are on or near the screen
+function mqc_serve_load_visible(){
+  var margin = $(window).height();
+  var top = $(window).scrollTop() - margin;
+  var bottom = $(window).scrollTop() + $(window).height() + margin;
+  $('.mqc-serve-section.not_loaded').each(function(){
+    var offset = $(this).offset().top;
+    if(offset < bottom && offset + $(this).outerHeight() > top){
+      mqc_serve_load_section($(this));
+    }
+  });
+}
+
+// Fetch the HTML for one section and add it to the page
+function mqc_serve_load_section(wrapper){
+  wrapper.removeClass('not_loaded');
+  var url = 'api/section/'+wrapper.data('module')+'/'+wrapper.data('section');
+  $.getJSON(url, function(data){
+    wrapper.html(data['html']).css('min-height', '');
+    mqc_plot_handles(wrapper);
+    mqc_table_init(wrapper);
+    wrapper.find('[data-toggle="tooltip"]').tooltip();
+    mqc_serve_render_plots(wrapper);
+  }).fail(function(){
+    wrapper.addClass('not_loaded').find('p.text-muted small').text('Could not load section - is MultiQC still running?');
+  });
+}
+
+// Fetch the data for all plots in an element and draw them
+function mqc_serve_render_plots(container){
+  $(container).find('.mqc_vtable').each(function(){
+    var tid = $(this).attr('id');
+    mqc_serve_load_plot(tid, function(){ mqc_vtable_init($('#'+tid+'_container')); });
+  });
+  $(container).find('.hc-plot.not_rendered:not(.gt_max_num_ds)').each(function(){
+    var target = $(this).attr('id');
+    if(target == 'tableScatterPlot'){ return true; }
+    mqc_serve_load_plot(target, function(){
+      // Only one point per dataset, so multiply limit by arbitrary number.
+      plot_graph(target, undefined, num_datasets_plot_limit * 50);
+      if($('.hc-plot.not_rendered:visible:not(.gt_max_num_ds)').length == 0){
+        $('.mqc_loading_warning').hide();
+      }
+    });
+  });
+}
+
+// Fetch the data for one plot, then call callback
+function mqc_serve_load_plot(target, callback){
+  if(mqc_plots[target] !== undefined){
+    callback();
+    return;
+  }
+  if(mqc_serve_plot_callbacks[target] !== undefined){
+    mqc_serve_plot_callbacks[target].push(callback);
+    return;
+  }
+  mqc_serve_plot_callbacks[target] = [callback];
+  $.getJSON('api/plot/'+target, function(data){
+    mqc_plots[target] = data;
+    $.each(mqc_serve_plot_callbacks[target], function(idx, f){ f(); });
+    delete mqc_serve_plot_callbacks[target];
+  }).fail(function(){
+    delete mqc_serve_plot_callbacks[target];
+    $('#'+target).html('<small>Could not load plot data</small>');
+  });
+}
@@ -7,7 +7,9 @@ from __future__ import print_function
 from datetime import datetime
 import inspect
 import collections
+import copy
 import os
+import pickle
 import pkg_resources
 import subprocess
 import sys
@@ -206,6 +208,36 @@ def load_sample_names(snames_file):
         logger.error("Error loading sample names file: {}".format(e))
     logger.debug("Found {} sample renaming patterns".format(len(sample_names_rename_buttons)))
 
+def reset():
+    """ Reset all config variables back to their defaults, discarding
+    anything set by config files, the command line or a previous run """
+    g = globals()
+    for k in [k for k in g if _is_config_var(k, g[k]) and k not in _defaults]:
+        del g[k]
+    for k, v in _defaults.items():
+        g[k] = copy.deepcopy(v)
+    g['creation_date'] = datetime.now().strftime("%Y-%m-%d, %H:%M")
+    g['working_dir'] = os.getcwd()
+    g['output_dir'] = os.path.realpath(os.getcwd())
+
+def snapshot():
+    """ The current config variables, for restore() in another process.
+    Values that can't be pickled are left out. """
+    snap = dict()
+    g = globals()
+    for k in [k for k in g if _is_config_var(k, g[k])]:
+        try:
+            pickle.dumps(g[k])
+        except Exception:
+            continue
+        snap[k] = g[k]
+    return snap
+
+def restore(snap):
+    """ Set config variables from a snapshot(), eg. in a worker process that
+    was started with only the default config """
+    globals().update(snap)
+
 def update(u):
     return update_dict(globals(), u)
 
@@ -218,3 +250,11 @@ def update_dict(d, u):
         else:
             d[key] = u[key]
     return d
+
+def _is_config_var(k, v):
+    """ Whether a module global is a config variable, not a function, import or constant """
+    return not (k.startswith('_') or k.isupper() or callable(v) or inspect.ismodule(v) or
+        k in ['print_function', 'logger', 'avail_modules', 'avail_templates', 'configs', 'c', 'v', 'f', 'entry_point', 'nicename'])
+
+# Snapshot of the default config, restored by reset()
+_defaults = { k: copy.deepcopy(v) for k, v in globals().items() if _is_config_var(k, v) }
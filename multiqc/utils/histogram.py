@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+""" Summary statistics for histograms of counts per value, such as coverage
+depth or insert size histograms, worked out with NumPy """
+
+import numpy as np
+
+class Histogram(object):
+    """ A histogram as two NumPy arrays, of values in increasing order and the
+    count for each value. Values that are given more than once are summed. """
+
+    def __init__(self, values, counts):
+        """
+        :param values: List or array of values (eg. depth, insert size)
+        :param counts: List or array of the count for each value
+        """
+        values = np.asarray(values)
+        counts = np.asarray(counts, dtype=float)
+        order = np.argsort(values, kind='mergesort')
+        values = values[order]
+        counts = counts[order]
+        if len(values) > 1 and np.any(values[1:] == values[:-1]):
+            values, idx = np.unique(values, return_inverse=True)
+            counts = np.bincount(idx, weights=counts)
+        self.values = values
+        self.counts = counts
+        # Cumulative counts from the lowest value, and from the highest value
+        self.cumulative = np.cumsum(counts)
+        self.cumulative_from_top = np.cumsum(counts[::-1])[::-1]
+
+    @classmethod
+    def from_dict(cls, data, count_idx=None):
+        """ Make a histogram from a dict of value: count
+        :param data: Dict of value: count
+        :param count_idx: Index of the count, if the dict values are lists
+        :return: Histogram
+        """
+        values = list(data.keys())
+        if count_idx is None:
+            counts = list(data.values())
+        else:
+            counts = [ c[count_idx] for c in data.values() ]
+        return cls(values, counts)
+
+    @classmethod
+    def pooled(cls, histograms):
+        """ Make one histogram with the counts from several histograms
+        :param histograms: List of Histogram objects
+        :return: Histogram
+        """
+        if len(histograms) == 0:
+            return cls([], [])
+        return cls(np.concatenate([ h.values for h in histograms ]),
+                   np.concatenate([ h.counts for h in histograms ]))
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def total(self):
+        """ Sum of the counts """
+        return self.cumulative[-1].item() if len(self.cumulative) > 0 else 0
+
+    def mean(self):
+        """ Mean value, weighted by count. None if there are no counts. """
+        if self.total == 0:
+            return None
+        return (np.sum(self.values * self.counts) / self.total).item()
+
+    def quantile(self, fraction, inclusive=True):
+        """ First value where the cumulative count reaches a fraction of the total
+        :param fraction: Fraction of the total count, from 0 to 1
+        :param inclusive: If False, the cumulative count must go past the fraction
+        :return: Value, or None if there are no counts
+        """
+        if self.total == 0:
+            return None
+        idx = np.searchsorted(self.cumulative, self.total * fraction, side='left' if inclusive else 'right')
+        return self.values[min(idx, len(self.values) - 1)].item()
+
+    def median(self, inclusive=True):
+        """ Median value. See quantile() for the options. """
+        return self.quantile(0.5, inclusive)
+
+    def percentiles(self, percents, inclusive=True):
+        """ Values for a list of percentiles. See quantile() for the options.
+        :param percents: List of percentiles, from 0 to 100
+        :return: List of values
+        """
+        if self.total == 0:
+            return [ None for p in percents ]
+        targets = self.total * np.asarray(percents, dtype=float) / 100.0
+        idx = np.searchsorted(self.cumulative, targets, side='left' if inclusive else 'right')
+        return self.values[np.minimum(idx, len(self.values) - 1)].tolist()
+
+    def nx(self, x=50):
+        """ N50-style statistic - the value where the values at or above it
+        make up x percent of the sum of all values (value times count)
+        :param x: Percentage, eg. 50 for N50
+        :return: Value, or None if there are no counts
+        """
+        weighted = np.cumsum((self.values * self.counts)[::-1])
+        if len(weighted) == 0 or weighted[-1] == 0:
+            return None
+        idx = np.searchsorted(weighted, weighted[-1] * x / 100.0, side='left')
+        return self.values[::-1][idx].item()
+
+    def count_at_least(self, thresholds):
+        """ Counts for values greater than or equal to each of a list of thresholds
+        :param thresholds: List of thresholds
+        :return: NumPy array of counts
+        """
+        idx = np.searchsorted(self.values, np.asarray(thresholds), side='left')
+        return np.append(self.cumulative_from_top, 0)[idx]
+
+    def fraction_at_least(self, thresholds):
+        """ Fraction of the total count for values greater than or equal to each
+        of a list of thresholds, from 0 to 1. None if there are no counts.
+        :param thresholds: List of thresholds
+        :return: NumPy array of fractions
+        """
+        if self.total == 0:
+            return None
+        return self.count_at_least(thresholds) / self.total
+
+    def percent_at_least(self, thresholds):
+        """ As fraction_at_least(), but as percentages """
+        if self.total == 0:
+            return None
+        return 100.0 * self.count_at_least(thresholds) / self.total
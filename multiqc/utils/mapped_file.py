@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+""" Read-only memory-mapped log files, as returned by
+BaseMultiqcModule.find_log_files(sp_key, filemap=True) """
+
+import codecs
+import io
+import mmap
+import os
+import re
+
+class MappedFile(object):
+    """ A log file mapped into memory. Lines and regex matches are read from
+    the mapped buffer as they are needed, so the whole file is never held as
+    one string. Keeps a note of how far into the file has been read. """
+
+    # Lines are split from blocks of this many bytes at a time
+    block_size = 1024 * 1024
+
+    def __init__(self, path):
+        """
+        :param path: Path to the file
+        """
+        self.path = path
+        self.bytes_read = 0
+        with io.open(path, 'rb') as fh:
+            self.size = os.fstat(fh.fileno()).st_size
+            # Empty files can't be mapped
+            if self.size > 0:
+                self.buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.buf = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    def _read_to(self, pos):
+        self.bytes_read = max(self.bytes_read, min(pos, self.size))
+
+    def lines(self, encoding='utf-8'):
+        """ Iterate over the lines of the file, without line endings.
+        Stopping early means that the rest of the file is never read.
+        :param encoding: Decode lines with this encoding. None to return bytes.
+        :return: Yields one string (or bytes) per line
+        :raises UnicodeDecodeError: When a line that isn't valid text is reached
+        """
+        nl, cr, tail = b'\n', b'\r', b''
+        decoder = None
+        if encoding is not None:
+            nl, cr, tail = u'\n', u'\r', u''
+            decoder = codecs.getincrementaldecoder(encoding)()
+        pos = 0
+        while pos < self.size:
+            block = self.buf[pos:pos + self.block_size]
+            pos += len(block)
+            self._read_to(pos)
+            if decoder is not None:
+                block = decoder.decode(block, final=(pos >= self.size))
+            lines = (tail + block).split(nl)
+            tail = lines.pop()
+            for line in lines:
+                yield line[:-1] if line.endswith(cr) else line
+        if len(tail) > 0:
+            yield tail[:-1] if tail.endswith(cr) else tail
+
+    def finditer(self, pattern, flags=0):
+        """ Iterate over regex matches in the mapped file, without copying it.
+        Matches are bytes, so string patterns are encoded as UTF-8.
+        :param pattern: Regex pattern (string, bytes or compiled bytes pattern)
+        :param flags: Regex flags, if pattern is not compiled
+        :return: Yields match objects
+        """
+        for m in _bytes_pattern(pattern, flags).finditer(self.buf):
+            self._read_to(m.end())
+            yield m
+        self._read_to(self.size)
+
+    def search(self, pattern, flags=0):
+        """ First regex match in the mapped file, or None
+        :param pattern: Regex pattern (string, bytes or compiled bytes pattern)
+        :param flags: Regex flags, if pattern is not compiled
+        :return: Match object or None
+        """
+        m = _bytes_pattern(pattern, flags).search(self.buf)
+        self._read_to(self.size if m is None else m.end())
+        return m
+
+
+def _bytes_pattern(pattern, flags):
+    """ Compiled regex for searching bytes """
+    if hasattr(pattern, 'finditer'):
+        return pattern
+    if not isinstance(pattern, bytes):
+        pattern = pattern.encode('utf-8')
+    return re.compile(pattern, flags)
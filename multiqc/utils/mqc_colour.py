@@ -20,6 +20,8 @@ class mqc_colour_scale(object):
 		""" Initialise class with a colour scale """
 
 		self.colours = self.get_colours(name)
+		self.scale = None
+		self.colour_cache = dict()
 
 		# Sanity checks
 		minval = re.sub("[^0-9\.]", "", str(minval))
@@ -49,14 +51,20 @@ class mqc_colour_scale(object):
 			val = max(val, self.minval)
 			val = min(val, self.maxval)
 
-			domain_nums = list( np.linspace(self.minval, self.maxval, len(self.colours)) )
-			my_scale = spectra.scale(self.colours).domain(domain_nums)
+			# Tables use the same scale for every cell in a column, and repeat values a lot
+			if val in self.colour_cache:
+				return self.colour_cache[val]
+
+			if self.scale is None:
+				domain_nums = list( np.linspace(self.minval, self.maxval, len(self.colours)) )
+				self.scale = spectra.scale(self.colours).domain(domain_nums)
 
 			# Weird, I know. I ported this from the original JavaScript for continuity
 			# Seems to work better than adjusting brightness / saturation / luminosity
 			rgb_converter = lambda x: max(0, min(1, 1+((x-1)*0.3)))
-			thecolour = spectra.rgb( *[rgb_converter(v) for v in my_scale(val).rgb] )
+			thecolour = spectra.rgb( *[rgb_converter(v) for v in self.scale(val).rgb] )
 
+			self.colour_cache[val] = thecolour.hexcode
 			return thecolour.hexcode
 
 		except:
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+""" Bulk parsing of tab-separated tables of numbers into NumPy arrays,
+for tool outputs with many rows and columns """
+
+import numpy as np
+import warnings
+
+def load_numeric_table(lines, lead_cols=0, trail_cols=0, dtype=float):
+    """ Parse lines of tab-separated numbers into a 2D NumPy array. All of the
+    numbers are parsed at once, instead of splitting lines and converting one
+    cell at a time. Text columns at the start or end of each line (eg. sample
+    names) are split off and returned separately. Trailing whitespace is ignored.
+    :param lines: List of lines, without any header lines
+    :param lead_cols: Number of text columns at the start of each line
+    :param trail_cols: Number of text columns at the end of each line
+    :param dtype: NumPy dtype for the numbers
+    :return: 2D array with a row for each line, a list of the lead columns for
+             each line and a list of the trail columns for each line
+    :raises ValueError: If a value isn't a number, or lines have different numbers of columns
+    """
+    lead = []
+    trail = []
+    if lead_cols > 0 or trail_cols > 0:
+        numbers = []
+        for line in lines:
+            line = line.rstrip()
+            if lead_cols > 0:
+                cols = line.split('\t', lead_cols)
+                if len(cols) <= lead_cols:
+                    raise ValueError("Expected more than {} columns: '{}'".format(lead_cols, line))
+                lead.append(cols[:lead_cols])
+                line = cols[lead_cols]
+            if trail_cols > 0:
+                cols = line.rsplit('\t', trail_cols)
+                if len(cols) <= trail_cols:
+                    raise ValueError("Expected more than {} columns: '{}'".format(trail_cols, line))
+                trail.append(cols[1:])
+                line = cols[0]
+            numbers.append(line)
+        lines = numbers
+
+    if len(lines) == 0:
+        return np.empty((0, 0), dtype=dtype), lead, trail
+
+    # Rows with different numbers of columns would otherwise be shifted into each other
+    ncols = lines[0].rstrip().count('\t') + 1
+    for i, line in enumerate(lines):
+        if line.rstrip().count('\t') + 1 != ncols:
+            raise ValueError("Expected {} columns of numbers, but line {} has {}".format(ncols, i + 1, line.rstrip().count('\t') + 1))
+
+    # NumPy warns and returns the numbers read so far if it finds something
+    # that isn't a number, so check that everything was read
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        values = np.fromstring('\n'.join(lines), dtype=dtype, sep='\t')
+    if values.size != len(lines) * ncols:
+        raise ValueError("Expected {} rows of {} numbers, but could only read {} numbers".format(len(lines), ncols, values.size))
+    return values.reshape(len(lines), ncols), lead, trail
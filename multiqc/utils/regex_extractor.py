@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+""" Single-pass extraction of key / value metrics from tool logs,
+as used by BaseMultiqcModule.extract_values() """
+
+import re
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    # Python < 3.11
+    import sre_parse
+
+class RegexExtractor(object):
+    """ A dict of metric regexes, compiled into one alternation. Each regex
+    should capture the value in its first group (or the whole match is used).
+    Regexes must not use named groups or backreferences.
+
+    Searching finds the first match of every regex in a single pass over the
+    text, instead of scanning the text once for every key. The results are the
+    same as calling re.search() for each key, as long as one key's match doesn't
+    start part way through the match for another key. Regexes that can match at
+    the same place (eg. a count and a percentage from the same line) are all
+    checked wherever one of them matches. """
+
+    def __init__(self, regexes, value_type=float, flags=re.MULTILINE):
+        """
+        :param regexes: Dict of metric key: regex string
+        :param value_type: Function to convert values, after commas are removed.
+                           Values that can't be converted are kept as strings.
+                           None to keep all values as strings.
+        :param flags: Regex flags
+        """
+        self.keys = list(regexes.keys())
+        self.value_type = value_type
+        compiled = [ re.compile(regexes[k], flags) for k in self.keys ]
+
+        # Alternatives are non-capturing so that re can still skip quickly
+        # through the text to the first characters of the regexes
+        self.pattern = re.compile('|'.join([ '(?:{})'.format(regexes[k]) for k in self.keys ]), flags)
+
+        # Which key each group belongs to, and the group with each key's value
+        self.group_keys = [None]
+        self.value_groups = dict()
+        for k, c in zip(self.keys, compiled):
+            self.value_groups[k] = len(self.group_keys) if c.groups > 0 else 0
+            self.group_keys.extend([k] * c.groups)
+
+        # Other regexes that could match at the same place as each key.
+        # Matches start with the literal text at the start of the regex, if any.
+        prefixes = [ _literal_prefix(regexes[k], flags) for k in self.keys ]
+        self.same_start = dict()
+        for k, prefix in zip(self.keys, prefixes):
+            self.same_start[k] = [ (j, c) for j, c, p in zip(self.keys, compiled, prefixes)
+                if j != k and (p.startswith(prefix) or prefix.startswith(p)) ]
+        self.compiled = dict(zip(self.keys, compiled))
+
+    def search(self, text, pos=0, endpos=None):
+        """ Find the first value for each key in some text.
+        Stops as soon as every key has been found.
+        :param text: String to search
+        :param pos: Start searching from this position
+        :param endpos: Stop searching at this position
+        :return: Dict of key: value, in the order of the regexes dict
+        """
+        if endpos is None:
+            endpos = len(text)
+        found = dict()
+        num_keys = len(self.keys)
+        for m in self.pattern.finditer(text, pos, endpos):
+            k = self.group_keys[m.lastindex] if m.lastindex is not None else self.match_key(text, m)
+            if k not in found:
+                found[k] = m.group(self.value_groups[k])
+            for j, c in self.same_start[k]:
+                if j not in found:
+                    jm = c.match(text, m.start(), endpos)
+                    if jm is not None:
+                        found[j] = jm.group(1 if c.groups > 0 else 0)
+            if len(found) == num_keys:
+                break
+        return { k: self.convert(found[k]) for k in self.keys if k in found }
+
+    def match_key(self, text, m):
+        """ Key for a match that has no groups - the first regex that
+        matches at the same place, as chosen by the alternation """
+        for k in self.keys:
+            if self.compiled[k].match(text, m.start()) is not None:
+                return k
+
+    def convert(self, value):
+        """ Convert a value with value_type, ignoring commas """
+        if value is None or self.value_type is None:
+            return value
+        try:
+            return self.value_type(value.replace(',', ''))
+        except ValueError:
+            return value
+
+def _literal_prefix(regex, flags):
+    """ Literal text that every match of a regex starts with. Empty if
+    it starts with anything else, or if case is ignored. """
+    if flags & re.IGNORECASE:
+        return ''
+    prefix = []
+    for op, arg in sre_parse.parse(regex, flags):
+        if op != sre_parse.LITERAL:
+            break
+        prefix.append(chr(arg))
+    return ''.join(prefix)
+
+# Compiled extractors, so that regex dicts made in parsing functions are only compiled once
+_extractors = dict()
+
+def get_extractor(regexes, value_type=float, flags=re.MULTILINE):
+    """ Compiled RegexExtractor for a dict of regexes, made once and then reused
+    :param regexes: Dict of metric key: regex string
+    :param value_type: Function to convert values. None to keep strings.
+    :param flags: Regex flags
+    :return: RegexExtractor
+    """
+    cache_key = (tuple(regexes.items()), value_type, flags)
+    if cache_key not in _extractors:
+        _extractors[cache_key] = RegexExtractor(regexes, value_type, flags)
+    return _extractors[cache_key]
@@ -7,6 +7,7 @@ helper functions to generate markup for report. """
 from __future__ import print_function
 from collections import defaultdict, OrderedDict
 import click
+import copy
 import fnmatch
 import io
 import json
@@ -15,6 +16,7 @@ import lzstring
 import mimetypes
 import os
 import re
+import stat
 import yaml
 
 from multiqc import config
@@ -29,26 +31,141 @@ try:
 except NameError:
     pass # Python 3
 
+class FoundFile(object):
+    """ A file found in the analysis directories. Values can also be read
+    with dict syntax (eg. f['fn']), as used by search patterns and modules. """
+
+    __slots__ = ['fn', 'root', 'path', 'abspath', 'filesize', 'mtime', 's_name']
+
+    def __init__(self, fn, root):
+        """
+        :param fn: File name
+        :param root: Directory, as found when walking the analysis directories
+        """
+        self.fn = fn
+        self.root = root
+        self.path = os.path.join(root, fn)
+        self.abspath = os.path.abspath(self.path)
+        self.filesize = None
+        self.mtime = None
+        self.s_name = None
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return getattr(self, key, None) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def as_dict(self):
+        """ New dict with the file name, directory, size, modification time and sample name """
+        return {'fn': self.fn, 'root': self.root, 'filesize': self.filesize, 'mtime': self.mtime, 's_name': self.s_name}
+
+
+class FileIndex(object):
+    """ Index of the files found while searching the analysis directories.
+    Matched files can be looked up by search pattern key, directory, file name
+    or sample name, without going through the list of all files again. """
+
+    def __init__(self):
+        self.files = dict()               # Search pattern key: list of matched files
+        self.by_path = OrderedDict()      # Every file that was searched
+        self.by_dir = defaultdict(list)
+        self.by_fn = defaultdict(list)
+        self.by_s_name = defaultdict(list)
+
+    def add(self, f):
+        """ Add a file that is being searched """
+        self.by_path[f.path] = f
+        self.by_dir[f.root].append(f)
+        self.by_fn[f.fn].append(f)
+
+    def add_match(self, key, f):
+        """ Record that a file matched the search pattern key """
+        self._add_sample(f)
+        self.files[key].append(f)
+
+    def _add_sample(self, f):
+        """ Give a matched file its cleaned sample name, the first time it matches """
+        if f.s_name is None:
+            f.s_name = clean_s_name(f.fn, f.root)
+            self.by_s_name[f.s_name].append(f)
+
+    def in_dir(self, root):
+        """ Files searched in a directory """
+        return self.by_dir.get(root, [])
+
+    def with_fn(self, fn):
+        """ Files searched with this file name, in any directory """
+        return self.by_fn.get(fn, [])
+
+    def for_sample(self, s_name):
+        """ Matched files with this cleaned sample name """
+        return self.by_s_name.get(s_name, [])
+
+    def search(self, pattern):
+        """ Files that match a search pattern dict, as used by old-style
+        find_log_files() calls. File names without wildcards are looked up directly.
+        :param pattern: Search pattern dict
+        :return: List of matching files
+        """
+        candidates = self.by_path.values()
+        fn = pattern.get('fn')
+        if fn is not None and pattern.get('fn_re') is None and not any(c in fn for c in '*?['):
+            candidates = self.with_fn(fn)
+        matches = list()
+        for f in candidates:
+            if search_file(pattern, f):
+                self._add_sample(f)
+                matches.append(f)
+        return matches
+
+
 # Set up global variables shared across modules
-general_stats_data = list()
-general_stats_headers = list()
-general_stats_html = ''
-data_sources = defaultdict(lambda:defaultdict(lambda:defaultdict()))
-plot_data = dict()
-html_ids = list()
-lint_errors = list()
-num_hc_plots = 0
-num_mpl_plots = 0
-saved_raw_data = dict()
-last_found_file = None
-
-# Make a dict of discovered files for each seach key
-searchfiles = list()
-files = dict()
-def get_filelist(run_module_names):
+# Inside a function so that they can be reset if MultiQC is run more than once
+def init():
+    global general_stats_data, general_stats_headers, general_stats_html, data_sources, plot_data, \
+        html_ids, lint_errors, num_hc_plots, num_mpl_plots, saved_raw_data, last_found_file, \
+        modules_output, plot_compressed_json, multiqc_command, searchfiles, files, file_index, bytes_read
+    general_stats_data = list()
+    general_stats_headers = list()
+    general_stats_html = ''
+    data_sources = defaultdict(lambda:defaultdict(lambda:defaultdict()))
+    plot_data = dict()
+    html_ids = list()
+    lint_errors = list()
+    num_hc_plots = 0
+    num_mpl_plots = 0
+    saved_raw_data = dict()
+    last_found_file = None
+    modules_output = list()
+    plot_compressed_json = ''
+    multiqc_command = ''
+
+    # Number of bytes read from log files by each module
+    bytes_read = defaultdict(int)
+
+    # Make a dict of discovered files for each seach key
+    searchfiles = list()
+    file_index = FileIndex()
+    files = file_index.files
+
+init()
+
+def get_filelist(run_module_names, discovery_cache=None):
     """
     Go through all supplied search directories and assembly a master
     list of files to search. Then fire search functions for each file.
+    :param run_module_names: List of module names to search for
+    :param discovery_cache: Optional dict kept between runs. Search results are
+                            saved here and reused for files with the same size
+                            and modification time, instead of searching them again.
     """
     # Prep search patterns
     spatterns = [{},{},{},{},{},{},{}]
@@ -72,6 +189,7 @@ def get_filelist(run_module_names):
             'num_lines',
             'shared',
             'max_filesize',
+            'large_files',
             'exclude_fn',
             'exclude_fn_re',
             'exclude_contents',
@@ -80,6 +198,9 @@ def get_filelist(run_module_names):
         unrecognised_keys = [y for x in sps for y in x.keys() if y not in expected_sp_keys]
         if len(unrecognised_keys) > 0:
             logger.warn("Unrecognised search pattern keys for '{}': {}".format(key, ', '.join(unrecognised_keys)))
+        bad_policies = [x['large_files'] for x in sps if x.get('large_files', LARGE_FILE_POLICIES[0]) not in LARGE_FILE_POLICIES]
+        if len(bad_policies) > 0:
+            logger.warn("Unrecognised large_files policy for '{}': {}".format(key, ', '.join(bad_policies)))
 
         # Split search patterns according to speed of execution.
         if any([x for x in sps if 'contents_re' in x]):
@@ -102,16 +223,25 @@ def get_filelist(run_module_names):
     if len(ignored_patterns) > 0:
         logger.debug("Ignored {} search patterns as didn't match running modules.".format(len(ignored_patterns)))
 
+    # Files larger than log_filesize_limit are only searched for patterns with a large_files policy
+    large_spatterns = [ {k: sps for k, sps in patterns.items() if large_files_policy(sps) is not None}
+                        for patterns in spatterns ]
+    search_large_files = any(len(patterns) > 0 for patterns in large_spatterns)
+
     def add_file(fn, root):
         """
         Function applied to each file found when walking the analysis
         directories. Runs through all search patterns and returns True
         if a match is found.
         """
-        f = {'fn': fn, 'root': root}
+        f = FoundFile(fn, root)
 
         # Check that this is a file and not a pipe or anything weird
-        if not os.path.isfile(os.path.join(root, fn)):
+        try:
+            fstat = os.stat(f.path)
+        except (IOError, OSError, ValueError):
+            return None
+        if not stat.S_ISREG(fstat.st_mode):
             return None
 
         # Check that we don't want to ignore this file
@@ -119,38 +249,70 @@ def get_filelist(run_module_names):
         if len(i_matches) > 0:
             logger.debug("Ignoring file as matched an ignore pattern: {}".format(fn))
             return None
+        file_index.add(f)
 
         # Limit search to small files, to avoid 30GB FastQ files etc.
-        try:
-            f['filesize'] = os.path.getsize(os.path.join(root,fn))
-        except (IOError, OSError, ValueError, UnicodeDecodeError):
-            logger.debug("Couldn't read file when checking filesize: {}".format(fn))
-        else:
-            if f['filesize'] > config.log_filesize_limit:
+        f.filesize = fstat.st_size
+        f.mtime = fstat.st_mtime
+        patterns = spatterns
+        if f.filesize > config.log_filesize_limit:
+            if not search_large_files:
                 return False
+            patterns = large_spatterns
+
+        # Reuse the search results from a previous run if the file hasn't changed
+        if discovery_cache is not None:
+            cached = discovery_cache.get(f.path)
+            if cached is not None and cached[0] == (f.filesize, f.mtime):
+                for key in cached[1]:
+                    if key in files:
+                        file_index.add_match(key, f)
+                return
 
         # Test file for each search pattern
+        with SearchBuffer(f.path) as contents:
+            matched_keys = match_file(f, contents, patterns)
+        for key in matched_keys:
+            file_index.add_match(key, f)
+        if discovery_cache is not None:
+            discovery_cache[f.path] = ((f.filesize, f.mtime), matched_keys)
+
+    def match_file(f, contents, spatterns):
+        """ Return the search pattern keys that match a file """
+        matched_keys = list()
         for patterns in spatterns:
             for key, sps in patterns.items():
                 for sp in sps:
-                    if search_file (sp, f):
+                    if search_file (sp, f, contents):
                         # Check that we shouldn't exclude this file
-                        if not exclude_file(sp, f):
+                        if not exclude_file(sp, f, contents):
                             # Looks good! Remember this file
-                            files[key].append(f)
+                            matched_keys.append(key)
                         # Don't keep searching this file for other modules
                         if not sp.get('shared', False):
-                            return
+                            return matched_keys
                         # Don't look at other patterns for this module
                         else:
                             break
+        return matched_keys
 
     # Go through the analysis directories and get file list
+    searchfiles.extend(iter_analysis_files())
+    # Search through collected files
+    with click.progressbar(searchfiles, label="Searching {} files..".format(len(searchfiles))) as sfiles:
+        for sf in sfiles:
+            add_file(sf[0], sf[1])
+
+def iter_analysis_files():
+    """
+    Walk the analysis directories, skipping anything that matches
+    the ignore config. Yields a [filename, directory] list for every file.
+    """
     for path in config.analysis_dir:
         if os.path.islink(path) and config.ignore_symlinks:
             continue
         elif os.path.isfile(path):
-            searchfiles.append([os.path.basename(path), os.path.dirname(path)])
+            yield [os.path.basename(path), os.path.dirname(path)]
         elif os.path.isdir(path):
             for root, dirnames, filenames in os.walk(path, followlinks=(not config.ignore_symlinks), topdown=True):
                 bname = os.path.basename(root)
@@ -180,15 +342,79 @@ def get_filelist(run_module_names):
                     continue
                 # Search filenames in this directory
                 for fn in filenames:
-                    searchfiles.append([fn, root])
-    # Search through collected files
-    with click.progressbar(searchfiles, label="Searching {} files..".format(len(searchfiles))) as sfiles:
-        for sf in sfiles:
-            add_file(sf[0], sf[1])
-
-def search_file (pattern, f):
+                    yield [fn, root]
+
+# How files larger than config.log_filesize_limit are read, set with the large_files search pattern key:
+#   header - Only the start of the file, up to log_filesize_limit bytes
+#   stream - The whole file, for modules that read it line by line
+#   sample - Blocks of lines from across the file, up to log_filesize_limit bytes in total
+LARGE_FILE_POLICIES = ['header', 'stream', 'sample']
+
+def large_files_policy(sps):
+    """ How a search pattern reads files larger than config.log_filesize_limit
+    :param sps: Search pattern dict, or list of search pattern dicts
+    :return: One of LARGE_FILE_POLICIES, or None if large files are skipped
+    """
+    if not isinstance(sps, list):
+        sps = [sps]
+    for sp in sps:
+        if sp.get('large_files') in LARGE_FILE_POLICIES:
+            return sp['large_files']
+    return None
+
+# Size of the blocks read from across a file with the 'sample' large_files policy
+SAMPLE_BLOCK_SIZE = 4096
+
+def read_large_file(path, policy, nbytes=None):
+    """ Read part of a file that is larger than config.log_filesize_limit
+    :param path: Path to the file
+    :param policy: 'header' for the start of the file, 'sample' for evenly spaced
+                   blocks of whole lines from across the file (starting with the first)
+    :param nbytes: Number of bytes to read. Defaults to config.log_filesize_limit
+    :return: Tuple of the text read, with universal newlines, and the number of bytes read
+    """
+    if nbytes is None:
+        nbytes = config.log_filesize_limit
+    bytes_read = 0
+    with io.open(path, 'rb') as fh:
+        filesize = os.fstat(fh.fileno()).st_size
+        if filesize <= nbytes:
+            data = fh.read()
+            bytes_read = len(data)
+        elif policy == 'header':
+            data = fh.read(nbytes)
+            bytes_read = len(data)
+            # Only keep whole lines
+            if len(data) == nbytes:
+                data = data[:data.rfind(b'\n') + 1]
+        else:
+            num_blocks = max(2, nbytes // SAMPLE_BLOCK_SIZE)
+            block_size = max(1, nbytes // num_blocks)
+            step = max(block_size, (filesize - block_size) // (num_blocks - 1))
+            blocks = list()
+            for i in range(num_blocks):
+                if i * step >= filesize:
+                    break
+                fh.seek(i * step)
+                block = fh.read(block_size)
+                bytes_read += len(block)
+                # Drop the lines cut by the start and end of the block
+                if i > 0:
+                    block = block[block.find(b'\n') + 1:] if b'\n' in block else b''
+                if i * step + block_size < filesize:
+                    block = block[:block.rfind(b'\n') + 1]
+                blocks.append(block)
+            data = b''.join(blocks)
+    text = data.decode('utf-8')
+    return text.replace(u'\r\n', u'\n').replace(u'\r', u'\n'), bytes_read
+
+def search_file (pattern, f, contents=None):
     """
     Function to searach a single file for a single search pattern.
+    :param pattern: Search pattern dict
+    :param f: Dict with the file name (fn) and directory (root)
+    :param contents: SearchBuffer for this file, shared with other search patterns.
+                     The file is read here if not given.
     """
 
     fn_matched = False
@@ -222,47 +448,55 @@ def search_file (pattern, f):
             if pattern.get('contents') is None and pattern.get('contents_re') is None:
                 return True
 
+    # No need to look at the contents if the file name didn't match
+    if (pattern.get('fn') is not None or pattern.get('fn_re') is not None) and not fn_matched:
+        return False
+
     # Search by file contents
     if pattern.get('contents') is not None or pattern.get('contents_re') is not None:
+        if contents is None:
+            with SearchBuffer(os.path.join(f['root'], f['fn'])) as contents:
+                return search_file(pattern, f, contents)
         if pattern.get('contents_re') is not None:
             repattern = re.compile(pattern['contents_re'])
-        try:
-            with io.open (os.path.join(f['root'],f['fn']), "r", encoding='utf-8') as f:
-                l = 1
-                for line in f:
-                    # Search by file contents (string)
-                    if pattern.get('contents') is not None:
-                        if pattern['contents'] in line:
-                            contents_matched = True
-                            if pattern.get('fn') is None and pattern.get('fn_re') is None:
-                                return True
-                            break
-                    # Search by file contents (regex)
-                    elif pattern.get('contents_re') is not None:
-                        if re.search(repattern, line):
-                            contents_matched = True
-                            if pattern.get('fn') is None and pattern.get('fn_re') is None:
-                                return True
-                            break
-                    # Break if we've searched enough lines for this pattern
-                    if pattern.get('num_lines') and l >= pattern.get('num_lines'):
-                        break
-                    l += 1
-        except (IOError, OSError, ValueError, UnicodeDecodeError):
-            if config.report_readerrors:
-                logger.debug("Couldn't read file when looking for output: {}".format(f['fn']))
-                return False
+        num_lines = pattern.get('num_lines')
+        l = 0
+        for text, lines in contents.blocks():
+            if num_lines:
+                lines = lines[:num_lines - l]
+            l += len(lines)
+            # Search by file contents (string)
+            if pattern.get('contents') is not None:
+                # Whole blocks can be searched at once if the string can't span lines
+                if not num_lines and u'\n' not in pattern['contents']:
+                    contents_matched = pattern['contents'] in text
+                else:
+                    contents_matched = any(pattern['contents'] in line for line in lines)
+            # Search by file contents (regex)
+            else:
+                contents_matched = any(repattern.search(line) for line in lines)
+            # Break if we've searched enough lines for this pattern
+            if contents_matched or (num_lines and l >= num_lines):
+                break
+        if contents.failed and config.report_readerrors:
+            logger.debug("Couldn't read file when looking for output: {}".format(f['fn']))
+        if contents_matched and pattern.get('fn') is None and pattern.get('fn_re') is None:
+            return True
 
     return fn_matched and contents_matched
 
-def exclude_file(sp, f):
+def exclude_file(sp, f, contents=None):
     """
     Exclude discovered files if they match the special exclude_
     search pattern keys
+    :param sp: Search pattern dict
+    :param f: Dict with the file name (fn) and directory (root)
+    :param contents: SearchBuffer for this file, shared with other search patterns.
+                     The file is read here if not given.
     """
     # Make everything a list if it isn't already
     for k in sp:
-        if k in ['exclude_fn', 'exclude_fn_re' 'exclude_contents', 'exclude_contents_re']:
+        if k in ['exclude_fn', 'exclude_fn_re', 'exclude_contents', 'exclude_contents_re']:
             if not isinstance(sp[k], list):
                 sp[k] = [sp[k]]
 
@@ -280,21 +514,258 @@ def exclude_file(sp, f):
 
     # Search the contents of the file
     if 'exclude_contents' in sp or 'exclude_contents_re' in sp:
+        if contents is None:
+            with SearchBuffer(os.path.join(f['root'], f['fn'])) as contents:
+                return exclude_file(sp, f, contents)
         # Compile regex patterns if we have any
         if 'exclude_contents_re' in sp:
             sp['exclude_contents_re'] = [re.compile(pat) for pat in sp['exclude_contents_re']]
-        with io.open (os.path.join(f['root'],f['fn']), "r", encoding='utf-8') as fh:
-            for line in fh:
-                if 'exclude_contents' in sp:
-                    for pat in sp['exclude_contents']:
-                        if pat in line:
-                            return True
-                if 'exclude_contents_re' in sp:
-                    for pat in sp['exclude_contents_re']:
-                        if re.search(pat, line):
+        for text, lines in contents.blocks():
+            if 'exclude_contents' in sp:
+                for pat in sp['exclude_contents']:
+                    if u'\n' in pat:
+                        if any(pat in line for line in lines):
                             return True
+                    elif pat in text:
+                        return True
+            if 'exclude_contents_re' in sp:
+                for pat in sp['exclude_contents_re']:
+                    if any(pat.search(line) for line in lines):
+                        return True
     return False
 
+def clean_s_name(s_name, root):
+    """ Take a long file name and strip it back to a clean sample name,
+    using the fn_clean_exts, fn_clean_trim and prepend_dirs config.
+    Used by BaseMultiqcModule.clean_s_name() and for files found when searching.
+    :param s_name: The sample name to clean
+    :param root: The directory path that this file is within
+    :return: The cleaned sample name, ready to be used
+    """
+    s_name_original = s_name
+    if root is None:
+        root = ''
+
+    if config.fn_clean_sample_names:
+        # Split then take first section to remove everything after these matches
+        for ext in config.fn_clean_exts:
+            if type(ext) is str:
+                ext = {'type': 'truncate', 'pattern': ext}
+            if ext['type'] == 'truncate':
+                s_name = os.path.basename(s_name.split(ext['pattern'], 1)[0])
+            elif ext['type'] in ('remove', 'replace'):
+                if ext['type'] == 'replace':
+                    logger.warning("use 'config.fn_clean_sample_names.remove' instead "
+                                   "of 'config.fn_clean_sample_names.replace' [deprecated]")
+                s_name = s_name.replace(ext['pattern'], '')
+            elif ext['type'] == 'regex':
+                s_name = re.sub(ext['pattern'], '', s_name)
+            elif ext['type'] == 'regex_keep':
+                match = re.search(ext['pattern'], s_name)
+                s_name = match.group() if match else s_name
+            else:
+                logger.error('Unrecognised config.fn_clean_exts type: {}'.format(ext['type']))
+        # Trim off characters at the end of names
+        for chrs in config.fn_clean_trim:
+            if s_name.endswith(chrs):
+                s_name = s_name[:-len(chrs)]
+            if s_name.startswith(chrs):
+                s_name = s_name[len(chrs):]
+
+    # Prepend sample name with directory
+    if config.prepend_dirs:
+        sep = config.prepend_dirs_sep
+        root = root.lstrip('.{}'.format(os.sep))
+        dirs = [d.strip() for d in root.split(os.sep) if d.strip() != '']
+        if config.prepend_dirs_depth != 0:
+            d_idx = config.prepend_dirs_depth * -1
+            if config.prepend_dirs_depth > 0:
+                dirs = dirs[d_idx:]
+            else:
+                dirs = dirs[:d_idx]
+        if len(dirs) > 0:
+            s_name = "{}{}{}".format(sep.join(dirs), sep, s_name)
+
+    # Remove trailing whitespace
+    s_name = s_name.strip()
+    if s_name == '':
+        s_name = s_name_original
+
+    return s_name
+
+
+class SearchBuffer(object):
+    """ The start of a file that is being searched, read once in binary and shared
+    by all of the search patterns and exclude checks for that file. More of the file
+    is read when a pattern needs it, up to config.search_bytes_limit bytes, and lines
+    are only decoded when they are read. Files with null bytes or text that isn't UTF-8
+    are not searched any further, instead of raising an exception for every pattern. """
+
+    block_size = 64 * 1024
+
+    def __init__(self, path):
+        """
+        :param path: Path to the file
+        """
+        self.path = path
+        self.fh = None
+        self.bytes_read = 0
+        self.pending = b''    # Start of a line that hasn't been read to the end yet
+        self.decoded = list() # Text and lines of each block read so far, with universal newlines
+        self.done = False
+        self.failed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+    def blocks(self):
+        """ Iterate over the file in blocks of whole lines, starting from the beginning each time.
+        :return: Yields the decoded text of each block and a list of its lines (ending with newlines)
+        """
+        idx = 0
+        while idx < len(self.decoded) or self._read_block():
+            if idx < len(self.decoded):
+                yield self.decoded[idx]
+                idx += 1
+
+    def _read_block(self):
+        """ Read and decode the next block of the file.
+        :return: False if there is nothing more to read
+        """
+        if self.done:
+            return False
+        block = b''
+        nbytes = min(self.block_size, config.search_bytes_limit - self.bytes_read)
+        if nbytes > 0:
+            try:
+                if self.fh is None:
+                    self.fh = io.open(self.path, 'rb')
+                block = self.fh.read(nbytes)
+            except (IOError, OSError, ValueError):
+                return self._stop(failed=True)
+        self.bytes_read += len(block)
+        if b'\0' in block:
+            return self._stop(failed=True)
+        # Only decode complete lines, so that characters aren't split between blocks
+        data = self.pending + block
+        last_block = len(block) < nbytes or nbytes <= 0
+        if last_block:
+            self.pending = b''
+        else:
+            nl = data.rfind(b'\n')
+            self.pending = data[nl+1:]
+            data = data[:nl+1]
+        try:
+            # The byte limit can cut the last character in half
+            text = data.decode('utf-8', 'ignore' if nbytes <= 0 else 'strict')
+        except UnicodeDecodeError:
+            return self._stop(failed=True)
+        # Universal newlines, as when reading in text mode
+        text = text.replace(u'\r\n', u'\n').replace(u'\r', u'\n')
+        lines = text.split(u'\n')
+        if len(lines[-1]) > 0:
+            lines = [ line + u'\n' for line in lines[:-1] ] + [lines[-1]]
+        else:
+            lines = [ line + u'\n' for line in lines[:-1] ]
+        if len(lines) > 0:
+            self.decoded.append((text, lines))
+        if last_block:
+            self._stop()
+        return True
+
+    def _stop(self, failed=False):
+        self.done = True
+        self.failed = failed
+        self.close()
+        return False
+
+def module_files_signature(names):
+    """ Summarise the files found for the search keys of some modules,
+    so that we can tell whether a module needs to be run again.
+    :param names: List of module names (or custom content IDs)
+    :return: Sorted list of (key, root, fn, filesize, mtime) tuples
+    """
+    names = [n.lower() for n in names]
+    return sorted( (k, f['root'], f['fn'], f.get('filesize'), f.get('mtime'))
+        for k in files if k.split('/', 1)[0].lower() in names for f in files[k] )
+
+def module_state_marker():
+    """ Note how much has been added to the report so far. Used
+    by module_state_since() to find what a single module added. """
+    return {
+        'general_stats': len(general_stats_data),
+        'plot_data': set(plot_data.keys()),
+        'saved_raw_data': set(saved_raw_data.keys()),
+        'data_sources': set(data_sources.keys()),
+        'html_ids': len(html_ids),
+        'lint_errors': len(lint_errors),
+        'num_hc_plots': num_hc_plots,
+        'num_mpl_plots': num_mpl_plots,
+        'output_files': _list_output_files()
+    }
+
+def module_state_since(marker):
+    """ Copy everything added to the report since module_state_marker() was
+    called, so that it can be added to a later report with restore_module_state() """
+    output_files = dict()
+    for k, path in _list_output_files().items():
+        if k not in marker['output_files']:
+            with io.open(path, 'rb') as fh:
+                output_files[k] = fh.read()
+    return copy.deepcopy({
+        'general_stats_data': general_stats_data[marker['general_stats']:],
+        'general_stats_headers': general_stats_headers[marker['general_stats']:],
+        'plot_data': { k: v for k, v in plot_data.items() if k not in marker['plot_data'] },
+        'saved_raw_data': { k: v for k, v in saved_raw_data.items() if k not in marker['saved_raw_data'] },
+        'data_sources': { k: v for k, v in data_sources.items() if k not in marker['data_sources'] },
+        'html_ids': html_ids[marker['html_ids']:],
+        'lint_errors': lint_errors[marker['lint_errors']:],
+        'num_hc_plots': num_hc_plots - marker['num_hc_plots'],
+        'num_mpl_plots': num_mpl_plots - marker['num_mpl_plots'],
+        'output_files': output_files
+    })
+
+def restore_module_state(state):
+    """ Add the report data saved by module_state_since() to this report """
+    global num_hc_plots, num_mpl_plots
+    state = copy.deepcopy(state)
+    general_stats_data.extend(state['general_stats_data'])
+    general_stats_headers.extend(state['general_stats_headers'])
+    plot_data.update(state['plot_data'])
+    saved_raw_data.update(state['saved_raw_data'])
+    data_sources.update(state['data_sources'])
+    html_ids.extend(state['html_ids'])
+    lint_errors.extend(state['lint_errors'])
+    num_hc_plots += state['num_hc_plots']
+    num_mpl_plots += state['num_mpl_plots']
+    dirs = {'data': config.data_dir, 'plots': getattr(config, 'plots_dir', None)}
+    for (d, fn), contents in state['output_files'].items():
+        if dirs[d] is not None:
+            path = os.path.join(dirs[d], fn)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with io.open(path, 'wb') as fh:
+                fh.write(contents)
+
+def _list_output_files():
+    """ All files in the data and plot export directories, keyed by (directory type, relative path) """
+    output_files = dict()
+    for d, dpath in [('data', config.data_dir), ('plots', getattr(config, 'plots_dir', None))]:
+        if dpath is not None and os.path.isdir(dpath):
+            for root, dirnames, filenames in os.walk(dpath):
+                for fn in filenames:
+                    path = os.path.join(root, fn)
+                    output_files[(d, os.path.relpath(path, dpath))] = path
+    return output_files
+
 def data_sources_tofile ():
     fn = 'multiqc_sources.{}'.format(config.data_format_extensions[config.data_format])
     with io.open (os.path.join(config.data_dir, fn), 'w', encoding='utf-8') as f:
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+""" MultiQC report server. Searches and parses the analysis files once and
+keeps the report in memory. The browser gets the report shell (navigation,
+toolbox and General Statistics), then fetches each section and plot as JSON
+when it is scrolled into view. Refreshing re-runs only modules with changed files.
+
+Run with `multiqc serve [OPTIONS] <analysis directory>`. Endpoints:
+    GET  /                          The report shell
+    GET  /api/sections              List of modules and their sections
+    GET  /api/section/<mod>/<idx>   HTML for one section
+    GET  /api/plot/<id>             Data for one plot
+    GET  /api/general_stats         General Statistics data and headers
+    POST /api/refresh               Look for new and changed files
+"""
+
+from __future__ import print_function
+import click
+import json
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler # py2
+
+try:
+    from StringIO import StringIO # py2 - accepts both str and unicode
+except ImportError:
+    from io import StringIO
+
+from multiqc import __version__
+from multiqc.templates import serve as serve_template
+from multiqc.utils import config, megaqc, report, template_assets
+logger = config.logger
+
+
+class ServeTemplateEntryPoint(object):
+    """ Stands in for a template entry point, so that multiqc.run() can load the
+    serve template. It isn't installed as an entry point, because the page it makes
+    only works through the server, so it can't be chosen with `-t` for a static report. """
+
+    def load(self):
+        return serve_template
+
+
+class ReportState(object):
+    """ The parsed report, kept between requests """
+
+    def __init__(self, run_function, run_kwargs):
+        self.run_function = run_function
+        self.run_kwargs = dict(run_kwargs, template='serve')
+        self.module_cache = dict()
+        self.discovery_cache = dict()
+        self.modules_output = list()
+        self.build()
+
+    def build(self):
+        """ Run MultiQC, reusing the results of modules whose files haven't changed.
+        :return: True if any modules were run again, or were added or removed
+        """
+        html = StringIO()
+        result = self.run_function(html_stream=html, module_cache=self.module_cache,
+            discovery_cache=self.discovery_cache, **self.run_kwargs)
+        # Reused modules are the same objects as last time
+        changed = [m for m in result.get('modules_output', []) if not any(m is old for old in self.modules_output)]
+        changed = len(changed) > 0 or len(result.get('modules_output', [])) != len(self.modules_output)
+        self.result = result
+        self.shell = html.getvalue()
+        self.modules_output = result.get('modules_output', [])
+        self.plot_data = result.get('plot_data', {})
+        return changed
+
+    def sections(self):
+        """ Summary of the modules and sections in the report """
+        return [ {
+            'name': m.name,
+            'anchor': m.anchor,
+            'sections': [ {'name': s['name'], 'anchor': s['anchor']} for s in m.sections if s['print_section'] ]
+        } for m in self.modules_output ]
+
+    def section_html(self, module_idx, section_idx):
+        """ Render one section with the same template code as the static report """
+        m = self.modules_output[module_idx]
+        s = m.sections[section_idx]
+        env = template_assets.get_environment('serve', template_dirs())
+        return env.get_template('section.html').render(m=m, s=s, last_section=(section_idx == len(m.sections) - 1),
+            report=report, config=config)
+
+
+def template_dirs():
+    """ Directories for the serve template and its parent theme """
+    parent_template = config.avail_templates[serve_template.template_parent].load()
+    return [serve_template.template_dir, parent_template.template_dir]
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """ Answer requests for the report shell and its contents """
+
+    server_version = 'MultiQC/{}'.format(__version__)
+
+    def do_GET(self):
+        state = self.server.report_state
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        try:
+            if parts == ['']:
+                self.send_content(state.shell, 'text/html')
+            elif parts == ['api', 'sections']:
+                self.send_json(state.sections())
+            elif len(parts) == 4 and parts[:2] == ['api', 'section']:
+                self.send_json({'html': state.section_html(int(parts[2]), int(parts[3]))})
+            elif len(parts) == 3 and parts[:2] == ['api', 'plot']:
+                self.send_json(state.plot_data[parts[2]])
+            elif parts == ['api', 'general_stats']:
+                self.send_json({
+                    'data': state.result.get('general_stats_data', []),
+                    'headers': state.result.get('general_stats_headers', [])
+                })
+            else:
+                self.send_error(404)
+        except (KeyError, IndexError, ValueError):
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0].strip('/') == 'api/refresh':
+            logger.info("Refreshing report")
+            changed = self.server.report_state.build()
+            self.send_json({'changed': changed, 'sys_exit_code': self.server.report_state.result['sys_exit_code']})
+        else:
+            self.send_error(404)
+
+    def send_json(self, data):
+        json_string = json.dumps(data, cls=megaqc.MQCJSONEncoder)
+        # JSON.parse() doesn't handle `NaN`, but it does handle `null`.
+        self.send_content(json_string.replace('NaN', 'null'), 'application/json')
+
+    def send_content(self, content, content_type):
+        content = content.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', '{}; charset=utf-8'.format(content_type))
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug("Server: {}".format(format % args))
+
+
+def serve(run_function, host='127.0.0.1', port=8000, **run_kwargs):
+    """ Parse the report once, then serve it until interrupted with Ctrl+C.
+    :param run_function: multiqc.run(), called for the first build and each refresh
+    :param host: Address to listen on. Only the local machine by default.
+    :param port: Port to listen on
+    :param run_kwargs: Arguments for run_function
+    :return: Exit code
+    """
+    config.avail_templates['serve'] = ServeTemplateEntryPoint()
+    state = ReportState(run_function, run_kwargs)
+    if state.result['sys_exit_code'] != 0 and len(state.modules_output) == 0:
+        logger.error("Nothing to serve")
+        return state.result['sys_exit_code']
+    server = HTTPServer((host, port), ReportRequestHandler)
+    server.report_state = state
+    logger.info("Serving report at http://{}:{}/ - press Ctrl+C to stop".format(host, server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopped serving report")
+    finally:
+        server.server_close()
+    return 0
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.argument('analysis_dir',
+                    type = click.Path(exists=True),
+                    nargs = -1,
+                    required = True,
+                    metavar = "<analysis directory>"
+)
+@click.option('--host',
+                    type = str,
+                    default = '127.0.0.1',
+                    help = "Address to listen on (default: 127.0.0.1)"
+)
+@click.option('--port',
+                    type = int,
+                    default = 8000,
+                    help = "Port to listen on (default: 8000)"
+)
+@click.option('-d', '--dirs',
+                    is_flag = True,
+                    help = "Prepend directory to sample names"
+)
+@click.option('-dd', '--dirs-depth', 'dirs_depth',
+                    type = int,
+                    help = "Prepend [INT] directories to sample names. Negative number to take from start of path."
+)
+@click.option('-s', '--fullnames', 'no_clean_sname',
+                    is_flag = True,
+                    help = "Do not clean the sample names (leave as full file name)"
+)
+@click.option('-i', '--title',
+                    type = str,
+                    help = "Report title. Printed as page header, used for filename if not otherwise specified."
+)
+@click.option('-x', '--ignore',
+                    type = str,
+                    multiple = True,
+                    help = "Ignore analysis files (glob expression)"
+)
+@click.option('--ignore-samples', 'ignore_samples',
+                    type = str,
+                    multiple = True,
+                    help = "Ignore sample names (glob expression)"
+)
+@click.option('-e', '--exclude', metavar='[module name]',
+                    type = click.Choice(sorted(config.avail_modules)),
+                    multiple = True,
+                    help = "Do not use this module. Can specify multiple times."
+)
+@click.option('-m', '--module', metavar='[module name]',
+                    type = click.Choice(sorted(config.avail_modules)),
+                    multiple = True,
+                    help = "Use only this module. Can specify multiple times."
+)
+@click.option('-c', '--config', 'config_file',
+                    type = click.Path(exists=True, readable=True),
+                    multiple=True,
+                    help = "Specific config file to load, after those in MultiQC dir / home dir / working dir."
+)
+@click.option('--cl-config', '--cl_config',
+                    type = str,
+                    multiple = True,
+                    help = "Specify MultiQC config YAML on the command line"
+)
+@click.option('-v', '--verbose',
+                    count = True,
+                    default = 0,
+                    help = "Increase output verbosity."
+)
+@click.option('-q', '--quiet',
+                    is_flag = True,
+                    help = "Only show log warnings"
+)
+@click.version_option(__version__)
+
+def serve_cli(analysis_dir, host, port, **kwargs):
+    """Serve a MultiQC report from memory, instead of writing a HTML file.
+
+        Analysis files are searched and parsed once. The browser fetches each
+        report section and plot when it is viewed, so large reports open quickly.
+        Click 'Refresh' in the report to look for new and changed files.
+
+        To run here, use 'multiqc serve .' and open http://127.0.0.1:8000/
+    """
+    from multiqc.multiqc import run
+    sys_exit_code = serve(run, host=host, port=port, analysis_dir=analysis_dir, **kwargs)
+    raise SystemExit(sys_exit_code)
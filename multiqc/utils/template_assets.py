@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+""" MultiQC template asset cache. Report templates inline their fonts,
+images, CSS and JavaScript libraries into every report. These files only
+change with the template and MultiQC version, so they are read and
+encoded once per Python process and then reused for every report. """
+
+from __future__ import print_function
+import base64
+import errno
+import io
+import jinja2
+import os
+import shutil
+
+from multiqc.utils import config
+logger = config.logger
+
+# Contents of template files, keyed by (template name, MultiQC version)
+# and then by (file path, b64)
+bundles = dict()
+# Jinja environments, which hold the compiled templates. Same keys.
+environments = dict()
+
+def get_environment(template_name, template_dirs):
+    """ Return the Jinja environment for a template, making it if needed.
+    Files are loaded from where the templates are installed, searching
+    the child theme directory before the parent theme directory. """
+    key = (template_name, config.version)
+    if key not in environments:
+        environments[key] = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dirs))
+    return environments[key]
+
+def get_bundle(template_name):
+    """ Return the cached asset bundle for a template, making it if needed """
+    return bundles.setdefault((template_name, config.version), dict())
+
+def read_file(path, b64=False):
+    """ Read a file as text, or as base64 encoded binary """
+    if b64:
+        with io.open (path, "rb") as f:
+            return base64.b64encode(f.read()).decode('utf-8')
+    else:
+        with io.open (path, "r", encoding='utf-8') as f:
+            return f.read()
+
+def include_file_function(template_name, template_dirs):
+    """ Make the include_file() function used by Jinja templates for one report.
+    :param template_name: Name of the template, used as the cache key
+    :param template_dirs: Template directories to search, child theme first
+    :return: Function that takes a file name, an optional directory (None for
+             paths used as-is) and b64=True for base64 encoding. Files found in the
+             template directories are cached for the whole process, anything else
+             (module assets, custom logos) for this report only.
+    """
+    bundle = get_bundle(template_name)
+    run_cache = dict()
+
+    def include_file(name, fdir=template_dirs, b64=False):
+        if fdir is template_dirs and not os.path.isabs(name):
+            cache = bundle
+            # Use the first template directory that has this file
+            fdir = next((d for d in template_dirs if os.path.exists(os.path.join(d, name))), template_dirs[0])
+        else:
+            cache = run_cache
+            if fdir is None or fdir is template_dirs:
+                fdir = ''
+        key = (os.path.join(fdir, name), b64)
+        if key not in cache:
+            try:
+                cache[key] = read_file(os.path.join(fdir, name), b64)
+            except (OSError, IOError) as e:
+                logger.error("Could not include file '{}': {}".format(name, e))
+                return None
+        return cache[key]
+
+    return include_file
+
+def copy_files(copy_files, template_dirs, modules_output, output_dir):
+    """ Copy template files and module css / js files next to the report,
+    for templates that link to them instead of including them.
+    :param copy_files: List of paths to copy, relative to the template directories
+    :param template_dirs: Template directories, child theme first
+    :param modules_output: List of module objects, which may have css and js dicts
+    :param output_dir: Directory that the report was written to
+    :return: None
+    """
+    for f in copy_files:
+        # Parent theme files first, so that child theme files overwrite them
+        for d in reversed(template_dirs):
+            if os.path.exists(os.path.join(d, f)):
+                copy_tree(os.path.join(d, f), os.path.join(output_dir, f))
+        # Module css & js files, copied from where the module is installed
+        for m in modules_output:
+            assets = list(getattr(m, 'css', {}).items()) + list(getattr(m, 'js', {}).items())
+            for to, path in assets:
+                if to.startswith(f.rstrip('/') + '/'):
+                    copy_to = os.path.join(output_dir, to)
+                    make_dirs(os.path.dirname(copy_to))
+                    shutil.copyfile(path, copy_to)
+
+def copy_tree(src, dest):
+    """ Copy a directory tree, overwriting existing files. Used instead of
+    distutils copy_tree(), which caches created directories between calls
+    and so fails if an output directory was deleted by an earlier run. """
+    for root, dirnames, filenames in os.walk(src):
+        dest_root = os.path.normpath(os.path.join(dest, os.path.relpath(root, src)))
+        make_dirs(dest_root)
+        for fn in filenames:
+            shutil.copyfile(os.path.join(root, fn), os.path.join(dest_root, fn))
+
+def make_dirs(path):
+    """ Make a directory and any parents, unless it already exists """
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
@@ -37,6 +37,26 @@ def robust_rmtree(path, logger=None, max_retries=10):
     shutil.rmtree(path)
 
 
+def replace_path(src, dest):
+    """ Move a file or directory to dest, replacing anything already there.
+    Files are replaced atomically. An old directory is first moved aside,
+    so that dest is only missing for a moment. """
+    if os.path.isdir(dest) and not os.path.islink(dest):
+        old_dest = '{}.old'.format(dest)
+        if os.path.exists(old_dest):
+            robust_rmtree(old_dest)
+        os.rename(dest, old_dest)
+        os.rename(src, dest)
+        robust_rmtree(old_dest)
+    elif hasattr(os, 'replace'):
+        os.replace(src, dest) # py3
+    else:
+        # py2 - os.rename() only overwrites on POSIX
+        if os.name == 'nt' and os.path.exists(dest):
+            os.remove(dest)
+        os.rename(src, dest)
+
+
 def write_data_file(data, fn, sort_cols=False, data_format=None):
     """ Write a data file to the report directory. Will not do anything
     if config.data_dir is not set.
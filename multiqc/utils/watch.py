@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+""" MultiQC watch mode. Keeps running after the report has been written and
+rebuilds it whenever files in the analysis directories change. Files that
+haven't changed are not searched again and modules whose files haven't
+changed are not run again - their results are reused from the last build. """
+
+from __future__ import print_function
+import os
+import time
+
+from multiqc.utils import config, report
+logger = config.logger
+
+# Use inotify if available (Linux only), otherwise poll the file system
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+def watch(run_function, **run_kwargs):
+    """ Build the report, then rebuild it whenever the input files change.
+    Runs until interrupted with Ctrl+C.
+    :param run_function: multiqc.run(), called with force=True for every build
+    :param run_kwargs: Arguments for run_function
+    :return: Result of the last build
+    """
+    run_kwargs['force'] = True
+    module_cache = dict()
+    discovery_cache = dict()
+
+    def build():
+        start = time.time()
+        result = run_function(module_cache=module_cache, discovery_cache=discovery_cache, **run_kwargs)
+        return start, result
+
+    last_build, result = build()
+    if inotify_simple is not None:
+        watcher = InotifyWatcher(output_paths(result))
+    else:
+        watcher = PollingWatcher(output_paths(result))
+    logger.info("Watching for changes. Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            if not watcher.wait_for_change():
+                continue
+            # Wait until files stop changing, so that we don't build half-written results
+            while watcher.wait_for_change(config.watch_debounce):
+                pass
+            # Don't rebuild more often than watch_min_interval
+            wait = last_build + config.watch_min_interval - time.time()
+            if wait > 0:
+                logger.debug("Waiting {:.1f}s before rebuilding".format(wait))
+                time.sleep(wait)
+                watcher.wait_for_change(0)
+            logger.info("Input files changed, rebuilding report")
+            last_build, result = build()
+            watcher.ignore = output_paths(result)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching for changes")
+        watcher.close()
+    return result
+
+def output_paths(result):
+    """ Paths written by MultiQC, which are ignored when watching.
+    Temporary and zipped versions of these paths start with the same string. """
+    paths = [result.get('output_fn'), result.get('data_dir')]
+    if config.export_plots:
+        paths.append(os.path.join(config.output_dir, config.plots_dir_name))
+    return tuple(os.path.realpath(p) for p in paths if p is not None and not hasattr(p, 'write'))
+
+def is_ignored(path, ignore):
+    """ Check whether a changed path was written by MultiQC """
+    return os.path.realpath(path).startswith(ignore)
+
+
+class PollingWatcher(object):
+    """ Find changes by comparing the size and modification time of
+    every file, walking the analysis directories every few seconds """
+
+    def __init__(self, ignore):
+        self.ignore = ignore
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = dict()
+        for fn, root in report.iter_analysis_files():
+            path = os.path.join(root, fn)
+            try:
+                fstat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (fstat.st_size, fstat.st_mtime)
+        return snapshot
+
+    def wait_for_change(self, timeout=None):
+        """ Return True as soon as a file has changed, or False
+        if nothing changed within timeout seconds """
+        start = time.time()
+        while True:
+            snapshot = self.scan()
+            changed = [ p for p in set(snapshot) | set(self.snapshot)
+                if snapshot.get(p) != self.snapshot.get(p) and not is_ignored(p, self.ignore) ]
+            self.snapshot = snapshot
+            if len(changed) > 0:
+                logger.debug("Changed files: {}".format(", ".join(sorted(changed))))
+                return True
+            if timeout is not None and time.time() - start >= timeout:
+                return False
+            sleep = config.watch_poll_interval
+            if timeout is not None:
+                sleep = min(sleep, max(0, start + timeout - time.time()))
+            time.sleep(sleep)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """ Find changes with inotify events. Every directory is watched,
+    including directories created after we started. """
+
+    def __init__(self, ignore):
+        self.ignore = ignore
+        self.inotify = inotify_simple.INotify()
+        self.mask = inotify_simple.flags.CREATE | inotify_simple.flags.CLOSE_WRITE | \
+            inotify_simple.flags.DELETE | inotify_simple.flags.MOVED_FROM | \
+            inotify_simple.flags.MOVED_TO | inotify_simple.flags.MODIFY
+        self.watch_dirs = dict()
+        for path in config.analysis_dir:
+            if os.path.isdir(path):
+                self.add_watches(path)
+            elif os.path.isfile(path):
+                self.add_watches(os.path.dirname(path), recursive=False)
+
+    def add_watches(self, path, recursive=True):
+        for root, dirnames, filenames in os.walk(path, followlinks=(not config.ignore_symlinks)):
+            if is_ignored(root, self.ignore):
+                dirnames[:] = []
+                continue
+            try:
+                self.watch_dirs[self.inotify.add_watch(root, self.mask)] = root
+            except OSError as e:
+                logger.debug("Could not watch directory '{}': {}".format(root, e))
+            if not recursive:
+                break
+
+    def wait_for_change(self, timeout=None):
+        """ Return True as soon as a file has changed, or False
+        if nothing changed within timeout seconds """
+        start = time.time()
+        while True:
+            if timeout is None:
+                events = self.inotify.read()
+            else:
+                events = self.inotify.read(timeout=int(max(0, start + timeout - time.time()) * 1000))
+            changed = []
+            for event in events:
+                if event.wd not in self.watch_dirs:
+                    continue
+                path = os.path.join(self.watch_dirs[event.wd], event.name)
+                if is_ignored(path, self.ignore):
+                    continue
+                changed.append(path)
+                if event.mask & inotify_simple.flags.ISDIR and event.mask & (inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                    self.add_watches(path)
+            if len(changed) > 0:
+                logger.debug("Changed files: {}".format(", ".join(sorted(set(changed)))))
+                return True
+            if timeout is not None and time.time() - start >= timeout:
+                return False
+
+    def close(self):
+        self.inotify.close()
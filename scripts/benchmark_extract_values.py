@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+""" Benchmark for BaseMultiqcModule.extract_values() and compile_regexes().
+
+Runs the log parsing functions of the modules that use them on small example
+logs, first with the combined single-pass regex (RegexExtractor) and then with
+the previous approach of calling re.search() once for every key. Both give the
+same results, which is checked before timing.
+
+Usage: python scripts/benchmark_extract_values.py [repeats]
+"""
+
+from __future__ import print_function
+import io
+import re
+import sys
+import timeit
+
+from multiqc.modules import base_module
+
+BISMARK_ALIGNMENT = """Bismark report for: s0_R1.fq.gz and s0_R2.fq.gz (version: v0.20.0)
+Bismark was run with Bowtie 2 against the bisulfite genome of /ref/ with the specified options: -q --score-min L,0,-0.2 --ignore-quals --no-mixed --no-discordant --dovetail --maxins 500
+Option '--directional' specified (default mode): alignments to complementary strands (CTOT, CTOB) were ignored (i.e. not performed)
+
+Final Alignment report
+======================
+Sequence pairs analysed in total:	131190
+Number of paired-end alignments with a unique best hit:	88839
+Mapping efficiency:	61.2%
+Sequence pairs with no alignments under any condition:	5458
+Sequence pairs did not map uniquely:	2068
+Sequence pairs which were discarded because genomic sequence could not be extracted:	5
+
+Number of sequence pairs with unique best (first) alignment came from the bowtie output:
+CT/GA/CT:	8503	((converted) top strand)
+GA/CT/CT:	0	(complementary to (converted) top strand)
+GA/CT/GA:	0	(complementary to (converted) bottom strand)
+CT/GA/GA:	5947	((converted) bottom strand)
+
+Final Cytosine Methylation Report
+=================================
+Total number of C's analysed:	1497081
+
+Total methylated C's in CpG context:	6125
+Total methylated C's in CHG context:	5758
+Total methylated C's in CHH context:	1536
+Total methylated C's in Unknown context:	1
+
+Total unmethylated C's in CpG context:	8445
+Total unmethylated C's in CHG context:	7860
+Total unmethylated C's in CHH context:	4843
+
+C methylated in CpG context:	24.1%
+C methylated in CHG context:	21.9%
+C methylated in CHH context:	89.6%
+"""
+
+BISMARK_DEDUP = """
+Total number of alignments analysed in s0_bismark_bt2_pe.bam:	80819
+Total number duplicated alignments removed:	5431 (25.26%)
+Duplicated alignments were found at:	1234 different position(s)
+
+Total count of deduplicated leftover sequences: 71218 (75.49% of total)
+"""
+
+STAR_LOG = """                                 Started job on |	Feb 14 08:00:00
+                          Number of input reads |	477693
+                      Average input read length |	67
+                                    UNIQUE READS:
+                   Uniquely mapped reads number |	59517
+                        Uniquely mapped reads % |	68.46%
+                          Average mapped length | 136.99
+                       Number of splices: Total |	4163
+            Number of splices: Annotated (sjdb) |	6274
+                       Number of splices: GT/AG |	8101
+                       Number of splices: GC/AG |	86
+                       Number of splices: AT/AC |	9
+               Number of splices: Non-canonical |	2
+                      Mismatch rate per base, % |	0.89%
+                         Deletion rate per base |	0.09%
+                        Deletion average length |	1.44
+                        Insertion rate per base |	0.07%
+                       Insertion average length |	1.91
+                             MULTI-MAPPING READS:
+        Number of reads mapped to multiple loci |	6900
+             % of reads mapped to multiple loci |	6.72%
+        Number of reads mapped to too many loci |	48
+             % of reads mapped to too many loci |	0.07%
+                                  UNMAPPED READS:
+       % of reads unmapped: too many mismatches |	0.00%
+                 % of reads unmapped: too short |	8.82%
+                     % of reads unmapped: other |	0.76%
+"""
+
+BOWTIE2_LOG = """Time loading reference: 00:00:08
+bowtie2 --very-sensitive -x ref -1 bt0_R1.fastq.gz -2 bt0_R2.fastq.gz
+19607 reads; of these:
+  15422 (100.00%) were paired; of these:
+    664 (3.43%) aligned concordantly 0 times
+    8216 (74.96%) aligned concordantly exactly 1 time
+    8552 (21.61%) aligned concordantly >1 times
+    ----
+    385 pairs aligned concordantly 0 times; of these:
+      74 (5.17%) aligned discordantly 1 time
+    ----
+    341 pairs aligned 0 times concordantly or discordantly; of these:
+      136 mates make up the pairs; of these:
+        417 (60.55%) aligned 0 times
+        107 (21.36%) aligned exactly 1 time
+        178 (18.09%) aligned >1 times
+98.03% overall alignment rate
+11771 reads; of these:
+  19826 (100.00%) were unpaired; of these:
+    648 (6.58%) aligned 0 times
+    1257 (71.90%) aligned exactly 1 time
+    8773 (21.52%) aligned >1 times
+93.42% overall alignment rate
+"""
+
+HISAT2_LOG = """HISAT2 summary stats:
+	Total pairs: 13233
+		Aligned concordantly or discordantly 0 time: 517 (1.00%)
+		Aligned concordantly 1 time: 3388 (90.00%)
+		Aligned concordantly >1 times: 725 (5.00%)
+		Aligned discordantly 1 time: 43 (1.00%)
+	Total unpaired reads: 259
+		Aligned 0 time: 806 (50.00%)
+		Aligned 1 time: 15 (30.00%)
+		Aligned >1 times: 53 (20.00%)
+	Overall alignment rate: 99.50%
+"""
+
+CUTADAPT_LOG = """This is cutadapt 1.18 with Python 3.6.5
+Command line parameters: -a AGATCGGAAGAGC -o out.fq ca0.fastq.gz
+Processing reads on 1 core in single-end mode ...
+Finished in 10.00 s (10 us/read; 6.00 M reads/minute).
+
+=== Summary ===
+
+Total reads processed:               494,806
+Reads with adapters:                   87,228 (40.8%)
+Reads written (passing filters):     762,889 (100.0%)
+
+Total basepairs processed:   27,886,984 bp
+Quality-trimmed:                 17,874 bp (0.4%)
+Total written (filtered):     54,620,796 bp (97.7%)
+
+=== Adapter 1 ===
+
+Sequence: AGATCGGAAGAGC; Type: regular 3'; Length: 13; Trimmed: 27890 times.
+
+Overview of removed sequences
+length	count	expect	max.err	error counts
+""" + ''.join([ "{}\t{}\t{:.1f}\t{}\t{}\n".format(i, 5000 // i, 3241.0 / i, i // 10, 1000) for i in range(1, 51) ])
+
+
+class PerKeyExtractor(object):
+    """ The previous approach: one re.search() over the text for every key """
+
+    def __init__(self, regexes, value_type=float, flags=re.MULTILINE):
+        self.regexes = regexes
+        self.value_type = value_type
+        self.flags = flags
+
+    def search(self, text):
+        found = dict()
+        for k, r in self.regexes.items():
+            match = re.search(r, text, self.flags)
+            if match:
+                value = match.group(1) if match.re.groups > 0 else match.group(0)
+                try:
+                    found[k] = self.value_type(value.replace(',', ''))
+                except ValueError:
+                    found[k] = value
+        return found
+
+def per_key_extractor(regexes, value_type=float, flags=re.MULTILINE):
+    return PerKeyExtractor(regexes, value_type, flags)
+
+
+def new_module(mod_class, **attrs):
+    """ Module instance for calling parsing functions, without searching for files """
+    mod = mod_class.__new__(mod_class)
+    mod.name = mod_class.__module__
+    for k, v in attrs.items():
+        setattr(mod, k, v)
+    return mod
+
+def log_file(contents, fn):
+    return {'f': io.StringIO(u'' + contents), 'fn': fn, 's_name': fn, 'root': '.'}
+
+def bismark_alignment():
+    from multiqc.modules.bismark import bismark
+    return new_module(bismark.MultiqcModule).parse_bismark_report(BISMARK_ALIGNMENT, bismark.regexes['alignment'])
+
+def bismark_dedup():
+    from multiqc.modules.bismark import bismark
+    return new_module(bismark.MultiqcModule).parse_bismark_report(BISMARK_DEDUP, bismark.regexes['dedup'])
+
+def star():
+    from multiqc.modules.star import star
+    return new_module(star.MultiqcModule).parse_star_report(STAR_LOG)
+
+def bowtie2():
+    from multiqc.modules.bowtie2 import bowtie2
+    mod = new_module(bowtie2.MultiqcModule, bowtie2_data=dict(), num_se=0, num_pe=0)
+    mod.parse_bowtie2_logs(log_file(BOWTIE2_LOG, 'bt0.log'))
+    return mod.bowtie2_data
+
+def hisat2():
+    from multiqc.modules.hisat2 import hisat2
+    mod = new_module(hisat2.MultiqcModule, hisat2_data=dict())
+    mod.parse_hisat2_logs(log_file(HISAT2_LOG, 'hs0.log'))
+    return mod.hisat2_data
+
+def cutadapt():
+    from multiqc.modules.cutadapt import cutadapt
+    mod = new_module(cutadapt.MultiqcModule, cutadapt_data=dict(), cutadapt_length_counts=dict(),
+        cutadapt_length_exp=dict(), cutadapt_length_obsexp=dict())
+    mod.parse_cutadapt_logs(log_file(CUTADAPT_LOG, 'ca0.txt'))
+    return mod.cutadapt_data
+
+BENCHMARKS = [
+    ('Bismark alignment report', bismark_alignment),
+    ('Bismark deduplication report', bismark_dedup),
+    ('STAR Log.final.out', star),
+    ('Bowtie 2 log', bowtie2),
+    ('HISAT2 summary', hisat2),
+    ('Cutadapt report', cutadapt),
+]
+
+def time_per_call(func, repeats):
+    number = 200
+    return min(timeit.repeat(func, number=number, repeat=repeats)) / number * 1e6
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    combined_extractor = base_module.get_extractor
+    print("{:<30} {:>14} {:>14} {:>8}".format('Log', 'per-key (us)', 'combined (us)', 'speedup'))
+    for name, func in BENCHMARKS:
+        base_module.get_extractor = per_key_extractor
+        expected = func()
+        per_key = time_per_call(func, repeats)
+        base_module.get_extractor = combined_extractor
+        if func() != expected:
+            raise AssertionError("Different results for {}".format(name))
+        combined = time_per_call(func, repeats)
+        print("{:<30} {:>14.1f} {:>14.1f} {:>7.2f}x".format(name, per_key, combined, per_key / combined))
+
+if __name__ == '__main__':
+    main()
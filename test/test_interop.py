@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+""" Tests for reading InterOp binary files in multiqc.modules.interop.binary_metrics.
+The run folders in data/interop are small synthetic runs, with one version of each
+metric file. Their expected summaries (the .json file for each run folder) have been
+checked against the summary and index-summary from Illumina's InterOp library. """
+
+import glob
+import json
+import os
+import unittest
+
+from multiqc.modules.interop import binary_metrics
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'interop')
+
+def run_folder(name):
+    return os.path.join(DATA_DIR, name)
+
+class TestBinaryMetrics(unittest.TestCase):
+
+    def assertSummaryEqual(self, actual, expected, path=''):
+        """ Compare nested summary dicts, with floats to 6 significant figures """
+        if isinstance(expected, dict):
+            self.assertIsInstance(actual, dict, path)
+            self.assertEqual(sorted(actual.keys()), sorted(expected.keys()), path)
+            for k in expected:
+                self.assertSummaryEqual(actual[k], expected[k], '{}/{}'.format(path, k))
+        elif isinstance(expected, float):
+            self.assertAlmostEqual(actual, expected, delta=abs(expected) * 1e-6, msg=path)
+        else:
+            self.assertEqual(actual, expected, path)
+
+    def test_parse_run_folder(self):
+        expected_files = sorted(glob.glob(os.path.join(DATA_DIR, '*.json')))
+        self.assertEqual(len(expected_files), 4)
+        for fn in expected_files:
+            with open(fn) as fh:
+                expected = json.load(fh)
+            run_id, run_summary, index_summary, bytes_read = \
+                binary_metrics.parse_run_folder(os.path.join(fn[:-5], 'RunInfo.xml'))
+            self.assertEqual(run_id, expected['run_id'])
+            self.assertSummaryEqual(run_summary, expected['run_summary'], run_id)
+            self.assertSummaryEqual(index_summary, expected['index_summary'], run_id)
+            self.assertGreater(bytes_read, 0)
+
+    def test_tile_metrics_v3(self):
+        # The read number and the first value of cluster count records share offset 7
+        tiles = binary_metrics.read_tile_metrics(run_folder('RUN_t3_q5_e4_i2/InterOp/TileMetricsOut.bin'))
+        self.assertEqual(tiles['tiles'].tolist(), [(1 << 32) + 1101, (1 << 32) + 2101, (2 << 32) + 1101, (2 << 32) + 2101])
+        self.assertEqual(tiles['lane'].tolist(), [1, 1, 2, 2])
+        self.assertEqual(sorted(tiles['aligned'].keys()), [1, 2, 3])
+        self.assertTrue((tiles['clusters'] > 100000).all())
+        self.assertTrue((tiles['clusters_pf'] < tiles['clusters']).all())
+
+    def test_tile_metrics_v2(self):
+        tiles = binary_metrics.read_tile_metrics(run_folder('RUN_t2_q4_e3_i1/InterOp/TileMetricsOut.bin'))
+        self.assertEqual(tiles['lane'].tolist(), [1, 1, 2, 2])
+        self.assertEqual(sorted(tiles['phasing'].keys()), [1, 2, 3])
+        self.assertEqual(sorted(tiles['aligned'].keys()), [1, 2, 3])
+        self.assertTrue((tiles['density_pf'] < tiles['density']).all())
+
+    def test_q_metrics_binned(self):
+        # Version 5 binned files still have 50 bins, versions 6 and 7 only have the 7 bins
+        for name, num_bins in [('RUN_t2_q4_e3_i1', 50), ('RUN_t3_q5_e4_i2', 50),
+                               ('RUN_t2_q6_e5_i1', 7), ('RUN_t3_q7_e6_i2', 7)]:
+            records, qscores = binary_metrics.read_q_metrics(run_folder(name + '/InterOp/QMetricsOut.bin'))
+            self.assertEqual(records['hist'].shape, (2 * 2 * 12, num_bins), name)
+            self.assertEqual(len(qscores), num_bins, name)
+            self.assertEqual(sorted(set(records['cycle'].tolist())), list(range(1, 13)), name)
+        self.assertEqual(qscores.tolist(), [2, 14, 21, 27, 32, 36, 40])
+
+    def test_error_metrics(self):
+        # Error rates are only written for the cycles of the two 5 cycle, non-index reads
+        for name in ['RUN_t2_q4_e3_i1', 'RUN_t3_q5_e4_i2', 'RUN_t2_q6_e5_i1', 'RUN_t3_q7_e6_i2']:
+            records = binary_metrics.read_error_metrics(run_folder(name + '/InterOp/ErrorMetricsOut.bin'))
+            self.assertEqual(len(records), 2 * 2 * 10, name)
+            self.assertEqual(sorted(set(records['tile'].tolist())), [1101, 2101], name)
+            self.assertTrue(((records['error_rate'] > 0.1) & (records['error_rate'] < 1.5)).all(), name)
+
+    def test_index_metrics(self):
+        for name in ['RUN_t2_q4_e3_i1', 'RUN_t3_q5_e4_i2']:
+            records = binary_metrics.read_index_metrics(run_folder(name + '/InterOp/IndexMetricsOut.bin'))
+            self.assertEqual(len(records), 2 * 2 * 3, name)
+            lane, tile, read, index_name, count, sample, project = records[0]
+            self.assertEqual((lane, tile, read, index_name, sample, project),
+                             (1, 1101, 2, 'ACGTACGT-TTGGCCAA', 'S1', 'ProjA'), name)
+
+if __name__ == '__main__':
+    unittest.main()